@@ -56,6 +56,14 @@ import io_tools.import_dro
 reload(io_tools.import_dro)
 import io_tools.propagate
 reload(io_tools.propagate)
+import io_tools.pipeline
+reload(io_tools.pipeline)
+import io_tools.uploads
+reload(io_tools.uploads)
+import io_tools.export_manager
+reload(io_tools.export_manager)
+import plotting_tools.rendering
+reload(plotting_tools.rendering)
 import dicom_tools.create_roicol
 reload(dicom_tools.create_roicol)
 import dro_tools.create_dro
@@ -70,12 +78,17 @@ from io_tools.download_data import DataDownloader
 from io_tools.import_data import DataImporter
 from io_tools.import_dro import DroImporter
 from io_tools.propagate import Propagator
+from io_tools.pipeline import download_and_import_data
+from io_tools.uploads import UploadManager
+from io_tools.export_manager import ExportManager
+from plotting_tools.rendering import PlotManager
 from dicom_tools.create_roicol import RoicolCreator
 from dro_tools.create_dro import DroCreator
 
 
 def main(
-        xnatCfgFname='xnatCfg', printSummary=False, plotResults=False):
+        xnatCfgFname='xnatCfg', printSummary=False, plotResults=False,
+        pipelined=True, bgUploads=True, bgPlots=True, bgExports=True):
     """
     Main script for fetching the config settings, downloading data from XNAT,
     importing of source ROI Collection and source and target DICOM series, 
@@ -92,6 +105,29 @@ def main(
         If True, summarising results will be printed. The default is False.
     plotResults : bool, optional
         If True, results will be printed. The default is False.
+    pipelined : bool, optional
+        If True, the downloading and importing of the source and target data,
+        and the search for a DRO, will be overlapped (see io_tools.pipeline).
+        If False, they will be run sequentially. The default is True.
+    bgUploads : bool, optional
+        If True, the new ROI Collection and DRO will be uploaded from memory
+        concurrently on background workers (see io_tools.uploads), with their
+        exports to disk (if applicable) written asynchronously, and the run
+        will finish once the uploads have been acknowledged. If False, they
+        will be exported and uploaded sequentially. The default is True.
+    bgPlots : bool, optional
+        If True (and plotResults and the config setting exportPlots are True),
+        the plots will be rendered and exported on background worker processes
+        using a non-interactive backend (see plotting_tools.rendering), and the
+        run will finish once they have been exported. If False, they will be
+        rendered sequentially. The default is True.
+    bgExports : bool, optional
+        If True, the exports of images, label images and transforms (if 
+        applicable) will be compressed, deduplicated and written on background
+        workers (see io_tools.export_manager), as too will the exports of the
+        new ROI Collection and DRO if bgUploads is False, and the run will 
+        finish once they have been written. If False, they will be exported 
+        sequentially. The default is True.
     
     Returns
     -------
@@ -114,38 +150,53 @@ def main(
     # (use or creating an XNAT Alias Token), download the data and create
     # pathsDict:
     params = DataDownloader(cfgObj)
-    params.download_and_get_pathsDict()
     
-    # Instantiate a DataImporter object for source and import the data:
-    srcDataset = DataImporter(params, 'src')
-    srcDataset.import_data(params)
-    
-    # Instantiate a DataImporter object for target and import the data:
-    trgDataset = DataImporter(params, 'trg')
-    trgDataset.import_data(params)
-    
-    # Check whether the RTS/SEG of interest intersects the target image's
-    # extent:
-    cfgObj.get_intersection_of_roi_and_trgIm(srcDataset, trgDataset, params)
-    
-    # Determine which use case applies (and will be applied):
-    cfgObj.which_use_case(srcDataset, trgDataset, params)
+    if pipelined:
+        # Download and import the source and target data, determine which use
+        # case applies and fetch the DRO (if applicable), with independent 
+        # stages overlapped:
+        srcDataset, trgDataset, droObj, pipeline = download_and_import_data(
+            cfgObj, params
+            )
+        
+        pipeline.print_summary()
+    else:
+        params.download_and_get_pathsDict()
+        
+        # Instantiate a DataImporter object for source and import the data:
+        srcDataset = DataImporter(params, 'src')
+        srcDataset.import_data(params)
+        
+        # Instantiate a DataImporter object for target and import the data:
+        trgDataset = DataImporter(params, 'trg')
+        trgDataset.import_data(params)
+        
+        # Check whether the RTS/SEG of interest intersects the target image's
+        # extent:
+        cfgObj.get_intersection_of_roi_and_trgIm(
+            srcDataset, trgDataset, params
+            )
+        
+        # Determine which use case applies (and will be applied):
+        cfgObj.which_use_case(srcDataset, trgDataset, params)
+        
+        # Instantiate a DROImporter object and fetch the DRO (if applicable):
+        droObj = DroImporter(params)
     
     if params.cfgDict['p2c']:
         print(f"runID = {params.cfgDict['runID']}")
         print(f"useCaseThatApplies = {params.cfgDict['useCaseThatApplies']}")
         print(f"useCaseToApply = {params.cfgDict['useCaseToApply']}\n")
     
-    # Instantiate a DROImporter object and fetch the DRO (if applicable):
-    droObj = DroImporter(params)
-    
     #times.append(time.time())
     #dTime = times[-1] - times[-2]
     
     # Instantiate a Propagator object and copy/propagate the source ROI
     # Collection to the target dataset:
     newDataset = Propagator(srcDataset, trgDataset, params)
-    newDataset.execute(srcDataset, trgDataset, params, droObj.dro)
+    newDataset.execute(
+        srcDataset, trgDataset, params, droObj.dro, droObj.txPath
+        )
     
     #times.append(time.time())
     #dTime = times[-1] - times[-2]
@@ -153,32 +204,101 @@ def main(
     if printSummary:
         newDataset.print_summary_of_results(srcDataset, trgDataset)
     
+    cfgDict = params.cfgDict
+    
+    if bgExports:
+        exporter = ExportManager(
+            useCompression=cfgDict['compressExports'],
+            dedupe=cfgDict['dedupeExports']
+            )
+    else:
+        exporter = None
+    
+    # Export the images, label images and transforms (conditional):
+    if cfgDict['exportIm']:
+        srcDataset.export_dicom_image(params, exporter=exporter)
+        trgDataset.export_dicom_image(params, exporter=exporter)
+    if cfgDict['exportLabim']:
+        newDataset.export_labims(
+            srcDataset, trgDataset, params, exporter=exporter
+            )
+    if cfgDict['exportTx']:
+        newDataset.export_txs_and_params(
+            srcDataset, trgDataset, params, exporter=exporter
+            )
+    
+    if plotResults and bgPlots and cfgDict['exportPlots']:
+        plotter = PlotManager(
+            thumbnails=cfgDict['exportPlotThumbs'],
+            thumbDpi=cfgDict['plotThumbDpi']
+            )
+    else:
+        plotter = None
+    
     if plotResults:
-        newDataset.plot_metric_v_iters(params)
-        newDataset.plot_res_results(srcDataset, trgDataset, params)
+        newDataset.plot_metric_v_iters(params, plotter=plotter)
+        newDataset.plot_res_results(
+            srcDataset, trgDataset, params, plotter=plotter
+            )
         newDataset.plot_roi_over_dicom_im(
-            srcDataset, trgDataset, params
+            srcDataset, trgDataset, params, plotter=plotter
             )
     
     # Instantiate RoicolCreator, create the new ROI Collection, check
     # for errors, export, upload to XNAT, and plot results 
     # (conditional):
+    uploader = UploadManager() if bgUploads else None
+    
+    # The new ROI Collection and DRO are exported on the workers of uploader
+    # (concurrently with their uploads) if applicable, or else of exporter:
+    writer = uploader if uploader is not None else exporter
+    
     roicolObj = RoicolCreator()
     roicolObj.create_roicol(srcDataset, trgDataset, newDataset, params)
     roicolObj.error_check_roicol(srcDataset, trgDataset, newDataset, params)
-    roicolObj.export_roicol(params)
-    roicolObj.upload_roicol(params)
+    roicolObj.export_roicol(params, uploader=writer)
+    roicolObj.upload_roicol(params, uploader=uploader)
     if plotResults:
         roicolObj.plot_roi_over_dicoms(
-            srcDataset, trgDataset, newDataset, params
+            srcDataset, trgDataset, newDataset, params, plotter=plotter
             )
     
     # Instantiate a DroCreator object, create a new DRO, export it to
     # disk, and upload to XNAT:
     newDroObj = DroCreator(newDataset, params)
     newDroObj.create_dro(srcDataset, trgDataset, newDataset, params)
-    newDroObj.export_dro(params)
-    newDroObj.upload_dro(params)
+    newDroObj.export_dro(params, uploader=writer)
+    newDroObj.upload_dro(params, uploader=uploader)
+    
+    if uploader is not None:
+        # Wait for the uploads (and exports) to complete:
+        uploader.wait()
+        
+        timingMsg = "Took [*] to complete the uploads.\n"
+        params.add_timestamp(timingMsg)
+        
+        if printSummary:
+            uploader.print_summary()
+    
+    if exporter is not None:
+        # Wait for the exports to be written:
+        exporter.flush()
+        
+        timingMsg = "Took [*] to complete the exports.\n"
+        params.add_timestamp(timingMsg)
+        
+        if printSummary:
+            exporter.print_summary()
+    
+    if plotter is not None:
+        # Wait for the plots to be exported:
+        plotter.wait()
+        
+        timingMsg = "Took [*] to complete the plots.\n"
+        params.add_timestamp(timingMsg)
+        
+        if printSummary:
+            plotter.print_summary()
     
     timingMsg = "Took total of [*] to execute the run.\n"
     params.add_timestamp(timingMsg)
@@ -226,7 +346,39 @@ if __name__ == '__main__':
         help="Plot results if True"
         )
     
+    parser.add_argument(
+        "--blockingUploads", 
+        action="store_true",
+        help="Export and upload the new ROI Collection and DRO sequentially" +\
+            " (rather than in the background) if True"
+        )
+    
+    parser.add_argument(
+        "--blockingPlots", 
+        action="store_true",
+        help="Render and export the plots sequentially (rather than in the " +\
+            "background) if True"
+        )
+    
+    parser.add_argument(
+        "--blockingExports", 
+        action="store_true",
+        help="Export the images, label images and transforms " +\
+            "sequentially (rather than in the background) if True"
+        )
+    
+    parser.add_argument(
+        "--sequential", 
+        action="store_true",
+        help="Download and import the data sequentially (rather than " +\
+            "pipelined) if True"
+        )
+    
     args = parser.parse_args()
     
     #main(args.cfgDir, args.runID, args.printSummary, args.plotResults)
-    main(args.xnatCfgFname, args.printSummary, args.plotResults)
\ No newline at end of file
+    main(
+        args.xnatCfgFname, args.printSummary, args.plotResults, 
+        not args.sequential, not args.blockingUploads, not args.blockingPlots,
+        not args.blockingExports
+        )
\ No newline at end of file
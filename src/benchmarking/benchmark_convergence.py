@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 15:21:09 2026
+
+@author: ctorti
+"""
+
+
+
+"""
+Benchmark of adaptive convergence (image_tools.convergence) v the fixed
+schedule for registration.
+
+Note:
+The synthetic source and target DICOM series for use cases 5a and 5b (see
+benchmark_propagation.create_benchmark_data) are registered using
+rigid_reg_im (affine) and/or bspline_reg_im with and without a
+ConvergenceController. The time saved and the difference in the final
+metric value (evaluated with a common, regular sampling - see
+image_tools.registering.evaluate_reg_metric) are reported.
+"""
+
+import os
+import sys
+
+#code_root = r'C:\Code\WP1.3_multiple_modalities\src'
+code_root = os.getcwd()
+
+# Add code_root to the system path so packages can be imported from it:
+sys.path.append(code_root)
+
+import time
+import json
+import shutil
+import argparse
+import platform
+from pathlib import Path
+from statistics import median
+import SimpleITK as sitk
+from image_tools.registering import (
+    rigid_reg_im, bspline_reg_im, evaluate_reg_metric
+    )
+from image_tools.convergence import ConvergenceController
+from benchmarking.benchmark_propagation import (
+    SIZE_PRESETS, create_benchmark_cfgDict, create_benchmark_data
+    )
+
+
+def import_series(dicomDir):
+    """
+    Import a DICOM series as a SimpleITK Image.
+    """
+
+    reader = sitk.ImageSeriesReader()
+    reader.SetFileNames(reader.GetGDCMSeriesFileNames(dicomDir))
+
+    return sitk.Cast(reader.Execute(), sitk.sitkFloat32)
+
+def run_registration(fixIm, movIm, regTxName, adaptive=False, numIters=None):
+    """
+    Run a registration with or without adaptive convergence.
+
+    Parameters
+    ----------
+    fixIm : SimpleITK Image
+        The fixed (target) image.
+    movIm : SimpleITK Image
+        The moving (source) image.
+    regTxName : str
+        'rigid', 'affine' or 'bspline'.
+    adaptive : bool, optional
+        If True a ConvergenceController will be used. The default value is
+        False.
+    numIters : int, optional
+        The maximum number of iterations. If None the defaults of
+        rigid_reg_im/bspline_reg_im will be used. The default value is None.
+
+    Returns
+    -------
+    result : dict
+        Dictionary with keys 'time', 'numIters', 'evalMetric' and 'log'.
+    """
+
+    controller = ConvergenceController() if adaptive else None
+
+    kwargs = {}
+    if numIters:
+        kwargs['numIters'] = numIters
+
+    t0 = time.perf_counter()
+
+    if regTxName == 'bspline':
+        _, _, finalTx, _, metricValues, _ = bspline_reg_im(
+            fixIm=fixIm, movIm=movIm, controller=controller, **kwargs
+            )
+    else:
+        _, _, finalTx, _, metricValues, _ = rigid_reg_im(
+            fixIm=fixIm, movIm=movIm, regTxName=regTxName,
+            initMethod='geometry', controller=controller, **kwargs
+            )
+
+    dTime = time.perf_counter() - t0
+
+    result = {
+        'time' : dTime,
+        'numIters' : len(metricValues),
+        'evalMetric' : evaluate_reg_metric(fixIm, movIm, finalTx),
+        'log' : controller.log if controller else []
+        }
+
+    return result
+
+def print_results(results):
+    """
+    Print the median time, iterations and final metric value for the fixed
+    and adaptive schedules, and the time saved and metric difference.
+    """
+
+    print('\n\nADAPTIVE CONVERGENCE RESULTS\n****************************')
+    print(f"{'case':<24} {'fixed (s)':>10} {'adapt (s)':>10} "
+          f"{'saved':>7} {'fixed iters':>12} {'adapt iters':>12} "
+          f"{'metric diff':>12}")
+
+    for caseID, result in results.items():
+        fixed = result['fixed']
+        adapt = result['adaptive']
+
+        fixedTime = median([item['time'] for item in fixed])
+        adaptTime = median([item['time'] for item in adapt])
+        fixedIters = median([item['numIters'] for item in fixed])
+        adaptIters = median([item['numIters'] for item in adapt])
+        fixedMetric = median([item['evalMetric'] for item in fixed])
+        adaptMetric = median([item['evalMetric'] for item in adapt])
+
+        saved = 100*(fixedTime - adaptTime)/fixedTime
+
+        # A positive difference means the adaptive result is worse:
+        metricDiff = adaptMetric - fixedMetric
+
+        print(f'{caseID:<24} {fixedTime:10.2f} {adaptTime:10.2f} '
+              f'{saved:6.1f}% {fixedIters:12.0f} {adaptIters:12.0f} '
+              f'{metricDiff:12.5f}')
+
+def main(
+        useCases=['5a', '5b'], sizeLabels=['tiny'], regTxNames=['affine'],
+        numRepeats=3, numIters=None, benchmarkDir=None, keepData=False,
+        p2c=False
+        ):
+    """
+    Run the adaptive convergence benchmark.
+
+    Parameters
+    ----------
+    useCases : list of strs, optional
+        The use cases ('5a' and/or '5b') whose datasets will be registered.
+        The default value is ['5a', '5b'].
+    sizeLabels : list of strs, optional
+        The size presets (see SIZE_PRESETS in benchmark_propagation). The
+        default value is ['tiny'].
+    regTxNames : list of strs, optional
+        The registration transforms ('rigid', 'affine' and/or 'bspline'). The
+        default value is ['affine'].
+    numRepeats : int, optional
+        The number of repeats for each schedule (the median is reported). The
+        default value is 3.
+    numIters : int, optional
+        The maximum number of iterations. If None the defaults of
+        rigid_reg_im/bspline_reg_im will be used. The default value is None.
+    benchmarkDir : str, optional
+        The directory for the benchmark data and results. If None
+        outputs/benchmarks (relative to the current working directory) will
+        be used. The default value is None.
+    keepData : bool, optional
+        If True the synthetic data will not be deleted. The default value is
+        False.
+    p2c : bool, optional
+        If True some results will be printed to the console. The default value
+        is False.
+
+    Returns
+    -------
+    results : dict
+        Dictionary (with case IDs as keys) of dictionaries (with keys 'fixed'
+        and 'adaptive') of a list (for each repeat) of the results of
+        run_registration.
+    """
+
+    for useCase in useCases:
+        if not useCase in ['5a', '5b']:
+            msg = f"useCase = '{useCase}' is not valid. Acceptable values are"\
+                + " '5a' and '5b'."
+            raise Exception(msg)
+
+    for sizeLabel in sizeLabels:
+        if not sizeLabel in SIZE_PRESETS:
+            msg = f"sizeLabel = '{sizeLabel}' is not valid. Acceptable "\
+                + f"values are {list(SIZE_PRESETS.keys())}."
+            raise Exception(msg)
+
+    if benchmarkDir is None:
+        benchmarkDir = os.path.join(os.getcwd(), 'outputs', 'benchmarks')
+
+    results = {}
+
+    for sizeLabel in sizeLabels:
+        size = SIZE_PRESETS[sizeLabel]['size']
+        spacings = SIZE_PRESETS[sizeLabel]['spacings']
+
+        for useCase in useCases:
+            dataID = f'convergence_{useCase}_{sizeLabel}'
+            caseDir = os.path.join(benchmarkDir, dataID)
+
+            if os.path.isdir(caseDir):
+                shutil.rmtree(caseDir)
+
+            cfgDict = create_benchmark_cfgDict(
+                dataID, useCase, 'SEG', caseDir, p2c=p2c
+                )
+
+            cfgDict = create_benchmark_data(
+                cfgDict, useCase, size, spacings, p2c
+                )
+
+            fixIm = import_series(cfgDict['trgDicomDir'])
+            movIm = import_series(cfgDict['srcDicomDir'])
+
+            for regTxName in regTxNames:
+                caseID = f'{useCase}_{regTxName}_{sizeLabel}'
+
+                print(f'\nBenchmarking {caseID}...\n')
+
+                results[caseID] = {'fixed' : [], 'adaptive' : []}
+
+                for i in range(numRepeats):
+                    for schedule in ['fixed', 'adaptive']:
+                        results[caseID][schedule].append(
+                            run_registration(
+                                fixIm, movIm, regTxName,
+                                adaptive=schedule == 'adaptive',
+                                numIters=numIters
+                                )
+                            )
+
+            if not keepData:
+                shutil.rmtree(caseDir)
+
+    print_results(results)
+
+    fname = time.strftime('%Y%m%d_%H%M%S') + '_convergence.json'
+    fpath = os.path.join(benchmarkDir, fname)
+
+    if not os.path.isdir(benchmarkDir):
+        Path(benchmarkDir).mkdir(parents=True)
+
+    with open(fpath, 'w') as file:
+        json.dump(
+            {'platform' : platform.platform(), 'results' : results},
+            file, indent=2
+            )
+
+    print(f'\nResults exported to:\n {fpath}\n')
+
+    return results
+
+if __name__ == '__main__':
+    """
+    Run benchmark_convergence.py as a script (from src/).
+
+    Example usage in a console:
+
+    python benchmarking/benchmark_convergence.py
+
+    or
+
+    python benchmarking/benchmark_convergence.py --sizeLabels small
+    --regTxNames affine bspline --numRepeats 5
+    """
+
+    parser = argparse.ArgumentParser(description='Arguments for main()')
+
+    parser.add_argument(
+        "--useCases",
+        nargs='+', default=['5a', '5b'],
+        help="Use cases whose datasets will be registered (default is 5a 5b)"
+        )
+
+    parser.add_argument(
+        "--sizeLabels",
+        nargs='+', default=['tiny'],
+        help=f"Size presets to benchmark from {list(SIZE_PRESETS.keys())} "
+        + "(default is tiny)"
+        )
+
+    parser.add_argument(
+        "--regTxNames",
+        nargs='+', default=['affine'],
+        help="Registration transforms (default is affine)"
+        )
+
+    parser.add_argument(
+        "--numRepeats",
+        type=int, default=3,
+        help="Number of repeats for each schedule (default is 3)"
+        )
+
+    parser.add_argument(
+        "--numIters",
+        type=int, default=None,
+        help="Maximum number of iterations (default is the defaults of "
+        + "rigid_reg_im/bspline_reg_im)"
+        )
+
+    parser.add_argument(
+        "--benchmarkDir",
+        nargs='?', default=None,
+        help="Directory for benchmark data and results (default is "
+        + "outputs/benchmarks)"
+        )
+
+    parser.add_argument(
+        "--keepData",
+        action="store_true",
+        help="Keep the synthetic data if True"
+        )
+
+    parser.add_argument(
+        "--p2c",
+        action="store_true",
+        help="Print results to the console if True"
+        )
+
+    args = parser.parse_args()
+
+    main(
+        args.useCases, args.sizeLabels, args.regTxNames, args.numRepeats,
+        args.numIters, args.benchmarkDir, args.keepData, args.p2c
+        )
@@ -0,0 +1,869 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 14:02:37 2026
+
+@author: ctorti
+"""
+
+
+
+"""
+Benchmark suite for the ROI Collection copy/propagation workflow using
+synthetic data.
+
+Note:
+The scripts in testing/ require a live XNAT and real patient data so
+timings cannot be reproduced. This script generates synthetic DICOM series
+(see benchmarking.synthetic_data) with matching RTSTRUCT or SEG ROI
+Collections for each use case (1 to 5b) and runs the same steps as app.main
+(DataImporter, Propagator, RoicolCreator and DroCreator) offline, i.e. the
+download and upload steps are skipped.
+
+The time taken for each step and the peak memory used are recorded for each
+case and appended to a JSON file containing the history of benchmark runs.
+The results for the current run are compared to the median of the previous
+runs for the same case so that regressions can be identified.
+
+Each case is run in a separate (spawned) process so that the peak memory
+reported is specific to that case.
+"""
+
+import os
+import sys
+
+#code_root = r'C:\Code\WP1.3_multiple_modalities\src'
+code_root = os.getcwd()
+
+# Add code_root to the system path so packages can be imported from it:
+sys.path.append(code_root)
+
+import time
+import json
+import shutil
+import threading
+import argparse
+import platform
+import tracemalloc
+import multiprocessing
+from pathlib import Path
+from statistics import median
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from io_tools.fetch_configs import get_global_vars, ConfigFetcher
+from io_tools.download_data import DataDownloader
+from io_tools.import_data import DataImporter
+from io_tools.propagate import Propagator
+from dicom_tools.create_roicol import RoicolCreator
+from dro_tools.create_dro import DroCreator
+from benchmarking.synthetic_data import (
+    get_direction_from_orientation, get_origin_for_centre, get_phantom_spec,
+    create_synthetic_series, create_synthetic_roicol, create_phantom_tx
+    )
+try:
+    import resource
+except ImportError:
+    # resource is not available on Windows:
+    resource = None
+
+
+# The image sizes and voxel spacings for each size preset. All presets have
+# a physical extent of 256 mm along each direction:
+SIZE_PRESETS = {
+    'tiny' : {'size' : [64, 64, 64], 'spacings' : [4, 4, 4]},
+    'small' : {'size' : [128, 128, 128], 'spacings' : [2, 2, 2]},
+    'medium' : {'size' : [256, 256, 256], 'spacings' : [1, 1, 1]},
+    'large' : {'size' : [512, 512, 512], 'spacings' : [0.5, 0.5, 0.5]},
+    'xlarge' : {'size' : [512, 512, 1000], 'spacings' : [0.5, 0.5, 0.256]}
+    }
+
+USE_CASES = ['1', '2a', '2b', '3a', '3b', '4a', '4b', '5a', '5b']
+
+
+class BenchmarkConfigFetcher(ConfigFetcher):
+    """
+    This class provides the methods of ConfigFetcher (e.g. which_use_case)
+    for a configuration dictionary that was created for a benchmark case
+    rather than imported from an XNAT config file.
+
+    Parameters
+    ----------
+    cfgDict : dict
+        Dictionary containing the parameters for the benchmark case.
+
+    Returns
+    -------
+    self.globalVars : dict
+        Dictionary containing the global variables.
+    self.cfgDict : dict
+        Same as input argument cfgDict.
+    self.runID : str
+        The ID for the run.
+    """
+
+    def __init__(self, cfgDict):
+        self.globalVars = get_global_vars()
+        self.cfgDict = cfgDict
+        self.runID = cfgDict['runID']
+
+class BenchmarkParams(DataDownloader):
+    """
+    This class stands in for DataDownloader (the object with variable name
+    'params' used in subsequent classes) without establishing a connection to
+    XNAT.
+
+    Parameters
+    ----------
+    cfgObj : BenchmarkConfigFetcher Object
+        Contains the parameters (cfgDict) for the benchmark case.
+
+    Returns
+    -------
+    self.cfgDict : dict
+        Dictionary containing the parameters for the benchmark case.
+    self.xnatSession : None
+        No XNAT session is established.
+    self.timings : list of floats
+        List of timestamps.
+    self.timingMsgs : list of strs
+        List of timing messages.
+    """
+
+    def __init__(self, cfgObj):
+        self.cfgDict = cfgObj.cfgDict
+        self.aliasToken = {}
+        self.xnatSession = None
+        self.pathsDict = None
+
+        # Initialise list of timestamps and timing messages to be stored:
+        self.timings = [time.time()]
+        self.timingMsgs = []
+
+        self.timingsByThread = {}
+        self.timingLock = threading.Lock()
+        self.pathsDictLock = threading.Lock()
+
+def create_benchmark_cfgDict(
+        caseID, useCase, roicolMod, caseDir, regTxName='affine', p2c=False
+        ):
+    """
+    Create the configuration dictionary for a benchmark case.
+
+    The global variables (global_variables.json) are used as default values.
+    Parameters that would otherwise be defined in the XNAT config file are
+    given dummy values.
+
+    Parameters
+    ----------
+    caseID : str
+        The ID for the benchmark case (used as the runID).
+    useCase : str
+        The use case to be benchmarked.
+    roicolMod : str
+        'RTSTRUCT' or 'SEG'.
+    caseDir : str
+        The directory for the data and outputs of the benchmark case.
+    regTxName : str, optional
+        The registration transform name. The default value is 'affine'.
+    p2c : bool, optional
+        If True some results will be printed to the console. The default value
+        is False.
+
+    Returns
+    -------
+    cfgDict : dict
+        Dictionary containing the parameters for the benchmark case.
+    """
+
+    cwd = os.getcwd()
+
+    cfgDict = get_global_vars()
+
+    cfgDict.update({
+        'runID' : caseID,
+        'url' : '',
+        'username' : '',
+        'projID' : 'BENCHMARK',
+        'subjLab' : 'SYNTH001',
+        'srcExpLab' : 'Synthetic',
+        'srcScanID' : '1',
+        'srcSlcNum' : None,
+        'srcRoicolName' : None,
+        'srcRoiName' : None,
+        'roicolMod' : roicolMod,
+        'trgExpLab' : 'Synthetic',
+        'trgScanID' : '2',
+        'trgSlcNum' : None,
+        'trgRoicolName' : None,
+        'trgRoiName' : None,
+        'srcFidsFname' : None,
+        'trgFidsFname' : None,
+        'forceReg' : False,
+        'useDroForTx' : False,
+        'regTxName' : regTxName,
+        'initMethod' : 'geometry',
+        'exportRoicol' : True,
+        'exportDro' : True,
+        'exportTx' : False,
+        'exportIm' : False,
+        'exportLabim' : False,
+        'exportPlots' : False,
+        'exportLogs' : False,
+        'uploadDro' : False,
+        'p2c' : p2c,
+        'cwd' : cwd,
+        'inputsDir' : os.path.join(caseDir, 'inputs'),
+        'outputsDir' : os.path.join(caseDir, 'outputs'),
+        'sampleDroDir' : os.path.join(cwd, 'inputs', 'sample_DROs'),
+        'fidsDir' : os.path.join(cwd, 'inputs', 'fiducials'),
+        'srcDicomDir' : os.path.join(caseDir, 'inputs', 'src_dicoms'),
+        'trgDicomDir' : os.path.join(caseDir, 'inputs', 'trg_dicoms'),
+        'srcRoicolFpath' : os.path.join(caseDir, 'inputs', 'src_roicol.dcm'),
+        'trgRoicolFpath' : None
+        })
+
+    for key, dirName in [
+            ('rtsExportDir', 'roicols'), ('segExportDir', 'roicols'),
+            ('droExportDir', 'dros'), ('txExportDir', 'transforms'),
+            ('imExportDir', 'images'), ('labimExportDir', 'label_images'),
+            ('logsExportDir', 'logs'), ('rtsPlotsExportDir', 'plots_rts'),
+            ('segPlotsExportDir', 'plots_seg'),
+            ('resPlotsExportDir', 'plots_res'),
+            ('dispFieldDir', 'displacement_fields'),
+            ('regCacheDir', 'reg_cache')
+            ]:
+        cfgDict[key] = os.path.join(caseDir, 'outputs', dirName)
+
+    return cfgDict
+
+def create_benchmark_data(cfgDict, useCase, size, spacings, p2c=False):
+    """
+    Create the synthetic source and target DICOM series and source ROI
+    Collection for a use case.
+
+    The source series is an axial series centred on (0, 0, 0). The target
+    series is:
+        -- '1': the source series
+        -- '2a'/'2b': a new series with the same geometry and FOR
+        -- '3a'/'3b': a new series with larger voxels in the same FOR
+        -- '4a'/'4b': a new coronal series in the same FOR
+        -- '5a'/'5b': a new series in a different FOR, with the phantom
+        moved by a rigid transform
+
+    For use cases '1', '2a', '3a', '4a' and '5a' srcSlcNum and trgSlcNum are
+    added to cfgDict (and srcRoiName is set to the first ROI).
+
+    Parameters
+    ----------
+    cfgDict : dict
+        Dictionary containing the parameters for the benchmark case.
+    useCase : str
+        The use case to be benchmarked.
+    size : list of ints
+        The source image size.
+    spacings : list of floats
+        The source voxel spacings.
+    p2c : bool, optional
+        If True some results will be printed to the console. The default value
+        is False.
+
+    Returns
+    -------
+    cfgDict : dict
+        Updated dictionary of the parameters for the benchmark case.
+    """
+
+    if not useCase in USE_CASES:
+        msg = f"useCase = '{useCase}' is not valid. Acceptable values are "\
+            + f"{USE_CASES}."
+        raise Exception(msg)
+
+    srcDicomDir = cfgDict['srcDicomDir']
+    trgDicomDir = cfgDict['trgDicomDir']
+
+    extent = [size[i]*spacings[i] for i in range(3)]
+
+    blobs, rois = get_phantom_spec(extent=extent)
+
+    axial = get_direction_from_orientation('axial')
+
+    studyuid, _, foruid, _ = create_synthetic_series(
+        srcDicomDir, size, spacings, direction=axial, blobs=blobs,
+        seriesNum=1, p2c=p2c
+        )
+
+    create_synthetic_roicol(
+        srcDicomDir, cfgDict['srcRoicolFpath'], rois, cfgDict['roicolMod'],
+        p2c
+        )
+
+    if useCase == '1':
+        cfgDict['trgDicomDir'] = srcDicomDir
+        cfgDict['trgScanID'] = cfgDict['srcScanID']
+    elif useCase in ['2a', '2b']:
+        create_synthetic_series(
+            trgDicomDir, size, spacings, direction=axial, blobs=blobs,
+            studyuid=studyuid, foruid=foruid, seriesNum=2, p2c=p2c
+            )
+    elif useCase in ['3a', '3b']:
+        trgSpacings = [1.25*item for item in spacings]
+        trgSize = [int(round(size[i]/1.25)) for i in range(3)]
+
+        create_synthetic_series(
+            trgDicomDir, trgSize, trgSpacings, direction=axial, blobs=blobs,
+            studyuid=studyuid, foruid=foruid, seriesNum=2, p2c=p2c
+            )
+    elif useCase in ['4a', '4b']:
+        coronal = get_direction_from_orientation('coronal')
+
+        # Swap the slice and column dimensions so that the physical extent
+        # is preserved:
+        trgSize = [size[0], size[2], size[1]]
+        trgSpacings = [spacings[0], spacings[2], spacings[1]]
+
+        create_synthetic_series(
+            trgDicomDir, trgSize, trgSpacings,
+            origin=get_origin_for_centre(trgSize, trgSpacings, coronal),
+            direction=coronal, blobs=blobs, studyuid=studyuid,
+            foruid=foruid, seriesNum=2, p2c=p2c
+            )
+    else:
+        phantomTx = create_phantom_tx(centre=[0, 0, 0])
+
+        create_synthetic_series(
+            trgDicomDir, size, spacings, direction=axial, blobs=blobs,
+            studyuid=studyuid, seriesNum=2, phantomTx=phantomTx, p2c=p2c
+            )
+
+    if useCase in ['1', '2a', '3a', '4a', '5a']:
+        # Use the source slice nearest the centre of the first ROI and the
+        # middle slice of the target:
+        origin = get_origin_for_centre(size, spacings, axial)
+
+        srcSlcNum = int(round(
+            (rois[0]['centre'][2] - origin[2])/spacings[2]
+            ))
+
+        trgSlcNum = len(os.listdir(cfgDict['trgDicomDir']))//2
+
+        if useCase == '1':
+            # Copy to a different slice in the same series:
+            trgSlcNum = min(srcSlcNum + 2, size[2] - 1)
+
+        cfgDict['srcSlcNum'] = srcSlcNum
+        cfgDict['trgSlcNum'] = trgSlcNum
+        cfgDict['srcRoiName'] = rois[0]['label']
+
+    return cfgDict
+
+def get_peak_memory():
+    """
+    Get the peak resident set size of the current process.
+
+    Parameters
+    ----------
+    None.
+
+    Returns
+    -------
+    peakMem : float or None
+        The peak resident set size in MiB, or None if it cannot be determined
+        (e.g. on Windows).
+    """
+
+    if resource is None:
+        return None
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS and in KiB on Linux:
+    if platform.system() == 'Darwin':
+        return maxrss/1024**2
+    else:
+        return maxrss/1024
+
+def run_benchmark_case(
+        useCase, roicolMod, sizeLabel, benchmarkDir, regTxName='affine',
+        keepData=False, p2c=False
+        ):
+    """
+    Run a benchmark case.
+
+    The synthetic data is created, then the steps in app.main (other than the
+    download and upload steps) are run and timed.
+
+    Parameters
+    ----------
+    useCase : str
+        The use case to be benchmarked.
+    roicolMod : str
+        'RTSTRUCT' or 'SEG'.
+    sizeLabel : str
+        The key of the size preset in SIZE_PRESETS.
+    benchmarkDir : str
+        The directory for the benchmark data and outputs.
+    regTxName : str, optional
+        The registration transform name (used for use cases '5a' and '5b').
+        The default value is 'affine'.
+    keepData : bool, optional
+        If True the synthetic data and outputs will not be deleted. The
+        default value is False.
+    p2c : bool, optional
+        If True some results will be printed to the console. The default value
+        is False.
+
+    Returns
+    -------
+    result : dict
+        Dictionary containing the case ID, parameters, the time taken for each
+        step (stageTimes), the total time, the peak memory (as traced by
+        tracemalloc and as the peak resident set size), the timing messages
+        and the error message (if the case failed).
+    """
+
+    caseID = f'{useCase}_{roicolMod}_{sizeLabel}'
+    caseDir = os.path.join(benchmarkDir, 'cases', caseID)
+
+    size = SIZE_PRESETS[sizeLabel]['size']
+    spacings = SIZE_PRESETS[sizeLabel]['spacings']
+
+    result = {
+        'caseID' : caseID,
+        'useCase' : useCase,
+        'roicolMod' : roicolMod,
+        'sizeLabel' : sizeLabel,
+        'size' : size,
+        'spacings' : spacings,
+        'regTxName' : regTxName,
+        'stageTimes' : {},
+        'totalTime' : None,
+        'tracedPeakMem' : None,
+        'peakRss' : None,
+        'timingMsgs' : [],
+        'error' : None
+        }
+
+    stageTimes = result['stageTimes']
+
+    if os.path.isdir(caseDir):
+        shutil.rmtree(caseDir)
+
+    cfgDict = create_benchmark_cfgDict(
+        caseID, useCase, roicolMod, caseDir, regTxName, p2c
+        )
+
+    try:
+        t0 = time.perf_counter()
+        cfgDict = create_benchmark_data(cfgDict, useCase, size, spacings, p2c)
+        stageTimes['create_synthetic_data'] = time.perf_counter() - t0
+
+        cfgObj = BenchmarkConfigFetcher(cfgDict)
+        params = BenchmarkParams(cfgObj)
+
+        tracemalloc.start()
+
+        times = [time.perf_counter()]
+
+        srcDataset = DataImporter(params, 'src')
+        srcDataset.import_data(params)
+        times.append(time.perf_counter())
+        stageTimes['import_src'] = times[-1] - times[-2]
+
+        trgDataset = DataImporter(params, 'trg')
+        trgDataset.import_data(params)
+        times.append(time.perf_counter())
+        stageTimes['import_trg'] = times[-1] - times[-2]
+
+        cfgObj.get_intersection_of_roi_and_trgIm(
+            srcDataset, trgDataset, params
+            )
+        cfgObj.which_use_case(srcDataset, trgDataset, params)
+        times.append(time.perf_counter())
+        stageTimes['which_use_case'] = times[-1] - times[-2]
+
+        if params.cfgDict['useCaseToApply'] != useCase:
+            msg = f"The synthetic data for use case {useCase} resulted in "\
+                + f"use case {params.cfgDict['useCaseToApply']}."
+            raise Exception(msg)
+
+        # No DRO is fetched (there is no XNAT connection):
+        newDataset = Propagator(srcDataset, trgDataset, params)
+        newDataset.execute(srcDataset, trgDataset, params, None)
+        times.append(time.perf_counter())
+        stageTimes['propagate'] = times[-1] - times[-2]
+
+        roicolObj = RoicolCreator()
+        roicolObj.create_roicol(srcDataset, trgDataset, newDataset, params)
+        times.append(time.perf_counter())
+        stageTimes['create_roicol'] = times[-1] - times[-2]
+
+        roicolObj.error_check_roicol(
+            srcDataset, trgDataset, newDataset, params
+            )
+        times.append(time.perf_counter())
+        stageTimes['error_check_roicol'] = times[-1] - times[-2]
+
+        roicolObj.export_roicol(params)
+        times.append(time.perf_counter())
+        stageTimes['export_roicol'] = times[-1] - times[-2]
+
+        newDroObj = DroCreator(newDataset, params)
+        newDroObj.create_dro(srcDataset, trgDataset, newDataset, params)
+        newDroObj.export_dro(params)
+        times.append(time.perf_counter())
+        stageTimes['create_and_export_dro'] = times[-1] - times[-2]
+
+        result['totalTime'] = times[-1] - times[0]
+        result['timingMsgs'] = params.timingMsgs
+    except Exception as err:
+        result['error'] = f'{type(err).__name__}: {err}'
+    finally:
+        if tracemalloc.is_tracing():
+            result['tracedPeakMem'] = tracemalloc.get_traced_memory()[1]/1024**2
+            tracemalloc.stop()
+        result['peakRss'] = get_peak_memory()
+
+        if not keepData and os.path.isdir(caseDir):
+            shutil.rmtree(caseDir)
+
+    return result
+
+def run_benchmark_case_in_subprocess(*args):
+    """
+    Run a benchmark case (see run_benchmark_case) in a new (spawned) process
+    so that the peak memory is specific to the case.
+    """
+
+    ctx = multiprocessing.get_context('spawn')
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+        return executor.submit(run_benchmark_case, *args).result()
+
+def import_history(historyFpath):
+    """
+    Import the history of benchmark runs from a JSON file.
+
+    Parameters
+    ----------
+    historyFpath : str
+        The file path of the JSON file.
+
+    Returns
+    -------
+    history : list of dicts
+        A list (for each run) of a dictionary containing the run's metadata
+        and results. An empty list is returned if the file doesn't exist.
+    """
+
+    if not os.path.isfile(historyFpath):
+        return []
+
+    with open(historyFpath, 'r') as file:
+        history = json.load(file)
+
+    return history
+
+def export_history(history, historyFpath):
+    """
+    Export the history of benchmark runs to a JSON file.
+
+    Parameters
+    ----------
+    history : list of dicts
+        A list (for each run) of a dictionary containing the run's metadata
+        and results.
+    historyFpath : str
+        The file path of the JSON file.
+
+    Returns
+    -------
+    None.
+    """
+
+    exportDir = os.path.dirname(historyFpath)
+    if exportDir and not os.path.isdir(exportDir):
+        Path(exportDir).mkdir(parents=True)
+
+    with open(historyFpath, 'w') as file:
+        json.dump(history, file, indent=2)
+
+def compare_to_history(results, history, tolerance=0.2, minRuns=1):
+    """
+    Compare the results of a benchmark run to the median of previous runs.
+
+    Parameters
+    ----------
+    results : list of dicts
+        The results (for each case) of the current run.
+    history : list of dicts
+        The previous runs.
+    tolerance : float, optional
+        The fractional increase over the median that will be flagged as a
+        regression. The default value is 0.2.
+    minRuns : int, optional
+        The minimum number of previous (successful) runs of a case required
+        for the comparison. The default value is 1.
+
+    Returns
+    -------
+    comparisons : list of dicts
+        A list (for each case) of a dictionary containing the caseID, the
+        current and median values of totalTime and peakRss, their ratios and
+        whether a regression was detected.
+    """
+
+    comparisons = []
+
+    for result in results:
+        caseID = result['caseID']
+
+        prevResults = [
+            prevResult for run in history for prevResult in run['results']
+            if prevResult['caseID'] == caseID and prevResult['error'] is None
+            ]
+
+        comparison = {
+            'caseID' : caseID,
+            'nPrevRuns' : len(prevResults),
+            'regression' : False
+            }
+
+        for key in ['totalTime', 'peakRss']:
+            prevValues = [
+                prevResult[key] for prevResult in prevResults
+                if prevResult[key] is not None
+                ]
+
+            value = result[key]
+
+            if value is None or len(prevValues) < minRuns:
+                comparison[key] = value
+                comparison[f'{key}Median'] = None
+                comparison[f'{key}Ratio'] = None
+                continue
+
+            medianValue = median(prevValues)
+
+            ratio = value/medianValue if medianValue else None
+
+            comparison[key] = value
+            comparison[f'{key}Median'] = medianValue
+            comparison[f'{key}Ratio'] = ratio
+
+            if ratio is not None and ratio > 1 + tolerance:
+                comparison['regression'] = True
+
+        comparisons.append(comparison)
+
+    return comparisons
+
+def print_results(results, comparisons):
+    """
+    Print a summary of the benchmark results to the console.
+
+    Parameters
+    ----------
+    results : list of dicts
+        The results (for each case) of the current run.
+    comparisons : list of dicts
+        The output of compare_to_history.
+
+    Returns
+    -------
+    None.
+    """
+
+    print('\n\nBENCHMARK SUMMARY\n*****************')
+
+    header = f"{'caseID':<24}{'total (s)':>11}{'median (s)':>12}"\
+        + f"{'peakRss (MiB)':>15}{'median (MiB)':>14}  status"
+    print(header)
+    print('-'*len(header))
+
+    for result, comparison in zip(results, comparisons):
+        if result['error']:
+            print(f"{result['caseID']:<24}  FAILED: {result['error']}")
+            continue
+
+        values = []
+        for key in ['totalTime', 'totalTimeMedian', 'peakRss', 'peakRssMedian']:
+            value = comparison[key]
+            values.append('-' if value is None else f'{value:.2f}')
+
+        status = 'REGRESSION' if comparison['regression'] else 'ok'
+
+        print(f"{result['caseID']:<24}{values[0]:>11}{values[1]:>12}"
+              f"{values[2]:>15}{values[3]:>14}  {status}")
+
+        stages = ', '.join(
+            [f'{stage} {dTime:.2f}' for stage, dTime
+             in result['stageTimes'].items()]
+            )
+        print(f"    {stages}")
+
+def main(
+        useCases=USE_CASES, roicolMods=['RTSTRUCT', 'SEG'],
+        sizeLabels=['tiny'], regTxName='affine', benchmarkDir=None,
+        historyFname='benchmark_history.json', tolerance=0.2,
+        keepData=False, p2c=False
+        ):
+    """
+    Main script for running the benchmark suite.
+
+    Parameters
+    ----------
+    useCases : list of strs, optional
+        The use cases to be benchmarked. The default value is USE_CASES.
+    roicolMods : list of strs, optional
+        The ROI Collection modalities to be benchmarked. The default value is
+        ['RTSTRUCT', 'SEG'].
+    sizeLabels : list of strs, optional
+        The keys of the size presets (in SIZE_PRESETS) to be benchmarked. The
+        default value is ['tiny'].
+    regTxName : str, optional
+        The registration transform name (used for use cases '5a' and '5b').
+        The default value is 'affine'.
+    benchmarkDir : str, optional
+        The directory for the benchmark data, outputs and history. If None
+        outputs/benchmarks (relative to the current working directory) will
+        be used. The default value is None.
+    historyFname : str, optional
+        The file name of the JSON file containing the history of benchmark
+        runs. The default value is 'benchmark_history.json'.
+    tolerance : float, optional
+        The fractional increase over the median of previous runs that will be
+        flagged as a regression. The default value is 0.2.
+    keepData : bool, optional
+        If True the synthetic data and outputs will not be deleted. The
+        default value is False.
+    p2c : bool, optional
+        If True some results will be printed to the console. The default value
+        is False.
+
+    Returns
+    -------
+    results : list of dicts
+        The results (for each case) of the run.
+    comparisons : list of dicts
+        The comparison of the results to the history of benchmark runs.
+    """
+
+    if benchmarkDir is None:
+        benchmarkDir = os.path.join(os.getcwd(), 'outputs', 'benchmarks')
+
+    historyFpath = os.path.join(benchmarkDir, historyFname)
+
+    for sizeLabel in sizeLabels:
+        if not sizeLabel in SIZE_PRESETS:
+            msg = f"sizeLabel = '{sizeLabel}' is not valid. Acceptable "\
+                + f"values are {list(SIZE_PRESETS.keys())}."
+            raise Exception(msg)
+
+    results = []
+
+    for sizeLabel in sizeLabels:
+        for roicolMod in roicolMods:
+            for useCase in useCases:
+                print(f'\nRunning benchmark case {useCase}_{roicolMod}_'
+                      f'{sizeLabel}...\n')
+
+                result = run_benchmark_case_in_subprocess(
+                    useCase, roicolMod, sizeLabel, benchmarkDir, regTxName,
+                    keepData, p2c
+                    )
+
+                results.append(result)
+
+    history = import_history(historyFpath)
+
+    comparisons = compare_to_history(results, history, tolerance)
+
+    print_results(results, comparisons)
+
+    history.append({
+        'timestamp' : time.strftime('%Y-%m-%d %H:%M:%S'),
+        'platform' : platform.platform(),
+        'python' : platform.python_version(),
+        'numpy' : np.__version__,
+        'results' : results
+        })
+
+    export_history(history, historyFpath)
+
+    print(f'\nBenchmark history exported to:\n {historyFpath}\n')
+
+    return results, comparisons
+
+if __name__ == '__main__':
+    """
+    Run benchmark_propagation.py as a script (from src/).
+
+    Example usage in a console:
+
+    python benchmarking/benchmark_propagation.py
+
+    or
+
+    python benchmarking/benchmark_propagation.py --useCases 3b 5b
+    --roicolMods SEG --sizeLabels tiny small
+    """
+
+    parser = argparse.ArgumentParser(description='Arguments for main()')
+
+    parser.add_argument(
+        "--useCases",
+        nargs='+', default=USE_CASES,
+        help="Use cases to benchmark (default is all)"
+        )
+
+    parser.add_argument(
+        "--roicolMods",
+        nargs='+', default=['RTSTRUCT', 'SEG'],
+        help="ROI Collection modalities to benchmark (default is both)"
+        )
+
+    parser.add_argument(
+        "--sizeLabels",
+        nargs='+', default=['tiny'],
+        help=f"Size presets to benchmark from {list(SIZE_PRESETS.keys())} "
+        + "(default is tiny)"
+        )
+
+    parser.add_argument(
+        "--regTxName",
+        nargs='?', default='affine', const='affine',
+        help="Registration transform for use cases 5a/5b (default is affine)"
+        )
+
+    parser.add_argument(
+        "--benchmarkDir",
+        nargs='?', default=None,
+        help="Directory for benchmark data, outputs and history (default is "
+        + "outputs/benchmarks)"
+        )
+
+    parser.add_argument(
+        "--tolerance",
+        type=float, default=0.2,
+        help="Fractional increase over the median of previous runs flagged "
+        + "as a regression (default is 0.2)"
+        )
+
+    parser.add_argument(
+        "--keepData",
+        action="store_true",
+        help="Keep the synthetic data and outputs if True"
+        )
+
+    parser.add_argument(
+        "--p2c",
+        action="store_true",
+        help="Print results to the console if True"
+        )
+
+    args = parser.parse_args()
+
+    main(
+        args.useCases, args.roicolMods, args.sizeLabels, args.regTxName,
+        args.benchmarkDir, tolerance=args.tolerance, keepData=args.keepData,
+        p2c=args.p2c
+        )
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Nov 12 11:05:48 2026
+
+@author: ctorti
+"""
+
+
+
+"""
+Benchmark of the bulk (column-selected) listings used for the XNAT snapshot
+statistics (xnat_tools.bulk_queries) v the per-project and per-experiment
+requests they replace.
+
+Note:
+A stand-in XNAT (benchmarking.xnat_standin) with a synthetic catalogue is
+served locally with a fixed latency per request, and the number of requests,
+bytes and time taken to get the file counts and sizes, project descriptions
+and first and last uploads by project are reported for the per-project and
+per-experiment requests, the bulk listings, and the bulk listings with the
+site-wide listings forbidden (i.e. falling back to the former). The results
+of the bulk listings are checked against those of the per-project and
+per-experiment requests.
+"""
+
+import os
+import sys
+
+#code_root = r'C:\Code\WP1.3_multiple_modalities\src'
+code_root = os.getcwd()
+
+# Add code_root to the system path so packages can be imported from it:
+sys.path.append(code_root)
+
+import time
+import json
+import argparse
+import platform
+from pathlib import Path
+import requests
+from xnat_tools.projects import get_proj_desc_by_proj
+from xnat_tools.file_count_size import get_file_count_size_by_type_by_proj
+from xnat_tools.dates_times import get_first_last_im_session_uploads_by_proj
+from xnat_tools.bulk_queries import get_bulk_data_by_proj
+from benchmarking.xnat_standin import create_synthetic_xnat, StandinXnat
+
+
+def get_legacy_data_by_proj(url, session):
+    """
+    Get the statistics using the per-project and per-experiment requests (as
+    in snapshots.get_xnat_snapshot).
+    """
+
+    data_by_proj = get_file_count_size_by_type_by_proj(url, session)
+    data_by_proj = get_proj_desc_by_proj(url, session, data_by_proj)
+    data_by_proj = get_first_last_im_session_uploads_by_proj(
+        url, session, data_by_proj
+        )
+
+    return data_by_proj
+
+def get_bulk_data(url, session):
+    """
+    Get the statistics using the bulk listings.
+    """
+
+    return get_bulk_data_by_proj(url, session)[0]
+
+def get_mismatches(data_by_proj, refData_by_proj, tol=0.011):
+    """
+    Get a list of the (project, key) pairs whose values differ from those of
+    the reference (allowing for rounding of values in k and MB).
+    """
+
+    mismatches = []
+
+    for proj_id in sorted(set(data_by_proj) | set(refData_by_proj)):
+        data = data_by_proj.get(proj_id, {})
+        refData = refData_by_proj.get(proj_id, {})
+
+        for key in sorted(set(data) | set(refData)):
+            value = data.get(key, None)
+            refValue = refData.get(key, None)
+
+            if isinstance(value, (int, float))\
+                    and isinstance(refValue, (int, float)):
+                if abs(value - refValue) > tol:
+                    mismatches.append((proj_id, key))
+            elif value != refValue:
+                mismatches.append((proj_id, key))
+
+    return mismatches
+
+def run_case(standin, getData, forbidBulk=False):
+    """
+    Get the statistics from a stand-in XNAT and return the numbers of
+    requests and bytes, the time taken and the statistics.
+    """
+
+    standin.forbidBulk = forbidBulk
+    standin.reset_counts()
+
+    with requests.Session() as session:
+        t0 = time.perf_counter()
+        data_by_proj = getData(standin.url, session)
+        dTime = time.perf_counter() - t0
+
+    result = standin.get_counts()
+    result['time'] = dTime
+
+    return result, data_by_proj
+
+def print_results(results):
+    """
+    Print the numbers of requests and bytes, times and speedups.
+    """
+
+    print('\n\nSNAPSHOT STATISTICS RESULTS\n***************************')
+    print(f"{'catalogue':<14} {'method':<14} {'requests':>9} {'MB':>8} "
+          f"{'time [s]':>9} {'speedup':>8} {'mismatches':>11}")
+
+    for caseID, cases in results.items():
+        for method, result in cases.items():
+            speedup = cases['legacy']['time']/result['time']
+
+            print(f"{caseID:<14} {method:<14} {result['numRequests']:>9} "
+                  f"{result['MBout']:8.2f} {result['time']:9.2f} "
+                  f"{speedup:7.1f}x {result['numMismatches']:>11}")
+
+def main(
+        catalogueSizes=[[5, 20], [10, 100]], latency=0.01, benchmarkDir=None
+        ):
+    """
+    Run the snapshot statistics benchmark.
+
+    Parameters
+    ----------
+    catalogueSizes : list of lists of ints, optional
+        The number of projects and the number of experiments per project of
+        each synthetic catalogue. The default value is [[5, 20], [10, 100]].
+    latency : float, optional
+        The time (in seconds) added to every request. The default value is
+        0.01.
+    benchmarkDir : str, optional
+        The directory for the results. If None outputs/benchmarks (relative
+        to the current working directory) will be used. The default value is
+        None.
+
+    Returns
+    -------
+    results : dict
+        Dictionary (with catalogue sizes as keys) of dictionaries (with
+        methods as keys) of the results of run_case.
+    """
+
+    if benchmarkDir is None:
+        benchmarkDir = os.path.join(os.getcwd(), 'outputs', 'benchmarks')
+
+    results = {}
+
+    for numProjs, numExpsPerProj in catalogueSizes:
+        caseID = f'{numProjs}x{numExpsPerProj}'
+
+        print(f'\nBenchmarking {numProjs} projects with {numExpsPerProj}',
+              'experiments each...')
+
+        catalogue = create_synthetic_xnat(numProjs, numExpsPerProj)
+
+        with StandinXnat(catalogue, latency) as standin:
+            legacyResult, legacyData = run_case(
+                standin, get_legacy_data_by_proj
+                )
+
+            results[caseID] = {'legacy' : legacyResult}
+
+            for method, forbidBulk in [('bulk', False),
+                                       ('bulkForbidden', True)]:
+                result, data_by_proj = run_case(
+                    standin, get_bulk_data, forbidBulk
+                    )
+
+                mismatches = get_mismatches(data_by_proj, legacyData)
+
+                if mismatches:
+                    print(f'The {method} statistics differ for',
+                          f'{mismatches[:5]}...')
+
+                result['numMismatches'] = len(mismatches)
+
+                results[caseID][method] = result
+
+            results[caseID]['legacy']['numMismatches'] = 0
+
+    print_results(results)
+
+    fname = time.strftime('%Y%m%d_%H%M%S') + '_snapshots.json'
+    fpath = os.path.join(benchmarkDir, fname)
+
+    if not os.path.isdir(benchmarkDir):
+        Path(benchmarkDir).mkdir(parents=True)
+
+    with open(fpath, 'w') as file:
+        json.dump(
+            {'platform' : platform.platform(), 'latency' : latency,
+             'results' : results},
+            file, indent=2
+            )
+
+    print(f'\nResults exported to:\n {fpath}\n')
+
+    return results
+
+if __name__ == '__main__':
+    """
+    Run benchmark_snapshots.py as a script (from src/).
+
+    Example usage in a console:
+
+    python benchmarking/benchmark_snapshots.py
+
+    or
+
+    python benchmarking/benchmark_snapshots.py --catalogueSizes 5 20 20 200
+    --latency 0.05
+    """
+
+    parser = argparse.ArgumentParser(description='Arguments for main()')
+
+    parser.add_argument(
+        "--catalogueSizes",
+        nargs='+', type=int, default=None,
+        help="Catalogue sizes as consecutive (number of projects, number of "
+        + "experiments per project) pairs (default is 5 20 10 100)"
+        )
+
+    parser.add_argument(
+        "--latency",
+        type=float, default=0.01,
+        help="Time in seconds added to every request (default is 0.01)"
+        )
+
+    parser.add_argument(
+        "--benchmarkDir",
+        nargs='?', default=None,
+        help="Directory for results (default is outputs/benchmarks)"
+        )
+
+    args = parser.parse_args()
+
+    if args.catalogueSizes:
+        if len(args.catalogueSizes) % 2:
+            msg = 'The number of values in --catalogueSizes must be a '\
+                + 'multiple of 2.'
+            raise Exception(msg)
+
+        catalogueSizes = [args.catalogueSizes[i:i+2]
+                          for i in range(0, len(args.catalogueSizes), 2)]
+    else:
+        catalogueSizes = [[5, 20], [10, 100]]
+
+    main(catalogueSizes, args.latency, args.benchmarkDir)
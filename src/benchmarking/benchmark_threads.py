@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 14:48:05 2026
+
+@author: ctorti
+"""
+
+
+
+"""
+Thread scaling benchmark for the SimpleITK-heavy stages.
+
+Note:
+Registration (rigid_reg_im), resampling (resample_im) and Gaussian 
+blurring (gaussian_blur_im) are run on synthetic images (see 
+benchmarking.synthetic_data) with the number of threads set to 1, 2, 4, ... 
+up to the number of available CPUs, and the speedup relative to 1
+thread is reported for each stage. The results can be used to choose the
+values of "numThreads" and "numThreadsByStage" in global_variables.json (see
+image_tools.threads).
+"""
+
+import os
+import sys
+
+#code_root = r'C:\Code\WP1.3_multiple_modalities\src'
+code_root = os.getcwd()
+
+# Add code_root to the system path so packages can be imported from it:
+sys.path.append(code_root)
+
+import time
+import json
+import argparse
+import platform
+from pathlib import Path
+import numpy as np
+import SimpleITK as sitk
+from image_tools.threads import STAGES, get_num_of_cpus, sitk_threads
+from image_tools.registering import rigid_reg_im
+from image_tools.resampling import resample_im
+from image_tools.operations import gaussian_blur_im
+from benchmarking.synthetic_data import (
+    get_direction_from_orientation, get_origin_for_centre, get_phantom_spec,
+    get_phantom_values, create_phantom_tx
+    )
+from benchmarking.benchmark_propagation import SIZE_PRESETS
+
+
+def create_phantom_im(size, spacings, phantomTx=None):
+    """
+    Create a synthetic (axial) 3D SimpleITK image of the phantom.
+
+    Parameters
+    ----------
+    size : list of ints
+        The image size.
+    spacings : list of floats
+        The voxel spacings.
+    phantomTx : SimpleITK Transform, optional
+        If provided, the phantom will appear moved by the inverse of
+        phantomTx (see get_phantom_values). The default value is None.
+
+    Returns
+    -------
+    im : SimpleITK Image
+        The 32-bit float image.
+    """
+
+    extent = [size[i]*spacings[i] for i in range(3)]
+
+    direction = get_direction_from_orientation('axial')
+    origin = get_origin_for_centre(size, spacings, direction)
+
+    blobs, _ = get_phantom_spec(extent=extent)
+
+    pixarr = np.zeros(size[::-1], dtype=np.float32)
+
+    # Physical points of the voxels in a slice (the direction is axial so
+    # the physical axes are aligned with the image axes):
+    x = origin[0] + spacings[0]*np.arange(size[0])
+    y = origin[1] + spacings[1]*np.arange(size[1])
+    xx, yy = np.meshgrid(x, y)
+
+    # Evaluate the phantom slice by slice to limit memory use for large
+    # images:
+    for k in range(size[2]):
+        z = origin[2] + spacings[2]*k
+        pts = np.stack(
+            [xx.ravel(), yy.ravel(), np.full(xx.size, z)], axis=1
+            )
+
+        pixarr[k] = get_phantom_values(pts, blobs, phantomTx).reshape(
+            size[1], size[0]
+            )
+
+    im = sitk.GetImageFromArray(pixarr)
+    im.SetSpacing([float(item) for item in spacings])
+    im.SetOrigin([float(item) for item in origin])
+    im.SetDirection([float(item) for item in direction])
+
+    return im
+
+def get_thread_counts(maxThreads=None):
+    """
+    Get the thread counts to benchmark, i.e. 1, 2, 4, ... up to maxThreads
+    (inclusive).
+
+    Parameters
+    ----------
+    maxThreads : int, optional
+        The maximum number of threads. If None the number of available CPUs
+        will be used. The default value is None.
+
+    Returns
+    -------
+    threadCounts : list of ints
+    """
+
+    if not maxThreads:
+        maxThreads = get_num_of_cpus()
+
+    threadCounts = []
+    n = 1
+    while n < maxThreads:
+        threadCounts.append(n)
+        n *= 2
+    threadCounts.append(maxThreads)
+
+    return threadCounts
+
+def get_stage_funcs(fixIm, movIm, labim, phantomTx, numIters=50):
+    """
+    Get the functions (that take the number of threads as their only
+    argument) for each stage.
+
+    Parameters
+    ----------
+    fixIm : SimpleITK Image
+        The fixed (target) image.
+    movIm : SimpleITK Image
+        The moving (source) image.
+    labim : SimpleITK Image
+        A binary label image in the gridspace of movIm.
+    phantomTx : SimpleITK Transform
+        The transform that relates movIm to fixIm.
+    numIters : int, optional
+        The maximum number of iterations for registration. The default value
+        is 50.
+
+    Returns
+    -------
+    stageFuncs : dict
+        Dictionary (with stage names as keys) of functions.
+    """
+
+    stageFuncs = {
+        'registration' : lambda n: rigid_reg_im(
+            fixIm=fixIm, movIm=movIm, regTxName='rigid',
+            initMethod='geometry', samplingPercentage=5, numIters=numIters,
+            numThreads=n
+            ),
+        'resampling' : lambda n: resample_im(
+            im=movIm, refIm=fixIm, sitkTx=phantomTx, interp='Linear',
+            numThreads=n
+            ),
+        'blurring' : lambda n: gaussian_blur_im(
+            im=labim, var=(1,1,1), numThreads=n
+            )
+        }
+
+    return stageFuncs
+
+def time_stage(func, numThreads, numRepeats=3):
+    """
+    Time a stage for a given number of threads.
+
+    Parameters
+    ----------
+    func : function
+        The function (that takes the number of threads as its only argument).
+    numThreads : int
+        The number of threads.
+    numRepeats : int, optional
+        The number of times to run the stage. The default value is 3.
+
+    Returns
+    -------
+    dTime : float
+        The minimum time taken over the repeats.
+
+    Note
+    ----
+    SimpleITK's global default number of threads is also set to numThreads
+    so that filters instantiated within the stage (e.g. the procedural
+    sitk.Resample calls in rigid_reg_im) use the same number of threads.
+    """
+
+    dTimes = []
+
+    with sitk_threads(numThreads):
+        for i in range(numRepeats):
+            t0 = time.perf_counter()
+            func(numThreads)
+            dTimes.append(time.perf_counter() - t0)
+
+    return min(dTimes)
+
+def print_results(results):
+    """
+    Print the time, speedup and parallel efficiency for each stage and
+    number of threads.
+    """
+
+    print('\n\nTHREAD SCALING RESULTS\n**********************')
+
+    for sizeLabel, resultsByStage in results.items():
+        print(f'\nSize: {sizeLabel} {SIZE_PRESETS[sizeLabel]["size"]}')
+
+        for stage, resultsByThreads in resultsByStage.items():
+            print(f'\n   {stage}:')
+
+            for result in resultsByThreads:
+                print(f"      {result['numThreads']:3d} threads : "
+                      f"{result['time']:8.3f} s, speedup = "
+                      f"{result['speedup']:5.2f}, efficiency = "
+                      f"{100*result['efficiency']:5.1f} %")
+
+def main(
+        stages=STAGES, sizeLabels=['small'], maxThreads=None, numRepeats=3,
+        numIters=50, exportDir=None
+        ):
+    """
+    Run the thread scaling benchmark.
+
+    Parameters
+    ----------
+    stages : list of strs, optional
+        The stages to benchmark. The default value is STAGES (all).
+    sizeLabels : list of strs, optional
+        The size presets (see SIZE_PRESETS in benchmark_propagation) to
+        benchmark. The default value is ['small'].
+    maxThreads : int, optional
+        The maximum number of threads. If None the number of available CPUs
+        will be used. The default value is None.
+    numRepeats : int, optional
+        The number of times to run each stage for each number of threads (the
+        minimum time is reported). The default value is 3.
+    numIters : int, optional
+        The maximum number of iterations for registration. The default value
+        is 50.
+    exportDir : str, optional
+        If provided, the results will be exported to a JSON file in exportDir.
+        The default value is None.
+
+    Returns
+    -------
+    results : dict
+        Dictionary (with size labels as keys) of dictionaries (with stages as
+        keys) of a list (for each number of threads) of a dictionary with
+        keys 'numThreads', 'time', 'speedup' and 'efficiency'.
+    """
+
+    for stage in stages:
+        if not stage in STAGES:
+            msg = f"stage = '{stage}' is not valid. Acceptable values are "\
+                + f"{STAGES}."
+            raise Exception(msg)
+
+    for sizeLabel in sizeLabels:
+        if not sizeLabel in SIZE_PRESETS:
+            msg = f"sizeLabel = '{sizeLabel}' is not valid. Acceptable "\
+                + f"values are {list(SIZE_PRESETS.keys())}."
+            raise Exception(msg)
+
+    threadCounts = get_thread_counts(maxThreads)
+
+    print(f'\nAvailable CPUs: {get_num_of_cpus()}')
+    print(f'Thread counts: {threadCounts}\n')
+
+    results = {}
+
+    for sizeLabel in sizeLabels:
+        size = SIZE_PRESETS[sizeLabel]['size']
+        spacings = SIZE_PRESETS[sizeLabel]['spacings']
+
+        phantomTx = create_phantom_tx(centre=(0, 0, 0))
+
+        fixIm = create_phantom_im(size, spacings)
+        movIm = create_phantom_im(size, spacings, phantomTx)
+        labim = sitk.Cast(fixIm > 450, sitk.sitkUInt8)
+
+        stageFuncs = get_stage_funcs(
+            fixIm, movIm, labim, phantomTx, numIters
+            )
+
+        results[sizeLabel] = {}
+
+        for stage in stages:
+            print(f'\nBenchmarking {stage} for size {sizeLabel}...\n')
+
+            resultsByThreads = []
+
+            for numThreads in threadCounts:
+                dTime = time_stage(stageFuncs[stage], numThreads, numRepeats)
+
+                speedup = resultsByThreads[0]['time']/dTime\
+                    if resultsByThreads else 1.0
+
+                resultsByThreads.append({
+                    'numThreads' : numThreads,
+                    'time' : dTime,
+                    'speedup' : speedup,
+                    'efficiency' : speedup/numThreads
+                    })
+
+            results[sizeLabel][stage] = resultsByThreads
+
+    print_results(results)
+
+    if exportDir:
+        if not os.path.isdir(exportDir):
+            Path(exportDir).mkdir(parents=True)
+
+        fname = time.strftime('%Y%m%d_%H%M%S') + '_thread_scaling.json'
+        fpath = os.path.join(exportDir, fname)
+
+        with open(fpath, 'w') as file:
+            json.dump(
+                {'platform' : platform.platform(),
+                 'numCpus' : get_num_of_cpus(),
+                 'results' : results},
+                file, indent=2
+                )
+
+        print(f'\nResults exported to:\n {fpath}\n')
+
+    return results
+
+if __name__ == '__main__':
+    """
+    Run benchmark_threads.py as a script (from src/).
+
+    Example usage in a console:
+
+    python benchmarking/benchmark_threads.py
+
+    or
+
+    python benchmarking/benchmark_threads.py --stages resampling blurring
+    --sizeLabels medium --maxThreads 8
+    """
+
+    parser = argparse.ArgumentParser(description='Arguments for main()')
+
+    parser.add_argument(
+        "--stages",
+        nargs='+', default=STAGES,
+        help=f"Stages to benchmark from {STAGES} (default is all)"
+        )
+
+    parser.add_argument(
+        "--sizeLabels",
+        nargs='+', default=['small'],
+        help=f"Size presets to benchmark from {list(SIZE_PRESETS.keys())} "
+        + "(default is small)"
+        )
+
+    parser.add_argument(
+        "--maxThreads",
+        type=int, default=None,
+        help="Maximum number of threads (default is the number of CPUs)"
+        )
+
+    parser.add_argument(
+        "--numRepeats",
+        type=int, default=3,
+        help="Number of repeats for each number of threads (default is 3)"
+        )
+
+    parser.add_argument(
+        "--numIters",
+        type=int, default=50,
+        help="Maximum number of iterations for registration (default is 50)"
+        )
+
+    parser.add_argument(
+        "--exportDir",
+        nargs='?', default=None,
+        help="Directory to export the results to (default is None, i.e. no "
+        + "export)"
+        )
+
+    args = parser.parse_args()
+
+    main(
+        args.stages, args.sizeLabels, args.maxThreads, args.numRepeats,
+        args.numIters, args.exportDir
+        )
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 28 14:02:37 2026
+
+@author: ctorti
+"""
+
+
+
+"""
+Round-trip benchmark of the VectorGridData codec (dro_tools.vector_grid_data)
+v the list-based conversions it replaced.
+
+Note:
+BSpline transforms with increasingly fine control point grids are encoded
+to VectorGridData (as in DroCreator.get_data_from_bspline_tx) and decoded
+back to a BSpline transform (as in create_tx_from_def_dro), and the times
+for the list-based and Numpy codecs are reported, along with the maximum
+difference between the coefficients of the original and round-tripped
+transforms.
+"""
+
+import os
+import sys
+
+#code_root = r'C:\Code\WP1.3_multiple_modalities\src'
+code_root = os.getcwd()
+
+# Add code_root to the system path so packages can be imported from it:
+sys.path.append(code_root)
+
+import time
+import json
+import argparse
+import platform
+from pathlib import Path
+from statistics import median
+import numpy as np
+import SimpleITK as sitk
+from pydicom.dataset import Dataset
+from pydicom.sequence import Sequence
+from dro_tools.vector_grid_data import (
+    encode_vector_grid_data, decode_vector_grid_data
+    )
+from dro_tools.create_tx_from_dro import create_tx_from_def_dro
+
+
+def create_bspline_tx(meshSize, seed=0):
+    """
+    Create a BSpline transform with random coefficients over a 256 mm cube.
+
+    Parameters
+    ----------
+    meshSize : list of ints
+        The mesh size along x, y and z (the grid dimensions are meshSize + 3).
+    seed : int, optional
+        The seed of the random number generator. The default value is 0.
+
+    Returns
+    -------
+    bsplineTx : SimpleITK BSplineTransform
+    """
+
+    refIm = sitk.Image([64, 64, 64], sitk.sitkUInt8)
+    refIm.SetSpacing([4, 4, 4])
+    refIm.SetOrigin([-128, -128, -128])
+
+    bsplineTx = sitk.BSplineTransformInitializer(refIm, meshSize)
+
+    rng = np.random.default_rng(seed)
+
+    bsplineTx.SetParameters(
+        rng.normal(0, 2, len(bsplineTx.GetParameters())).tolist()
+        )
+
+    return bsplineTx
+
+def create_def_dro(bsplineTx, vectGridData):
+    """
+    Create a minimal Pydicom Dataset with the DeformableRegistrationSequence
+    attributes read by create_tx_from_def_dro.
+    """
+
+    coeffIm = bsplineTx.GetCoefficientImages()[0]
+
+    gridSeq = Dataset()
+    gridSeq.ImagePositionPatient = list(coeffIm.GetOrigin())
+    gridSeq.ImageOrientationPatient = list(coeffIm.GetDirection())[0:6]
+    gridSeq.GridDimensions = list(coeffIm.GetSize())
+    gridSeq.GridResolution = list(coeffIm.GetSpacing())
+    gridSeq.VectorGridData = vectGridData
+
+    defRegSeq = Dataset()
+    defRegSeq.DeformableRegistrationGridSequence = Sequence([gridSeq])
+
+    dro = Dataset()
+    dro.DeformableRegistrationSequence = Sequence([Dataset(), defRegSeq])
+
+    return dro
+
+def legacy_encode(coeffIms):
+    """
+    Encode the coefficient images to VectorGridData as was done in
+    DroCreator.get_data_from_bspline_tx prior to the Numpy codec.
+    """
+
+    coeffImX, coeffImY, coeffImZ = coeffIms
+
+    listOfTuples = list(zip(
+        list(sitk.GetArrayViewFromImage(coeffImX).flatten()),
+        list(sitk.GetArrayViewFromImage(coeffImY).flatten()),
+        list(sitk.GetArrayViewFromImage(coeffImZ).flatten())
+        ))
+
+    flatListOfVects = [item for tup in listOfTuples for item in tup]
+
+    return np.array(flatListOfVects).tobytes()
+
+def legacy_decode(vectGridData, gridSize):
+    """
+    Decode VectorGridData to coefficient arrays as was done in
+    create_tx_from_def_dro prior to the Numpy codec (including the reshape
+    to gridSize, which is in (x, y, z) rather than (z, y, x) order).
+    """
+
+    flatList = list(np.frombuffer(vectGridData, dtype=np.float64))
+
+    listOfTuples = zip(*[iter(flatList)]*3)
+
+    coeffX, coeffY, coeffZ = zip(*listOfTuples)
+
+    return [np.reshape(np.array(coeff), gridSize)
+            for coeff in [coeffX, coeffY, coeffZ]]
+
+def get_max_coeff_diff(tx0, tx1):
+    """
+    Get the maximum absolute difference between the coefficients of two
+    BSpline transforms.
+    """
+
+    return max(
+        float(np.abs(
+            sitk.GetArrayViewFromImage(im0) - sitk.GetArrayViewFromImage(im1)
+            ).max())
+        for im0, im1 in zip(
+                tx0.GetCoefficientImages(), tx1.GetCoefficientImages()
+                )
+        )
+
+def run_round_trip(meshSize, numRepeats=3):
+    """
+    Time the encoding and decoding of a BSpline transform with the legacy and
+    Numpy codecs.
+
+    Parameters
+    ----------
+    meshSize : list of ints
+        The mesh size along x, y and z.
+    numRepeats : int, optional
+        The number of repeats (the median is reported). The default value is
+        3.
+
+    Returns
+    -------
+    result : dict
+        Dictionary with the grid dimensions, number of values, the median
+        times (in s) for encoding/decoding with each codec, the time to
+        create the transform from a DRO (create_tx_from_def_dro) and the
+        maximum coefficient difference after the round trip.
+    """
+
+    bsplineTx = create_bspline_tx(meshSize)
+    coeffIms = bsplineTx.GetCoefficientImages()
+    gridDims = list(coeffIms[0].GetSize())
+
+    times = {
+        'legacyEncode' : [], 'legacyDecode' : [], 'encode' : [],
+        'decode' : [], 'createTx' : []
+        }
+
+    for i in range(numRepeats):
+        t0 = time.perf_counter()
+        legacyData = legacy_encode(coeffIms)
+        times['legacyEncode'].append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        legacy_decode(legacyData, gridDims)
+        times['legacyDecode'].append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        vectGridData = encode_vector_grid_data(coeffIms)
+        times['encode'].append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        decode_vector_grid_data(vectGridData, gridDims)
+        times['decode'].append(time.perf_counter() - t0)
+
+        dro = create_def_dro(bsplineTx, vectGridData)
+
+        t0 = time.perf_counter()
+        resTx = create_tx_from_def_dro(dro)
+        times['createTx'].append(time.perf_counter() - t0)
+
+    if vectGridData != legacyData:
+        msg = f'The encoded VectorGridData for meshSize = {meshSize} '\
+            + 'differs from that of the legacy encoding.'
+        raise Exception(msg)
+
+    result = {key : median(val) for key, val in times.items()}
+    result['gridDims'] = gridDims
+    result['numVals'] = 3*int(np.prod(gridDims))
+    result['maxCoeffDiff'] = get_max_coeff_diff(bsplineTx, resTx)
+
+    return result
+
+def print_results(results):
+    """
+    Print the median encoding and decoding times and the speedups.
+    """
+
+    print('\n\nVECTORGRIDDATA CODEC RESULTS\n****************************')
+    print(f"{'grid dims':<16} {'values':>10} {'legacy enc':>11} "
+          f"{'enc':>8} {'legacy dec':>11} {'dec':>8} {'speedup':>8} "
+          f"{'createTx':>9} {'max diff':>9}")
+
+    for result in results.values():
+        gridDims = 'x'.join([str(item) for item in result['gridDims']])
+
+        speedup = (result['legacyEncode'] + result['legacyDecode'])\
+            /(result['encode'] + result['decode'])
+
+        print(f"{gridDims:<16} {result['numVals']:>10} "
+              f"{result['legacyEncode']:11.4f} {result['encode']:8.4f} "
+              f"{result['legacyDecode']:11.4f} {result['decode']:8.4f} "
+              f"{speedup:7.0f}x {result['createTx']:9.4f} "
+              f"{result['maxCoeffDiff']:9.1e}")
+
+def main(
+        meshSizes=[[8, 8, 8], [32, 32, 32], [64, 64, 48], [128, 128, 96]],
+        numRepeats=3, benchmarkDir=None
+        ):
+    """
+    Run the VectorGridData codec benchmark.
+
+    Parameters
+    ----------
+    meshSizes : list of lists of ints, optional
+        The mesh sizes of the BSpline transforms. The default value is
+        [[8, 8, 8], [32, 32, 32], [64, 64, 48], [128, 128, 96]].
+    numRepeats : int, optional
+        The number of repeats for each mesh size (the median is reported).
+        The default value is 3.
+    benchmarkDir : str, optional
+        The directory for the results. If None outputs/benchmarks (relative
+        to the current working directory) will be used. The default value is
+        None.
+
+    Returns
+    -------
+    results : dict
+        Dictionary (with mesh sizes as keys) of the results of
+        run_round_trip.
+    """
+
+    if benchmarkDir is None:
+        benchmarkDir = os.path.join(os.getcwd(), 'outputs', 'benchmarks')
+
+    results = {}
+
+    for meshSize in meshSizes:
+        caseID = 'x'.join([str(item) for item in meshSize])
+
+        print(f'\nBenchmarking meshSize = {meshSize}...')
+
+        results[caseID] = run_round_trip(meshSize, numRepeats)
+
+    print_results(results)
+
+    fname = time.strftime('%Y%m%d_%H%M%S') + '_vector_grid_data.json'
+    fpath = os.path.join(benchmarkDir, fname)
+
+    if not os.path.isdir(benchmarkDir):
+        Path(benchmarkDir).mkdir(parents=True)
+
+    with open(fpath, 'w') as file:
+        json.dump(
+            {'platform' : platform.platform(), 'results' : results},
+            file, indent=2
+            )
+
+    print(f'\nResults exported to:\n {fpath}\n')
+
+    return results
+
+if __name__ == '__main__':
+    """
+    Run benchmark_vector_grid_data.py as a script (from src/).
+
+    Example usage in a console:
+
+    python benchmarking/benchmark_vector_grid_data.py
+
+    or
+
+    python benchmarking/benchmark_vector_grid_data.py --meshSizes 8 8 8
+    64 64 64 --numRepeats 5
+    """
+
+    parser = argparse.ArgumentParser(description='Arguments for main()')
+
+    parser.add_argument(
+        "--meshSizes",
+        nargs='+', type=int, default=None,
+        help="Mesh sizes as consecutive x y z triplets (default is 8 8 8 "
+        + "32 32 32 64 64 48 128 128 96)"
+        )
+
+    parser.add_argument(
+        "--numRepeats",
+        type=int, default=3,
+        help="Number of repeats for each mesh size (default is 3)"
+        )
+
+    parser.add_argument(
+        "--benchmarkDir",
+        nargs='?', default=None,
+        help="Directory for results (default is outputs/benchmarks)"
+        )
+
+    args = parser.parse_args()
+
+    if args.meshSizes:
+        if len(args.meshSizes) % 3:
+            msg = 'The number of values in --meshSizes must be a multiple '\
+                + 'of 3.'
+            raise Exception(msg)
+
+        meshSizes = [args.meshSizes[i:i+3]
+                     for i in range(0, len(args.meshSizes), 3)]
+    else:
+        meshSizes = [[8, 8, 8], [32, 32, 32], [64, 64, 48], [128, 128, 96]]
+
+    main(meshSizes, args.numRepeats, args.benchmarkDir)
@@ -0,0 +1,489 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Nov 13 10:21:44 2026
+
+@author: ctorti
+"""
+
+
+
+"""
+Benchmark of the XNAT I/O of the workflow (downloads, DRO search, uploads
+and snapshots) against a stand-in XNAT.
+
+Note:
+A stand-in XNAT (benchmarking.xnat_standin) serves a synthetic catalogue
+(for the snapshot statistics) and a subject with synthetic Source and
+Target DICOM series (in different Frames of Reference, as for use case 5a),
+a Source ROI Collection and a sample DRO (see
+benchmarking.benchmark_propagation.create_benchmark_data). For each network
+profile (latency and bandwidth) the number of requests, the MB downloaded
+and uploaded and the wall time are reported for:
+    -- DataDownloader.download_and_get_pathsDict (including establishing
+    the connection using an alias token)
+    -- DroImporter.fetch_dro
+    -- the uploads of a ROI Collection and DRO (as in
+    RoicolCreator.upload_roicol and DroCreator.upload_dro), one after the
+    other and on the background workers of an UploadManager
+    -- get_xnat_snapshot, with and without bulk listings
+
+Responses recorded from a live XNAT can be replayed in preference to the
+synthetic responses (see --recordingDir). To record them, mount a recorder
+on the session used, e.g.:
+
+    recorder = record_session(params.xnatSession)
+    params.download_and_get_pathsDict()
+    recorder.export(recordDir)
+"""
+
+import os
+import sys
+
+#code_root = r'C:\Code\WP1.3_multiple_modalities\src'
+code_root = os.getcwd()
+
+# Add code_root to the system path so packages can be imported from it:
+sys.path.append(code_root)
+
+import io
+import copy
+import time
+import json
+import shutil
+import argparse
+import platform
+import contextlib
+from pathlib import Path
+from io_tools.download_data import DataDownloader
+from io_tools.import_dro import DroImporter
+from io_tools.uploads import UploadManager
+from io_tools.exports import export_dict_to_json
+from xnat_tools.im_assessors import upload_im_asr
+from xnat_tools.subject_assessors import upload_subj_asr
+from xnat_tools.im_sessions_exps import get_exp_id_from_label
+from snapshots import get_xnat_snapshot
+from benchmarking.benchmark_propagation import (
+    SIZE_PRESETS, BenchmarkConfigFetcher, create_benchmark_cfgDict,
+    create_benchmark_data
+    )
+from benchmarking.xnat_standin import (
+    create_synthetic_xnat, add_dicom_session, import_recording, StandinXnat
+    )
+
+
+# The latency (in seconds) and bandwidth (in bytes per second) of each
+# network profile:
+NETWORK_PROFILES = {
+    'local' : {'latency' : 0, 'bandwidth' : None},
+    'lan' : {'latency' : 0.002, 'bandwidth' : 1e8},
+    'wan' : {'latency' : 0.03, 'bandwidth' : 1e7}
+    }
+
+# The name of the Source ROI Collection and the file path of the DRO served:
+ROICOL_NAME = 'Synthetic spheres'
+DRO_FPATH = os.path.join('inputs', 'sample_DROs', 'sample_spatial_dro.dcm')
+
+
+def create_io_catalogue(
+        caseDir, numProjs=5, numExpsPerProj=20, roicolMod='SEG',
+        sizeLabel='tiny'
+        ):
+    """
+    Create the catalogue and configuration dictionary for the benchmark.
+
+    Parameters
+    ----------
+    caseDir : str
+        The directory for the synthetic data and downloads.
+    numProjs : int, optional
+        The number of synthetic projects. The default value is 5.
+    numExpsPerProj : int, optional
+        The number of experiments in each synthetic project. The default value
+        is 20.
+    roicolMod : str, optional
+        'RTSTRUCT' or 'SEG'. The default value is 'SEG'.
+    sizeLabel : str, optional
+        The key of the size preset (in SIZE_PRESETS) of the DICOM series. The
+        default value is 'tiny'.
+
+    Returns
+    -------
+    catalogue : dict
+        The catalogue (see benchmarking.xnat_standin.create_synthetic_xnat).
+    cfgDict : dict
+        Dictionary containing the parameters for the benchmark (with the
+        cwd and downloads in caseDir).
+    """
+
+    catalogue = create_synthetic_xnat(numProjs, numExpsPerProj)
+
+    cfgDict = create_benchmark_cfgDict('xnat_io', '5a', roicolMod, caseDir)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        cfgDict = create_benchmark_data(
+            cfgDict, '5a', SIZE_PRESETS[sizeLabel]['size'],
+            SIZE_PRESETS[sizeLabel]['spacings']
+            )
+
+    projID = cfgDict['projID']
+    subjLab = cfgDict['subjLab']
+
+    cfgDict.update({
+        'cwd' : caseDir,
+        'useCaseToApply' : '5a',
+        'srcExpLab' : 'Source',
+        'trgExpLab' : 'Target',
+        'srcRoicolName' : ROICOL_NAME,
+        'useTxGraph' : False
+        })
+
+    add_dicom_session(
+        catalogue, projID, subjLab, cfgDict['srcExpLab'],
+        {cfgDict['srcScanID'] : cfgDict['srcDicomDir']},
+        {ROICOL_NAME : cfgDict['srcRoicolFpath']}
+        )
+
+    add_dicom_session(
+        catalogue, projID, subjLab, cfgDict['trgExpLab'],
+        {cfgDict['trgScanID'] : cfgDict['trgDicomDir']}
+        )
+
+    for subj in catalogue['subjects']:
+        if subj['project'] == projID and subj['label'] == subjLab:
+            with open(DRO_FPATH, 'rb') as file:
+                subj['files'][os.path.basename(DRO_FPATH)] = file.read()
+
+    return catalogue, cfgDict
+
+def get_params(standin, cfgDict):
+    """
+    Get a DataDownloader (params) connected to the stand-in XNAT using an
+    alias token issued by it.
+    """
+
+    tokenDir = os.path.join(cfgDict['cwd'], 'xnat_tokens')
+
+    if os.path.isdir(tokenDir):
+        shutil.rmtree(tokenDir)
+
+    export_dict_to_json(
+        standin.issue_alias_token('benchmark'), 'XNAT_alias_token', tokenDir
+        )
+
+    cfgDict['url'] = standin.url
+
+    return DataDownloader(BenchmarkConfigFetcher(cfgDict))
+
+def run_downloads(standin, cfgDict):
+    """
+    Connect to XNAT and download the Source and Target scans and the Source
+    ROI Collection (as in app.main).
+    """
+
+    downloadDir = os.path.join(cfgDict['cwd'], 'xnat_downloads')
+
+    if os.path.isdir(downloadDir):
+        shutil.rmtree(downloadDir)
+
+    params = get_params(standin, cfgDict)
+
+    params.download_and_get_pathsDict()
+
+def run_fetch_dro(params):
+    """
+    Search for a suitable DRO (use case 5a).
+    """
+
+    DroImporter(params)
+
+def run_uploads(params, background=False):
+    """
+    Upload the Source ROI Collection (to the Target experiment) and the DRO,
+    either one after the other or on the workers of an UploadManager.
+    """
+
+    cfgDict = params.cfgDict
+    url = cfgDict['url']
+
+    expID = get_exp_id_from_label(
+        url, cfgDict['projID'], cfgDict['subjLab'], cfgDict['trgExpLab'],
+        params.xnatSession
+        )
+
+    with open(cfgDict['srcRoicolFpath'], 'rb') as file:
+        roicolBytes = file.read()
+
+    with open(DRO_FPATH, 'rb') as file:
+        droBytes = file.read()
+
+    tasks = {
+        'roicolUpload' : (upload_im_asr, {
+            'roicol_fpath' : cfgDict['srcRoicolFpath'], 'url' : url,
+            'proj_id' : cfgDict['projID'], 'session_id' : expID,
+            'coll_label' : 'benchmark', 'session' : params.xnatSession,
+            'roicol' : roicolBytes
+            }),
+        'droUpload' : (upload_subj_asr, {
+            'subj_asr_fpath' : DRO_FPATH, 'url' : url,
+            'proj_id' : cfgDict['projID'], 'subj_label' : cfgDict['subjLab'],
+            'content_label' : 'SRO_DRO', 'session' : params.xnatSession,
+            'subj_asr' : droBytes
+            })
+        }
+
+    if background:
+        uploader = UploadManager()
+
+        for name, (func, kwargs) in tasks.items():
+            uploader.submit(name, func, **kwargs)
+
+        uploader.wait()
+    else:
+        for func, kwargs in tasks.values():
+            func(**kwargs)
+
+def run_snapshot(params, bulk=False):
+    """
+    Get a snapshot of the XNAT (without exporting it), from the cwd of the
+    benchmark (where the alias token is exported).
+    """
+
+    cwd = os.getcwd()
+
+    os.chdir(params.cfgDict['cwd'])
+
+    try:
+        get_xnat_snapshot(
+            params.cfgDict['url'], session=params.xnatSession,
+            export_xlsx=False, bulk=bulk
+            )
+    finally:
+        os.chdir(cwd)
+
+def run_case(standin, func, *args):
+    """
+    Run a function and return the numbers of requests and bytes and the time
+    taken.
+    """
+
+    standin.reset_counts()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        func(*args)
+        dTime = time.perf_counter() - t0
+
+    result = standin.get_counts()
+    result['time'] = dTime
+
+    return result
+
+def print_results(results):
+    """
+    Print the numbers of requests and bytes and the times.
+    """
+
+    print('\n\nXNAT I/O RESULTS\n****************')
+    print(f"{'profile':<8} {'case':<26} {'requests':>9} {'MB out':>8} "
+          f"{'MB in':>7} {'replayed':>9} {'time [s]':>9}")
+
+    for profile, cases in results.items():
+        for case, result in cases.items():
+            print(f"{profile:<8} {case:<26} {result['numRequests']:>9} "
+                  f"{result['MBout']:8.2f} {result['MBin']:7.2f} "
+                  f"{result['numReplayed']:>9} {result['time']:9.2f}")
+
+def main(
+        profiles=['local', 'lan', 'wan'], numProjs=5, numExpsPerProj=20,
+        roicolMod='SEG', sizeLabel='tiny', recordingDir=None,
+        benchmarkDir=None, keepData=False
+        ):
+    """
+    Run the XNAT I/O benchmark.
+
+    Parameters
+    ----------
+    profiles : list of strs, optional
+        The keys of the network profiles (in NETWORK_PROFILES) to be
+        benchmarked. The default value is ['local', 'lan', 'wan'].
+    numProjs : int, optional
+        The number of synthetic projects. The default value is 5.
+    numExpsPerProj : int, optional
+        The number of experiments in each synthetic project. The default value
+        is 20.
+    roicolMod : str, optional
+        'RTSTRUCT' or 'SEG'. The default value is 'SEG'.
+    sizeLabel : str, optional
+        The key of the size preset (in SIZE_PRESETS) of the DICOM series. The
+        default value is 'tiny'.
+    recordingDir : str, optional
+        The directory of recorded responses (see
+        benchmarking.xnat_standin.RecordingAdapter.export) to be replayed. The
+        default value is None.
+    benchmarkDir : str, optional
+        The directory for the synthetic data and results. If None
+        outputs/benchmarks (relative to the current working directory) will
+        be used. The default value is None.
+    keepData : bool, optional
+        If True the synthetic data and downloads will not be deleted. The
+        default value is False.
+
+    Returns
+    -------
+    results : dict
+        Dictionary (with profiles as keys) of dictionaries (with cases as
+        keys) of the results of run_case.
+    """
+
+    if benchmarkDir is None:
+        benchmarkDir = os.path.join(os.getcwd(), 'outputs', 'benchmarks')
+
+    for profile in profiles:
+        if not profile in NETWORK_PROFILES:
+            msg = f"profile = '{profile}' is not valid. Acceptable values "\
+                + f"are {list(NETWORK_PROFILES.keys())}."
+            raise Exception(msg)
+
+    caseDir = os.path.join(benchmarkDir, 'xnat_io')
+
+    print('\nCreating the synthetic data...')
+
+    catalogue, cfgDict = create_io_catalogue(
+        caseDir, numProjs, numExpsPerProj, roicolMod, sizeLabel
+        )
+
+    recording = import_recording(recordingDir) if recordingDir else None
+
+    results = {}
+
+    for profile in profiles:
+        print(f"\nBenchmarking the '{profile}' network profile...")
+
+        # (A copy since the uploads are added to the catalogue:)
+        with StandinXnat(
+                copy.deepcopy(catalogue), recording=recording, credentials={},
+                **NETWORK_PROFILES[profile]
+                ) as standin:
+            results[profile] = {}
+
+            results[profile]['download_and_get_pathsDict'] = run_case(
+                standin, run_downloads, standin, cfgDict
+                )
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                params = get_params(standin, cfgDict)
+
+            results[profile]['fetch_dro'] = run_case(
+                standin, run_fetch_dro, params
+                )
+
+            results[profile]['uploads'] = run_case(
+                standin, run_uploads, params
+                )
+
+            results[profile]['uploads (background)'] = run_case(
+                standin, run_uploads, params, True
+                )
+
+            results[profile]['get_xnat_snapshot'] = run_case(
+                standin, run_snapshot, params
+                )
+
+            results[profile]['get_xnat_snapshot (bulk)'] = run_case(
+                standin, run_snapshot, params, True
+                )
+
+    print_results(results)
+
+    if not keepData:
+        shutil.rmtree(caseDir, ignore_errors=True)
+
+    fname = time.strftime('%Y%m%d_%H%M%S') + '_xnat_io.json'
+    fpath = os.path.join(benchmarkDir, fname)
+
+    if not os.path.isdir(benchmarkDir):
+        Path(benchmarkDir).mkdir(parents=True)
+
+    with open(fpath, 'w') as file:
+        json.dump(
+            {'platform' : platform.platform(),
+             'profiles' : {profile : NETWORK_PROFILES[profile]
+                           for profile in profiles},
+             'results' : results},
+            file, indent=2
+            )
+
+    print(f'\nResults exported to:\n {fpath}\n')
+
+    return results
+
+if __name__ == '__main__':
+    """
+    Run benchmark_xnat_io.py as a script (from src/).
+
+    Example usage in a console:
+
+    python benchmarking/benchmark_xnat_io.py
+
+    or
+
+    python benchmarking/benchmark_xnat_io.py --profiles lan wan --numProjs 10
+    --numExpsPerProj 50 --recordingDir recordings/my_xnat
+    """
+
+    parser = argparse.ArgumentParser(description='Arguments for main()')
+
+    parser.add_argument(
+        "--profiles",
+        nargs='+', default=['local', 'lan', 'wan'],
+        help="Network profiles (default is local lan wan)"
+        )
+
+    parser.add_argument(
+        "--numProjs",
+        type=int, default=5,
+        help="Number of synthetic projects (default is 5)"
+        )
+
+    parser.add_argument(
+        "--numExpsPerProj",
+        type=int, default=20,
+        help="Number of experiments per synthetic project (default is 20)"
+        )
+
+    parser.add_argument(
+        "--roicolMod",
+        default='SEG',
+        help="ROI Collection modality (default is SEG)"
+        )
+
+    parser.add_argument(
+        "--sizeLabel",
+        default='tiny',
+        help="Size preset of the DICOM series (default is tiny)"
+        )
+
+    parser.add_argument(
+        "--recordingDir",
+        nargs='?', default=None,
+        help="Directory of recorded responses to replay (default is None)"
+        )
+
+    parser.add_argument(
+        "--benchmarkDir",
+        nargs='?', default=None,
+        help="Directory for results (default is outputs/benchmarks)"
+        )
+
+    parser.add_argument(
+        "--keepData",
+        action='store_true',
+        help="Keep the synthetic data and downloads?"
+        )
+
+    args = parser.parse_args()
+
+    main(
+        args.profiles, args.numProjs, args.numExpsPerProj, args.roicolMod,
+        args.sizeLabel, args.recordingDir, args.benchmarkDir, args.keepData
+        )
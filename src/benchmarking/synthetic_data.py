@@ -0,0 +1,857 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:41:12 2026
+
+@author: ctorti
+"""
+
+"""
+Functions for generating synthetic DICOM series and ROI Collections (RTS and
+SEG) that can be used to exercise the import/propagate/create workflow
+without access to XNAT or patient data.
+
+The phantom is made up of ellipsoidal "blobs" of constant intensity defined in
+physical (patient) coordinates, so that series of any size, spacing,
+orientation and position can be generated that sample the same object. The
+ROIs are spheres, also defined in physical coordinates.
+"""
+
+import os
+import datetime
+from pathlib import Path
+import numpy as np
+import SimpleITK as sitk
+from pydicom.dataset import Dataset, FileDataset, FileMetaDataset
+from pydicom.sequence import Sequence
+from pydicom.uid import generate_uid, ExplicitVRLittleEndian
+from pydicom.pixel_data_handlers.numpy_handler import pack_bits
+from io_tools.imports import import_dcms
+
+
+MR_IMAGE_STORAGE = '1.2.840.10008.5.1.4.1.1.4'
+RTSTRUCT_STORAGE = '1.2.840.10008.5.1.4.1.1.481.3'
+SEG_STORAGE = '1.2.840.10008.5.1.4.1.1.66.4'
+STUDY_COMPONENT_MANAGEMENT = '1.2.840.10008.3.1.2.3.1'
+
+def get_direction_from_orientation(orientation='axial'):
+    """
+    Get the (SimpleITK-style) direction cosines for a named orientation.
+
+    Parameters
+    ----------
+    orientation : str, optional
+        Acceptable values are 'axial', 'coronal' or 'sagittal'. The default
+        value is 'axial'.
+
+    Returns
+    -------
+    direction : list of floats
+        A list of length 9 of the direction cosines, whose columns are the
+        row, column and slice directions.
+    """
+
+    if orientation == 'axial':
+        rowDir, colDir = [1, 0, 0], [0, 1, 0]
+    elif orientation == 'coronal':
+        rowDir, colDir = [1, 0, 0], [0, 0, -1]
+    elif orientation == 'sagittal':
+        rowDir, colDir = [0, 1, 0], [0, 0, -1]
+    else:
+        msg = f"orientation = '{orientation}' is not valid. Acceptable "\
+            + "values are 'axial', 'coronal' and 'sagittal'."
+        raise Exception(msg)
+
+    normal = list(np.cross(rowDir, colDir))
+
+    direction = [
+        rowDir[0], colDir[0], normal[0],
+        rowDir[1], colDir[1], normal[1],
+        rowDir[2], colDir[2], normal[2]
+        ]
+
+    return [float(item) for item in direction]
+
+def get_origin_for_centre(size, spacings, direction, centre=(0, 0, 0)):
+    """
+    Get the origin of an image grid such that the grid is centred on a
+    physical point.
+
+    Parameters
+    ----------
+    size : list of ints
+        The image size along the row, column and slice directions.
+    spacings : list of floats
+        The voxel spacings along the row, column and slice directions.
+    direction : list of floats
+        A list of length 9 of the (SimpleITK-style) direction cosines.
+    centre : list of floats, optional
+        The physical point to centre the grid on. The default value is
+        (0, 0, 0).
+
+    Returns
+    -------
+    origin : list of floats
+        The physical position of the first voxel.
+    """
+
+    dirMatrix = np.array(direction, dtype=float).reshape(3, 3)
+
+    halfExtent = (np.array(size) - 1)*np.array(spacings)/2
+
+    origin = np.array(centre, dtype=float) - dirMatrix @ halfExtent
+
+    return [float(item) for item in origin]
+
+def get_phantom_spec(centre=(0, 0, 0), extent=(64, 64, 64)):
+    """
+    Get the blobs that make up the default phantom and the spherical ROIs that
+    lie within it.
+
+    Parameters
+    ----------
+    centre : list of floats, optional
+        The physical centre of the phantom. The default value is (0, 0, 0).
+    extent : list of floats, optional
+        The physical extent (in mm) along x, y and z that the phantom is to
+        fill. The default value is (64, 64, 64).
+
+    Returns
+    -------
+    blobs : list of dicts
+        A list (for each ellipsoid) of a dictionary with keys 'centre',
+        'radii' and 'value'.
+    rois : list of dicts
+        A list (for each ROI) of a dictionary with keys 'label', 'centre' and
+        'radius'.
+    """
+
+    c = np.array(centre, dtype=float)
+    e = np.array(extent, dtype=float)
+
+    blobs = [
+        {'centre' : c, 'radii' : 0.42*e, 'value' : 400},
+        {'centre' : c + [0.12*e[0], 0.05*e[1], 0],
+         'radii' : [0.14*e[0], 0.10*e[1], 0.12*e[2]], 'value' : 500},
+        {'centre' : c - [0.15*e[0], 0.10*e[1], 0.08*e[2]],
+         'radii' : [0.08*e[0], 0.14*e[1], 0.10*e[2]], 'value' : -250},
+        {'centre' : c + [0, -0.20*e[1], 0.15*e[2]],
+         'radii' : [0.20*e[0], 0.05*e[1], 0.05*e[2]], 'value' : 300}
+        ]
+
+    rois = [
+        {'label' : 'Sphere A',
+         'centre' : c + [0.12*e[0], 0.05*e[1], 0],
+         'radius' : 0.09*min(e)},
+        {'label' : 'Sphere B',
+         'centre' : c - [0.15*e[0], 0.10*e[1], 0.08*e[2]],
+         'radius' : 0.06*min(e)}
+        ]
+
+    return blobs, rois
+
+def get_phantom_values(pts, blobs, phantomTx=None):
+    """
+    Get the phantom's intensities at a set of physical points.
+
+    Parameters
+    ----------
+    pts : Numpy array
+        An (N, 3) array of physical points.
+    blobs : list of dicts
+        A list (for each ellipsoid) of a dictionary with keys 'centre',
+        'radii' and 'value'.
+    phantomTx : SimpleITK Transform, optional
+        If provided, pts will be mapped through phantomTx before evaluating
+        the phantom, i.e. the phantom will appear moved by the inverse of
+        phantomTx. The default value is None.
+
+    Returns
+    -------
+    vals : Numpy array
+        The (N,) array of intensities.
+    """
+
+    if phantomTx is not None:
+        matrix = np.array(phantomTx.GetMatrix()).reshape(3, 3)
+        txCentre = np.array(phantomTx.GetCenter())
+        translation = np.array(phantomTx.GetTranslation())
+
+        pts = (pts - txCentre) @ matrix.T + txCentre + translation
+
+    vals = np.zeros(pts.shape[0], dtype=np.float32)
+
+    for blob in blobs:
+        d = (pts - np.array(blob['centre']))/np.array(blob['radii'])
+
+        vals[np.einsum('ij,ij->i', d, d) <= 1] += blob['value']
+
+    return vals
+
+def get_slice_pts(ipp, rowDir, colDir, spacings, rows, cols):
+    """
+    Get the physical points of every pixel in a slice.
+
+    Parameters
+    ----------
+    ipp : Numpy array
+        The ImagePositionPatient of the slice.
+    rowDir : Numpy array
+        The direction cosine along the rows.
+    colDir : Numpy array
+        The direction cosine along the columns.
+    spacings : list of floats
+        The voxel spacings along the row, column and slice directions.
+    rows : int
+        The number of rows.
+    cols : int
+        The number of columns.
+
+    Returns
+    -------
+    pts : Numpy array
+        An (rows*cols, 3) array of physical points in row-major order.
+    """
+
+    i = np.arange(cols)*spacings[0]
+    j = np.arange(rows)*spacings[1]
+
+    pts = ipp[None, None, :] + j[:, None, None]*colDir[None, None, :]\
+        + i[None, :, None]*rowDir[None, None, :]
+
+    return pts.reshape(-1, 3)
+
+def create_file_dataset(sopClassUID, sopuid, fpath):
+    """
+    Create an empty Pydicom FileDataset with the file meta information
+    populated.
+
+    Parameters
+    ----------
+    sopClassUID : str
+        The SOPClassUID.
+    sopuid : str
+        The SOPInstanceUID.
+    fpath : str
+        The file path the dataset will be saved to.
+
+    Returns
+    -------
+    ds : Pydicom Object
+    """
+
+    fileMeta = FileMetaDataset()
+    fileMeta.MediaStorageSOPClassUID = sopClassUID
+    fileMeta.MediaStorageSOPInstanceUID = sopuid
+    fileMeta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = FileDataset(fpath, {}, file_meta=fileMeta, preamble=b'\0'*128)
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+
+    ds.SOPClassUID = sopClassUID
+    ds.SOPInstanceUID = sopuid
+
+    return ds
+
+def copy_patient_and_study_tags(ds, dicom):
+    """
+    Copy patient, study and frame of reference tags from a DICOM to a new
+    dataset.
+
+    Parameters
+    ----------
+    ds : Pydicom Object
+        The dataset to be modified.
+    dicom : Pydicom Object
+        The DICOM whose tags are to be copied.
+
+    Returns
+    -------
+    ds : Pydicom Object
+    """
+
+    for keyword in [
+            'PatientName', 'PatientID', 'PatientBirthDate', 'PatientSex',
+            'StudyInstanceUID', 'StudyID', 'StudyDate', 'StudyTime',
+            'AccessionNumber', 'ReferringPhysicianName', 'Manufacturer',
+            'ManufacturerModelName', 'FrameOfReferenceUID',
+            'PositionReferenceIndicator'
+            ]:
+        setattr(ds, keyword, getattr(dicom, keyword))
+
+    return ds
+
+def create_synthetic_series(
+        exportDir, size=(64, 64, 64), spacings=(1, 1, 1), origin=None,
+        direction=None, blobs=None, studyuid=None, foruid=None, seriesNum=1,
+        phantomTx=None, p2c=False
+        ):
+    """
+    Create a synthetic MR DICOM series of the phantom and export it to disk.
+
+    Parameters
+    ----------
+    exportDir : str
+        The directory the DICOM files will be exported to.
+    size : list of ints, optional
+        The number of columns, rows and slices. The default value is
+        (64, 64, 64).
+    spacings : list of floats, optional
+        The voxel spacings along the row, column and slice directions. The
+        default value is (1, 1, 1).
+    origin : list of floats, optional
+        The physical position of the first voxel. If None the grid will be
+        centred on (0, 0, 0). The default value is None.
+    direction : list of floats, optional
+        A list of length 9 of the (SimpleITK-style) direction cosines. If None
+        the axial direction will be used. The default value is None.
+    blobs : list of dicts, optional
+        The phantom (see get_phantom_spec). If None the default phantom for
+        the grid's extent will be used. The default value is None.
+    studyuid : str, optional
+        The StudyInstanceUID. If None a new UID will be generated. The default
+        value is None.
+    foruid : str, optional
+        The FrameOfReferenceUID. If None a new UID will be generated. The
+        default value is None.
+    seriesNum : int, optional
+        The SeriesNumber. The default value is 1.
+    phantomTx : SimpleITK Transform, optional
+        Transform applied to the phantom (see get_phantom_values). The default
+        value is None.
+    p2c : bool, optional
+        If True some results will be printed to the console. The default value
+        is False.
+
+    Returns
+    -------
+    studyuid : str
+        The StudyInstanceUID of the series.
+    seriesuid : str
+        The SeriesInstanceUID of the series.
+    foruid : str
+        The FrameOfReferenceUID of the series.
+    sopuids : list of strs
+        The SOPInstanceUIDs of the series (in slice order).
+    """
+
+    if direction is None:
+        direction = get_direction_from_orientation('axial')
+    if origin is None:
+        origin = get_origin_for_centre(size, spacings, direction)
+    if blobs is None:
+        blobs, _ = get_phantom_spec(
+            extent=[size[i]*spacings[i] for i in range(3)]
+            )
+    if studyuid is None:
+        studyuid = generate_uid()
+    if foruid is None:
+        foruid = generate_uid()
+
+    seriesuid = generate_uid()
+
+    dirMatrix = np.array(direction, dtype=float).reshape(3, 3)
+    rowDir = dirMatrix[:, 0]
+    colDir = dirMatrix[:, 1]
+    normal = dirMatrix[:, 2]
+
+    cols, rows, slices = size
+
+    if not os.path.isdir(exportDir):
+        Path(exportDir).mkdir(parents=True)
+
+    timeNow = datetime.datetime.now()
+    currentDate = timeNow.strftime('%Y%m%d')
+    currentTime = timeNow.strftime('%H%M%S')
+
+    iop = [f'{item:.6f}' for item in list(rowDir) + list(colDir)]
+
+    sopuids = []
+
+    for k in range(slices):
+        ipp = np.array(origin) + k*spacings[2]*normal
+
+        sopuid = generate_uid()
+
+        fpath = os.path.join(exportDir, f'{k:04d}.dcm')
+
+        ds = create_file_dataset(MR_IMAGE_STORAGE, sopuid, fpath)
+
+        ds.PatientName = 'Synthetic^Phantom'
+        ds.PatientID = 'SYNTH001'
+        ds.PatientBirthDate = '19700101'
+        ds.PatientSex = 'O'
+        ds.StudyInstanceUID = studyuid
+        ds.StudyID = '1'
+        ds.StudyDate = currentDate
+        ds.StudyTime = currentTime
+        ds.SeriesDate = currentDate
+        ds.SeriesTime = currentTime
+        ds.ContentDate = currentDate
+        ds.ContentTime = currentTime
+        ds.AccessionNumber = ''
+        ds.ReferringPhysicianName = ''
+        ds.Manufacturer = 'Synthetic'
+        ds.ManufacturerModelName = 'benchmarking'
+        ds.Modality = 'MR'
+        ds.SeriesInstanceUID = seriesuid
+        ds.SeriesNumber = seriesNum
+        ds.SeriesDescription = f'Synthetic series {seriesNum}'
+        ds.InstanceNumber = k + 1
+        ds.FrameOfReferenceUID = foruid
+        ds.PositionReferenceIndicator = ''
+        ds.ImageType = ['ORIGINAL', 'PRIMARY']
+        ds.ImagePositionPatient = [f'{item:.6f}' for item in ipp]
+        ds.ImageOrientationPatient = iop
+        ds.SliceLocation = f'{float(np.dot(ipp, normal)):.6f}'
+        ds.SliceThickness = f'{spacings[2]}'
+        ds.SpacingBetweenSlices = f'{spacings[2]}'
+        ds.PixelSpacing = [f'{spacings[1]}', f'{spacings[0]}']
+        ds.Rows = rows
+        ds.Columns = cols
+        ds.SamplesPerPixel = 1
+        ds.PhotometricInterpretation = 'MONOCHROME2'
+        ds.BitsAllocated = 16
+        ds.BitsStored = 16
+        ds.HighBit = 15
+        ds.PixelRepresentation = 1
+        ds.RescaleIntercept = '0'
+        ds.RescaleSlope = '1'
+
+        pts = get_slice_pts(ipp, rowDir, colDir, spacings, rows, cols)
+
+        pixarr = get_phantom_values(pts, blobs, phantomTx).reshape(rows, cols)
+
+        ds.PixelData = pixarr.astype(np.int16).tobytes()
+
+        ds.save_as(fpath, write_like_original=False)
+
+        sopuids.append(sopuid)
+
+    if p2c:
+        print(f'Exported {slices} synthetic DICOMs ({cols}x{rows}) to '
+              f'{exportDir}\n')
+
+    return studyuid, seriesuid, foruid, sopuids
+
+def get_sphere_cross_sections(dicoms, roi):
+    """
+    Get the circular cross-sections of a spherical ROI with the slices of a
+    DICOM series.
+
+    Parameters
+    ----------
+    dicoms : list of Pydicom Objects
+        The DICOM series (sorted along the slice direction).
+    roi : dict
+        Dictionary with keys 'label', 'centre' and 'radius'.
+
+    Returns
+    -------
+    sections : list of tuples
+        A list (for each intersected slice) of a tuple of the slice index, the
+        physical centre of the cross-section and its radius.
+    """
+
+    iop = np.array([float(item) for item in dicoms[0].ImageOrientationPatient])
+    normal = np.cross(iop[:3], iop[3:])
+
+    centre = np.array(roi['centre'], dtype=float)
+    radius = roi['radius']
+
+    sections = []
+
+    for s in range(len(dicoms)):
+        ipp = np.array([float(item) for item in dicoms[s].ImagePositionPatient])
+
+        # Signed distance from the sphere centre to the slice plane:
+        d = np.dot(centre - ipp, normal)
+
+        if abs(d) < radius:
+            sections.append(
+                (s, centre - d*normal, np.sqrt(radius**2 - d**2))
+                )
+
+    return sections
+
+def create_synthetic_rts(dicomDir, exportFpath, rois, p2c=False):
+    """
+    Create a synthetic RTSTRUCT of spherical ROIs for a DICOM series and
+    export it to disk.
+
+    Parameters
+    ----------
+    dicomDir : str
+        The directory containing the DICOM series the RTSTRUCT will reference.
+    exportFpath : str
+        The file path of the exported RTSTRUCT.
+    rois : list of dicts
+        A list (for each ROI) of a dictionary with keys 'label', 'centre' and
+        'radius'.
+    p2c : bool, optional
+        If True some results will be printed to the console. The default value
+        is False.
+
+    Returns
+    -------
+    rts : Pydicom Object
+        The RTSTRUCT.
+    """
+
+    dicoms = import_dcms(dicomDir)
+
+    iop = np.array([float(item) for item in dicoms[0].ImageOrientationPatient])
+    rowDir, colDir = iop[:3], iop[3:]
+    minSpacing = min([float(item) for item in dicoms[0].PixelSpacing])
+
+    rts = create_file_dataset(RTSTRUCT_STORAGE, generate_uid(), exportFpath)
+
+    rts = copy_patient_and_study_tags(rts, dicoms[0])
+
+    timeNow = datetime.datetime.now()
+
+    rts.Modality = 'RTSTRUCT'
+    rts.SeriesInstanceUID = generate_uid()
+    rts.SeriesNumber = dicoms[0].SeriesNumber
+    rts.InstanceNumber = 1
+    rts.StructureSetLabel = 'Synthetic spheres'
+    rts.StructureSetName = 'Synthetic spheres'
+    rts.StructureSetDate = timeNow.strftime('%Y%m%d')
+    rts.StructureSetTime = timeNow.strftime('%H%M%S')
+
+    ssRoiSeq = Sequence()
+    roiCntSeq = Sequence()
+    obsSeq = Sequence()
+    refSlcInds = []
+
+    for r in range(len(rois)):
+        ssRoi = Dataset()
+        ssRoi.ROINumber = f'{r+1}'
+        ssRoi.ReferencedFrameOfReferenceUID = dicoms[0].FrameOfReferenceUID
+        ssRoi.ROIName = rois[r]['label']
+        ssRoi.ROIGenerationAlgorithm = 'MANUAL'
+        ssRoiSeq.append(ssRoi)
+
+        cntSeq = Sequence()
+
+        for s, centre, radius in get_sphere_cross_sections(dicoms, rois[r]):
+            # The number of points in the contour (~1 per pixel along the
+            # circumference):
+            N = max(16, int(2*np.pi*radius/minSpacing))
+
+            theta = np.linspace(0, 2*np.pi, N, endpoint=False)
+
+            pts = centre[None, :]\
+                + radius*np.cos(theta)[:, None]*rowDir[None, :]\
+                + radius*np.sin(theta)[:, None]*colDir[None, :]
+
+            cntImSeq = Dataset()
+            cntImSeq.ReferencedSOPClassUID = dicoms[s].SOPClassUID
+            cntImSeq.ReferencedSOPInstanceUID = dicoms[s].SOPInstanceUID
+
+            cnt = Dataset()
+            cnt.ContourImageSequence = Sequence([cntImSeq])
+            cnt.ContourGeometricType = 'CLOSED_PLANAR'
+            cnt.NumberOfContourPoints = f'{N}'
+            cnt.ContourNumber = f'{len(cntSeq)+1}'
+            cnt.ContourData = [f'{item:.4f}' for item in pts.ravel()]
+            cntSeq.append(cnt)
+
+            if not s in refSlcInds:
+                refSlcInds.append(s)
+
+        if not len(cntSeq):
+            msg = f"The ROI '{rois[r]['label']}' does not intersect any of "\
+                + f"the slices in {dicomDir}."
+            raise Exception(msg)
+
+        roiCnt = Dataset()
+        roiCnt.ROIDisplayColor = [255*(r % 2), 255*((r + 1) % 2), 0]
+        roiCnt.ContourSequence = cntSeq
+        roiCnt.ReferencedROINumber = f'{r+1}'
+        roiCntSeq.append(roiCnt)
+
+        obs = Dataset()
+        obs.ObservationNumber = f'{r+1}'
+        obs.ReferencedROINumber = f'{r+1}'
+        obs.RTROIInterpretedType = 'ORGAN'
+        obs.ROIInterpreter = ''
+        obsSeq.append(obs)
+
+    cntImSeq = Sequence()
+    for s in refSlcInds:
+        item = Dataset()
+        item.ReferencedSOPClassUID = dicoms[s].SOPClassUID
+        item.ReferencedSOPInstanceUID = dicoms[s].SOPInstanceUID
+        cntImSeq.append(item)
+
+    rtRefSer = Dataset()
+    rtRefSer.SeriesInstanceUID = dicoms[0].SeriesInstanceUID
+    rtRefSer.ContourImageSequence = cntImSeq
+
+    rtRefStu = Dataset()
+    rtRefStu.ReferencedSOPClassUID = STUDY_COMPONENT_MANAGEMENT
+    rtRefStu.ReferencedSOPInstanceUID = dicoms[0].StudyInstanceUID
+    rtRefStu.RTReferencedSeriesSequence = Sequence([rtRefSer])
+
+    refFor = Dataset()
+    refFor.FrameOfReferenceUID = dicoms[0].FrameOfReferenceUID
+    refFor.RTReferencedStudySequence = Sequence([rtRefStu])
+
+    rts.ReferencedFrameOfReferenceSequence = Sequence([refFor])
+    rts.StructureSetROISequence = ssRoiSeq
+    rts.ROIContourSequence = roiCntSeq
+    rts.RTROIObservationsSequence = obsSeq
+
+    exportDir = os.path.dirname(exportFpath)
+    if exportDir and not os.path.isdir(exportDir):
+        Path(exportDir).mkdir(parents=True)
+
+    rts.save_as(exportFpath, write_like_original=False)
+
+    if p2c:
+        print(f'Exported synthetic RTSTRUCT with {len(rois)} ROIs to '
+              f'{exportFpath}\n')
+
+    return rts
+
+def create_synthetic_seg(dicomDir, exportFpath, rois, p2c=False):
+    """
+    Create a synthetic SEG of spherical segments for a DICOM series and export
+    it to disk.
+
+    Parameters
+    ----------
+    dicomDir : str
+        The directory containing the DICOM series the SEG will reference.
+    exportFpath : str
+        The file path of the exported SEG.
+    rois : list of dicts
+        A list (for each segment) of a dictionary with keys 'label', 'centre'
+        and 'radius'.
+    p2c : bool, optional
+        If True some results will be printed to the console. The default value
+        is False.
+
+    Returns
+    -------
+    seg : Pydicom Object
+        The SEG.
+    """
+
+    dicoms = import_dcms(dicomDir)
+
+    rows = int(dicoms[0].Rows)
+    cols = int(dicoms[0].Columns)
+    pixSpacing = [float(item) for item in dicoms[0].PixelSpacing]
+    spacings = [pixSpacing[1], pixSpacing[0], float(dicoms[0].SliceThickness)]
+
+    iop = np.array([float(item) for item in dicoms[0].ImageOrientationPatient])
+    rowDir, colDir = iop[:3], iop[3:]
+
+    seg = create_file_dataset(SEG_STORAGE, generate_uid(), exportFpath)
+
+    seg = copy_patient_and_study_tags(seg, dicoms[0])
+
+    timeNow = datetime.datetime.now()
+
+    seg.Modality = 'SEG'
+    seg.SeriesInstanceUID = generate_uid()
+    seg.SeriesNumber = dicoms[0].SeriesNumber
+    seg.SeriesDescription = 'Synthetic spheres'
+    seg.InstanceNumber = 1
+    seg.ContentLabel = 'SPHERES'
+    seg.ContentDescription = 'Synthetic spheres'
+    seg.ContentCreatorName = ''
+    seg.ContentDate = timeNow.strftime('%Y%m%d')
+    seg.ContentTime = timeNow.strftime('%H%M%S')
+    seg.ImageType = ['DERIVED', 'PRIMARY']
+    seg.SegmentationType = 'BINARY'
+    seg.SamplesPerPixel = 1
+    seg.PhotometricInterpretation = 'MONOCHROME2'
+    seg.Rows = rows
+    seg.Columns = cols
+    seg.BitsAllocated = 1
+    seg.BitsStored = 1
+    seg.HighBit = 0
+    seg.PixelRepresentation = 0
+    seg.LossyImageCompression = '00'
+
+    pixMeas = Dataset()
+    pixMeas.SliceThickness = f'{spacings[2]}'
+    pixMeas.SpacingBetweenSlices = f'{spacings[2]}'
+    pixMeas.PixelSpacing = list(dicoms[0].PixelSpacing)
+
+    planeOri = Dataset()
+    planeOri.ImageOrientationPatient = list(dicoms[0].ImageOrientationPatient)
+
+    shared = Dataset()
+    shared.PixelMeasuresSequence = Sequence([pixMeas])
+    shared.PlaneOrientationSequence = Sequence([planeOri])
+
+    seg.SharedFunctionalGroupsSequence = Sequence([shared])
+
+    segSeq = Sequence()
+    frames = []
+    framesSlcInds = []
+    framesSegNums = []
+
+    for r in range(len(rois)):
+        segment = Dataset()
+        segment.SegmentNumber = r + 1
+        segment.SegmentLabel = rois[r]['label']
+        segment.SegmentAlgorithmType = 'MANUAL'
+        segSeq.append(segment)
+
+        centre = np.array(rois[r]['centre'], dtype=float)
+
+        for s, _, _ in get_sphere_cross_sections(dicoms, rois[r]):
+            ipp = np.array(
+                [float(item) for item in dicoms[s].ImagePositionPatient]
+                )
+
+            pts = get_slice_pts(ipp, rowDir, colDir, spacings, rows, cols)
+
+            d = pts - centre
+
+            frame = (np.einsum('ij,ij->i', d, d) <= rois[r]['radius']**2)
+
+            if frame.any():
+                frames.append(frame.reshape(rows, cols).astype(np.uint8))
+                framesSlcInds.append(s)
+                framesSegNums.append(r + 1)
+
+        if not r + 1 in framesSegNums:
+            msg = f"The segment '{rois[r]['label']}' does not intersect any "\
+                + f"of the slices in {dicomDir}."
+            raise Exception(msg)
+
+    seg.SegmentSequence = segSeq
+
+    # The unique slice indices in order of first reference:
+    refSlcInds = list(dict.fromkeys(framesSlcInds))
+
+    refInsSeq = Sequence()
+    for s in refSlcInds:
+        item = Dataset()
+        item.ReferencedSOPClassUID = dicoms[s].SOPClassUID
+        item.ReferencedSOPInstanceUID = dicoms[s].SOPInstanceUID
+        refInsSeq.append(item)
+
+    refSer = Dataset()
+    refSer.SeriesInstanceUID = dicoms[0].SeriesInstanceUID
+    refSer.ReferencedInstanceSequence = refInsSeq
+
+    seg.ReferencedSeriesSequence = Sequence([refSer])
+
+    perFrameSeq = Sequence()
+
+    for f in range(len(frames)):
+        s = framesSlcInds[f]
+
+        srcIm = Dataset()
+        srcIm.ReferencedSOPClassUID = dicoms[s].SOPClassUID
+        srcIm.ReferencedSOPInstanceUID = dicoms[s].SOPInstanceUID
+
+        derIm = Dataset()
+        derIm.SourceImageSequence = Sequence([srcIm])
+
+        frameCnt = Dataset()
+        frameCnt.DimensionIndexValues = [
+            framesSegNums[f], refSlcInds.index(s) + 1
+            ]
+
+        planePos = Dataset()
+        planePos.ImagePositionPatient = list(dicoms[s].ImagePositionPatient)
+
+        segId = Dataset()
+        segId.ReferencedSegmentNumber = framesSegNums[f]
+
+        perFrame = Dataset()
+        perFrame.DerivationImageSequence = Sequence([derIm])
+        perFrame.FrameContentSequence = Sequence([frameCnt])
+        perFrame.PlanePositionSequence = Sequence([planePos])
+        perFrame.SegmentIdentificationSequence = Sequence([segId])
+        perFrameSeq.append(perFrame)
+
+    seg.PerFrameFunctionalGroupsSequence = perFrameSeq
+    seg.NumberOfFrames = f'{len(frames)}'
+
+    packed = pack_bits(np.stack(frames).ravel())
+
+    seg.PixelData = packed + b'\x00' if len(packed) % 2 else packed
+
+    exportDir = os.path.dirname(exportFpath)
+    if exportDir and not os.path.isdir(exportDir):
+        Path(exportDir).mkdir(parents=True)
+
+    seg.save_as(exportFpath, write_like_original=False)
+
+    if p2c:
+        print(f'Exported synthetic SEG with {len(rois)} segments and '
+              f'{len(frames)} frames to {exportFpath}\n')
+
+    return seg
+
+def create_synthetic_roicol(dicomDir, exportFpath, rois, roicolMod, p2c=False):
+    """
+    Create a synthetic RTSTRUCT or SEG for a DICOM series and export it to
+    disk.
+
+    Parameters
+    ----------
+    dicomDir : str
+        The directory containing the DICOM series the ROI Collection will
+        reference.
+    exportFpath : str
+        The file path of the exported ROI Collection.
+    rois : list of dicts
+        A list (for each ROI/segment) of a dictionary with keys 'label',
+        'centre' and 'radius'.
+    roicolMod : str
+        'RTSTRUCT' or 'SEG'.
+    p2c : bool, optional
+        If True some results will be printed to the console. The default value
+        is False.
+
+    Returns
+    -------
+    roicol : Pydicom Object
+        The RTSTRUCT or SEG.
+    """
+
+    if roicolMod == 'RTSTRUCT':
+        return create_synthetic_rts(dicomDir, exportFpath, rois, p2c)
+    elif roicolMod == 'SEG':
+        return create_synthetic_seg(dicomDir, exportFpath, rois, p2c)
+    else:
+        msg = f"roicolMod = '{roicolMod}' is not valid. Acceptable values "\
+            + "are 'RTSTRUCT' and 'SEG'."
+        raise Exception(msg)
+
+def create_phantom_tx(centre, angles=(0, 0, 5), translation=(3, -2, 1.5)):
+    """
+    Create the rigid transform used to move the phantom between frames of
+    reference (e.g. to simulate a repositioned patient).
+
+    Parameters
+    ----------
+    centre : list of floats
+        The centre of rotation.
+    angles : list of floats, optional
+        The rotation angles (in degrees) about x, y and z. The default value
+        is (0, 0, 5).
+    translation : list of floats, optional
+        The translation (in mm). The default value is (3, -2, 1.5).
+
+    Returns
+    -------
+    tx : SimpleITK Euler3DTransform
+    """
+
+    tx = sitk.Euler3DTransform()
+    tx.SetCenter([float(item) for item in centre])
+    tx.SetRotation(*[float(np.deg2rad(item)) for item in angles])
+    tx.SetTranslation([float(item) for item in translation])
+
+    return tx
@@ -0,0 +1,1166 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Nov 12 09:37:15 2026
+
+@author: ctorti
+"""
+
+
+
+"""
+A stand-in XNAT (a local HTTP server) serving a synthetic catalogue of
+projects, subjects, experiments, scans and ROI Collections, and/or responses
+recorded from a live XNAT, for benchmarking xnat_tools (and the classes that
+use it) without access to an XNAT.
+
+Note:
+The REST endpoints used by xnat_tools are served: the project, subject and
+experiment listings (with or without column selection by the 'columns' query
+parameter, as for the XNAT search service), the JSON of individual projects
+and experiments, scan and subject file listings and downloads (including
+zipped scans), ROI Collection downloads and uploads (the ROI Collection
+XAPI), subject resource uploads, users, investigators and alias tokens.
+
+A fixed latency can be added to every request, the transfer of request and
+response bodies can be limited to a bandwidth, and the site-wide
+column-selected listings can be forbidden (HTTP 403, as happens for some
+queries on XNAT Central) to exercise the fallbacks of
+xnat_tools.bulk_queries.
+
+Responses recorded from a live XNAT (see record_session) take precedence
+over the synthetic catalogue when replayed (see import_recording), so that
+a benchmark can be run against recorded responses for the requests that
+were recorded and synthetic responses for any others.
+"""
+
+import os
+import io
+import json
+import time
+import uuid
+import base64
+import random
+import zipfile
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, parse_qsl, urlencode, unquote
+from requests.adapters import HTTPAdapter
+from pydicom import dcmread
+
+
+""" The search column of the projects each experiment is shared into: """
+sharingColumn = 'xnat:experimentData/sharing/share/project'
+
+
+def create_synthetic_xnat(numProjs=5, numExpsPerProj=20, seed=0):
+    """
+    Create a synthetic catalogue of projects, subjects, (image session)
+    experiments, investigators and users.
+
+    Parameters
+    ----------
+    numProjs : int, optional
+        The number of projects. The default value is 5.
+    numExpsPerProj : int, optional
+        The number of experiments in each project. The default value is 20.
+    seed : int, optional
+        The seed of the random number generator. The default value is 0.
+
+    Returns
+    -------
+    catalogue : dict
+        Dictionary containing lists of the projects (ID, name, description
+        and start date), subjects (ID, label, project and files),
+        experiments, investigators and (by project) users. Each experiment
+        has an ID, label, project, subject, xsiType, dates, study UID, scans,
+        ROI Collections (assessors) and the projects it is shared into 
+        (sharing), where each scan and assessor has a list of resources 
+        (files) with a label, format, file count and file size.
+
+    Note
+    ----
+    The synthetic experiments have no file contents (see add_dicom_session),
+    so only their listings and JSON can be requested. The first experiment of
+    each project is shared into the next project (if there is more than one
+    project).
+    """
+
+    rng = random.Random(seed)
+
+    startDate = datetime(2021, 1, 1)
+
+    catalogue = get_empty_catalogue()
+
+    for p in range(numProjs):
+        projID = f'PROJ{p:03d}'
+
+        catalogue['projects'].append({
+            'ID' : projID,
+            'name' : f'Project {p}',
+            # Some projects have no description:
+            'description' : '' if p % 3 == 2 else f'Synthetic project {p}',
+            'start_date' : (
+                startDate + timedelta(days=p)
+                ).strftime('%a %b %d %H:%M:%S UTC %Y')
+            })
+
+        catalogue['investigators'].append({
+            'firstname' : 'Principal',
+            'lastname' : f'Investigator {p}',
+            'primaryProjects' : [projID],
+            'investigatorProjects' : []
+            })
+
+        catalogue['users'][projID] = [
+            {'login' : f'user{u}', 'firstname' : 'User', 'lastname' : f'{u}'}
+            for u in rng.sample(range(2*numProjs), 3)
+            ]
+
+        for e in range(numExpsPerProj):
+            expID = f'{projID}_E{e:05d}'
+            subjLab = f'{projID}_S{e//2:05d}'
+            modality = rng.choice(['MR', 'CT', 'PET'])
+            insertDate = startDate + timedelta(
+                days=rng.randint(0, 1000), seconds=rng.randint(0, 86399)
+                )
+
+            if e % 2 == 0:
+                add_subject(catalogue, projID, subjLab)
+
+            scans = []
+            for s in range(rng.randint(1, 6)):
+                label = rng.choice(['DICOM', 'DICOM', 'secondary', 'SNAPSHOTS'])
+
+                if label == 'DICOM':
+                    scanMod = 'PT' if modality == 'PET' else modality
+                elif label == 'secondary':
+                    scanMod = rng.choice(['RTSTRUCT', 'OT'])
+                else:
+                    scanMod = modality
+
+                scans.append({
+                    'ID' : str(s + 1),
+                    'UID' : f'2.25.{rng.getrandbits(96)}',
+                    'type' : f'Series {s + 1}',
+                    'modality' : scanMod,
+                    'files' : [{
+                        'label' : label,
+                        'format' : 'GIF' if label == 'SNAPSHOTS' else 'DICOM',
+                        'file_count' : rng.randint(1, 400),
+                        'file_size' : rng.randint(10**5, 10**8)
+                        }]
+                    })
+
+            assessors = []
+            for a in range(rng.randint(0, 2)):
+                collType = rng.choice(['RTSTRUCT', 'SEG'])
+
+                assessors.append(create_assessor(
+                    f'{expID}_ROI{a}', f'ROIs {a}', collType,
+                    rng.choice(scans)['UID'], insertDate,
+                    file_size=rng.randint(10**4, 10**6)
+                    ))
+
+            exp = create_experiment(
+                expID, f'{projID}_X{e:05d}', projID, subjLab,
+                f'xnat:{modality.lower()}SessionData', insertDate,
+                f'2.25.{rng.getrandbits(96)}', scans, assessors
+                )
+
+            if e == 0 and numProjs > 1:
+                exp['sharing'].append(f'PROJ{(p + 1) % numProjs:03d}')
+
+            catalogue['experiments'].append(exp)
+
+    return catalogue
+
+def get_empty_catalogue():
+    """
+    Get a catalogue (see create_synthetic_xnat) with no projects.
+    """
+
+    return {'projects' : [], 'subjects' : [], 'experiments' : [],
+            'investigators' : [], 'users' : {}}
+
+def add_subject(catalogue, projID, subjLab):
+    """
+    Add a subject (if it doesn't exist) to a catalogue and return it.
+    """
+
+    for subj in catalogue['subjects']:
+        if subj['project'] == projID and subj['label'] == subjLab:
+            return subj
+
+    subj = {
+        'ID' : f'{projID}_SUBJ{len(catalogue["subjects"]):05d}',
+        'label' : subjLab,
+        'project' : projID,
+        'files' : {}
+        }
+
+    catalogue['subjects'].append(subj)
+
+    return subj
+
+def create_experiment(
+        expID, expLab, projID, subjLab, xsiType, insertDate, studyUID, scans,
+        assessors
+        ):
+    """
+    Create an experiment of a catalogue (see create_synthetic_xnat).
+    """
+
+    insertDate = insertDate.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+    return {
+        'ID' : expID,
+        'label' : expLab,
+        'project' : projID,
+        'subject' : subjLab,
+        'xsiType' : xsiType,
+        'date' : insertDate[:10],
+        'insert_date' : insertDate,
+        'last_modified' : insertDate,
+        'URI' : f'/data/experiments/{expID}',
+        'UID' : studyUID,
+        'scans' : scans,
+        'assessors' : assessors,
+        'sharing' : []
+        }
+
+def create_assessor(
+        asrID, name, collType, seriesUID, asrDateTime, content=None,
+        file_size=None
+        ):
+    """
+    Create an (ROI Collection) assessor of an experiment of a catalogue. If
+    content (the bytes of the ROI Collection) is provided its file can be
+    downloaded.
+    """
+
+    label = f'{collType}_{asrID}'
+
+    return {
+        'id' : asrID,
+        'label' : label,
+        'name' : name,
+        'collectionType' : collType,
+        'date' : asrDateTime.strftime('%Y-%m-%d'),
+        'time' : asrDateTime.strftime('%H:%M:%S'),
+        'seriesUID' : seriesUID,
+        'content' : content,
+        'files' : [{
+            'label' : collType,
+            'format' : 'DICOM',
+            'file_count' : 1,
+            'file_size' : len(content) if content is not None else file_size
+            }]
+        }
+
+def add_dicom_session(
+        catalogue, projID, subjLab, expLab, dicomDirByScanID,
+        roicolFpathByName=None
+        ):
+    """
+    Add an experiment (image session) with the contents of DICOM series and
+    ROI Collections on disk to a catalogue, so that they can be downloaded
+    from a StandinXnat.
+
+    Parameters
+    ----------
+    catalogue : dict
+        The catalogue (see create_synthetic_xnat).
+    projID : str
+        The project ID (the project is added if it doesn't exist).
+    subjLab : str
+        The subject label (the subject is added if it doesn't exist).
+    expLab : str
+        The experiment label.
+    dicomDirByScanID : dict
+        Dictionary (with scan IDs as keys) of the directories containing the
+        DICOM series.
+    roicolFpathByName : dict, optional
+        Dictionary (with ROI Collection names as keys) of the file paths of
+        ROI Collections of the series. The default value is None.
+
+    Returns
+    -------
+    exp : dict
+        The experiment.
+    """
+
+    if not projID in [proj['ID'] for proj in catalogue['projects']]:
+        catalogue['projects'].append({
+            'ID' : projID, 'name' : projID, 'description' : '',
+            'start_date' : datetime(2021, 1, 1).strftime(
+                '%a %b %d %H:%M:%S UTC %Y'
+                )
+            })
+
+        catalogue['users'][projID] = []
+
+    add_subject(catalogue, projID, subjLab)
+
+    scans = []
+
+    for scanID, dicomDir in dicomDirByScanID.items():
+        dicoms = {}
+        for fname in sorted(os.listdir(dicomDir)):
+            with open(os.path.join(dicomDir, fname), 'rb') as file:
+                dicoms[fname] = file.read()
+
+        ds = dcmread(io.BytesIO(next(iter(dicoms.values()))),
+                     stop_before_pixels=True)
+
+        scans.append({
+            'ID' : scanID,
+            'UID' : ds.SeriesInstanceUID,
+            'type' : getattr(ds, 'SeriesDescription', ''),
+            'modality' : ds.Modality,
+            'dicoms' : dicoms,
+            'files' : [{
+                'label' : 'DICOM', 'format' : 'DICOM',
+                'file_count' : len(dicoms),
+                'file_size' : sum(len(item) for item in dicoms.values())
+                }]
+            })
+
+    expID = f'{projID}_E{len(catalogue["experiments"]):05d}'
+
+    exp = create_experiment(
+        expID, expLab, projID, subjLab, f'xnat:{ds.Modality.lower()}SessionData',
+        datetime.now(), ds.StudyInstanceUID, scans, []
+        )
+
+    if roicolFpathByName is not None:
+        for name, fpath in roicolFpathByName.items():
+            with open(fpath, 'rb') as file:
+                content = file.read()
+
+            add_roicol(exp, name, content, datetime.now())
+
+    catalogue['experiments'].append(exp)
+
+    return exp
+
+def add_roicol(exp, name, content, asrDateTime):
+    """
+    Add a ROI Collection (the bytes of an RTSTRUCT or SEG) to an experiment.
+    """
+
+    roicol = dcmread(io.BytesIO(content), stop_before_pixels=True)
+
+    if roicol.Modality == 'RTSTRUCT':
+        seriesUID = roicol.ReferencedFrameOfReferenceSequence[0]\
+            .RTReferencedStudySequence[0].RTReferencedSeriesSequence[0]\
+                .SeriesInstanceUID
+    else:
+        seriesUID = roicol.ReferencedSeriesSequence[0].SeriesInstanceUID
+
+    asrID = f"{exp['ID']}_ROI{len(exp['assessors'])}"
+
+    exp['assessors'].append(create_assessor(
+        asrID, name, roicol.Modality, seriesUID, asrDateTime, content
+        ))
+
+def get_exp_json(exp):
+    """
+    Get the JSON of an experiment (as returned by
+    /data/experiments/{ID}?format=json).
+    """
+
+    def get_file_items(files):
+        return [{'data_fields' : dict(file)} for file in files]
+
+    assessors = [
+        {'data_fields' : {key : assessor[key] for key in
+                          ['id', 'label', 'name', 'collectionType', 'date',
+                           'time']},
+         'children' : [{'field' : 'out/file',
+                        'items' : get_file_items(assessor['files'])},
+                       {'field' : 'references/seriesUID',
+                        'items' : [{'data_fields' :
+                                    {'seriesUID' : assessor['seriesUID']}}]}]}
+        for assessor in exp['assessors']
+        ]
+
+    scans = [
+        {'data_fields' : {key : scan[key] for key in
+                          ['ID', 'UID', 'type', 'modality']},
+         'children' : [{'field' : 'file',
+                        'items' : get_file_items(scan['files'])}]}
+        for scan in exp['scans']
+        ]
+
+    children = []
+    if assessors:
+        children.append({'field' : 'assessors/assessor', 'items' : assessors})
+    children.append({'field' : 'scans/scan', 'items' : scans})
+
+    return {'items' : [{
+        'data_fields' : {key : exp[key] for key in
+                         ['ID', 'label', 'project', 'UID']},
+        'children' : children
+        }]}
+
+def get_proj_json(proj):
+    """
+    Get the JSON of a project (as returned by
+    /data/projects/{ID}?format=json).
+    """
+
+    dataFields = {'ID' : proj['ID'], 'name' : proj['name']}
+
+    if proj['description']:
+        dataFields['description'] = proj['description']
+
+    return {'items' : [{
+        'data_fields' : dataFields,
+        'meta' : {'start_date' : proj['start_date']},
+        'children' : []
+        }]}
+
+def get_exp_rows(experiments, bySharing=False):
+    """
+    Get the rows (keyed by XNAT search column) of a listing of experiments,
+    with one row per project each experiment is shared into (or one row with
+    an empty sharingColumn if it isn't shared) if bySharing is True, as XNAT
+    does if sharingColumn is selected.
+    """
+
+    keys = ['ID', 'label', 'project', 'xsiType', 'date', 'insert_date',
+            'last_modified', 'URI']
+
+    rows = []
+
+    for exp in experiments:
+        row = {key : exp[key] for key in keys}
+
+        if bySharing:
+            for projID in exp['sharing'] or ['']:
+                rows.append(dict(row, **{sharingColumn : projID}))
+        else:
+            rows.append(row)
+
+    return rows
+
+def get_scan_resource_rows(experiments):
+    """
+    Get the rows (one per resource of each scan) of a listing of image
+    sessions with scan resource columns.
+    """
+
+    rows = []
+
+    for exp in experiments:
+        for scan in exp['scans']:
+            for file in scan['files']:
+                rows.append({
+                    'ID' : exp['ID'],
+                    'project' : exp['project'],
+                    'xnat:imageScanData/ID' : scan['ID'],
+                    'xnat:imageScanData/modality' : scan['modality'],
+                    'xnat:imageScanData/file/label' : file['label'],
+                    'xnat:imageScanData/file/format' : file['format'],
+                    'xnat:imageScanData/file/file_count' : file['file_count'],
+                    'xnat:imageScanData/file/file_size' : file['file_size']
+                    })
+
+    return rows
+
+def get_assessor_resource_rows(experiments):
+    """
+    Get the rows (one per resource of each ROI Collection) of a listing of
+    ROI Collections with resource columns.
+    """
+
+    rows = []
+
+    for exp in experiments:
+        for assessor in exp['assessors']:
+            for file in assessor['files']:
+                root = 'icr:roiCollectionData'
+
+                rows.append({
+                    'ID' : assessor['id'],
+                    'project' : exp['project'],
+                    f'{root}/imageSession_ID' : exp['ID'],
+                    f'{root}/collectionType' : assessor['collectionType'],
+                    f'{root}/out/file/label' : file['label'],
+                    f'{root}/out/file/format' : file['format'],
+                    f'{root}/out/file/file_count' : file['file_count'],
+                    f'{root}/out/file/file_size' : file['file_size']
+                    })
+
+    return rows
+
+def select_columns(rows, columns):
+    """
+    Select columns of the rows of a listing, returning columns given by XML
+    paths in lower case (as XNAT does).
+    """
+
+    return [
+        {(column.lower() if '/' in column else column) : row.get(column, '')
+         for column in columns}
+        for row in rows
+        ]
+
+def get_result_set(rows):
+    """
+    Get the JSON of a listing (as returned by XNAT).
+    """
+
+    return {'ResultSet' : {'Result' : rows, 'totalRecords' : str(len(rows))}}
+
+def get_zipped_scan(exp, scan):
+    """
+    Get the zipped DICOMs of a scan (as returned by
+    .../scans/{ID}/resources/DICOM/files?format=zip).
+    """
+
+    scanDir = f"{scan['ID']}-{scan['type']}".replace(' ', '_')
+
+    buf = io.BytesIO()
+
+    with zipfile.ZipFile(buf, 'w') as file:
+        for fname, content in scan['dicoms'].items():
+            file.writestr(
+                f"{exp['label']}/scans/{scanDir}/resources/DICOM/files/{fname}",
+                content
+                )
+
+    return buf.getvalue()
+
+def get_query_key(method, path, query):
+    """
+    Get the key of a request (used to record and replay responses), with the
+    query parameters sorted so that their order doesn't matter.
+    """
+
+    query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+
+    return f'{method} {path}?{query}' if query else f'{method} {path}'
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    This class records the responses to the requests made with a requests
+    Session it is mounted on (see record_session).
+
+    Returns
+    -------
+    self.responses : dict
+        Dictionary (with request keys, see get_query_key, as keys) of the
+        status code, content type and content of each response.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.responses = {}
+        self.lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+
+        url = urlsplit(request.url)
+
+        key = get_query_key(request.method, url.path, url.query)
+
+        with self.lock:
+            self.responses[key] = (
+                response.status_code,
+                response.headers.get('Content-Type', 'application/json'),
+                response.content
+                )
+
+        return response
+
+    def export(self, recordDir):
+        """
+        Export the recorded responses to a directory (an index.json file with
+        the content of each response in a separate file).
+
+        Returns
+        -------
+        fpath : str
+            The full file path of the index.
+        """
+
+        os.makedirs(recordDir, exist_ok=True)
+
+        index = {}
+
+        with self.lock:
+            for n, (key, response) in enumerate(self.responses.items()):
+                status, contentType, content = response
+
+                fname = f'{n:06d}.bin'
+
+                with open(os.path.join(recordDir, fname), 'wb') as file:
+                    file.write(content)
+
+                index[key] = {'status' : status, 'contentType' : contentType,
+                              'fname' : fname}
+
+        fpath = os.path.join(recordDir, 'index.json')
+
+        with open(fpath, 'w') as file:
+            json.dump(index, file, indent=2)
+
+        return fpath
+
+def record_session(session):
+    """
+    Record the responses to requests made with a requests Session (e.g. to a
+    live XNAT), which can then be exported by the returned RecordingAdapter
+    and replayed by a StandinXnat.
+
+    Parameters
+    ----------
+    session : requests Session
+        The session.
+
+    Returns
+    -------
+    recorder : RecordingAdapter
+        The adapter mounted on the session.
+
+    Note
+    ----
+    The responses are recorded by path and query (not by host) so that they
+    can be replayed from a different URL.
+    """
+
+    recorder = RecordingAdapter()
+
+    session.mount('http://', recorder)
+    session.mount('https://', recorder)
+
+    return recorder
+
+def import_recording(recordDir):
+    """
+    Import the responses exported by RecordingAdapter.export.
+
+    Returns
+    -------
+    recording : dict
+        Dictionary (with request keys as keys) of the status code, content
+        type and content of each response.
+    """
+
+    with open(os.path.join(recordDir, 'index.json'), 'r') as file:
+        index = json.load(file)
+
+    recording = {}
+
+    for key, item in index.items():
+        with open(os.path.join(recordDir, item['fname']), 'rb') as file:
+            recording[key] = (item['status'], item['contentType'], file.read())
+
+    return recording
+
+
+class StandinXnat:
+    """
+    This class serves a catalogue (see create_synthetic_xnat) and/or recorded
+    responses (see import_recording) from a local HTTP server on a
+    background thread.
+
+    Parameters
+    ----------
+    catalogue : dict
+        The catalogue (see create_synthetic_xnat). Uploaded ROI Collections
+        and subject resources are added to it.
+    latency : float, optional
+        The time (in seconds) added to every request. The default value is
+        0.
+    bandwidth : float, optional
+        The bandwidth (in bytes per second) the transfer of request and
+        response bodies is limited to. The default value is None (unlimited).
+    forbidBulk : bool, optional
+        If True the site-wide column-selected listings (of /data/projects and
+        /data/experiments) will return HTTP 403. The default value is False.
+    recording : dict, optional
+        Recorded responses (see import_recording), which are replayed in
+        preference to the responses for the catalogue. The default value is
+        None.
+    credentials : dict, optional
+        Dictionary (with user names as keys) of passwords. If provided
+        requests must be authenticated (with HTTP basic authentication) by a
+        user or an alias token issued by the server, else HTTP 401 is
+        returned. The default value is None.
+
+    Returns
+    -------
+    self.url : str
+        The URL of the server.
+    self.numRequests : int
+        The number of requests served.
+    self.numBytes : int
+        The number of bytes of the responses served.
+    self.numBytesIn : int
+        The number of bytes of the request bodies (e.g. uploads) received.
+    self.requestsByPath : dict
+        Dictionary (with the method and the first two parts of each path as
+        keys, e.g. 'GET /data/experiments') of the number of requests served.
+    self.numReplayed : int
+        The number of requests served from the recording.
+    """
+
+    def __init__(
+            self, catalogue, latency=0, bandwidth=None, forbidBulk=False,
+            recording=None, credentials=None
+            ):
+        self.catalogue = catalogue
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.forbidBulk = forbidBulk
+        self.recording = recording if recording is not None else {}
+        self.credentials = credentials
+        self.aliasTokens = {}
+        self.lock = threading.Lock()
+        self.reset_counts()
+
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep connections alive (as XNAT does) without delaying the
+            # small writes of responses:
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                standin.handle_request(self, 'GET')
+
+            def do_PUT(self):
+                standin.handle_request(self, 'PUT')
+
+            def do_POST(self):
+                standin.handle_request(self, 'POST')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = None
+
+    def reset_counts(self):
+        """
+        Reset the numbers of requests and bytes served.
+        """
+
+        self.numRequests = 0
+        self.numBytes = 0
+        self.numBytesIn = 0
+        self.numReplayed = 0
+        self.requestsByPath = {}
+
+    def get_counts(self):
+        """
+        Get the numbers of requests and bytes served as a dictionary.
+        """
+
+        with self.lock:
+            return {
+                'numRequests' : self.numRequests,
+                'MBout' : self.numBytes/1e6,
+                'MBin' : self.numBytesIn/1e6,
+                'numReplayed' : self.numReplayed,
+                'requestsByPath' : dict(self.requestsByPath)
+                }
+
+    def start(self):
+        """
+        Start serving on a background thread.
+        """
+
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+            )
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        """
+        Stop serving.
+        """
+
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def issue_alias_token(self, username):
+        """
+        Issue an alias token (as returned by /data/services/tokens/issue).
+        """
+
+        alias = str(uuid.uuid4())
+        secret = uuid.uuid4().hex
+
+        with self.lock:
+            self.aliasTokens[alias] = (secret, username)
+
+        return {'alias' : alias, 'secret' : secret, 'xdatUserId' : username,
+                'estimatedExpirationTime' : int(time.time() + 172800)*1000}
+
+    def get_user(self, headers):
+        """
+        Get the user name of an authenticated request (or None).
+        """
+
+        auth = headers.get('Authorization', '')
+
+        if not auth.startswith('Basic '):
+            return None
+
+        try:
+            username, password = base64.b64decode(auth[6:]).decode().split(
+                ':', 1
+                )
+        except ValueError:
+            return None
+
+        if self.credentials is None\
+                or self.credentials.get(username, None) == password:
+            return username
+
+        if self.aliasTokens.get(username, (None,))[0] == password:
+            return self.aliasTokens[username][1]
+
+        return None
+
+    def get_proj(self, projID):
+        """ Get a project of the catalogue by ID (or None). """
+
+        for proj in self.catalogue['projects']:
+            if proj['ID'] == projID:
+                return proj
+
+        return None
+
+    def get_subj(self, projID, subjLab):
+        """ Get a subject of the catalogue by label or ID (or None). """
+
+        for subj in self.catalogue['subjects']:
+            if subj['project'] == projID and subjLab in [subj['label'],
+                                                         subj['ID']]:
+                return subj
+
+        return None
+
+    def get_exp(self, expLab, projID=None):
+        """ Get an experiment of the catalogue by label or ID (or None). """
+
+        for exp in self.catalogue['experiments']:
+            if expLab in [exp['label'], exp['ID']]\
+                    and projID in [None, exp['project'], *exp['sharing']]:
+                return exp
+
+        return None
+
+    def get_response(self, method, path, query, body, user):
+        """
+        Get the status code, content type and content (a dict to be returned
+        as JSON, or bytes) of the response to a request for the catalogue.
+        """
+
+        parts = [unquote(part) for part in path.split('/') if part]
+        columns = query['columns'][0].split(',') if 'columns' in query\
+            else None
+        xsiType = query.get('xsiType', [None])[0]
+        experiments = self.catalogue['experiments']
+
+        if not parts:
+            # The test of the connection (see xnat_tools.sessions):
+            return 200, 'text/html', b'<html>XNAT</html>'
+
+        if method == 'PUT':
+            return self.put_response(parts, query, body)
+
+        if parts[:3] == ['data', 'services', 'tokens']:
+            if parts[3:4] == ['issue']:
+                return 200, None, self.issue_alias_token(user)
+            elif parts[3:4] == ['validate'] and len(parts) == 6:
+                secret, username = self.aliasTokens.get(parts[4], (None, None))
+
+                if secret == parts[5]:
+                    return 200, None, {'valid' : username}
+                return 200, None, {}
+            return 404, None, None
+
+        if parts == ['xapi', 'investigators']:
+            return 200, None, self.catalogue['investigators']
+
+        if parts[:1] != ['data'] or len(parts) < 2:
+            return 404, None, None
+
+        if parts[1] == 'subjects' and len(parts) == 2:
+            rows = [{key : subj[key] for key in ['ID', 'label', 'project']}
+                    for subj in self.catalogue['subjects']]
+        elif parts[1] == 'projects':
+            if len(parts) == 2:
+                if columns is not None and self.forbidBulk:
+                    return 403, None, None
+
+                rows = [
+                    {key : proj[key] for key in ['ID', 'name', 'description']}
+                    for proj in self.catalogue['projects']
+                    ]
+            elif self.get_proj(parts[2]) is None:
+                return 404, None, None
+            elif len(parts) == 3:
+                return 200, None, get_proj_json(self.get_proj(parts[2]))
+            elif parts[3:] == ['users']:
+                rows = self.catalogue['users'].get(parts[2], [])
+            elif parts[3:] == ['experiments']:
+                rows = get_exp_rows(
+                    [exp for exp in experiments
+                     if parts[2] in [exp['project'], *exp['sharing']]]
+                    )
+            elif parts[3] == 'subjects' and len(parts) >= 5:
+                return self.get_subj_response(
+                    parts[2], parts[4], parts[5:], query
+                    )
+            else:
+                return 404, None, None
+        elif parts[1] == 'experiments':
+            if len(parts) >= 3:
+                return self.get_exp_response(
+                    self.get_exp(parts[2]), parts[3:], query
+                    )
+
+            if columns is not None and self.forbidBulk:
+                return 403, None, None
+
+            if xsiType == 'xnat:imageSessionData':
+                rows = get_scan_resource_rows(experiments)
+            elif xsiType == 'icr:roiCollectionData':
+                rows = get_assessor_resource_rows(experiments)
+            else:
+                bySharing = columns is not None and sharingColumn in columns
+
+                rows = get_exp_rows(experiments, bySharing)
+        else:
+            return 404, None, None
+
+        if columns is not None:
+            rows = select_columns(rows, columns)
+
+        return 200, None, get_result_set(rows)
+
+    def get_subj_response(self, projID, subjLab, parts, query):
+        """
+        Get the response to a request for a subject (or its experiments or
+        files).
+        """
+
+        subj = self.get_subj(projID, subjLab)
+
+        if subj is None:
+            return 404, None, None
+
+        if parts == ['experiments']:
+            rows = get_exp_rows(
+                [exp for exp in self.catalogue['experiments']
+                 if exp['project'] == projID and exp['subject'] == subj['label']]
+                )
+
+            return 200, None, get_result_set(rows)
+
+        if parts[:1] == ['experiments'] and len(parts) >= 2:
+            exp = self.get_exp(parts[1], projID)
+
+            if exp is None or exp['subject'] != subj['label']:
+                return 404, None, None
+
+            return self.get_exp_response(exp, parts[2:], query)
+
+        if parts == ['files']:
+            rows = [
+                {'Name' : fname, 'Size' : str(len(content)),
+                 'collection' : 'DICOM', 'file_format' : 'DICOM',
+                 'URI' : f"/data/projects/{projID}/subjects/{subj['label']}"\
+                     + f"/resources/DICOM/files/{fname}"}
+                for fname, content in subj['files'].items()
+                ]
+
+            return 200, None, get_result_set(rows)
+
+        # .../files/{fname} or .../resources/DICOM/files/{fname}:
+        if len(parts) in [2, 4] and parts[-2] == 'files':
+            content = subj['files'].get(parts[-1], None)
+
+            if content is not None:
+                return 200, 'application/octet-stream', content
+
+        return 404, None, None
+
+    def get_exp_response(self, exp, parts, query):
+        """
+        Get the response to a request for an experiment (or its scans or
+        assessors).
+        """
+
+        if exp is None:
+            return 404, None, None
+
+        if not parts:
+            return 200, None, get_exp_json(exp)
+
+        if parts[0] == 'scans' and len(parts) >= 3:
+            scans = [scan for scan in exp['scans'] if scan['ID'] == parts[1]]
+
+            if not scans or not 'dicoms' in scans[0]:
+                return 404, None, None
+
+            scan = scans[0]
+
+            if parts[2:] == ['resources', 'DICOM', 'files']\
+                    and query.get('format', [None])[0] == 'zip':
+                return 200, 'application/zip', get_zipped_scan(exp, scan)
+
+            if parts[2:] == ['files']:
+                rows = [
+                    {'Name' : fname, 'Size' : str(len(content)),
+                     'collection' : 'DICOM', 'file_format' : 'DICOM',
+                     'URI' : f"/data/experiments/{exp['ID']}/scans/"\
+                         + f"{scan['ID']}/resources/DICOM/files/{fname}"}
+                    for fname, content in scan['dicoms'].items()
+                    ]
+
+                return 200, None, get_result_set(rows)
+
+            if parts[2:4] == ['resources', 'DICOM'] and len(parts) == 6:
+                content = scan['dicoms'].get(parts[5], None)
+
+                if content is not None:
+                    return 200, 'application/dicom', content
+
+        if parts[0] == 'assessors' and len(parts) == 6:
+            for assessor in exp['assessors']:
+                if assessor['id'] == parts[1]\
+                        and assessor['content'] is not None\
+                        and parts[5] == assessor['label'] + '.dcm':
+                    return 200, 'application/dicom', assessor['content']
+
+        return 404, None, None
+
+    def put_response(self, parts, query, body):
+        """
+        Get the response to an upload (a ROI Collection or subject resource),
+        which is added to the catalogue.
+        """
+
+        # /xapi/roi/projects/{ID}/sessions/{label}/collections/{label}:
+        if parts[:3] == ['xapi', 'roi', 'projects'] and len(parts) == 8:
+            exp = self.get_exp(parts[5], parts[3])
+
+            if exp is None:
+                return 404, None, None
+
+            with self.lock:
+                add_roicol(exp, parts[7], body, datetime.now())
+
+            return 200, 'text/plain', exp['assessors'][-1]['id'].encode()
+
+        # /data/projects/{ID}/subjects/{label}/resources/DICOM/files/{fname}:
+        if parts[:2] == ['data', 'projects'] and len(parts) == 9\
+                and parts[3] == 'subjects' and parts[7] == 'files':
+            subj = self.get_subj(parts[2], parts[4])
+
+            if subj is None:
+                return 404, None, None
+
+            with self.lock:
+                subj['files'][parts[8]] = body
+
+            return 200, 'text/plain', b''
+
+        return 404, None, None
+
+    def read_body(self, handler):
+        """
+        Read the body of a request (of known length or chunked).
+        """
+
+        if 'Content-Length' in handler.headers:
+            return handler.rfile.read(int(handler.headers['Content-Length']))
+
+        if handler.headers.get('Transfer-Encoding', '') != 'chunked':
+            return b''
+
+        body = b''
+        while True:
+            size = int(handler.rfile.readline().strip().split(b';')[0], 16)
+            if size == 0:
+                handler.rfile.readline()
+                return body
+            body += handler.rfile.read(size)
+            handler.rfile.readline()
+
+    def handle_request(self, handler, method):
+        """
+        Handle a request.
+        """
+
+        url = urlsplit(handler.path)
+
+        body = self.read_body(handler)
+
+        key = get_query_key(method, url.path, url.query)
+
+        replayed = key in self.recording
+
+        user = self.get_user(handler.headers)
+
+        if replayed:
+            status, contentType, content = self.recording[key]
+        elif self.credentials is not None and user is None:
+            status, contentType, content = 401, None, None
+        else:
+            status, contentType, content = self.get_response(
+                method, url.path, parse_qs(url.query), body, user
+                )
+
+        if isinstance(content, (dict, list)):
+            content = json.dumps(content).encode()
+        elif content is None:
+            content = b''
+
+        if contentType is None:
+            contentType = 'application/json'
+
+        delay = self.latency
+        if self.bandwidth:
+            delay += (len(body) + len(content))/self.bandwidth
+
+        if delay:
+            time.sleep(delay)
+
+        with self.lock:
+            self.numRequests += 1
+            self.numBytes += len(content)
+            self.numBytesIn += len(body)
+            self.numReplayed += replayed
+
+            pathKey = method + ' ' + '/'.join(url.path.split('/')[:3])
+            self.requestsByPath[pathKey] = self.requestsByPath.get(
+                pathKey, 0
+                ) + 1
+
+        handler.send_response(status)
+        handler.send_header('Content-Type', contentType)
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
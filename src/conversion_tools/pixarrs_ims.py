@@ -149,7 +149,7 @@ def pixarrBySeg_to_labimBySeg(pixarrBySeg, f2sIndsBySeg, refIm, p2c=False):
     
     #from ImageTools import GetImageInfo
     #from GeneralTools import UniqueItems, AreListsEqualToWithinEpsilon
-    from image_tools.attrs_info import get_im_info
+    from image_tools.attrs_info import get_im_info, get_cached_im_stats
     
     if p2c:
         print('\n\nStart', '-'*110)
@@ -170,9 +170,9 @@ def pixarrBySeg_to_labimBySeg(pixarrBySeg, f2sIndsBySeg, refIm, p2c=False):
         if p2c:
             print(f'\n   Image info for labimBySeg[{r}]:')
             
-        pixID, pixIDtypeAsStr, uniqueVals, f2sInds = get_im_info(labim, p2c)
+            get_im_info(labim, p2c)
         
-        newF2SIndsBySeg.append(f2sInds)
+        newF2SIndsBySeg.append(get_cached_im_stats(labim)['f2sInds'])
     
     if p2c:
         print('\nThe (original) f2sIndsBySeg corresponding to the input',
@@ -104,6 +104,10 @@ def create_global_vars():
     imExportDir = os.path.join(outputsDir, r'images')
     labimExportDir = os.path.join(outputsDir, r'label_images')
     logsExportDir = os.path.join(outputsDir, r'logs')
+    # displacement fields created from deformable transforms
+    dispFieldDir = os.path.join(outputsDir, r'displacement_fields')
+    # transforms from registrations (by project and subject)
+    regCacheDir = os.path.join(outputsDir, r'reg_cache')
     
     """
     Define registration settings.
@@ -120,6 +124,79 @@ def create_global_vars():
     initMethod = 'geometry'
     maxIters = 512
     
+    """
+    Chose whether or not to search the transform graph of the subject (built
+    from the DROs and the transforms of previous registrations stored in 
+    regCacheDir) for a path of existing transforms (including inverses of
+    rigid and affine transforms) if no DRO matches the Source and Target 
+    Frames of Reference, and the maximum number of transforms in the path
+    (see dro_tools.tx_graph). The composed transform is only used if 
+    useDroForTx is True and it passes a quality check (see 
+    Propagator.create_tx_from_path):
+    """
+    useTxGraph = False
+    maxTxPathLength = 3
+    
+    """
+    Chose the number of iterations of the short registration (starting from 
+    a composed path of transforms) used to check the composed transform, and
+    the relative improvement of the metric value (txPathTol) and displacement
+    in mm (txPathMaxShift) that the short registration may make for the 
+    composed transform to be accepted (see Propagator.create_tx_from_path):
+    """
+    txPathRefineIters = 20
+    txPathTol = 0.02
+    txPathMaxShift = 2
+    
+    """
+    Chose whether or not to perform multi-start registration, i.e. run several
+    registrations (with different optimisers, sampling percentages and 
+    initialisations) concurrently and keep the best result (see 
+    image_tools.registering.multistart_reg_im):
+    """
+    multiStartReg = False
+    
+    """
+    Chose whether or not to use adaptive convergence for registration, i.e. 
+    stop pyramid levels once the metric plateaus, skip levels that bring no
+    improvement and raise the sampling percentage at the finest level only
+    (see image_tools.convergence.ConvergenceController):
+    """
+    adaptiveReg = False
+    
+    """
+    Chose whether or not to focus registration on the region around the 
+    source ROI(s), i.e. the bounding box of the ROI(s) expanded by 
+    focusedRegMargin (in mm) and intersected with both image extents (see 
+    Propagator.get_focused_reg_inputs). Acceptable values include:
+        - '' (register the full images)
+        - 'crop' (register the images cropped to the region)
+        - 'mask' (register the full images but only sample within the region;
+        not used for multi-start registration)
+    """
+    focusedReg = ''
+    #focusedReg = 'crop'
+    focusedRegMargin = 20
+    
+    """
+    Chose whether or not to cache the smoothed and shrunk levels of the images
+    used for multi-resolution registration, so that they are reused across
+    registrations in the same process (e.g. of several source images to the
+    same target image), and execute registrations level by level (see 
+    image_tools.pyramid and image_tools.registering.execute_reg_by_level):
+    """
+    cacheRegPyramids = False
+    
+    """
+    Chose whether or not to perform a cascaded registration if regTxName is
+    'bspline', i.e. an affine registration at the coarse levels followed by a
+    BSpline registration of the residual deformation at the finer levels. The
+    affine transform is exported as the pre-deformation matrix of the DRO.
+    The results of linear registrations in the same process are reused (see
+    image_tools.registering.cascade_reg_im):
+    """
+    cascadeReg = False
+    
     """ 
     Define resampling settings.
     
@@ -135,6 +212,57 @@ def create_global_vars():
     applyPostResBlur = True
     postResVar = (1,1,1)
     
+    """
+    Chose whether or not to resample by indexing (skipping interpolation and
+    blurring) when the resampling transform and the source and target grids
+    reduce to an integer offset, stride and/or permutation of voxel indices
+    (e.g. for use cases 3 and 4 with the same direction cosines and spacings
+    that differ by integer factors; see 
+    image_tools.resampling.get_grid_index_map):
+    """
+    useGridAlignedRes = False
+    
+    """
+    Chose whether or not to convert a deformable (BSpline) transform to a 
+    dense displacement field in the target image gridspace (once per 
+    transform, and cached to dispFieldDir) that will be used for all 
+    resamplings (label images, DICOM image, plots), and the maximum error (in
+    mm) between the displacement field and the deformable transform at the
+    voxel centres of the target image (see 
+    image_tools.displacement and Propagator.get_res_tx):
+    """
+    useDispField = False
+    dispFieldTol = 0.01
+    
+    """
+    Chose whether or not to propagate RTSTRUCT contours by transforming their
+    points directly (for relationship-preserving propagations with linear
+    transforms) rather than by resampling label images, and the maximum
+    spread of a transformed contour along the target slice normal (as a
+    fraction of the target slice spacing) for it to be considered coplanar
+    with the target slices (otherwise label images will be resampled; see
+    Propagator.transform_src_pts):
+    """
+    usePtsTx = False
+    ptsTxTol = 0.1
+    
+    """
+    Define the CPU thread budget for SimpleITK.
+    
+    Chose the total number of threads (0 to use all available CPUs), the
+    number of runs that will be executed concurrently (e.g. in a process pool)
+    so that the budget is divided between them, and the number of threads for
+    individual stages ('registration', 'resampling', 'blurring') where 0 
+    denotes the full budget:
+    """
+    numThreads = 0
+    numConcurrentRuns = 1
+    numThreadsByStage = {
+        'registration' : 0,
+        'resampling' : 0,
+        'blurring' : 0
+        }
+    
     """
     Chose whether or not to export the new ROI Collection (i.e. RTS or SEG),
     DRO, transforms, label images, plots and logs:
@@ -147,6 +275,28 @@ def create_global_vars():
     exportPlots = False
     exportLogs = True
     
+    """
+    Chose whether or not to export a low-resolution PNG thumbnail with each
+    exported plot, and the resolution (dpi) of the thumbnails (the plots are
+    rendered on background worker processes, see plotting_tools.rendering):
+    """
+    exportPlotThumbs = False
+    plotThumbDpi = 30
+    
+    """
+    Chose the formats of exported images ('HDF5ImageIO', 'NiftiImageIO' or
+    'NrrdImageIO') and label images (as for images, or 'PackedLabel' for 
+    bit-packed .npz files), the files exported for each transform ('.tfm',
+    '.hdf' and/or '.txt' for its parameters), whether or not to compress
+    exported images, and whether or not exports identical to previously 
+    exported files are to be hard links to them (see io_tools.export_manager):
+    """
+    imExportFormat = 'NrrdImageIO'
+    labimExportFormat = 'NrrdImageIO'
+    txExportExts = ['.tfm']
+    compressExports = True
+    dedupeExports = False
+    
     """
     Chose whether or not to upload the (new) target DRO to XNAT:
     """
@@ -195,17 +345,43 @@ def create_global_vars():
         'regTxName' : regTxName,
         'initMethod' : initMethod,
         'maxIters' : maxIters,
+        'useTxGraph' : useTxGraph,
+        'maxTxPathLength' : maxTxPathLength,
+        'txPathRefineIters' : txPathRefineIters,
+        'txPathTol' : txPathTol,
+        'txPathMaxShift' : txPathMaxShift,
+        'multiStartReg' : multiStartReg,
+        'adaptiveReg' : adaptiveReg,
+        'focusedReg' : focusedReg,
+        'focusedRegMargin' : focusedRegMargin,
+        'cacheRegPyramids' : cacheRegPyramids,
+        'cascadeReg' : cascadeReg,
         'applyPreResBlur' : applyPreResBlur,
         'preResVar' : preResVar,
         'resInterp' : resInterp,
         'applyPostResBlur' : applyPostResBlur,
         'postResVar' : postResVar,
+        'useGridAlignedRes' : useGridAlignedRes,
+        'useDispField' : useDispField,
+        'dispFieldTol' : dispFieldTol,
+        'usePtsTx' : usePtsTx,
+        'ptsTxTol' : ptsTxTol,
+        'numThreads' : numThreads,
+        'numConcurrentRuns' : numConcurrentRuns,
+        'numThreadsByStage' : numThreadsByStage,
         'exportRoicol' : exportRoicol,
         'exportDro' : exportDro,
         'exportTx' : exportTx,
         'exportIm' : exportIm,
         'exportLabim' : exportLabim,
         'exportPlots' : exportPlots,
+        'exportPlotThumbs' : exportPlotThumbs,
+        'plotThumbDpi' : plotThumbDpi,
+        'imExportFormat' : imExportFormat,
+        'labimExportFormat' : labimExportFormat,
+        'txExportExts' : txExportExts,
+        'compressExports' : compressExports,
+        'dedupeExports' : dedupeExports,
         'exportLogs' : exportLogs,
         'uploadDro' : uploadDro,
         'overwriteDro' : overwriteDro,
@@ -227,7 +403,9 @@ def create_global_vars():
         'logsExportDir' : logsExportDir,
         'rtsPlotsExportDir' : rtsPlotsExportDir,
         'segPlotsExportDir' : segPlotsExportDir,
-        'resPlotsExportDir' : resPlotsExportDir
+        'resPlotsExportDir' : resPlotsExportDir,
+        'dispFieldDir' : dispFieldDir,
+        'regCacheDir' : regCacheDir
         }
     
     # Export the dictionary to a JSON file:
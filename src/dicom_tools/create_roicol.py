@@ -19,6 +19,8 @@ import xnat_tools.im_sessions_exps
 reload(xnat_tools.im_sessions_exps)
 import xnat_tools.im_assessors
 reload(xnat_tools.im_assessors)
+import io_tools.uploads
+reload(io_tools.uploads)
 import plotting_tools.general
 reload(plotting_tools.general)
 """
@@ -37,6 +39,7 @@ from dicom_tools.error_check_rts import error_check_rts
 from dicom_tools.error_check_seg import error_check_seg
 from xnat_tools.im_sessions_exps import get_exp_id_from_label
 from xnat_tools.im_assessors import upload_im_asr
+from io_tools.uploads import ds_to_bytes, write_bytes
 from plotting_tools.general import (
     plot_pixarrs_from_list_of_segs_and_dicom_ims, 
     plot_contours_from_list_of_rtss_and_dicom_ims
@@ -158,14 +161,15 @@ class RoicolCreator:
         timingMsg = "Took [*] to error check the target ROI Collection.\n"
         params.add_timestamp(timingMsg)
     
-    def export_roicol(self, params, fname=''):
+    def get_roicol_fpath(self, params, fname=''):
         """
-        Export ROI Collection (RTS/SEG) to disk.  
+        Get the file path of the new ROI Collection (RTS/SEG), which is used
+        for its export to disk and its label in XNAT.  
         
         Parameters
         ----------
         self.roicol : Pydicom object
-            New ROI Collection (RTS/SEG) to be exported.
+            New ROI Collection (RTS/SEG).
         params : DataDownloader Object
             Contains parameters (cfgDict), file paths (pathsDict), timestamps
             (timings) and timing messages (timingMsgs).
@@ -178,7 +182,7 @@ class RoicolCreator:
         Returns
         -------
         self.roicolFpath : str
-            Full path of the exported new RTS/SEG file.
+            Full path of the new RTS/SEG file.
         """
         
         cfgDict = params.cfgDict
@@ -212,19 +216,88 @@ class RoicolCreator:
             #fname = f'{runID}_{roicolMod}_{currentDateTime}.dcm'
             fname = f'{runID}_{roicolMod}_{dateTime}.dcm'
         
+        self.roicolFpath = os.path.join(exportDir, fname)
+        
+        return self.roicolFpath
+    
+    def get_roicol_bytes(self):
+        """
+        Get the new ROI Collection serialised in memory (serialised once for
+        its export and upload).
+        
+        Returns
+        -------
+        self.roicolBytes : bytes
+        """
+        
+        if getattr(self, 'roicolBytes', None) is None:
+            self.roicolBytes = ds_to_bytes(self.roicol)
+        
+        return self.roicolBytes
+    
+    def export_roicol(self, params, fname='', uploader=None):
+        """
+        Export ROI Collection (RTS/SEG) to disk.  
+        
+        Parameters
+        ----------
+        self.roicol : Pydicom object
+            New ROI Collection (RTS/SEG) to be exported.
+        params : DataDownloader Object
+            Contains parameters (cfgDict), file paths (pathsDict), timestamps
+            (timings) and timing messages (timingMsgs).
+        fname : str, optional
+            File name to assign. The default value is ''. If empty the file
+            name will be of the form:
+                "{runID}_{roicolMod}_{currentDateTime}.dcm"
+            where roicolMod = RTSTRUCT or SEG
+        uploader : UploadManager, optional
+            If provided the export will be written on a background worker of 
+            uploader. The default value is None.
+        
+        Returns
+        -------
+        future : Future or None
+            The Future of the export if uploader was provided and the ROI
+            Collection is to be exported (cfgDict['exportRoicol']), None
+            otherwise.
+        
+        Note
+        ----
+        The full path of the exported RTS/SEG file is stored as 
+        self.roicolFpath (see get_roicol_fpath). It is set even if the ROI 
+        Collection is not exported (cfgDict['exportRoicol'] = False) since it
+        is used for the label of the uploaded ROI Collection.
+        """
+        
+        roicolMod = params.cfgDict['roicolMod']
+        exportRoicol = params.cfgDict['exportRoicol']
+        
+        fpath = self.get_roicol_fpath(params, fname)
+        
+        if not exportRoicol:
+            return None
+        
+        exportDir = os.path.dirname(fpath)
+        
         if not os.path.isdir(exportDir):
             #os.mkdir(ExportDir)
-            Path(exportDir).mkdir(parents=True)
-        
-        fpath = os.path.join(exportDir, fname)
+            Path(exportDir).mkdir(parents=True, exist_ok=True)
         
-        roicol.save_as(fpath)
+        if uploader is None:
+            self.roicol.save_as(fpath)
             
-        print(f'New {roicolMod} exported to:\n {fpath}\n')
+            print(f'New {roicolMod} exported to:\n {fpath}\n')
+            
+            return None
+        
+        print(f'New {roicolMod} being exported to:\n {fpath}\n')
         
-        self.roicolFpath = fpath
+        return uploader.submit(
+            'roicolExport', write_bytes, self.get_roicol_bytes(), fpath
+            )
       
-    def upload_roicol(self, params, collLab=''):
+    def upload_roicol(self, params, collLab='', uploader=None):
         """
         Upload ROI Collection to XNAT.
         
@@ -236,15 +309,27 @@ class RoicolCreator:
         collLab : str, optional
             Label to apply to the ROI Collection.  If not provided the file 
             name from self.roicolFpath will be used. The default value is ''.
+        uploader : UploadManager, optional
+            If provided the ROI Collection will be uploaded on a background
+            worker of uploader. The default value is None.
         
         Returns
         -------
-        None.
+        future : Future or None
+            The Future of the upload if uploader was provided, None otherwise.
+        
+        Note
+        ----
+        The ROI Collection is serialised to memory and uploaded (i.e. it
+        doesn't need to have been exported to disk).
         """
         
         timingMsg = "* Uploading the new target ROI Collection to XNAT...\n"
         params.add_timestamp(timingMsg)
         
+        if not hasattr(self, 'roicolFpath'):
+            self.get_roicol_fpath(params)
+        
         roicolFpath = self.roicolFpath
         
         xnatSession = params.xnatSession
@@ -262,24 +347,40 @@ class RoicolCreator:
             exp_label=expLab,
             session=params.xnatSession
         )
-
-        xnatSession = upload_im_asr(
-            roicol_fpath=roicolFpath, 
-            url=url,
-            proj_id=projID, 
-            session_id=expID, 
-            coll_label=collLab,
-            session=xnatSession
-        )
+        
+        kwargs = {
+            'roicol_fpath' : roicolFpath, 
+            'url' : url,
+            'proj_id' : projID, 
+            'session_id' : expID, 
+            'coll_label' : collLab,
+            'session' : xnatSession,
+            'roicol' : self.roicol if uploader is None\
+                else self.get_roicol_bytes()
+            }
+        
+        if uploader is not None:
+            timingMsg = "Took [*] to submit the upload of the target ROI "\
+                + "Collection.\n"
+            params.add_timestamp(timingMsg)
+            
+            return uploader.submit('roicolUpload', upload_im_asr, **kwargs)
+        
+        upload_im_asr(**kwargs)
         
         timingMsg = "Took [*] to upload the target ROI Collection.\n"
         params.add_timestamp(timingMsg)
         
+        return None
+        
     def plot_roi_over_dicoms(
-            self, srcDataset, trgDataset, newDataset, params
+            self, srcDataset, trgDataset, newDataset, params, plotter=None
             ):
         """ 
         Plot copied/propagated ROI overlaid on DICOM images 
+        
+        If plotter (a PlotManager, see plotting_tools.rendering) is provided
+        the plot will be rendered and exported on a background worker.
         """
         
         print('* Plotting ROI over DICOMs..\n')
@@ -381,7 +482,7 @@ class RoicolCreator:
                 runID=runID, useCaseToApply=useCaseToApply,
                 forceReg=forceReg, useDroForTx=useDroForTx, regTxName=regTxName,
                 initMethod=initMethod, resInterp=resInterp, 
-                fname=fname, fontSize=fontSize, p2c=p2c
+                fname=fname, fontSize=fontSize, p2c=p2c, plotter=plotter
                 #fname='', p2c=p2c
             )
         else:
@@ -391,7 +492,7 @@ class RoicolCreator:
                 runID=runID, useCaseToApply=useCaseToApply,
                 forceReg=forceReg, useDroForTx=useDroForTx, regTxName=regTxName,
                 initMethod=initMethod, resInterp=resInterp, 
-                fname=fname, fontSize=fontSize, p2c=p2c
+                fname=fname, fontSize=fontSize, p2c=p2c, plotter=plotter
                 #fname='', p2c=p2c
             )
         
@@ -44,9 +44,14 @@ def error_check_rts(rts, trgDataset, params):
         
         Test RR4 previously took 1 s to create the RTS and 5 s to error check
         it.  Now it takes 115 s and 343 s.
+    
+    The sequences are no longer deep-copied (they are only read), the tags
+    of ContourSequence are extracted in a single pass and the
+    ReferencedSOPInstanceUIDs are looked up in sets, so that the checks are
+    linear in the number of contours.
     """        
     
-    from copy import deepcopy
+    import numpy as np
     
     """ 
     Since the source RTS has been copied/propagated to the target domain, it's
@@ -55,6 +60,7 @@ def error_check_rts(rts, trgDataset, params):
     """
     dicom = trgDataset.dicoms[0]
     SOPuids = trgDataset.sopuids
+    SOPuidsSet = set(SOPuids)
     #spacings = trgDataset.imSpacings
     #ST = trgDataset.imSlcThick
     #IPPs = trgDataset.imPositions
@@ -71,8 +77,8 @@ def error_check_rts(rts, trgDataset, params):
         print('\n\n', '-'*120)
     
     # Determine whether MediaStorageSOPInstanceUID matches SOPInstanceUID
-    MSSOPuid = deepcopy(rts.file_meta.MediaStorageSOPInstanceUID)
-    SOPuid = deepcopy(rts.SOPInstanceUID)
+    MSSOPuid = rts.file_meta.MediaStorageSOPInstanceUID
+    SOPuid = rts.SOPInstanceUID
     
     if MSSOPuid == SOPuid:
         msg = f'INFO:  MediaStorageSOPInstanceUID {MSSOPuid} does not ' +\
@@ -146,10 +152,10 @@ def error_check_rts(rts, trgDataset, params):
         print(msg)
     
     #RFORS = deepcopy(rts.ReferencedFrameOfReferenceSequence[0])
-    RFORS = deepcopy(rts.ReferencedFrameOfReferenceSequence)
+    RFORS = rts.ReferencedFrameOfReferenceSequence
     
     #FORuidInRFORS = deepcopy(RFORS.FrameOfReferenceUID)
-    FORuidInRFORS = deepcopy(RFORS[0].FrameOfReferenceUID)
+    FORuidInRFORS = RFORS[0].FrameOfReferenceUID
     
     if FORuidInRFORS == dicom.FrameOfReferenceUID:
         msg = 'INFO:  FrameOfReferenceUID in ' +\
@@ -189,9 +195,9 @@ def error_check_rts(rts, trgDataset, params):
     #rtsSeriesuid = deepcopy(RFORS.RTReferencedStudySequence[0]\
     #                             .RTReferencedSeriesSequence[0]\
     #                             .SeriesInstanceUID)
-    rtsSeriesuid = deepcopy(RFORS[0].RTReferencedStudySequence[0]\
-                                    .RTReferencedSeriesSequence[0]\
-                                    .SeriesInstanceUID)
+    rtsSeriesuid = RFORS[0].RTReferencedStudySequence[0]\
+                           .RTReferencedSeriesSequence[0]\
+                           .SeriesInstanceUID
     
     if rtsSeriesuid == dicom.SeriesInstanceUID:
         msg = 'INFO:  SeriesInstanceUID in ' +\
@@ -211,21 +217,18 @@ def error_check_rts(rts, trgDataset, params):
     #CIS = deepcopy(RFORS.RTReferencedStudySequence[0]\
     #                    .RTReferencedSeriesSequence[0]\
     #                    .ContourImageSequence)
-    CIS = deepcopy(RFORS[0].RTReferencedStudySequence[0]\
-                           .RTReferencedSeriesSequence[0]\
-                           .ContourImageSequence)
-    
-    refSOPuidsInRFORS = [
-        CIS[i].ReferencedSOPInstanceUID for i in range(len(CIS))
-        ]
+    CIS = RFORS[0].RTReferencedStudySequence[0]\
+                  .RTReferencedSeriesSequence[0]\
+                  .ContourImageSequence
     
-    # Determine whether the Ref SOP UIDs match the SOP UIDs:
-    isMatch = [refSOPuid in SOPuids for refSOPuid in refSOPuidsInRFORS]
-    
-    #numOfMatches = isMatch.count(True)
+    refSOPuidsInRFORS = [item.ReferencedSOPInstanceUID for item in CIS]
+    refSOPuidsInRFORSset = set(refSOPuidsInRFORS)
     
     # Find the indices of any non-matching Ref SOP UIDs:
-    inds = [i for i, x in enumerate(isMatch) if x==False]
+    inds = [
+        i for i, refSOPuid in enumerate(refSOPuidsInRFORS)
+        if not refSOPuid in SOPuidsSet
+        ]
     
     if inds:
         nonMatchingUids = [refSOPuidsInRFORS[i] for i in inds]
@@ -276,8 +279,8 @@ def error_check_rts(rts, trgDataset, params):
     
     # Verify that the ReferencedFrameOfReferenceUID in StructureSetROISequence
     # matches the DICOM FrameOfReferenceUID.
-    refFORuidInSSRS = deepcopy(rts.StructureSetROISequence[0]\
-                                  .ReferencedFrameOfReferenceUID)
+    refFORuidInSSRS = rts.StructureSetROISequence[0]\
+                         .ReferencedFrameOfReferenceUID
     
     if refFORuidInSSRS == dicom.FrameOfReferenceUID:
         msg = 'INFO:  ReferencedFrameOfReferenceUID in ' +\
@@ -309,19 +312,27 @@ def error_check_rts(rts, trgDataset, params):
     
     # Verify that the ReferencedSOPInstanceUIDs in ROIContourSequence
     # match the ReferencedSOPInstanceUIDs in ContourImageSequence.
-    CS = deepcopy(rts.ROIContourSequence[0].ContourSequence)
-    
-    refSOPuidsInRCS = [
-        CS[i].ContourImageSequence[0].ReferencedSOPInstanceUID for i in range(len(CS))
-        ]
-    
-    # Determine whether the Ref SOP UIDs match the SOP UIDs:
-    isMatch = [uid in refSOPuidsInRFORS for uid in refSOPuidsInRCS]
-    
-    #numOfMatches = isMatch.count(True)
+    CS = rts.ROIContourSequence[0].ContourSequence
+    
+    # Extract the tags of each ContourSequence in a single pass:
+    refSOPuidsInRCS = []
+    contourNums = np.zeros(len(CS), dtype=np.int64)
+    NCP = np.zeros(len(CS), dtype=np.int64)
+    NCD = np.zeros(len(CS), dtype=np.int64)
+    
+    for i, contour in enumerate(CS):
+        refSOPuidsInRCS.append(
+            contour.ContourImageSequence[0].ReferencedSOPInstanceUID
+            )
+        contourNums[i] = int(contour.ContourNumber)
+        NCP[i] = int(contour.NumberOfContourPoints)
+        NCD[i] = len(contour.ContourData)
     
     # Find the indices of any non-matching Ref SOP UIDs:
-    inds = [i for i, x in enumerate(isMatch) if x==False]
+    inds = [
+        i for i, uid in enumerate(refSOPuidsInRCS)
+        if not uid in refSOPuidsInRFORSset
+        ]
     
     if inds:
         nonMatchingUids = [refSOPuidsInRCS[i] for i in inds]
@@ -342,18 +353,10 @@ def error_check_rts(rts, trgDataset, params):
     
     # Verify that the ContourNumbers in each ContourSequence range from 1 to
     # len(CS).
-    expectedNums = list(range(1, len(CS)+1))
-    
-    contourNums = [int(CS[i].ContourNumber) for i in range(len(CS))]
-    
-    #print(f'\n\n\ncontourNums = {contourNums}')
-    
-    # Determine whether the contour numbers match the expected contour numbers:
-    isMatch = [contourNums[i] == expectedNums[i] for i in range(len(CS))]
-    #isMatch = [contourNums[i] == i+1 for i in range(len(CS))]
+    expectedNums = np.arange(1, len(CS)+1)
     
     # Find the indices of any non-matching contour numbers:
-    inds = [i for i, x in enumerate(isMatch) if x==False]
+    inds = np.flatnonzero(contourNums != expectedNums).tolist()
     
     if inds:        
         for i in range(len(inds)):
@@ -372,14 +375,8 @@ def error_check_rts(rts, trgDataset, params):
     
     # Verify that the number of elements in ContourData is 3x 
     # NumberOfContourPoints for each ContourSequence.
-    NCP = [int(CS[i].NumberOfContourPoints) for i in range(len(CS))]
-    
-    NCD = [len(CS[i].ContourData) for i in range(len(CS))]
-    
-    isMatch = [NCD[i] == 3*NCP[i] for i in range(len(CS))]
-    
     # Find the indices of any non-zero modulos:
-    inds = [i for i, x in enumerate(isMatch) if x==False]
+    inds = np.flatnonzero(NCD != 3*NCP).tolist()
     
     if inds:        
         for i in range(len(inds)):
@@ -29,9 +29,15 @@ def error_check_seg(seg, trgDataset, params):
         errors are found an empty list ([]) will be returned.
     Nerrors : int
         The number of errors found.
+    
+    Note
+    ----
+    The per-frame tags are extracted in a single pass of
+    PerFrameFunctionalGroupsSequence and the SOPInstanceUIDs are looked up in
+    a set/dictionary, so that the checks are linear in the number of frames.
     """
     
-    from copy import deepcopy
+    import numpy as np
     from general_tools.general import are_items_equal_to_within_eps
     
     """ 
@@ -41,6 +47,14 @@ def error_check_seg(seg, trgDataset, params):
     """
     dicom = trgDataset.dicoms[0]
     SOPuids = trgDataset.sopuids
+    
+    # Hashed lookups of the SOPInstanceUIDs (and the index of the first DICOM
+    # with each SOPInstanceUID):
+    SOPuidsSet = set(SOPuids)
+    SOPindsByUid = {}
+    for i, uid in enumerate(SOPuids):
+        SOPindsByUid.setdefault(uid, i)
+    
     spacings = trgDataset.imSpacings
     #ST = trgDataset.imSlcThick
     IPPs = trgDataset.imPositions
@@ -94,12 +108,11 @@ def error_check_seg(seg, trgDataset, params):
     
     refSOPuidsInRIS = [RIS[i].ReferencedSOPInstanceUID for i in range(len(RIS))]
 
-    isMatch = [RefSOPuid in SOPuids for RefSOPuid in refSOPuidsInRIS]
-    
-    #numOfMatches = isMatch.count(True)
-    
     # Find the indices of any non-matching Ref SOP UIDs:
-    inds = [i for i, x in enumerate(isMatch) if x==False]
+    inds = [
+        i for i, RefSOPuid in enumerate(refSOPuidsInRIS)
+        if not RefSOPuid in SOPuidsSet
+        ]
     
     if inds:
         for i in range(len(inds)):
@@ -251,7 +264,7 @@ def error_check_seg(seg, trgDataset, params):
     numSS = len(seg.SegmentSequence)
     
     # Verify that the SegmentNumber in each SegmentSequence increments from 1.
-    SS = deepcopy(seg.SegmentSequence)
+    SS = seg.SegmentSequence
     
     for i in range(numSS):
         N = int(SS[i].SegmentNumber)
@@ -398,20 +411,54 @@ def error_check_seg(seg, trgDataset, params):
     if p2c:
         print(msg)
     
+    # Extract the per-frame tags in a single pass of
+    # PerFrameFunctionalGroupsSequence.
+    numPFFGS = len(PFFGS)
+    
+    RefSOPuidsInPFFGS = []
+    DIVs = []
+    RSNs = []
+    IPPsInPFFGS = np.zeros((numPFFGS, 3), dtype=np.float64)
+    
+    for i, frameGroups in enumerate(PFFGS):
+        RefSOPuidsInPFFGS.append(
+            frameGroups.DerivationImageSequence[0]\
+                       .SourceImageSequence[0]\
+                       .ReferencedSOPInstanceUID
+            )
+        
+        DIVs.append(
+            frameGroups.FrameContentSequence[0].DimensionIndexValues
+            )
+        
+        RSNs.append(
+            frameGroups.SegmentIdentificationSequence[0]\
+                       .ReferencedSegmentNumber
+            )
+        
+        IPPsInPFFGS[i] = [
+            float(item) for item in frameGroups.PlanePositionSequence[0]\
+                                               .ImagePositionPatient
+            ]
+    
+    firstElements = np.array(
+        [int(DIV[0]) for DIV in DIVs], dtype=np.int64
+        )
+    secondElements = np.array(
+        [int(DIV[1]) for DIV in DIVs], dtype=np.int64
+        )
+    
+    # The index of the DICOM referenced by each frame (-1 if the
+    # ReferencedSOPInstanceUID doesn't match any SOPInstanceUID):
+    SOPindsInPFFGS = np.array(
+        [SOPindsByUid.get(uid, -1) for uid in RefSOPuidsInPFFGS],
+        dtype=np.int64
+        )
+    
     # Determine whether any of the ReferencedSOPInstanceUIDs in
     # PerFrameFunctionGroupsSequence do not match the SOPInstanceUIDs.       
-    RefSOPuidsInPFFGS = [
-        PFFGS[i].DerivationImageSequence[0]\
-                .SourceImageSequence[0]\
-                .ReferencedSOPInstanceUID for i in range(len(PFFGS))
-                ]
-    
-    isMatch = [RefSOPuid in SOPuids for RefSOPuid in RefSOPuidsInPFFGS]
-    
-    #numOfMatches = isMatch.count(True)
-    
     # Find the indices of any non-matching ReferencedSOPInstanceUID:
-    inds = [i for i, x in enumerate(isMatch) if x==False]
+    inds = np.flatnonzero(SOPindsInPFFGS < 0).tolist()
     
     if inds:        
         for i in range(len(inds)):
@@ -433,14 +480,10 @@ def error_check_seg(seg, trgDataset, params):
     # Determine whether the DimensionIndexValues are sensible integers,
     # and if the indexed ReferencedSOPInstanceUID agrees with the 
     # ReferencedSOPInstanceUID within the SourceImageSequence.
-    DIVs = [PFFGS[i].FrameContentSequence[0]\
-                    .DimensionIndexValues for i in range(len(PFFGS))]
-    
-    firstElements = [int(DIVs[i][0]) for i in range(len(DIVs))]
     
     # Find the indices of any elements that exceed the number of sequences in
     # SegmentSequence, numSS:
-    inds = [i for i, x in enumerate(firstElements) if x > numSS]
+    inds = np.flatnonzero(firstElements > numSS).tolist()
     
     if inds:        
         for i in range(len(inds)):
@@ -461,10 +504,9 @@ def error_check_seg(seg, trgDataset, params):
                 
     # Determine if any of the second elements in the DIVs exceed the number
     #of sequences in ReferencedInstanceSequence:
-    secondElements = [int(DIVs[i][1]) for i in range(len(DIVs))]
     
     # Find the indices of any elements that exceed len(RIS):
-    inds = [i for i, x in enumerate(secondElements) if x > len(RIS)]
+    inds = np.flatnonzero(secondElements > len(RIS)).tolist()
 
     if inds:       
         for i in range(len(inds)):
@@ -483,40 +525,30 @@ def error_check_seg(seg, trgDataset, params):
     if p2c:
         print(msg)
     
-    #print(f'\n\n\nlen(RefSOPuidsInPFFGS) = {RefSOPuidsInPFFGS}')
-    #print(f'len(secondElements) = {len(secondElements)}')
-    #print(f'DIVs = {DIVs}')
-    
     # Determine if the ReferencedSOPInstanceUID in the 
     # ReferencedInstanceSequence indexed by the second elements in the DIVs 
     # match the ReferencedSOPInstanceUID in the SourceImageSequence.
-    n = 0
-    for i in range(len(secondElements)):
-        refSOPinPFFGS = RefSOPuidsInPFFGS[i]
-        
-        """ -1 since i is zero-indexed: """
-        ind = secondElements[i] - 1
-        
-        #print(f'ind = {ind}')
-        
-        refSOPinRIS = refSOPuidsInRIS[ind]
-        
-        if refSOPinPFFGS == refSOPinRIS:
-            msg = 'INFO:  ReferencedSOPInstanceUID referenced in ' +\
-                f'SourceImageSequence[{i}] matches ReferencedSOPInstanceUID' +\
-                f'referenced in ReferencedInstanceSequence[{DIVs[i]}], as ' +\
-                f'indexed by DimensionalIndexValue[{i}], {DIVs[i]}.\n'
-        else:
-            msg = 'ERROR:  ReferencedSOPInstanceUID referenced in ' +\
-                f'SourceImageSequence[{i}] does not match ' +\
-                'ReferencedSOPInstanceUID referenced in ' +\
-                f'ReferencedInstanceSequence[{DIVs[i]}], as indexed by ' +\
-                f'DimensionalIndexValue[{i}], {DIVs[i]}.\n'
-            logList.append(msg)
-            Nerrors +=  1
-            n += 1
+    """ -1 since the indices are zero-indexed. Second elements that are out
+    of range of ReferencedInstanceSequence (reported above) are treated as
+    non-matching. """
+    isMatch = [
+        1 <= ind <= len(RIS) and refSOPuidsInRIS[ind - 1] == refSOPinPFFGS
+        for ind, refSOPinPFFGS in zip(secondElements.tolist(),
+                                      RefSOPuidsInPFFGS)
+        ]
+    
+    inds = [i for i, x in enumerate(isMatch) if x==False]
+    
+    for i in inds:
+        msg = 'ERROR:  ReferencedSOPInstanceUID referenced in ' +\
+            f'SourceImageSequence[{i}] does not match ' +\
+            'ReferencedSOPInstanceUID referenced in ' +\
+            f'ReferencedInstanceSequence[{DIVs[i]}], as indexed by ' +\
+            f'DimensionalIndexValue[{i}], {DIVs[i]}.\n'
+        logList.append(msg)
+        Nerrors +=  1
                   
-    if n == 0:
+    if not inds:
         msg = 'INFO:  The ReferencedSOPInstanceUIDs referenced in ' +\
             'SourceImageSequence match the ReferencedSOPInstanceUIDs ' +\
             'referenced in ReferencedInstanceSequence, as indexed by ' +\
@@ -526,61 +558,49 @@ def error_check_seg(seg, trgDataset, params):
         print(msg)
     
     # Determine if ImagePositionPatient in PerFrameFunctionalGroupsSequence 
-    # matches ImagePositionPatient of the DICOM as indexed by the DIVs.
-    IPPsInPFFGS = [PFFGS[i].PlanePositionSequence[0]\
-                           .ImagePositionPatient for i in range(len(PFFGS))]
+    # matches ImagePositionPatient of the DICOM as indexed by the DIVs (for
+    # the frames whose ReferencedSOPInstanceUID matches a SOPInstanceUID).
+    framesWithSOP = np.flatnonzero(SOPindsInPFFGS >= 0)
     
-    IPPsInPFFGS = [[float(item) for item in IPP] for IPP in IPPsInPFFGS]
+    dcmIPPs = np.array(IPPs, dtype=np.float64).reshape(-1, 3)
     
-    c = 0
-    for i in range(len(IPPsInPFFGS)):
-        if RefSOPuidsInPFFGS[i] in SOPuids:
-            ind = SOPuids.index(RefSOPuidsInPFFGS[i])
-            
-            IPP = IPPs[ind]
-            
-            #if IPPsInPFFGS[i] != IPP:
-            if are_items_equal_to_within_eps(IPPsInPFFGS[i], IPP, epsilon):
-                msg = f'INFO: ImagePositionPatient, {IPPsInPFFGS[i]}, ' +\
-                    f'referenced in PlanePositionSequence[{i}] is within ' +\
-                    f'{epsilon} of the DICOM ImagePositionPatient, {IPP}, ' +\
-                    f'indexed by the second element, {secondElements[i]}, ' +\
-                    f'in DimensionalIndexValue[{i}], {DIVs[i]}.\n'
-            else:
-                msg = f'ERROR: ImagePositionPatient, {IPPsInPFFGS[i]}, ' +\
-                    f'referenced in PlanePositionSequence[{i+1}] is not ' +\
-                    f'within {epsilon} of the DICOM ImagePositionPatient, ' +\
-                    f'{IPP}, indexed by the second element, ' +\
-                    f'{secondElements[i]}, in DimensionalIndexValue[{i}],' +\
-                    f' {DIVs[i]}.\n'
-                logList.append(msg)
-                Nerrors +=  1
-                c += 1
+    maxAbsDiffs = np.max(
+        np.abs(
+            IPPsInPFFGS[framesWithSOP] - dcmIPPs[SOPindsInPFFGS[framesWithSOP]]
+            ),
+        axis=1, initial=0
+        )
+    
+    inds = framesWithSOP[maxAbsDiffs >= epsilon].tolist()
+    
+    for i in inds:
+        IPP = IPPs[SOPindsInPFFGS[i]]
         
-        if c == 0:
-            msg = 'INFO: All ImagePositionPatient referenced in ' +\
-                f'PlanePositionSequence are within {epsilon} of the DICOM ' +\
-                'ImagePositionPatient indexed by the second element in ' +\
-                'DimensionalIndexValue.\n'
-            logList.append(msg)
-            
-        #else:
-        #    msg = f'.\n'
-        #    
-        #    Nerrors +=  1
-                  
-    logList.append(msg)
+        msg = f'ERROR: ImagePositionPatient, {IPPsInPFFGS[i].tolist()}, ' +\
+            f'referenced in PlanePositionSequence[{i+1}] is not ' +\
+            f'within {epsilon} of the DICOM ImagePositionPatient, ' +\
+            f'{IPP}, indexed by the second element, ' +\
+            f'{secondElements[i]}, in DimensionalIndexValue[{i}],' +\
+            f' {DIVs[i]}.\n'
+        logList.append(msg)
+        Nerrors +=  1
+    
+    if not inds:
+        msg = 'INFO: All ImagePositionPatient referenced in ' +\
+            f'PlanePositionSequence are within {epsilon} of the DICOM ' +\
+            'ImagePositionPatient indexed by the second element in ' +\
+            'DimensionalIndexValue.\n'
+        logList.append(msg)
     if p2c:
         print(msg)
     
     # Check that the ReferencedSegmentNumber match the first elements in the
     # DimensionIndexValues.
-    RSNs = [PFFGS[i].SegmentIdentificationSequence[0]\
-                    .ReferencedSegmentNumber for i in range(len(PFFGS))]
-    
-    diffs = [firstElements[i] - RSNs[i] for i in range(len(RSNs))]
+    diffs = firstElements - np.array(
+        [int(RSN) for RSN in RSNs], dtype=np.int64
+        )
     
-    inds = [i for i, x in enumerate(diffs) if x > 0]
+    inds = np.flatnonzero(diffs > 0).tolist()
     
     if inds:       
         for i in range(len(inds)):
@@ -107,20 +107,14 @@ def get_seg_data_of_interest(
     if seg == None:
         return None, None
     
-    # Get all pixel arrays by seg:
-    """ 16/07: making changes to get_pixarrBySeg... """
-    allPixarrBySeg = get_pixarrBySeg(
-        seg=seg, f2sIndsBySeg=allF2SindsBySeg, p2c=p2c
-        )
+    # Get the frame numbers (in the SEG's pixel array) by seg. Only the frames
+    # of interest will be decoded (at the end):
+    allFrameNumsBySeg = get_frameNumsBySeg(allF2SindsBySeg)
     
-    #print('\n\nallPixarrBySeg =', allPixarrBySeg)
     #print(f'\n\nallF2SindsBySeg = {allF2SindsBySeg}')
     
     Nsegs = len(allF2SindsBySeg)
     
-    # The shape of the first pixel array:
-    F, R, C = allPixarrBySeg[0].shape
-    
     if p2c:
         print_indsByRoi(allF2SindsBySeg)
     
@@ -130,12 +124,13 @@ def get_seg_data_of_interest(
             
     if slcNum:
         # Limit data to those which belong to the chosen slice number:
-        pixarrBySeg = []
+        frameNumsBySeg = []
         f2sIndsBySeg = []
     
         for s in range(Nsegs):
-            # The pixel array and frame-to-slice indices for this segment:
-            allPixarr = deepcopy(allPixarrBySeg[s])
+            # The SEG frame numbers and frame-to-slice indices for this
+            # segment:
+            allSegFrameNums = allFrameNumsBySeg[s]
             allF2Sinds = deepcopy(allF2SindsBySeg[s])
                 
             # Get the frame number(s) that relate to slcNum:
@@ -149,50 +144,43 @@ def get_seg_data_of_interest(
                 # Some frames will be rejected:
                 reducedBySlc = True
                 
-                # Initialise pixarr with the reduced number of frames matching
-                # len(frameNums):
-                pixarr = np.zeros((len(frameNums), R, C), dtype='uint')
+                segFrameNums = []
                 f2sInds = []
                 
                 if frameNums:
                     # Keep only the indeces and frames that relate to frameNums:
                     for f in range(len(frameNums)):
-                        pixarr[f] = allPixarr[frameNums[f]]
+                        segFrameNums.append(allSegFrameNums[frameNums[f]])
                         
                         f2sInds.append(allF2Sinds[frameNums[f]])
                     
                     if p2c:
                         print(f'f2sInds = {f2sInds}')
                     
-                    # Append non-empty pixel arrays and non-empty f2sInds:
-                    pixarrBySeg.append(pixarr)
+                    # Append non-empty frame numbers and non-empty f2sInds:
+                    frameNumsBySeg.append(segFrameNums)
                     f2sIndsBySeg.append(f2sInds)
             """ 
             else 
             all frames to remain
             """
         
-        #print('\n\npixarrBySeg =', pixarrBySeg)
-        
         if reducedBySlc:
-            # Replace allPixarrBySeg and allF2SindsBySeg with pixarrBySeg and 
-            # f2sIndsBySeg in case further restricting of data is required 
-            # below:
-            allPixarrBySeg = deepcopy(pixarrBySeg)
+            # Replace allFrameNumsBySeg and allF2SindsBySeg with 
+            # frameNumsBySeg and f2sIndsBySeg in case further restricting of 
+            # data is required below:
+            allFrameNumsBySeg = deepcopy(frameNumsBySeg)
             allF2SindsBySeg = deepcopy(f2sIndsBySeg)
         """ 
         else 
-            allPixarrBySeg and allF2SindsBySeg remain unchanged
+            allFrameNumsBySeg and allF2SindsBySeg remain unchanged
         """
         
-        #print('\n\nallPixarrBySeg =', allPixarrBySeg)
-        
         if p2c and reducedBySlc:
             print('\n   After limiting data to those that relate to slice',
                   f'number {slcNum}:')#, the f2sIndsBySeg =')
             print_indsByRoi(f2sIndsBySeg)
-            print('   pixarrBySeg = ', pixarrBySeg)
-            print_shape_of_pixarrBySeg(pixarrBySeg)
+            print(f'   frameNumsBySeg = {frameNumsBySeg}')
     
     # Initialise variable that indicates if the SEG data was reduced by
     # chosen segment label (segLab):
@@ -200,7 +188,7 @@ def get_seg_data_of_interest(
     
     if segLab:
         # Limit data to those which belong to the chosen segment(s):
-        pixarrBySeg = []
+        frameNumsBySeg = []
         f2sIndsBySeg = []
         
         #print(f'\nsegNums = {segNums}')
@@ -209,7 +197,7 @@ def get_seg_data_of_interest(
         if len(segNums) != len(allF2SindsBySeg):
             #reducedBySeg = True
             
-            pixarrBySeg = [allPixarrBySeg[s] for s in segNums]
+            frameNumsBySeg = [allFrameNumsBySeg[s] for s in segNums]
             f2sIndsBySeg = [allF2SindsBySeg[s] for s in segNums]
             
             if p2c:
@@ -220,16 +208,20 @@ def get_seg_data_of_interest(
                 print('\n   After limiting data to those whose segment name',
                       f'matches {allSegLabs}:')
                 print_indsByRoi(f2sIndsBySeg)
-                print_shape_of_pixarrBySeg(pixarrBySeg)
                 
         else:
-            pixarrBySeg = deepcopy(allPixarrBySeg)
+            frameNumsBySeg = deepcopy(allFrameNumsBySeg)
             f2sIndsBySeg = deepcopy(allF2SindsBySeg)
         
     else:
-        pixarrBySeg = deepcopy(allPixarrBySeg)
+        frameNumsBySeg = deepcopy(allFrameNumsBySeg)
         f2sIndsBySeg = deepcopy(allF2SindsBySeg)
     
+    # Decode the frames of interest:
+    pixarrBySeg = [
+        get_frames_in_seg(seg, frameNums) for frameNums in frameNumsBySeg
+        ]
+    
     if p2c:
         print('\n   Final outputs of get_seg_data_of_interest():')
         print_shape_of_pixarrBySeg(pixarrBySeg)
@@ -430,21 +422,13 @@ def get_pixarr_in_seg(seg, dicomDir, searchStr):
     
     """ 16/07: Making changes to metadata.py in seg_tools... """
     
-    pixarr_all = seg.pixel_array
-    
-    F_all, R, C = pixarr_all.shape
-    
     # Get the frame numbers of the SEG's pixel array that correspond to the 
     # segment of interest, and the corresponding Per-frame Functional Groups
     # Sequence-to-slice indices:
     frameNumsInSeg, f2sIndsInSeg = get_frameNums(seg, searchStr, dicomDir)
     
-    F = len(frameNumsInSeg)
-    
-    pixarrInSeg = np.zeros((F, R, C), dtype='uint')
-    
-    for i in range(F):  
-        pixarrInSeg[i] = pixarr_all[frameNumsInSeg[i]]
+    # Decode only the frames that belong to the segment of interest:
+    pixarrInSeg = get_frames_in_seg(seg, frameNumsInSeg)
     
     return pixarrInSeg, f2sIndsInSeg
 
@@ -479,47 +463,134 @@ def get_pixarrBySeg(seg, f2sIndsBySeg, p2c=False):
         print('Running of get_pixarrBySeg():')
         print('\n\n', '-'*120)
         
-    pixarr_all = seg.pixel_array
+    if p2c:
+        #print('f2sIndsBySeg =')
+        print_indsByRoi(f2sIndsBySeg)
     
-    """ If the seg has a single frame it will have shape (NumOfRows, NumOfCols).
-    For compatibility with multi-framed pixel arrays, convert single-framed
-    pixel arrays to shape (1, NumOfRows, NumOfCols). """
+    # Decode the frames of each segment (rather than the entire pixel array
+    # followed by copies of its frames):
+    pixarrBySeg = [
+        get_frames_in_seg(seg, frameNums) 
+        for frameNums in get_frameNumsBySeg(f2sIndsBySeg)
+        ]
     
-    if len(pixarr_all.shape) < 3:
-        R, C = pixarr_all.shape
+    if p2c:
+        print_shape_of_pixarrBySeg(pixarrBySeg)
+        print('-'*120)
         
-        pixarr_all = np.reshape(pixarr_all, (1, R, C))
+    return pixarrBySeg
+
+def get_frameNumsBySeg(f2sIndsBySeg):
+    """
+    Get the frame numbers in a SEG's pixel array grouped by segment.
     
-    F_all, R, C = pixarr_all.shape
+    Parameters
+    ----------
+    f2sIndsBySeg : list of a list of ints
+        List (for each segment) of the slice numbers that correspond to each
+        frame in the SEG's pixel array.
     
-    Nsegs = len(f2sIndsBySeg)
+    Returns
+    -------
+    frameNumsBySeg : list of a list of ints
+        List (for each segment) of the frame numbers (in the SEG's pixel 
+        array) that belong to each segment.
     
-    if p2c:
-        print(f'pixarr_all.shape = {pixarr_all.shape}')
-        #print('f2sIndsBySeg =')
-        print_indsByRoi(f2sIndsBySeg)
-        
-    pixarrBySeg = []
+    Notes
+    -----
+    The frames are assumed to be ordered by segment (as in get_pixarrBySeg).
+    """
+    
+    frameNumsBySeg = []
     
-    j = 0 # total frame counter for all frames in pixarr_all
+    j = 0 # total frame counter for all frames in the SEG
     
-    for s in range(Nsegs):
-        # The number of frames in pixarr_all that belong to this segment:
-        F = len(f2sIndsBySeg[s])
+    for f2sInds in f2sIndsBySeg:
+        frameNumsBySeg.append(list(range(j, j + len(f2sInds))))
         
-        # Initialise the pixel array for this segment:
-        pixarr = np.zeros((F, R, C), dtype='uint')
+        j += len(f2sInds)
+    
+    return frameNumsBySeg
+
+def get_frames_in_seg(seg, frameNums):
+    """
+    Get selected frames of a SEG's pixel array, decoding only those frames.
+    
+    Parameters
+    ----------
+    seg : Pydicom object
+        SEG object.
+    frameNums : list of ints
+        List of the (zero-indexed) frame numbers of interest.
+    
+    Returns
+    -------
+    pixarr : Numpy array
+        The frames of interest as a FxRxC array, where F is the number of 
+        frame numbers in frameNums.
+    
+    Notes
+    -----
+    For (uncompressed) binary SEGs the frames are unpacked directly from the
+    bytes in PixelData: the pixels of frame f start at bit f*R*C (frames 
+    aren't padded to a byte boundary) and the bits within each byte are in
+    little-endian order. Only the bytes that span each frame of interest are
+    unpacked, so the memory used scales with the number of frames selected 
+    rather than with the number of frames in the SEG.
+    
+    For other SEGs (e.g. fractional or compressed) the entire pixel array is
+    decoded using Pydicom.
+    """
+    
+    R = int(seg.Rows)
+    C = int(seg.Columns)
+    F_all = int(getattr(seg, 'NumberOfFrames', 1))
+    
+    pixarr = np.zeros((len(frameNums), R, C), dtype='uint')
+    
+    if not frameNums:
+        return pixarr
+    
+    if max(frameNums) >= F_all or min(frameNums) < 0:
+        msg = f"The frame numbers {frameNums} are not all within the range "\
+            + f"of the {F_all} frames in the SEG's pixel array."
+        raise Exception(msg)
+    
+    try:
+        isCompressed = seg.file_meta.TransferSyntaxUID.is_compressed
+    except AttributeError:
+        isCompressed = False
+    
+    if seg.BitsAllocated != 1 or isCompressed:
+        pixarr_all = np.reshape(seg.pixel_array, (F_all, R, C))
         
-        if F > 0:
-            for i in range(F):
-                pixarr[i] = pixarr_all[j]
-                
-                j += 1 # increment the total frame counter
+        for i in range(len(frameNums)):
+            pixarr[i] = pixarr_all[frameNums[i]]
         
-        pixarrBySeg.append(pixarr)
+        return pixarr
     
-    if p2c:
-        print_shape_of_pixarrBySeg(pixarrBySeg)
-        print('-'*120)
+    pixelData = seg.PixelData
+    
+    # The number of pixels in each frame:
+    P = R*C
+    
+    for i in range(len(frameNums)):
+        # The first bit of this frame, and the bytes that span the frame:
+        startBit = frameNums[i]*P
+        startByte = startBit // 8
+        stopByte = (startBit + P + 7) // 8
         
-    return pixarrBySeg
\ No newline at end of file
+        bits = np.unpackbits(
+            np.frombuffer(
+                pixelData, dtype=np.uint8, count=stopByte - startByte,
+                offset=startByte
+                ),
+            bitorder='little'
+            )
+        
+        # Discard the bits that belong to the preceding frame:
+        offset = startBit % 8
+        
+        pixarr[i] = np.reshape(bits[offset:offset + P], (R, C))
+    
+    return pixarr
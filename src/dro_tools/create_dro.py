@@ -9,10 +9,14 @@ Created on Mon Aug 23 19:07:06 2021
 from importlib import reload
 import dro_tools.matrices
 reload(dro_tools.matrices)
+import dro_tools.vector_grid_data
+reload(dro_tools.vector_grid_data)
 import general_tools.general
 reload(general_tools.general)
 import xnat_tools.subject_assessors
 reload(xnat_tools.subject_assessors)
+import io_tools.uploads
+reload(io_tools.uploads)
 """
 
 import os
@@ -27,10 +31,12 @@ from dro_tools.general import (
     )
 #from dro_tools.matrices import is_matrix_orthonormal, is_matrix_orthogonal
 from dro_tools.matrices import (get_txMatrix_from_tx, get_tx_matrix_type)
+from dro_tools.vector_grid_data import encode_vector_grid_data
 from general_tools.general import (
     reduce_list_of_str_floats_to_16, generate_reg_fname
     )
 from xnat_tools.subject_assessors import upload_subj_asr
+from io_tools.uploads import ds_to_bytes, write_bytes
 
 
 class DroCreator:
@@ -194,9 +200,11 @@ class DroCreator:
         self.droFpath = ''
         
         # Get the transformation matrix and grid data (if the registration
-        # transformation is a bspline):
+        # transformation is a bspline), unless the transform was composed 
+        # from a path of existing transforms (see create_dro):
         #self.get_txMatrix_from_tx(newDataset, params)
-        self.get_data_from_tx(newDataset, params)
+        if getattr(newDataset, 'txPath', None) is None:
+            self.get_data_from_tx(newDataset, params)
         
         # Import the sample DRO:
         self.import_sample_dro(params)
@@ -324,9 +332,10 @@ class DroCreator:
             The dimensions of the bspline grid.
         self.gridRes : list of floats
             The spacings of the bspline grid.
-        self.vectGridData : list of floats
+        self.vectGridData : bytes
             The deformations of the bspline, e.g.: 
-            [def0_x, def0_y, def0_z, def1_x, def1_y, def1_z, ...].
+            [def0_x, def0_y, def0_z, def1_x, def1_y, def1_z, ...] (see 
+            dro_tools.vector_grid_data.encode_vector_grid_data).
         """
         
         #regTxName = params.cfgDict['regTxName']
@@ -352,22 +361,24 @@ class DroCreator:
         SimpleITK.SimpleITK.Transform but needs to be of class
         SimpleITK.SimpleITK.BSplineTransform. Check and change if needed:
         """
+        if type(regTx) == sitk.SimpleITK.CompositeTransform:
+            """
+            The composite of the pre-registration (linear) transform and the
+            BSpline, e.g. from a cascaded registration (see cascade_reg_im in
+            image_tools.registering) or from a DRO (see create_tx_from_dro in
+            io_tools.propagate):
+            """
+            preRegTx = regTx.GetNthTransform(0)
+            regTx = regTx.GetNthTransform(regTx.GetNumberOfTransforms() - 1)
+        
         if type(regTx) == sitk.SimpleITK.Transform:
             regTx = sitk.BSplineTransform(regTx)
         
         # Get the coefficient images (deformations along x, y and z):
         coeffImX, coeffImY, coeffImZ = regTx.GetCoefficientImages()
         
-        # Zip the vectors to a list of x, y, z tuples:
-        listOfTuples = list(zip(
-            list(sitk.GetArrayViewFromImage(coeffImX).flatten()),
-            list(sitk.GetArrayViewFromImage(coeffImY).flatten()),
-            list(sitk.GetArrayViewFromImage(coeffImZ).flatten())
-            ))
-        
-        flatListOfVects = [item for tup in listOfTuples for item in tup]
-        
-        vectGridData = np.array(flatListOfVects).tobytes()
+        # Interleave the deformations to x, y, z vectors:
+        vectGridData = encode_vector_grid_data([coeffImX, coeffImY, coeffImZ])
         
         gridOrig = [str(item) for item in coeffImX.GetOrigin()]
         gridDir = [str(item) for item in coeffImX.GetDirection()]
@@ -1188,12 +1199,27 @@ class DroCreator:
         -------
         self.dro : Pydicom Object
             DICOM Spatial or Deformable Spatial Registration Object.
+        
+        Note
+        ----
+        A DRO isn't created if the transform was composed from a path of 
+        existing transforms (newDataset.txPath isn't None, see 
+        io_tools.propagate.Propagator.create_tx_from_path), since the 
+        transforms along the path are already stored, and a composed path 
+        may not be of the type given by cfgDict['regTxName'] (e.g. a linear
+        transform followed by a bspline).
         """
         
         useCaseToApply = params.cfgDict['useCaseToApply']
         useDroForTx = params.cfgDict['useDroForTx']
         regTxName = params.cfgDict['regTxName']
         
+        if getattr(newDataset, 'txPath', None) is not None:
+            if params.cfgDict['p2c']:
+                print('A DRO will not be created since the transform was',
+                      'composed from a path of existing transforms.\n')
+            return
+        
         if '5' in useCaseToApply and not useDroForTx:
             timingMsg = "Creating the DICOM Registration Object...\n"
             params.add_timestamp(timingMsg)
@@ -1206,12 +1232,25 @@ class DroCreator:
             timingMsg = "Took [*] to create the DICOM Registration Object.\n"
             params.add_timestamp(timingMsg)
     
-    def export_dro(self, params):
+    def get_dro_fpath(self, params):
+        """
+        Get the file path of the new DRO, which is used for its export to disk
+        and its file name in XNAT.
+        
+        Parameters
+        ----------
+        params : DataDownloader Object
+            Contains parameters (cfgDict), file paths (pathsDict), timestamps
+            (timings) and timing messages (timingMsgs).
+        
+        Returns
+        -------
+        self.droFpath : str
+            Full path of the new DRO file.
+        """
         
-        dro = self.dro
         cfgDict = params.cfgDict
         
-        exportDro = cfgDict['exportDro']
         exportDir = cfgDict['droExportDir']
         srcExpLab = cfgDict['srcExpLab']
         srcScanID = cfgDict['srcScanID']
@@ -1219,30 +1258,83 @@ class DroCreator:
         trgScanID = cfgDict['trgScanID']
         regTxName = cfgDict['regTxName']
         
+        #cdt = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
+        #
+        #fname = f'{cdt}_ExpLab_{srcExpLab}_ScanID_{srcScanID}_{regTxName}'\
+        #    + f'_reg_to_ExpLab_{trgExpLab}_ScanID_{trgScanID}.dcm'
+        
+        fname = generate_reg_fname(
+            srcExpLab, srcScanID, trgExpLab, trgScanID, regTxName
+            ) + '.dcm'
+        
+        self.droFpath = os.path.join(exportDir, fname)
+        
+        return self.droFpath
+    
+    def get_dro_bytes(self):
+        """
+        Get the new DRO serialised in memory (serialised once for its export
+        and upload).
+        
+        Returns
+        -------
+        self.droBytes : bytes
+        """
+        
+        if getattr(self, 'droBytes', None) is None:
+            self.droBytes = ds_to_bytes(self.dro)
+        
+        return self.droBytes
+    
+    def export_dro(self, params, uploader=None):
+        """
+        Export the DRO to disk if it exists and is to be exported 
+        (cfgDict['exportDro']).
+        
+        Parameters
+        ----------
+        params : DataDownloader Object
+            Contains parameters (cfgDict), file paths (pathsDict), timestamps
+            (timings) and timing messages (timingMsgs).
+        uploader : UploadManager, optional
+            If provided the export will be written on a background worker of 
+            uploader. The default value is None.
+        
+        Returns
+        -------
+        future : Future or None
+            The Future of the export if uploader was provided and the DRO was
+            exported, None otherwise.
+        """
+        
+        dro = self.dro
+        exportDro = params.cfgDict['exportDro']
+        
         if dro and exportDro:
+            fpath = self.get_dro_fpath(params)
+            
+            exportDir = os.path.dirname(fpath)
+            
             # Create directory if it doesn't already exist:
             if not os.path.isdir(exportDir):
                 #os.mkdir(exportDir)
-                Path(exportDir).mkdir(parents=True)
+                Path(exportDir).mkdir(parents=True, exist_ok=True)
             
-            #cdt = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
-            #
-            #fname = f'{cdt}_ExpLab_{srcExpLab}_ScanID_{srcScanID}_{regTxName}'\
-            #    + f'_reg_to_ExpLab_{trgExpLab}_ScanID_{trgScanID}.dcm'
-            
-            fname = generate_reg_fname(
-                srcExpLab, srcScanID, trgExpLab, trgScanID, regTxName
-                ) + '.dcm'
-            
-            fpath = os.path.join(exportDir, fname)
+            if uploader is not None:
+                print('\nNew DICOM Registration Object being exported to:\n',
+                      f'{fpath}\n')
+                
+                return uploader.submit(
+                    'droExport', write_bytes, self.get_dro_bytes(), fpath
+                    )
             
             dro.save_as(fpath)
-            
-            self.droFpath = fpath
         
             print(f'\nNew DICOM Registration Object exported to:\n {fpath}\n')
+        
+        return None
     
-    def upload_dro(self, params):
+    def upload_dro(self, params, uploader=None):
         """
         Upload the DRO to XNAT if the DRO is to be uploaded, the use case to
         apply was one that potentially required image registration, and if an
@@ -1253,10 +1345,20 @@ class DroCreator:
         params : DataDownloader Object
             Contains parameters (cfgDict), file paths (pathsDict), timestamps
             (timings) and timing messages (timingMsgs).
+        uploader : UploadManager, optional
+            If provided the DRO will be uploaded on a background worker of
+            uploader. The default value is None.
         
         Returns
         -------
-        None.
+        future : Future or None
+            The Future of the upload if uploader was provided and the DRO is to
+            be uploaded, None otherwise.
+        
+        Note
+        ----
+        The DRO is serialised to memory and uploaded (i.e. it doesn't need to
+        have been exported to disk).
         """
         
         timingMsg = "* Uploading the DRO to XNAT...\n"
@@ -1280,11 +1382,22 @@ class DroCreator:
             else:
                 droType = 'DSRO_DRO'
             
-            xnatSession = upload_subj_asr(
-                subj_asr_fpath=self.droFpath, 
-                url=url, proj_id=projID, subj_label=subjLab, 
-                content_label=droType, session=xnatSession
-                )
+            kwargs = {
+                'subj_asr_fpath' : self.get_dro_fpath(params), 
+                'url' : url, 'proj_id' : projID, 'subj_label' : subjLab, 
+                'content_label' : droType, 'session' : xnatSession,
+                'subj_asr' : dro if uploader is None else self.get_dro_bytes()
+                }
+            
+            if uploader is not None:
+                timingMsg = "Took [*] to submit the upload of the DRO.\n"
+                params.add_timestamp(timingMsg)
+                
+                return uploader.submit('droUpload', upload_subj_asr, **kwargs)
+            
+            xnatSession = upload_subj_asr(**kwargs)
         
         timingMsg = "Took [*] to upload the DRO.\n"
-        params.add_timestamp(timingMsg)
\ No newline at end of file
+        params.add_timestamp(timingMsg)
+        
+        return None
\ No newline at end of file
@@ -10,6 +10,9 @@ Created on Thu Jul  8 20:14:44 2021
 
 import SimpleITK as sitk
 import numpy as np
+from dro_tools.vector_grid_data import (
+    decode_vector_grid_data, create_coeff_ims
+    )
 
 
 def create_tx_from_spa_dro(dro, p2c=False):
@@ -275,40 +278,23 @@ def create_tx_from_def_dro(dro, refIm=None, p2c=False):
     #print(f'type(vectGridData) = {type(vectGridData)}')
     #print(f'vectGridData = {vectGridData}\n')
     
-    # Convert from bytes to list of floats:
-    flatList = list(np.frombuffer(dro.DeformableRegistrationSequence[1]\
-                                     .DeformableRegistrationGridSequence[0]\
-                                     .VectorGridData, dtype=np.float64))
-    
-    # Unflatten list to (x, y, z) tuples:
-    listOfTuples = zip(*[iter(flatList)]*3)
-    
-    # Unzip from x, y, z to lists for x, y and z:
-    coeffX, coeffY, coeffZ = zip(*listOfTuples)
-    
-    coeffArrX = np.reshape(np.array(coeffX), gridSize)
-    coeffArrY = np.reshape(np.array(coeffY), gridSize)
-    coeffArrZ = np.reshape(np.array(coeffZ), gridSize)
+    # De-interleave the (x, y, z) vectors to arrays for x, y and z 
+    # (GridDimensions is in (x, y, z) order, the arrays in (z, y, x) order):
+    coeffArrX, coeffArrY, coeffArrZ = decode_vector_grid_data(
+        dro.DeformableRegistrationSequence[1]\
+           .DeformableRegistrationGridSequence[0]\
+           .VectorGridData, 
+        gridSize
+        )
     
     if p2c:
         print(f'coeffArrX.shape = {coeffArrX.shape}')
         print(f'coeffArrY.shape = {coeffArrY.shape}')
         print(f'coeffArrZ.shape = {coeffArrZ.shape}\n')
     
-    coeffImX = sitk.GetImageFromArray(coeffArrX)
-    coeffImX.SetOrigin(gridOrig)
-    coeffImX.SetDirection(gridDir)
-    coeffImX.SetSpacing(gridSpacing)
-    
-    coeffImY = sitk.GetImageFromArray(coeffArrY)
-    coeffImY.SetOrigin(gridOrig)
-    coeffImY.SetDirection(gridDir)
-    coeffImY.SetSpacing(gridSpacing)
-    
-    coeffImZ = sitk.GetImageFromArray(coeffArrZ)
-    coeffImZ.SetOrigin(gridOrig)
-    coeffImZ.SetDirection(gridDir)
-    coeffImZ.SetSpacing(gridSpacing)
+    coeffImX, coeffImY, coeffImZ = create_coeff_ims(
+        [coeffArrX, coeffArrY, coeffArrZ], gridOrig, gridDir, gridSpacing
+        )
     
     sitkTx = sitk.BSplineTransform([coeffImX, coeffImY, coeffImZ])
     
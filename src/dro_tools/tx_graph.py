@@ -0,0 +1,490 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 29 09:31:44 2026
+
+@author: ctorti
+"""
+
+""" Transform graph over the DROs and local registrations of a subject. """
+
+import os
+import json
+import heapq
+import itertools
+from pathlib import Path
+from datetime import datetime
+import SimpleITK as sitk
+from dro_tools.create_tx_from_dro import (
+    create_tx_from_spa_dro, create_pre_tx_from_def_dro, create_tx_from_def_dro
+    )
+from image_tools.displacement import get_sub_txs
+
+
+"""
+The edge transform types that may be composed for each regTxName (e.g. a
+path for an affine registration may include rigid and affine transforms but
+not deformable ones):
+"""
+ALLOWED_TX_NAMES = {
+    'rigid' : ['rigid'],
+    'affine' : ['rigid', 'affine'],
+    'bspline' : ['rigid', 'affine', 'bspline']
+    }
+
+"""
+The transform types that can be inverted (the inverses of deformable
+transforms are not readily available):
+"""
+INVERTIBLE_TX_NAMES = ['rigid', 'affine']
+
+
+def get_for_uids_from_dro(dro):
+    """
+    Get the Source and Target Frame of Reference UIDs of a DRO.
+    
+    Parameters
+    ----------
+    dro : Pydicom Object
+        The DICOM Spatial or Deformable Spatial Registration Object.
+    
+    Returns
+    -------
+    srcFORuid : str
+        The FrameOfReferenceUID of the Source (moving) image.
+    trgFORuid : str
+        The FrameOfReferenceUID of the Target (fixed) image.
+    """
+    
+    if 'DeformableRegistrationSequence' in dro:
+        trgFORuid = f'{dro.DeformableRegistrationSequence[0].SourceFrameOfReferenceUID}'
+        srcFORuid = f'{dro.DeformableRegistrationSequence[1].SourceFrameOfReferenceUID}'
+    else:
+        trgFORuid = f'{dro.RegistrationSequence[0].FrameOfReferenceUID}'
+        srcFORuid = f'{dro.RegistrationSequence[1].FrameOfReferenceUID}'
+    
+    return srcFORuid, trgFORuid
+
+def get_tx_from_dro(dro, p2c=False):
+    """
+    Create a SimpleITK Transform from a DRO, as in create_tx_from_dro in
+    io_tools.propagate.
+    
+    Parameters
+    ----------
+    dro : Pydicom Object
+        The DICOM Spatial or Deformable Spatial Registration Object.
+    p2c : bool, optional
+        Denotes whether intermediate results will be logged to the console.
+        The default value is False.
+    
+    Returns
+    -------
+    sitkTx : SimpleITK Transform
+        The transform (the composite of the pre-deformation transform and the
+        BSpline transform for deformable DROs).
+    txName : str
+        'rigid', 'affine' or 'bspline'.
+    """
+    
+    if 'DeformableRegistrationSequence' in dro:
+        bsplineTx = create_tx_from_def_dro(dro, p2c=p2c)
+        preRegTx = create_pre_tx_from_def_dro(dro, p2c)
+        
+        sitkTx = sitk.CompositeTransform(preRegTx)
+        sitkTx.AddTransform(bsplineTx)
+        
+        txName = 'bspline'
+    else:
+        matrixType = dro.RegistrationSequence[1]\
+                        .MatrixRegistrationSequence[0]\
+                        .MatrixSequence[0]\
+                        .FrameOfReferenceTransformationMatrixType
+        
+        sitkTx = create_tx_from_spa_dro(dro, p2c)
+        
+        txName = 'affine' if matrixType == 'AFFINE' else 'rigid'
+    
+    return sitkTx, txName
+
+def get_dro_datetime(dro):
+    """
+    Get the content date and time of a DRO as a datetime object.
+    """
+    
+    contentDateTime = f'{dro.ContentDate}{dro.ContentTime}'
+    
+    try:
+        return datetime.strptime(contentDateTime, '%Y%m%d%H%M%S.%f')
+    except ValueError:
+        return datetime.strptime(contentDateTime, '%Y%m%d%H%M%S')
+
+
+class TxGraph:
+    """
+    This class stores the known transforms between the Frames of Reference
+    of a subject (e.g. from DROs and local registrations) as a directed
+    graph, and finds and composes a path of transforms between two Frames of
+    Reference, e.g. so that if A->B and B->C are known, the transform A->C
+    can be obtained without registration.
+    
+    Each transform is added as an edge from the Source to the Target Frame
+    of Reference. Rigid and affine transforms are also added as an edge from
+    the Target to the Source Frame of Reference using their inverses.
+    
+    Parameters
+    ----------
+    None.
+    
+    Returns
+    -------
+    self.edgesBySrc : dict
+        Dictionary (with Source FORuids as keys) of a list of edges, each a
+        dictionary with keys 'srcFORuid', 'trgFORuid', 'tx', 'txName',
+        'origin' (e.g. 'dro' or 'local'), 'label' (e.g. the DRO file name),
+        'isInverse' and 'dateTime'.
+    """
+    
+    def __init__(self):
+        self.edgesBySrc = {}
+    
+    def add_tx(
+            self, srcFORuid, trgFORuid, sitkTx, txName, origin, label='',
+            dateTime=None
+            ):
+        """
+        Add a transform (and its inverse if rigid or affine) to the graph.
+        
+        Parameters
+        ----------
+        srcFORuid : str
+            The FrameOfReferenceUID of the Source (moving) image.
+        trgFORuid : str
+            The FrameOfReferenceUID of the Target (fixed) image.
+        sitkTx : SimpleITK Transform
+            The transform used to resample the Source image onto the Target
+            image (i.e. that maps points in the Target domain to the Source
+            domain).
+        txName : str
+            'rigid', 'affine' or 'bspline'.
+        origin : str
+            The origin of the transform (e.g. 'dro' or 'local').
+        label : str, optional
+            A label for the transform (e.g. the DRO file name). The default
+            value is ''.
+        dateTime : datetime, optional
+            The date and time the transform was created. The default value is
+            None.
+        
+        Returns
+        -------
+        None.
+        """
+        
+        if srcFORuid == trgFORuid:
+            return
+        
+        edge = {
+            'srcFORuid' : srcFORuid,
+            'trgFORuid' : trgFORuid,
+            'tx' : sitkTx,
+            'txName' : txName,
+            'origin' : origin,
+            'label' : label,
+            'isInverse' : False,
+            'dateTime' : dateTime
+            }
+        
+        self.edgesBySrc.setdefault(srcFORuid, []).append(edge)
+        
+        if txName in INVERTIBLE_TX_NAMES:
+            invEdge = dict(edge)
+            invEdge['srcFORuid'] = trgFORuid
+            invEdge['trgFORuid'] = srcFORuid
+            invEdge['tx'] = sitkTx.GetInverse()
+            invEdge['isInverse'] = True
+            
+            self.edgesBySrc.setdefault(trgFORuid, []).append(invEdge)
+    
+    def add_dro(self, dro, label='', p2c=False):
+        """
+        Add the transform of a DRO to the graph (see add_tx).
+        """
+        
+        srcFORuid, trgFORuid = get_for_uids_from_dro(dro)
+        
+        sitkTx, txName = get_tx_from_dro(dro, p2c)
+        
+        self.add_tx(
+            srcFORuid, trgFORuid, sitkTx, txName, origin='dro', label=label,
+            dateTime=get_dro_datetime(dro)
+            )
+    
+    def get_num_of_edges(self):
+        """
+        Get the number of edges in the graph.
+        """
+        
+        return sum([len(edges) for edges in self.edgesBySrc.values()])
+    
+    def find_path(self, srcFORuid, trgFORuid, txNames, maxPathLength=3):
+        """
+        Find the path of transforms from one Frame of Reference to another.
+        
+        Parameters
+        ----------
+        srcFORuid : str
+            The FrameOfReferenceUID of the Source (moving) image.
+        trgFORuid : str
+            The FrameOfReferenceUID of the Target (fixed) image.
+        txNames : list of strs
+            The transform types that may be used (e.g.
+            ALLOWED_TX_NAMES[regTxName]).
+        maxPathLength : int, optional
+            The maximum number of transforms in the path. The default value
+            is 3.
+        
+        Returns
+        -------
+        path : list of dicts or None
+            The list of edges from srcFORuid to trgFORuid, or None if no path
+            was found.
+        
+        Note
+        ----
+        The path with the fewest transforms is returned. Ties are broken by
+        the number of inverted transforms (fewer is preferred), then by the
+        age of the oldest transform in the path (more recent is preferred).
+        """
+        
+        counter = itertools.count()
+        
+        # Priority queue of (numEdges, numInverses, -oldestTimestamp, count,
+        # FORuid, path):
+        queue = [(0, 0, 0, next(counter), srcFORuid, [])]
+        
+        visited = set()
+        
+        while queue:
+            numEdges, numInverses, negOldest, _, FORuid, path = \
+                heapq.heappop(queue)
+            
+            if FORuid == trgFORuid:
+                return path
+            
+            if FORuid in visited or numEdges >= maxPathLength:
+                continue
+            
+            visited.add(FORuid)
+            
+            for edge in self.edgesBySrc.get(FORuid, []):
+                if not edge['txName'] in txNames:
+                    continue
+                
+                if edge['trgFORuid'] in visited:
+                    continue
+                
+                timestamp = edge['dateTime'].timestamp()\
+                    if edge['dateTime'] else 0
+                
+                oldest = timestamp if not path else min(-negOldest, timestamp)
+                
+                heapq.heappush(
+                    queue,
+                    (numEdges + 1, numInverses + int(edge['isInverse']),
+                     -oldest, next(counter), edge['trgFORuid'],
+                     path + [edge])
+                    )
+        
+        return None
+    
+    def print_path(self, path):
+        """
+        Print the edges in a path.
+        """
+        
+        print(f'Path of {len(path)} transform(s):')
+        for edge in path:
+            inverse = ' (inverted)' if edge['isInverse'] else ''
+            print(f"   {edge['srcFORuid']} -> {edge['trgFORuid']}: "
+                  f"{edge['txName']}{inverse} from {edge['origin']} "
+                  f"{edge['label']}")
+
+
+def compose_path(path):
+    """
+    Compose the transforms in a path into a single transform.
+    
+    Parameters
+    ----------
+    path : list of dicts
+        The list of edges from the Source to the Target Frame of Reference
+        (see TxGraph.find_path).
+    
+    Returns
+    -------
+    pathTx : SimpleITK CompositeTransform
+        The composite transform that resamples the Source image onto the
+        Target image.
+    
+    Note
+    ----
+    Each transform maps points in its Target domain to its Source domain, so
+    points in the final Target domain are mapped by the last transform
+    first. A CompositeTransform applies its transforms in the reverse order
+    they were added, so the transforms are added in the order of the path.
+    Composite transforms (e.g. from deformable DROs) are flattened.
+    """
+    
+    subTxs = []
+    for edge in path:
+        subTxs.extend(get_sub_txs(edge['tx']))
+    
+    pathTx = sitk.CompositeTransform(subTxs)
+    
+    return pathTx
+
+def get_reg_cache_dir(cfgDict):
+    """
+    Get the directory of the local registration cache for the subject of a
+    run.
+    
+    Parameters
+    ----------
+    cfgDict : dict
+        Dictionary containing the parameters for the run.
+    
+    Returns
+    -------
+    cacheDir : str
+        The directory (regCacheDir/projID/subjLab).
+    """
+    
+    cacheDir = os.path.join(
+        cfgDict['regCacheDir'], cfgDict['projID'], cfgDict['subjLab']
+        )
+    
+    return cacheDir
+
+def import_reg_cache_index(cacheDir):
+    """
+    Import the index of a local registration cache.
+    
+    Parameters
+    ----------
+    cacheDir : str
+        The directory of the cache.
+    
+    Returns
+    -------
+    index : list of dicts
+        The list of entries, each a dictionary with keys 'srcFORuid',
+        'trgFORuid', 'txName', 'fname' and 'dateTime'.
+    """
+    
+    fpath = os.path.join(cacheDir, 'index.json')
+    
+    if not os.path.isfile(fpath):
+        return []
+    
+    with open(fpath, 'r') as file:
+        index = json.load(file)
+    
+    return index
+
+def store_reg_in_cache(cacheDir, srcFORuid, trgFORuid, sitkTx, txName):
+    """
+    Store the transform from a registration in a local registration cache.
+    
+    Parameters
+    ----------
+    cacheDir : str
+        The directory of the cache.
+    srcFORuid : str
+        The FrameOfReferenceUID of the Source (moving) image.
+    trgFORuid : str
+        The FrameOfReferenceUID of the Target (fixed) image.
+    sitkTx : SimpleITK Transform
+        The registration transform.
+    txName : str
+        'rigid', 'affine' or 'bspline'.
+    
+    Returns
+    -------
+    fpath : str
+        The file path of the exported transform.
+    
+    Note
+    ----
+    An existing entry for the same Frames of Reference and transform type is
+    replaced.
+    """
+    
+    if not os.path.isdir(cacheDir):
+        Path(cacheDir).mkdir(parents=True, exist_ok=True)
+    
+    fname = f'{srcFORuid}_{trgFORuid}_{txName}.tfm'
+    fpath = os.path.join(cacheDir, fname)
+    
+    sitk.WriteTransform(sitkTx, fpath)
+    
+    index = [
+        entry for entry in import_reg_cache_index(cacheDir)
+        if entry['fname'] != fname
+        ]
+    
+    index.append(
+        {
+            'srcFORuid' : srcFORuid,
+            'trgFORuid' : trgFORuid,
+            'txName' : txName,
+            'fname' : fname,
+            'dateTime' : datetime.now().strftime('%Y%m%d%H%M%S')
+            }
+        )
+    
+    tmpFpath = os.path.join(cacheDir, f'index_{os.getpid()}.tmp')
+    with open(tmpFpath, 'w') as file:
+        json.dump(index, file, indent=2)
+    os.replace(tmpFpath, os.path.join(cacheDir, 'index.json'))
+    
+    return fpath
+
+def add_reg_cache_to_graph(txGraph, cacheDir):
+    """
+    Add the transforms in a local registration cache to a TxGraph.
+    
+    Parameters
+    ----------
+    txGraph : TxGraph Object
+        The transform graph.
+    cacheDir : str
+        The directory of the cache.
+    
+    Returns
+    -------
+    numAdded : int
+        The number of transforms added.
+    """
+    
+    numAdded = 0
+    
+    for entry in import_reg_cache_index(cacheDir):
+        fpath = os.path.join(cacheDir, entry['fname'])
+        
+        if not os.path.isfile(fpath):
+            continue
+        
+        sitkTx = sitk.ReadTransform(fpath)
+        
+        if entry['txName'] != 'bspline':
+            sitkTx = sitkTx.Downcast()
+        
+        txGraph.add_tx(
+            entry['srcFORuid'], entry['trgFORuid'], sitkTx, entry['txName'],
+            origin='local', label=entry['fname'],
+            dateTime=datetime.strptime(entry['dateTime'], '%Y%m%d%H%M%S')
+            )
+        
+        numAdded += 1
+    
+    return numAdded
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 28 10:26:03 2026
+
+@author: ctorti
+"""
+
+""" Functions that encode and decode the VectorGridData of deformable DROs. """
+
+import numpy as np
+import SimpleITK as sitk
+
+
+"""
+The byte order and dtypes of VectorGridData. DROs created by DroCreator store
+64-bit floats (to preserve the precision of the BSpline coefficients),
+whereas VR = OF denotes 32-bit floats, so both are decoded (see
+get_vector_grid_dtype).
+"""
+VECTOR_GRID_DTYPES = [np.dtype('<f8'), np.dtype('<f4')]
+
+
+def encode_vector_grid_data(coeffIms, dtype='<f8'):
+    """
+    Encode the coefficient images of a BSpline transform as VectorGridData.
+    
+    Parameters
+    ----------
+    coeffIms : list of SimpleITK Images
+        The coefficient images (deformations along x, y and z), e.g. from
+        BSplineTransform.GetCoefficientImages().
+    dtype : str or Numpy dtype, optional
+        The dtype of the encoded values. The default value is '<f8' (64-bit
+        little endian floats).
+    
+    Returns
+    -------
+    vectGridData : bytes
+        The interleaved deformations, i.e.
+        [def0_x, def0_y, def0_z, def1_x, def1_y, def1_z, ...], with x varying
+        fastest across the grid.
+    
+    Note
+    ----
+    The coefficient images are interleaved by stacking Numpy views of them
+    along a trailing axis, so no intermediate lists are created.
+    """
+    
+    if len(coeffIms) != 3:
+        msg = f"There must be 3 coefficient images ({len(coeffIms)} were "\
+            + "provided)."
+        raise Exception(msg)
+    
+    vectArr = np.stack(
+        [sitk.GetArrayViewFromImage(coeffIm) for coeffIm in coeffIms],
+        axis=-1
+        )
+    
+    vectGridData = vectArr.astype(dtype, copy=False).tobytes()
+    
+    return vectGridData
+
+def get_vector_grid_dtype(vectGridData, gridDims):
+    """
+    Get the dtype of VectorGridData from its length and the grid dimensions.
+    
+    Parameters
+    ----------
+    vectGridData : bytes
+        The VectorGridData.
+    gridDims : list of ints
+        The grid dimensions (GridDimensions) along x, y and z.
+    
+    Returns
+    -------
+    dtype : Numpy dtype
+        The dtype (one of VECTOR_GRID_DTYPES).
+    """
+    
+    numVals = 3*int(np.prod([int(item) for item in gridDims]))
+    
+    for dtype in VECTOR_GRID_DTYPES:
+        if len(vectGridData) == numVals*dtype.itemsize:
+            return dtype
+    
+    msg = f"The length of VectorGridData ({len(vectGridData)} bytes) is not "\
+        + f"consistent with GridDimensions = {list(gridDims)} (i.e. "\
+        + f"{numVals} values) for any of the dtypes {VECTOR_GRID_DTYPES}."
+    raise Exception(msg)
+
+def decode_vector_grid_data(vectGridData, gridDims):
+    """
+    Decode VectorGridData to the coefficient arrays of a BSpline transform.
+    
+    Parameters
+    ----------
+    vectGridData : bytes
+        The VectorGridData.
+    gridDims : list of ints
+        The grid dimensions (GridDimensions) along x, y and z.
+    
+    Returns
+    -------
+    coeffArrs : list of Numpy arrays
+        The coefficient arrays (deformations along x, y and z) with shape
+        gridDims[::-1] (i.e. in (z, y, x) order as for
+        sitk.GetArrayFromImage).
+    
+    Note
+    ----
+    The buffer is viewed (not copied) as an array of shape
+    gridDims[::-1] + [3], so the coefficient arrays are strided views of
+    vectGridData.
+    """
+    
+    dtype = get_vector_grid_dtype(vectGridData, gridDims)
+    
+    shape = [int(item) for item in gridDims][::-1] + [3]
+    
+    vectArr = np.frombuffer(vectGridData, dtype=dtype).reshape(shape)
+    
+    coeffArrs = [vectArr[..., i] for i in range(3)]
+    
+    return coeffArrs
+
+def create_coeff_ims(coeffArrs, gridOrig, gridDir, gridSpacing):
+    """
+    Create the coefficient images of a BSpline transform from coefficient
+    arrays.
+    
+    Parameters
+    ----------
+    coeffArrs : list of Numpy arrays
+        The coefficient arrays (e.g. from decode_vector_grid_data).
+    gridOrig : list of floats
+        The origin of the grid.
+    gridDir : list of floats
+        The direction cosines of the grid.
+    gridSpacing : list of floats
+        The spacings of the grid.
+    
+    Returns
+    -------
+    coeffIms : list of SimpleITK Images
+        The coefficient images (of pixel type sitkFloat64).
+    """
+    
+    coeffIms = []
+    
+    for coeffArr in coeffArrs:
+        coeffIm = sitk.GetImageFromArray(coeffArr.astype(np.float64))
+        coeffIm.SetOrigin([float(item) for item in gridOrig])
+        coeffIm.SetDirection([float(item) for item in gridDir])
+        coeffIm.SetSpacing([float(item) for item in gridSpacing])
+        
+        coeffIms.append(coeffIm)
+    
+    return coeffIms
@@ -7,9 +7,15 @@ Created on Tue Jul  6 13:38:32 2021
 
 import os
 import time
+import threading
 from copy import deepcopy
 import numpy as np
 
+# Locks (by file path) and a lock to guard the dictionary of locks (see 
+# get_lock_for_fpath):
+LOCKS_BY_FPATH = {}
+LOCKS_BY_FPATH_LOCK = threading.Lock()
+
 def flatten_list(listOfLists):
     """
     Flatten a nested list of lists.
@@ -505,4 +511,34 @@ def get_list_of_filePaths(dirPath, fileExt=""):
             
         print(msg)
     
-    return filePaths
\ No newline at end of file
+    return filePaths
+
+def get_lock_for_fpath(fpath):
+    """
+    Get the (process-wide) lock for a file path.
+    
+    Parameters
+    ----------
+    fpath : str
+        The file path.
+    
+    Returns
+    -------
+    lock : threading.Lock
+        The lock for fpath, which will be the same lock for all calls with the
+        same (normalised) file path.
+    
+    Notes
+    -----
+    Used to guard sequences such as check if file exists -> write -> read 
+    when the same file may be downloaded by concurrent threads (e.g. when the
+    Source and Target scans are the same, see io_tools.pipeline).
+    """
+    
+    fpath = os.path.normcase(os.path.abspath(fpath))
+    
+    with LOCKS_BY_FPATH_LOCK:
+        if not fpath in LOCKS_BY_FPATH:
+            LOCKS_BY_FPATH[fpath] = threading.Lock()
+        
+        return LOCKS_BY_FPATH[fpath]
@@ -9,12 +9,19 @@ from importlib import reload
 
 import conversion_tools.inds_pts_pixarrs
 reload(conversion_tools.inds_pts_pixarrs)
+import general_tools.transforming
+reload(general_tools.transforming)
+import general_tools.slice_index
+reload(general_tools.slice_index)
 
+import numpy as np
 from shapely.geometry import Point, MultiPoint
 #from image_tools.imports import import_im
 #from io_tools.imports import import_im
-from conversion_tools.inds_pts_pixarrs import pixarr_to_ptsByCnt
-from conversion_tools.inds_pts_pixarrs import pixarrBySeg_to_ptsByCntByRoi
+#from conversion_tools.inds_pts_pixarrs import pixarr_to_ptsByCnt
+#from conversion_tools.inds_pts_pixarrs import pixarrBySeg_to_ptsByCntByRoi
+from general_tools.transforming import get_im_geometry, transform_pts
+from general_tools.slice_index import get_slice_index
 
 
 def is_pt_in_poly(point, vertices):
@@ -142,6 +149,134 @@ def get_slice_verts(image, slcNum):
     
     return pts
 
+def are_inds_in_extent(inds, image, tol=1e-6):
+    """
+    Determine which continuous indices lie within the extent of a 3D image.
+    
+    Parameters
+    ----------
+    inds : Numpy array
+        The continuous indices (in the index space of image) with shape 
+        (N, 3).
+    image : SimpleITK Image
+        The image whose extent is to be checked.
+    tol : float, optional
+        The tolerance (in voxels) of the bounds. The default value is 1e-6.
+    
+    Returns
+    -------
+    isInside : Numpy array of bools
+        Array of length N that is True for each index that lies within the 
+        extent of image.
+    
+    Note
+    ----
+    The extent of image spans from the outer edges of the voxels at index 0
+    to those at index size - 1, i.e. continuous indices in 
+    [-0.5, size - 0.5] along each dimension.
+    """
+    
+    upper = np.array(image.GetSize()) - 0.5 + tol
+    
+    isInside = np.all((inds >= -0.5 - tol) & (inds <= upper), axis=1)
+    
+    return isInside
+
+def are_pts_in_extent(points, image, tol=1e-6):
+    """
+    Determine which physical points lie within the (oriented) extent of a 3D
+    image.
+    
+    Parameters
+    ----------
+    points : Numpy array or list of a list of floats
+        The physical points with shape (N, 3), e.g. 
+        [[x0, y0, z0], [x1, y1, z1], ...].
+    image : SimpleITK Image
+        The image whose extent is to be checked.
+    tol : float, optional
+        The tolerance (in voxels) of the bounds. The default value is 1e-6.
+    
+    Returns
+    -------
+    isInside : Numpy array of bools
+        Array of length N that is True for each point that lies within the 
+        extent of image.
+    
+    Note
+    ----
+    The extent of image is an oriented bounding box. All points are 
+    transformed into the index space of image in a single array operation, in
+    which the box is axis-aligned so the six half-spaces that bound it are 
+    simple bounds on the indices (see are_inds_in_extent).
+    """
+    
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    
+    ind2pt, pt2ind = get_im_geometry(image)
+    
+    return are_inds_in_extent(transform_pts(points, pt2ind), image, tol)
+
+def are_voxels_in_extent(pixarr, f2sInds, srcIm, trgIm, thresh=0.5, tol=1e-6):
+    """
+    Determine which (non-zero) voxels of a 3D pixel array lie within the 
+    extent of a 3D image.
+    
+    Parameters
+    ----------
+    pixarr : Numpy array with dimensions Z x Y x X where Z may be 1
+        The pixel array that may represent a mask or labelmap.
+    f2sInds : list of ints
+        A list (for each frame) of the slice numbers that correspond to each 
+        frame in pixarr.
+    srcIm : SimpleITK Image
+        The image that relates to pixarr.
+    trgIm : SimpleITK Image
+        The image whose extent is to be checked.
+    thresh : float, optional
+        Voxels with values above thresh are considered. The default value is 
+        0.5.
+    tol : float, optional
+        The tolerance (in voxels) of the bounds. The default value is 1e-6.
+    
+    Returns
+    -------
+    isInside : Numpy array of bools
+        Array (for each voxel in pixarr above thresh) that is True for each
+        voxel whose centre lies within the extent of trgIm.
+    
+    Note
+    ----
+    The indices of the voxels (without conversion to points) are transformed
+    to the index space of trgIm in a single array operation.
+    """
+    
+    if not len(f2sInds):
+        return np.zeros(0, dtype=bool)
+    
+    frameInds, rowInds, colInds = np.nonzero(pixarr > thresh)
+    
+    # The continuous indices (x, y, z) in the index space of srcIm:
+    srcInds = np.column_stack(
+        (colInds, rowInds, np.asarray(f2sInds)[frameInds])
+        ).astype(np.float64)
+    
+    srcInd2pt, srcPt2ind = get_im_geometry(srcIm)
+    trgInd2pt, trgPt2ind = get_im_geometry(trgIm)
+    
+    return are_inds_in_extent(
+        transform_pts(srcInds, trgPt2ind @ srcInd2pt), trgIm, tol
+        )
+
+def get_frac_prop(isInside):
+    """
+    Get the fractional proportion of True values in an array of bools (or 0.0
+    if the array is empty).
+    """
+    
+    return float(np.count_nonzero(isInside)/len(isInside)) if len(isInside)\
+        else 0.0
+
 def prop_of_cnt_in_extent(points, trgIm, p2c=False):
     """
     Determine what proportion of points that make up a contour intersect the
@@ -167,50 +302,78 @@ def prop_of_cnt_in_extent(points, trgIm, p2c=False):
         that intersect the extent of trgIm.
     """
     
-    verts = get_im_verts(trgIm)
-    
-    isInside = []
+    isInside = are_pts_in_extent(points, trgIm)
     
-    for pt in points:
-        isInside.append(is_pt_in_poly(pt, verts))
-    
-    fracProp = sum(isInside)/len(isInside)
+    fracProp = get_frac_prop(isInside)
     
     if p2c:
+        verts = get_im_verts(trgIm)
+        
         print('\n\n\nFunction prop_of_cnt_in_extent():')
         print(f'   Contour has {len(points)} points')
         
         print('\n   The vertices of the image grid:')
         for i in range(len(verts)):
             print(f'   {verts[i]}')
-        N = len(isInside)
+        
         limit = 10
-        if N > limit:
-            print(f'\n   The first {limit} points:')
-            for i in range(limit):
-                print(f'   {points[i]}')
-        else:
-            print(f'\n   The first {N} points:')
-            for i in range(N):
-                print(f'   {points[i]}')
+        print(f'\n   The first {min(limit, len(points))} points:')
+        for pt in points[:limit]:
+            print(f'   {pt}')
         
         if fracProp < 1:
-            print('\n   The vertices of the image grid:')
-            for i in range(len(verts)):
-                print(f'   {verts[i]}')
-            N = len(isInside)
             limit = 3
-            if N > limit:
-                print(f'\n   The first {limit} points that lie outside of extent:')
-                for i in range(limit):
-                    print(f'   {points[i]}')
-            else:
-                print(f'\n   The first {N} points that lie outside of extent:')
-                for i in range(N):
-                    print(f'   {points[i]}')
+            outsideInds = np.nonzero(~isInside)[0][:limit]
+            print(f'\n   The first {len(outsideInds)} points that lie outside',
+                  'of extent:')
+            for i in outsideInds:
+                print(f'   {points[i]}')
                     
     return fracProp
 
+def props_of_rois_in_extent(ptsByCntByRoi, trgIm):
+    """
+    Determine what proportion of the points of each ROI in a list of points by
+    contour by ROI intersect with the volume of a 3D image.
+    
+    Parameters
+    ----------
+    ptsByCntByRoi : list of list of a list of a list of floats
+        List (for each ROI) of a list (for all contours) of a list (for each
+        point) of a list (for each dimension) of coordinates.
+    trgIm : SimpleITK Image
+        The image whose grid/extent is to be checked for intersection with the
+        points of interest.
+    
+    Returns
+    -------
+    fracPropByRoi : list of floats
+        List (for each ROI) of the fractional proportion (normalised to 1) of
+        the points that intersect the extent of trgIm.
+    numOfPtsByRoi : list of ints
+        List (for each ROI) of the number of points.
+    """
+    
+    numOfPtsByRoi = [
+        sum(len(pts) for pts in ptsByCnt) if ptsByCnt else 0
+        for ptsByCnt in ptsByCntByRoi
+        ]
+    
+    pts = [pt for ptsByCnt in ptsByCntByRoi if ptsByCnt 
+           for pts in ptsByCnt for pt in pts]
+    
+    # Test the points of all ROIs at once:
+    isInside = are_pts_in_extent(pts, trgIm) if pts else np.zeros(0, bool)
+    
+    starts = np.cumsum([0] + numOfPtsByRoi)
+    
+    fracPropByRoi = [
+        get_frac_prop(isInside[starts[r]:starts[r + 1]]) 
+        for r in range(len(numOfPtsByRoi))
+        ]
+    
+    return fracPropByRoi, numOfPtsByRoi
+
 def prop_of_rois_in_extent(ptsByCntByRoi, trgIm, p2c=False):
     """
     Determine what proportion of the points in a list of points by contour by
@@ -236,19 +399,21 @@ def prop_of_rois_in_extent(ptsByCntByRoi, trgIm, p2c=False):
         intersect the extent of trgIm.
     """
     
-    verts = get_im_verts(trgIm)
+    fracPropByRoi, numOfPtsByRoi = props_of_rois_in_extent(
+        ptsByCntByRoi, trgIm
+        )
     
-    isInside = []
+    numOfPts = sum(numOfPtsByRoi)
     
-    # Iterate through ROIs:
-    for r in range(len(ptsByCntByRoi)):
-        # Iterate through contours:
-        for c in range(len(ptsByCntByRoi[r])):
-            # Iterate through points:
-            for p in range(len(ptsByCntByRoi[r][c])):
-                isInside.append(is_pt_in_poly(ptsByCntByRoi[r][c][p], verts))
+    fracProp = sum(
+        [fracPropByRoi[r]*numOfPtsByRoi[r] for r in range(len(fracPropByRoi))]
+        )/numOfPts if numOfPts else 0.0
     
-    fracProp = sum(isInside)/len(isInside)
+    if p2c:
+        print('\n\n\nFunction prop_of_rois_in_extent():')
+        for r in range(len(fracPropByRoi)):
+            print(f'   ROI {r} has {numOfPtsByRoi[r]} points of which',
+                  f'{100*fracPropByRoi[r]:.2f}% intersect the extent')
                     
     return fracProp
 
@@ -280,74 +445,77 @@ def prop_of_pixarr_in_extent(pixarr, f2sInds, srcIm, trgIm, p2c=False):
     fracProp : float
         The fractional proportion (normalised to 1) of voxels in pixarr that 
         intersect the extent of RefImage.
-    """
-    
-    #from conversion_tools.inds_pts_pixarrs import pixarr_to_ptsByCnt
-    #from image_tools.imports import import_im
-    
-    F, R, C = pixarr.shape
-    
-    # Convert the pixel array to a list (for each frame in pixarr) of a list 
-    # (for each point) of a list (for each dimension) of physical coordinates:
-    ptsByObjByFrame, cntdataByObjByFrame\
-        = pixarr_to_ptsByCnt(pixarr, f2sInds, srcIm)
-    
-    verts = get_im_verts(trgIm)
     
-    isInside = []
+    Note
+    ----
+    The centres of the voxels above 0.5 are tested directly (see
+    are_voxels_in_extent) rather than points along the contours of each
+    object.
+    """
     
-    for f in range(len(ptsByObjByFrame)):
-        for o in range(len(ptsByObjByFrame[f])):
-            for pt in ptsByObjByFrame[f][o]:
-                isInside.append(is_pt_in_poly(pt, verts))
+    isInside = are_voxels_in_extent(pixarr, f2sInds, srcIm, trgIm)
     
-    fracProp = sum(isInside)/len(isInside)
+    fracProp = get_frac_prop(isInside)
     
     if p2c:
-        print('\n\n\nFunction ProportionOfPixArrInExtent():')
+        F, R, C = pixarr.shape
+        
+        print('\n\n\nFunction prop_of_pixarr_in_extent():')
         print(f'   pixarr has {F}x{R}x{C} (FxRxC)')
         print(f'   f2sInds = {f2sInds}')
-        print(f'   len(ptsByObjByFrame) = {len(ptsByObjByFrame)}')
-        print(f'   len(cntdataByObjByFrame) = {len(cntdataByObjByFrame)}')
-        for f in range(len(ptsByObjByFrame)):
-            print(f'   Frame {f} has {len(ptsByObjByFrame[f])} objects')
-            for o in range(len(ptsByObjByFrame[f])):
-                print(f'      Object {o} has {len(ptsByObjByFrame[f][o])} points')
-                ##print(f'   len(CntDataByFrame[{i}]) = {len(CntDataByFrame[i])}')
-        #print(f'   \nPtsByFrame = {PtsByFrame}')
-        #print(f'   \nCntDataByFrame = {CntDataByFrame}')
+        print(f'   {len(isInside)} voxels of which',
+              f'{np.count_nonzero(isInside)} intersect the extent')
         
-        if False:
-            print('\n   The vertices of the image grid:')
-            for i in range(len(verts)):
-                print(f'   {verts[i]}')
-            
-            print('\n   The points from the input indices:')
-            for i in range(len(ptsByObjByFrame[f][o])):
-                print(f'   {ptsByObjByFrame[f][o][i]}')
-                
-            print(f'\n   len(isInside) = {len(isInside)}')
-            print(f'   sum(isInside) = {sum(isInside)}')
-            
         if fracProp < 1:
+            verts = get_im_verts(trgIm)
             print('\n   The vertices of the image grid:')
             for i in range(len(verts)):
                 print(f'   {verts[i]}')
-            N = len(isInside)
-            limit = 10
-            if N > limit:
-                print(f'\n   The first {limit} points that lie outside of extent:')
-                #print([f'\n   {ptsByObjByFrame[0][0][i]}' for i in range(5)])
-                for i in range(limit):
-                    print(f'   {ptsByObjByFrame[0][0][i]}')
-            else:
-                print(f'\n   The first {N} points that lie outside of extent:')
-                #print([f'\n   {ptsByObjByFrame[0][0][i]}' for i in range(N)])
-                for i in range(N):
-                    print(f'   {ptsByObjByFrame[0][0][i]}')
     
     return fracProp
 
+def props_of_segs_in_extent(pixarrBySeg, f2sIndsBySeg, srcIm, trgIm):
+    """
+    Determine what proportion of the voxels of each segment in a list of 3D
+    pixel arrays intersect with the volume of a 3D image.
+    
+    Parameters
+    ----------
+    pixarrBySeg : list of Numpy arrays
+        A list (for each segment) of a FxRxC (frames x rows x cols) Numpy array 
+        containing F RxC masks in each pixel array.
+    f2sIndsBySeg : list of list of ints
+        A list (for each segment) of a list (for each frame) of the slice 
+        numbers that correspond to each frame in each pixel array in 
+        pixarrBySeg.   
+    srcIm : SimpleITK Image
+        The image that relates to pixarrBySeg.
+    trgIm : SimpleITK Image
+        The image whose grid/extent is to be checked for intersection with the
+        voxels of interest.
+    
+    Returns
+    -------
+    fracPropBySeg : list of floats
+        List (for each segment) of the fractional proportion (normalised to 1)
+        of voxels that intersect the extent of trgIm.
+    numOfVoxelsBySeg : list of ints
+        List (for each segment) of the number of voxels.
+    """
+    
+    fracPropBySeg = []
+    numOfVoxelsBySeg = []
+    
+    for s in range(len(pixarrBySeg)):
+        isInside = are_voxels_in_extent(
+            pixarrBySeg[s], f2sIndsBySeg[s], srcIm, trgIm
+            )
+        
+        fracPropBySeg.append(get_frac_prop(isInside))
+        numOfVoxelsBySeg.append(len(isInside))
+    
+    return fracPropBySeg, numOfVoxelsBySeg
+
 def prop_of_segs_in_extent(
         pixarrBySeg, f2sIndsBySeg, srcIm, trgIm, p2c=False
         ):
@@ -381,23 +549,29 @@ def prop_of_segs_in_extent(
         intersect the extent of trgIm.
     """
     
-    #from conversion_tools.inds_pts_pixarrs import pixarrByRoi_to_ptsByCntByRoi
+    fracPropBySeg, numOfVoxelsBySeg = props_of_segs_in_extent(
+        pixarrBySeg, f2sIndsBySeg, srcIm, trgIm
+        )
     
-    # Convert the list of pixel arrays-by-segment to a list of 
-    # points-by-contour-by-ROI:
-    ptsByCntByRoi, cntdataByCntByRoi, c2sIndsByRoi\
-        = pixarrBySeg_to_ptsByCntByRoi(
-            pixarrBySeg, f2sIndsBySeg, srcIm, thresh=0.5
-            )
+    numOfVoxels = sum(numOfVoxelsBySeg)
     
-    fracProp = prop_of_rois_in_extent(ptsByCntByRoi, trgIm, p2c)
+    fracProp = sum(
+        [fracPropBySeg[s]*numOfVoxelsBySeg[s] 
+         for s in range(len(fracPropBySeg))]
+        )/numOfVoxels if numOfVoxels else 0.0
+    
+    if p2c:
+        print('\n\n\nFunction prop_of_segs_in_extent():')
+        for s in range(len(fracPropBySeg)):
+            print(f'   Segment {s} has {numOfVoxelsBySeg[s]} voxels of which',
+                  f'{100*fracPropBySeg[s]:.2f}% intersect the extent')
     
     return fracProp
 
 def get_ind_of_nearest_slice(refIm, refInd, im, useCentre=True):
     """ 
-    Get the index of the slice in im that is nearest in z-position to the
-    refInd^th slice in refIm.
+    Get the index of the slice in im that is nearest in position (along the
+    slice normal of im) to the refInd^th slice in refIm.
     
     Parameters
     ----------
@@ -408,44 +582,26 @@ def get_ind_of_nearest_slice(refIm, refInd, im, useCentre=True):
         The image whose slice index nearest to refIm[refInd] is to be 
         determined.
     useCentre : bool, optional
-        If True, the z-position of the central pixel in each slice will be 
+        If True, the position of the central pixel in each slice will be 
         considered. If False, the origin (0, 0) of each slice will. The 
         default value is True.
     
     Returns
     -------
     ind : int
-        The slice index in im whose z-position is nearest to refIm[refInd].
+        The slice index in im whose position is nearest to refIm[refInd].
     minDiff : float
-        The difference in z-position between refIm[refInd] and im[ind] in mm.
-    """
+        The difference in position between refIm[refInd] and im[ind] in mm.
     
-    R_r, C_r, S_r = refIm.GetSize()
-    R_i, C_i, S_i = im.GetSize()
-        
-    if useCentre:
-        i_r = R_r//2
-        j_r = C_r//2
-        
-        i_i = R_i//2
-        j_i = C_i//2
-    else:
-        i_r = 0
-        j_r = 0
-        
-        i_i = 0
-        j_i = 0
-    
-    # The z-position of refIm at refInd:
-    refZ = refIm.TransformIndexToPhysicalPoint([i_r,j_r,refInd])[2]
-    
-    # All z-positions in im:
-    Zs = [im.TransformIndexToPhysicalPoint([i_i,j_i,k])[2] for k in range(S_i)]
-    
-    diffs = [abs(refZ - Zs[k]) for k in range(S_i)]
-    
-    minDiff = min(diffs)
+    Note
+    ----
+    The slice positions of both images are obtained from their SliceIndex
+    (see general_tools.slice_index), which is created once per image, and 
+    the nearest slice is found by binary search.
+    """
     
-    ind = diffs.index(minDiff)
+    inds, diffs = get_slice_index(im).map_slices(
+        get_slice_index(refIm), [refInd], useCentre
+        )
     
-    return ind, minDiff
+    return int(inds[0]), float(diffs[0])
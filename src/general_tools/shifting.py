@@ -11,6 +11,7 @@ from general_tools.general import get_unique_items
 #from io_tools.imports import import_im
 from conversion_tools.inds_pts_cntdata import pts_to_inds, inds_to_pts
 from general_tools.console_printing import print_indsByRoi, print_ptsByCntByRoi
+from general_tools.slice_index import get_slice_index
 
 def replace_ind_in_C2SindsByRoi(c2sIndsByRoi, indToReplace, replacementInd):
     
@@ -46,8 +47,8 @@ def get_phys_shift_bt_slices(image0, sliceNum0, image1, sliceNum1):
         Shift in mm between image0[0,0,sliceNum0] and image1[0,0,sliceNum1].
     """
     
-    mmShift = np.array(image1.TransformIndexToPhysicalPoint([0,0,sliceNum1])) \
-            - np.array(image0.TransformIndexToPhysicalPoint([0,0,sliceNum0]))
+    mmShift = get_slice_index(image1).sliceOrigins[sliceNum1]\
+        - get_slice_index(image0).sliceOrigins[sliceNum0]
             
     return mmShift
 
@@ -401,29 +402,26 @@ def get_srcF2SindsByRoi_to_trgF2SindsByRoi(
         List (for each segment/ROI) of a list (for each segmentation/contour) 
         of slice numbers that correspond to each Source segmentation/contour in 
         the Target image domain.
-    """
-    
-    srcOrigin = srcIm.GetOrigin()
-    trgOrigin = trgIm.GetOrigin()
-    
-    #dim = len(srcOrigin)
-    #mmDiff = [trgOrigin[i] - srcOrigin[i] for i in range(dim)]
-    
-    dz_mm = trgOrigin[2] - srcOrigin[2]
     
-    dk = trgIm.GetSpacing()[2]
+    Note
+    ----
+    The positions of the source slices along the target slice normal are 
+    obtained from the SliceIndex of each image in a single array operation 
+    and converted to (rounded) target slice indices, which may lie outside of
+    the range of target slices.
+    """
     
-    dz_pix = round(dz_mm/dk)
+    # The continuous indices (in the target image) of all source slices:
+    contInds = get_slice_index(trgIm).get_cont_inds(
+        get_slice_index(srcIm).sliceOrigins
+        )
     
     trgF2SindsByRoi = []
     
     for r in range(len(srcF2SindsByRoi)):
-        trgF2Sinds = []
-        
-        for c in range(len(srcF2SindsByRoi[r])):
-            #trgF2Sinds.append(srcF2SindsByRoi[r][c] + dz_pix)
-            trgF2Sinds.append(srcF2SindsByRoi[r][c] - dz_pix)
-            
-        trgF2SindsByRoi.append(trgF2Sinds)
+        trgF2SindsByRoi.append(
+            [int(ind) for ind in np.round(contInds[srcF2SindsByRoi[r]])]
+            if len(srcF2SindsByRoi[r]) else []
+            )
     
     return trgF2SindsByRoi
\ No newline at end of file
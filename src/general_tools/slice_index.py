@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Nov  5 09:47:13 2026
+
+@author: ctorti
+"""
+
+""" Precomputed slice geometry of 3D images for slice queries. """
+
+import numpy as np
+
+
+class SliceIndex:
+    """
+    This class stores the slice geometry of a 3D SimpleITK Image (the slice
+    normal and the position of every slice along it) so that nearest-slice
+    and slice-mapping queries don't require a transformation of every slice.
+    
+    Parameters
+    ----------
+    image : SimpleITK Image
+        The 3D image.
+    
+    Returns
+    -------
+    self.normal : Numpy array
+        The unit vector normal to the slices (i.e. the direction along z).
+    self.sliceOrigins : Numpy array
+        The physical points of the origins (i.e. index (0, 0)) of every slice,
+        with shape (S, 3).
+    self.sliceCentres : Numpy array
+        The physical points of the central pixels of every slice (as used by
+        get_ind_of_nearest_slice with useCentre = True), with shape (S, 3).
+    self.positions : Numpy array
+        The position of every slice along self.normal (in mm), with shape
+        (S,).
+    self.sortedPositions : Numpy array
+        self.positions sorted in ascending order.
+    self.sortedInds : Numpy array
+        The slice indices of self.sortedPositions.
+    self.sliceSpacing : float
+        The spacing between slices along self.normal.
+    
+    Note
+    ----
+    Queries are batched (i.e. take arrays of points or slice indices) and
+    use binary search of self.sortedPositions.
+    """
+    
+    def __init__(self, image):
+        size = image.GetSize()
+        spacings = np.array(image.GetSpacing())
+        dirs = np.array(image.GetDirection()).reshape(3, 3)
+        origin = np.array(image.GetOrigin())
+        
+        self.geometry = get_im_geometry_key(image)
+        self.normal = dirs[:, 2]
+        self.sliceSpacing = spacings[2]
+        
+        # The vectors (in mm) from the origin of the first slice along x and
+        # y (columns and rows) and z (slices):
+        axes = dirs*spacings
+        
+        inds = np.arange(size[2])
+        
+        self.sliceOrigins = origin + np.outer(inds, axes[:, 2])
+        
+        self.sliceCentres = self.sliceOrigins\
+            + (size[0]//2)*axes[:, 0] + (size[1]//2)*axes[:, 1]
+        
+        self.positions = self.sliceOrigins @ self.normal
+        
+        self.sortedInds = np.argsort(self.positions, kind='stable')
+        self.sortedPositions = self.positions[self.sortedInds]
+    
+    def get_slice_pts(self, inds, useCentre=True):
+        """
+        Get the physical points of the centres (or origins) of slices.
+        
+        Parameters
+        ----------
+        inds : int or list of ints
+            The slice indices.
+        useCentre : bool, optional
+            If True the central pixel of each slice will be used, if False the
+            origin (0, 0) of each slice. The default value is True.
+        
+        Returns
+        -------
+        pts : Numpy array
+            The points with shape (N, 3) (or (3,) if inds is an int).
+        """
+        
+        pts = self.sliceCentres if useCentre else self.sliceOrigins
+        
+        return pts[inds]
+    
+    def get_nearest_inds(self, points):
+        """
+        Get the indices of the slices nearest to physical points (along the
+        slice normal).
+        
+        Parameters
+        ----------
+        points : Numpy array or list of a list of floats
+            The points with shape (N, 3).
+        
+        Returns
+        -------
+        inds : Numpy array of ints
+            The index of the nearest slice to each point.
+        diffs : Numpy array of floats
+            The distance (in mm) along the slice normal between each point and
+            its nearest slice.
+        
+        Note
+        ----
+        If a point is equidistant to two slices the lower index is returned,
+        as for a linear scan of the slices.
+        """
+        
+        positions = np.asarray(points, dtype=np.float64).reshape(-1, 3)\
+            @ self.normal
+        
+        sortedPositions = self.sortedPositions
+        numOfSlices = len(sortedPositions)
+        
+        # The neighbouring slices (in sorted order) either side of each point:
+        right = np.clip(
+            np.searchsorted(sortedPositions, positions), 1, numOfSlices - 1
+            ) if numOfSlices > 1 else np.zeros(len(positions), dtype=int)
+        left = np.maximum(right - 1, 0)
+        
+        leftDiffs = np.abs(positions - sortedPositions[left])
+        rightDiffs = np.abs(positions - sortedPositions[right])
+        
+        leftInds = self.sortedInds[left]
+        rightInds = self.sortedInds[right]
+        
+        useRight = (rightDiffs < leftDiffs)\
+            | ((rightDiffs == leftDiffs) & (rightInds < leftInds))
+        
+        inds = np.where(useRight, rightInds, leftInds)
+        diffs = np.where(useRight, rightDiffs, leftDiffs)
+        
+        return inds, diffs
+    
+    def map_slices(self, refIndex, refInds, useCentre=True):
+        """
+        Map slices of another image to the nearest slices of this image.
+        
+        Parameters
+        ----------
+        refIndex : SliceIndex
+            The SliceIndex of the other image.
+        refInds : list of ints
+            The slice indices in the other image.
+        useCentre : bool, optional
+            If True the central pixel of each slice in the other image will be
+            used, if False the origin (0, 0) of each slice. The default value
+            is True.
+        
+        Returns
+        -------
+        inds : Numpy array of ints
+            The index of the nearest slice in this image for each slice in
+            refInds.
+        diffs : Numpy array of floats
+            The distance (in mm) along the slice normal between each slice in
+            refInds and its nearest slice in this image.
+        """
+        
+        return self.get_nearest_inds(
+            refIndex.get_slice_pts(np.asarray(refInds, dtype=int), useCentre)
+            )
+    
+    def get_cont_inds(self, points):
+        """
+        Get the continuous slice indices of physical points (i.e. without
+        rounding to, or limiting to the range of, the slices).
+        
+        Parameters
+        ----------
+        points : Numpy array or list of a list of floats
+            The points with shape (N, 3).
+        
+        Returns
+        -------
+        contInds : Numpy array of floats
+            The continuous slice index of each point.
+        """
+        
+        positions = np.asarray(points, dtype=np.float64).reshape(-1, 3)\
+            @ self.normal
+        
+        return (positions - self.positions[0])/self.sliceSpacing
+
+
+def get_im_geometry_key(image):
+    """
+    Get the size, spacings, origin and direction of a SimpleITK Image as a
+    tuple (to determine whether its geometry has changed).
+    """
+    
+    return (image.GetSize(), image.GetSpacing(), image.GetOrigin(), 
+            image.GetDirection())
+
+def get_slice_index(image):
+    """
+    Get the SliceIndex of a 3D SimpleITK Image.
+    
+    Parameters
+    ----------
+    image : SimpleITK Image
+        The 3D image.
+    
+    Returns
+    -------
+    sliceIndex : SliceIndex
+    
+    Note
+    ----
+    The SliceIndex is created once and attached to image (as
+    image.sliceIndex), so that subsequent calls (e.g. from shifting, geometry
+    and the determination of the use case) share it. Copies of image (e.g.
+    resampled images) don't carry it, and it is re-created if the geometry of
+    image has changed (e.g. by image.SetOrigin()).
+    """
+    
+    sliceIndex = getattr(image, 'sliceIndex', None)
+    
+    if sliceIndex is None\
+            or sliceIndex.geometry != get_im_geometry_key(image):
+        sliceIndex = SliceIndex(image)
+        
+        image.sliceIndex = sliceIndex
+    
+    return sliceIndex
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Nov  2 10:14:36 2026
+
+@author: ctorti
+"""
+
+""" Functions that transform points-by-contour-by-ROI by linear transforms. """
+
+import numpy as np
+import SimpleITK as sitk
+from image_tools.displacement import get_sub_txs
+
+
+"""
+The names of SimpleITK Transforms that are linear (i.e. that can be
+represented by a 4x4 homogeneous matrix). The identity transform (e.g. 
+sitk.Transform(3, sitk.sitkIdentity)) is named 'Transform' so it is 
+identified by its transform enum (see is_linear_tx).
+"""
+LINEAR_TX_NAMES = [
+    'TranslationTransform', 'ScaleTransform',
+    'VersorTransform', 'VersorRigid3DTransform', 'Euler3DTransform',
+    'Similarity3DTransform', 'ScaleVersor3DTransform',
+    'ScaleSkewVersor3DTransform', 'ComposeScaleSkewVersor3DTransform',
+    'AffineTransform'
+    ]
+
+
+def is_linear_tx(sitkTx):
+    """
+    Determine whether a SimpleITK Transform is linear.
+    
+    Parameters
+    ----------
+    sitkTx : SimpleITK Transform
+        The transform.
+    
+    Returns
+    -------
+    isLinear : bool
+        True if sitkTx (or every transform in it if it is a 
+        CompositeTransform) is linear.
+    """
+    
+    isLinear = all(
+        subTx.GetName() in LINEAR_TX_NAMES\
+            or subTx.GetTransformEnum() == sitk.sitkIdentity
+        for subTx in get_sub_txs(sitkTx)
+        )
+    
+    return isLinear
+
+def get_affine_matrix(sitkTx):
+    """
+    Get the 4x4 homogeneous matrix of a linear SimpleITK Transform.
+    
+    Parameters
+    ----------
+    sitkTx : SimpleITK Transform
+        The transform (e.g. an Euler3DTransform, AffineTransform, or a
+        CompositeTransform of linear transforms).
+    
+    Returns
+    -------
+    affMatrix : Numpy array or None
+        The matrix of shape (4, 4) that maps homogeneous points as sitkTx
+        does, or None if sitkTx is (or contains) a non-linear transform (e.g.
+        a BSplineTransform or DisplacementFieldTransform).
+    
+    Note
+    ----
+    The matrix is obtained by transforming the origin and the unit vectors,
+    which is exact for any linear transform (including composites, whatever
+    their centres of rotation), so the parameterisation of each transform
+    type need not be known.
+    """
+    
+    if not is_linear_tx(sitkTx):
+        return None
+    
+    origin = np.array(sitkTx.TransformPoint((0.0, 0.0, 0.0)))
+    
+    affMatrix = np.eye(4)
+    affMatrix[:3, 3] = origin
+    
+    for i in range(3):
+        unitVect = [0.0, 0.0, 0.0]
+        unitVect[i] = 1.0
+        
+        affMatrix[:3, i] = np.array(sitkTx.TransformPoint(unitVect)) - origin
+    
+    return affMatrix
+
+def transform_pts(pts, affMatrix):
+    """
+    Transform an array of points by a 4x4 homogeneous matrix.
+    
+    Parameters
+    ----------
+    pts : Numpy array
+        The points with shape (N, 3).
+    affMatrix : Numpy array
+        The matrix with shape (4, 4) (e.g. from get_affine_matrix).
+    
+    Returns
+    -------
+    txPts : Numpy array
+        The transformed points with shape (N, 3).
+    """
+    
+    return pts @ affMatrix[:3, :3].T + affMatrix[:3, 3]
+
+def get_im_geometry(image):
+    """
+    Get the matrices that convert between continuous indices and physical
+    points of a SimpleITK Image.
+    
+    Parameters
+    ----------
+    image : SimpleITK Image
+    
+    Returns
+    -------
+    ind2pt : Numpy array
+        The matrix with shape (4, 4) that maps homogeneous continuous indices
+        to physical points.
+    pt2ind : Numpy array
+        The inverse of ind2pt.
+    """
+    
+    dirs = np.array(image.GetDirection()).reshape(3, 3)
+    
+    ind2pt = np.eye(4)
+    ind2pt[:3, :3] = dirs * np.array(image.GetSpacing())
+    ind2pt[:3, 3] = image.GetOrigin()
+    
+    return ind2pt, np.linalg.inv(ind2pt)
+
+def transform_ptsByCntByRoi(
+        ptsByCntByRoi, c2sIndsByRoi, sitkTx, srcIm, trgIm, tol=0.1, p2c=False
+        ):
+    """
+    Propagate points-by-contour-by-ROI to the target domain by transforming
+    the points directly, and assign the transformed contours to the target
+    slices whose planes intersect them.
+    
+    Parameters
+    ----------
+    ptsByCntByRoi : list of list of a list of a list of floats
+        List (for each ROI) of a list (for each contour) of a list (for each
+        point) of a list (for each dimension) of coordinates in the source
+        domain.
+    c2sIndsByRoi : list of a list of ints
+        List (for each ROI) of a list (for each contour) of indices that denote
+        the (source) slice number that the contour relates to.
+    sitkTx : SimpleITK Transform
+        The transform used to resample the source image to the target domain
+        (i.e. that maps target points to source points), e.g. the identity
+        transform or a rigid/affine registration transform.
+    srcIm : SimpleITK Image
+        The source image.
+    trgIm : SimpleITK Image
+        The target image.
+    tol : float, optional
+        The maximum spread of each transformed contour along the target
+        slice normal (as a fraction of the target slice spacing) for it to be
+        considered coplanar with the target slices. The default value is 0.1.
+    p2c : bool, optional
+        Denotes whether intermediate results will be logged to the console.
+        The default value is False.
+    
+    Returns
+    -------
+    newPtsByCntByRoi : list of list of a list of a list of floats or None
+        The propagated ptsByCntByRoi, or None if sitkTx isn't linear or any
+        transformed contour isn't coplanar with the target slices (to within
+        tol).
+    newC2SindsByRoi : list of a list of ints or None
+        The (target) slice number of each contour in newPtsByCntByRoi, or None
+        as above.
+    maxSpread : float or None
+        The maximum spread of the transformed contours along the target slice
+        normal (as a fraction of the target slice spacing), or None if
+        sitkTx isn't linear.
+    
+    Notes
+    -----
+    The points of all contours are transformed by the inverse of sitkTx in
+    a single array operation.
+    
+    Each source contour represents the slab of its slice (i.e. of thickness
+    equal to the source slice spacing). The transformed contour is copied
+    (projected) onto every target slice whose plane intersects the
+    transformed slab, so that a contour may propagate to zero, one or
+    multiple target slices, as for nearest neighbour resampling of the label
+    images along the slice normal. In-plane the points are exact, so the
+    contours aren't degraded by rasterisation and conversion back to
+    contours.
+    """
+    
+    affMatrix = get_affine_matrix(sitkTx)
+    
+    if affMatrix is None:
+        return None, None, None
+    
+    # Source-to-target matrix in target (continuous) index space:
+    trgInd2pt, trgPt2ind = get_im_geometry(trgIm)
+    
+    src2trgInds = trgPt2ind @ np.linalg.inv(affMatrix)
+    
+    cntLens = [len(pts) for ptsByCnt in ptsByCntByRoi if ptsByCnt
+               for pts in ptsByCnt]
+    
+    if not cntLens:
+        return ptsByCntByRoi, c2sIndsByRoi, 0.0
+    
+    pts = np.array(
+        [pt for ptsByCnt in ptsByCntByRoi if ptsByCnt
+         for pts in ptsByCnt for pt in pts], dtype=np.float64
+        )
+    
+    inds = transform_pts(pts, src2trgInds)
+    
+    # The first point of each contour:
+    starts = np.cumsum([0] + cntLens[:-1])
+    
+    zInds = inds[:, 2]
+    
+    spreads = np.maximum.reduceat(zInds, starts)\
+        - np.minimum.reduceat(zInds, starts)
+    
+    maxSpread = float(spreads.max())
+    
+    if p2c:
+        print(f'\nMaximum spread of transformed contours = {maxSpread:.2e} '
+              + 'slices')
+    
+    if maxSpread > tol:
+        return None, None, maxSpread
+    
+    centres = np.add.reduceat(zInds, starts)/np.array(cntLens)
+    
+    # Half the thickness of the transformed source slab in target slices:
+    srcSlabVect = np.array(srcIm.GetDirection()).reshape(3, 3)[:, 2]\
+        *srcIm.GetSpacing()[2]
+    halfThick = abs((src2trgInds[:3, :3] @ srcSlabVect)[2])/2
+    
+    numSlices = trgIm.GetSize()[2]
+    
+    newPtsByCntByRoi = []
+    newC2SindsByRoi = []
+    
+    c = 0 # index of the contour in cntLens
+    
+    for r in range(len(ptsByCntByRoi)):
+        newPtsByCnt = []
+        newC2Sinds = []
+        
+        if ptsByCntByRoi[r]:
+            for i in range(len(ptsByCntByRoi[r])):
+                cntInds = inds[starts[c]:starts[c] + cntLens[c]].copy()
+                
+                # The target slices in [centre - halfThick, centre + halfThick):
+                first = max(int(np.ceil(centres[c] - halfThick)), 0)
+                last = min(
+                    int(np.ceil(centres[c] + halfThick)) - 1, numSlices - 1
+                    )
+                
+                for s in range(first, last + 1):
+                    cntInds[:, 2] = s
+                    
+                    newPtsByCnt.append(
+                        transform_pts(cntInds, trgInd2pt).tolist()
+                        )
+                    newC2Sinds.append(s)
+                
+                c += 1
+        
+        newPtsByCntByRoi.append(newPtsByCnt)
+        newC2SindsByRoi.append(newC2Sinds)
+    
+    return newPtsByCntByRoi, newC2SindsByRoi, maxSpread
@@ -16,16 +16,20 @@ import dicom_tools.dcm_metadata
 reload(dicom_tools.dcm_metadata)
 import general_tools.general
 reload(general_tools.general)
+import general_tools.slice_index
+reload(general_tools.slice_index)
 
 
 import numpy as np
+import SimpleITK as sitk
 #from image_tools.imports import import_im
 from io_tools.imports import import_dcms, import_im
 #from image_tools.operations import im_min, im_max
 from dicom_tools.dcm_metadata import get_dcm_fpaths
-from general_tools.general import get_items_unique_to_within, get_unique_items
-from conversion_tools.pixarrs_ims import im_to_pixarr
-from image_tools.operations import im_min, im_max
+from general_tools.general import get_items_unique_to_within#, get_unique_items
+from general_tools.slice_index import get_slice_index
+#from conversion_tools.pixarrs_ims import im_to_pixarr
+#from image_tools.operations import im_min, im_max
 
 def get_im_attrs(dicomDir, package='pydicom', p2c=False):
     """
@@ -90,10 +94,9 @@ def get_im_attrs(dicomDir, package='pydicom', p2c=False):
         
         #origin = im.GetOrigin() 
         
-        positions = []
-        
-        for i in range(size[2]):
-            positions.append(im.TransformIndexToPhysicalPoint((0, 0, i)))
+        positions = [
+            tuple(pt) for pt in get_slice_index(im).sliceOrigins.tolist()
+            ]
         
         directions = im.GetDirection() 
         
@@ -221,6 +224,88 @@ def get_im_attrs(dicomDir, package='pydicom', p2c=False):
     
     return size, spacings, slcThick, positions, directions, warnings
 
+def get_cached_im_stats(image, uniqueVals=False):
+    """
+    Get statistics of an image, computing them once and attaching them to the
+    image (as image.imStats).
+    
+    Parameters
+    ----------
+    image : SimpleITK Image
+    uniqueVals : bool, optional
+        If True the unique values will also be computed (if they weren't 
+        previously). The default value is False.
+    
+    Returns
+    -------
+    imStats : dict
+        Dictionary with keys:
+        - 'pixID' : the pixel type
+        - 'pixIDtypeAsStr' : the pixel type as a string
+        - 'f2sInds' : the list of indices of non-zero frames
+        - 'minVal' and 'maxVal' : the minimum and maximum values
+        - 'numNonzero' : the number of non-zero voxels
+        - 'isBinary' : True if the values are zeros and ones only (as for
+        a non-empty binary label image)
+        - 'uniqueVals' : the Numpy array of unique values in the non-zero 
+        frames (as for get_im_info), if uniqueVals is True
+    
+    Note
+    ----
+    The statistics are computed from a view of the pixel array (i.e. without 
+    copying it), with a single pass for the frame-wise extrema and counts. 
+    SimpleITK filters return new images, so the statistics remain valid for 
+    the lifetime of image (provided its pixels aren't modified in place, 
+    e.g. using SetPixel).
+    """
+    
+    imStats = getattr(image, 'imStats', None)
+    
+    if imStats is None:
+        pixarr = sitk.GetArrayViewFromImage(image)
+        
+        frames = pixarr.reshape(pixarr.shape[0], -1)
+        
+        frameMaxs = frames.max(axis=1)
+        frameMins = frames.min(axis=1)
+        
+        minVal = frameMins.min().item()
+        maxVal = frameMaxs.max().item()
+        
+        numNonzero = int(np.count_nonzero(frames))
+        
+        if minVal == 0 and maxVal == 1:
+            # Binary if there are no values between 0 and 1:
+            isBinary = numNonzero == int(np.count_nonzero(frames == 1))
+        else:
+            isBinary = False
+        
+        imStats = {
+            'pixID' : image.GetPixelID(),
+            'pixIDtypeAsStr' : image.GetPixelIDTypeAsString(),
+            'f2sInds' : [int(i) for i in np.flatnonzero(frameMaxs)],
+            'minVal' : minVal,
+            'maxVal' : maxVal,
+            'numNonzero' : numNonzero,
+            'isBinary' : isBinary
+            }
+        
+        image.imStats = imStats
+    
+    if uniqueVals and not 'uniqueVals' in imStats:
+        f2sInds = imStats['f2sInds']
+        
+        if f2sInds:
+            pixarr = sitk.GetArrayViewFromImage(image)
+            
+            imStats['uniqueVals'] = np.unique(
+                pixarr[f2sInds]
+                ).astype(np.float64)
+        else:
+            imStats['uniqueVals'] = []
+    
+    return imStats
+
 def get_im_info(image, p2c=False):
     """
     Return some info about an image.
@@ -251,77 +336,39 @@ def get_im_info(image, p2c=False):
     
     For pixel type as a string see:
     https://simpleitk.org/doxygen/latest/html/classitk_1_1simple_1_1Image.html#ad195963d0b257560819b833b9cfe18d6
-    """
-    
-    #from conversion_tools.pixarrs_ims import im_to_pixarr
-    #from image_tools.operations import im_min, im_max
-    
-    pixarr, f2sInds = im_to_pixarr(image)
     
-    #print(f'\npixarr.shape = {pixarr.shape}')
-    #print(f'f2sInds = {f2sInds}')
-    #print(f'\npixarr = {pixarr}')
-    #print(f'\ntype(pixarr) = {type(pixarr)}')
-    
-    uniqueVals = get_unique_items(items=pixarr, ignoreZero=False)
+    The info is computed once per image (see get_cached_im_stats), so 
+    repeated calls (e.g. at each p2c checkpoint) don't recompute it. If only
+    the pixel type or frame-to-slice indices are required use 
+    get_cached_im_stats, which doesn't compute the unique values.
+    """
     
-    #print(f'uniqueVals = {uniqueVals}')
-    #print(f'type(uniqueVals) = {type(uniqueVals)}')
+    imStats = get_cached_im_stats(image, uniqueVals=True)
     
-    pixID = image.GetPixelID()
-    pixIDtypeAsStr = image.GetPixelIDTypeAsString()
+    pixID = imStats['pixID']
+    pixIDtypeAsStr = imStats['pixIDtypeAsStr']
+    uniqueVals = imStats['uniqueVals']
+    f2sInds = imStats['f2sInds']
     
     if p2c:
-        #print('\nImage info:')
-        #print(f'type(image) = {type(image)}')
+        size = image.GetSize()
+        
         print(f'    Image pixID = {pixID}')
         print(f'    Image pixIDTypeAsString = {pixIDtypeAsStr}')
-        print(f'    Image size = {image.GetSize()}')
-        print(f'    Image max = {im_max(image)}')
-        print(f'    Image min = {im_min(image)}')
+        print(f'    Image size = {size}')
+        print(f'    Image max = {imStats["maxVal"]}')
+        print(f'    Image min = {imStats["minVal"]}')
         print('\n    Conversion of image to pixarr:')
-        print(f'    pixarr shape = {pixarr.shape}')
+        print(f'    pixarr shape = {(len(f2sInds), size[1], size[0])}')
         if isinstance(uniqueVals, np.ndarray):
             if len(uniqueVals) < 7:
-                print('\n    There are {len(uniqueVals)} unique values in pixarr:')
+                print(f'\n    There are {len(uniqueVals)} unique values in pixarr:')
                 print(f'    {uniqueVals}')
             else:
-                
                 print(f'\n    There are {len(uniqueVals)} unique values in pixarr:')
                 print(f'    {uniqueVals[:3]}...{uniqueVals[-3:-1]}')
-            
-            """ Print histogram of uniqueVals
-            https://www.machinelearningplus.com/plots/matplotlib-histogram-python-examples/
-            """
-            
-            vals = pixarr.flatten()
-            minVal = min(vals)
-            maxVal = max(vals)
-            
-            freq, bins = np.histogram(vals, bins=10, range=[minVal, maxVal])
-            
-            """
-            print('\n      Distribution of values:')
-            #for b, f in zip(bins[1:], freq):
-            #    #print(round(b, 1), ' '.join(np.repeat('*', f)))
-            #    print(f'      {round(b, 2)} - {f}')
-            for i in reversed(range(len(freq))):
-                valRange = f'[{round(bins[i], 2)} - {round(bins[i+1], 2)}]'
-                print(f'      {valRange} : {freq[i]}')
-            """
-            
-            #vals = pixarr.flatten()
-            #minVal = 0
-            ##maxVal = 0.2
-            #maxVal - 0.1
-            #freq, bins = np.histogram(vals, bins=10, range=[minVal, maxVal])
-            #print('\n      Distribution of values near 0:')
-            #for i in reversed(range(len(freq))):
-            #    valRange = f'[{round(bins[i], 2)} - {round(bins[i+1], 2)}]'
-            #    print(f'      {valRange} : {freq[i]}')
-            
-        elif uniqueVals == None:
-            print('       There are no uniqueVals (= {uniqueVals}) in pixarr:')
+        elif not uniqueVals:
+            print(f'       There are no uniqueVals (= {uniqueVals}) in pixarr:')
         print(f'       \nThere are {len(f2sInds)} frames with slice indices:')
         print(f'       {f2sInds}')
     
@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 10:05:41 2026
+
+@author: ctorti
+"""
+
+""" Adaptive convergence control for SimpleITK registrations. """
+
+import time
+import numpy as np
+import SimpleITK as sitk
+
+
+class ConvergenceController:
+    """
+    This class controls a multi-resolution SimpleITK registration via its
+    sitkStartEvent, sitkMultiResolutionIterationEvent and sitkIterationEvent
+    observers (see rigid_reg_im and bspline_reg_im in
+    image_tools.registering). It:
+        -- stops a pyramid level once the metric value plateaus (i.e. the
+        range of the last windowSize values is within plateauTol of their
+        mean)
+        -- uses a reduced sampling percentage at the coarse levels and the
+        full sampling percentage (of the registration) only at the finest
+        level
+        -- skips a (non-finest) level after probeIters iterations if it is
+        bringing no improvement (relative improvement below skipTol) and the
+        previous level brought no improvement either
+    and logs every decision.
+    
+    Parameters
+    ----------
+    windowSize : int, optional
+        The number of iterations over which a plateau is assessed. The default
+        value is 10.
+    plateauTol : float, optional
+        The relative range of metric values within the window below which the
+        metric is considered to have plateaued. The default value is 1e-4.
+    minItersPerLevel : int, optional
+        The minimum number of iterations at a level before it can be stopped
+        due to a plateau. The default value is 10.
+    skipTol : float, optional
+        The relative improvement within a level below which a level is
+        considered to bring no improvement. The default value is 1e-3.
+    probeIters : int, optional
+        The number of iterations after which a level may be skipped. The
+        default value is 5.
+    coarseSamplingFraction : float, optional
+        The fraction of the sampling percentage of the registration that will
+        be used for all but the finest level. The default value is 0.5.
+    p2c : bool, optional
+        Denotes whether decisions will be logged to the console. The default
+        value is False.
+    
+    Returns
+    -------
+    self.log : list of dicts
+        A list (for each decision) of a dictionary with keys 'level',
+        'iteration', 'action', 'reason' and 'time' (relative to the start of
+        the registration).
+    self.metricValuesByLevel : dict
+        Dictionary (with levels as keys) of a list of the metric values at
+        each iteration.
+    self.levelTimes : dict
+        Dictionary (with levels as keys) of the time spent at each level.
+    
+    Note
+    ----
+    Calling StopRegistration() on the ImageRegistrationMethod only stops the
+    optimiser at the current level, so the registration continues at the
+    next level.
+    
+    Metric values at different levels are not comparable (the images are
+    shrunk and smoothed differently), so improvements are only assessed
+    within a level.
+    
+    If the registration is executed level by level (see execute_reg_by_level
+    in image_tools.registering), levelOffset is set to the index of the 
+    level being executed, so that the state is kept across calls of 
+    ImageRegistrationMethod.Execute().
+    """
+    
+    def __init__(
+            self, windowSize=10, plateauTol=1e-4, minItersPerLevel=10,
+            skipTol=1e-3, probeIters=5, coarseSamplingFraction=0.5,
+            p2c=False
+            ):
+        self.windowSize = windowSize
+        self.plateauTol = plateauTol
+        self.minItersPerLevel = minItersPerLevel
+        self.skipTol = skipTol
+        self.probeIters = probeIters
+        self.coarseSamplingFraction = coarseSamplingFraction
+        self.p2c = p2c
+        
+        self.numLevels = None
+        self.levelOffset = 0
+        self.reset()
+    
+    def reset(self):
+        """
+        Reset the state (e.g. prior to a new registration).
+        """
+        
+        self.log = []
+        self.metricValuesByLevel = {}
+        self.levelTimes = {}
+        self.level = None
+        self.lastIter = None
+        self.stopped = False
+        self.probing = False
+        self.t0 = time.time()
+        self.levelT0 = self.t0
+    
+    def get_sampling_percentages(self, numLevels, samplingPercentage):
+        """
+        Get the sampling percentage for each level (for
+        ImageRegistrationMethod.SetMetricSamplingPercentagePerLevel).
+        
+        Parameters
+        ----------
+        numLevels : int
+            The number of levels in the pyramid.
+        samplingPercentage : float
+            The sampling percentage of the registration (as a fraction, as
+            passed to ImageRegistrationMethod.SetMetricSamplingPercentage),
+            which will be used at the finest level.
+        
+        Returns
+        -------
+        samplingPercentages : list of floats
+            The list (for each level) of sampling percentages (as fractions).
+        """
+        
+        self.numLevels = numLevels
+        
+        samplingPercentages = \
+            [samplingPercentage*self.coarseSamplingFraction]*(numLevels - 1)\
+                + [samplingPercentage]
+        
+        return samplingPercentages
+    
+    def add_to_log(self, action, reason):
+        """
+        Add a decision to the log.
+        """
+        
+        entry = {
+            'level' : self.level,
+            'iteration' : len(self.metricValuesByLevel.get(self.level, [])),
+            'action' : action,
+            'reason' : reason,
+            'time' : time.time() - self.t0
+            }
+        
+        self.log.append(entry)
+        
+        if self.p2c:
+            print(f"[ConvergenceController] level {entry['level']}, iter "
+                  f"{entry['iteration']}: {action} ({reason})")
+    
+    def get_improvement(self, level):
+        """
+        Get the relative improvement (decrease) in the metric value within a
+        level.
+        """
+        
+        values = self.metricValuesByLevel.get(level, [])
+        
+        if len(values) < 2:
+            return None
+        
+        return (values[0] - min(values))/max(abs(values[0]), 1e-12)
+    
+    def start(self, regMethod):
+        """
+        Callback for the sitkStartEvent.
+        """
+        
+        # Not the start of the registration if executing level by level:
+        if self.levelOffset:
+            return
+        
+        self.reset()
+        
+        self.level = regMethod.GetCurrentLevel()
+        self.metricValuesByLevel[self.level] = []
+        
+        self.add_to_log('start', f'numLevels = {self.numLevels}')
+    
+    def new_level(self, regMethod):
+        """
+        Callback for the sitkMultiResolutionIterationEvent (which is invoked
+        at the start of every level).
+        """
+        
+        now = time.time()
+        
+        # The event is also invoked at the start of the first level:
+        if self.metricValuesByLevel.get(self.level, []):
+            self.levelTimes[self.level] = now - self.levelT0
+            prevLevel = self.level
+        else:
+            prevLevel = None
+        
+        self.level = regMethod.GetCurrentLevel() + self.levelOffset
+        self.metricValuesByLevel[self.level] = []
+        self.lastIter = None
+        self.stopped = False
+        self.probing = False
+        self.levelT0 = now
+        
+        isFinest = self.numLevels is not None\
+            and self.level == self.numLevels - 1
+        
+        if prevLevel is not None and not isFinest:
+            improvement = self.get_improvement(prevLevel)
+            
+            if improvement is not None and improvement < self.skipTol:
+                self.probing = True
+                
+                reason = f'level {prevLevel} improved by {improvement:.2e}'\
+                    + f' < skipTol = {self.skipTol}'
+                self.add_to_log('probe', reason)
+    
+    def iteration(self, regMethod):
+        """
+        Callback for the sitkIterationEvent.
+        """
+        
+        if self.stopped:
+            return
+        
+        # Some optimisers invoke an iteration event for every function
+        # evaluation rather than every iteration:
+        iteration = regMethod.GetOptimizerIteration()
+        if iteration == self.lastIter:
+            return
+        self.lastIter = iteration
+        
+        values = self.metricValuesByLevel.setdefault(self.level, [])
+        values.append(regMethod.GetMetricValue())
+        
+        numIters = len(values)
+        
+        isFinest = self.numLevels is not None\
+            and self.level == self.numLevels - 1
+        
+        if self.probing and numIters >= self.probeIters and not isFinest:
+            improvement = self.get_improvement(self.level)
+            
+            if improvement is not None and improvement < self.skipTol:
+                reason = f'improved by {improvement:.2e} < skipTol = '\
+                    + f'{self.skipTol} after {numIters} iterations'
+                self.stop(regMethod, 'skip level', reason)
+                return
+            
+            self.probing = False
+        
+        if numIters >= max(self.minItersPerLevel, self.windowSize):
+            window = np.array(values[-self.windowSize:])
+            
+            relRange = (window.max() - window.min())\
+                /max(abs(window.mean()), 1e-12)
+            
+            if relRange < self.plateauTol:
+                reason = f'relative range {relRange:.2e} < plateauTol = '\
+                    + f'{self.plateauTol} over the last {self.windowSize} '\
+                    + 'iterations'
+                self.stop(regMethod, 'stop level', reason)
+    
+    def stop(self, regMethod, action, reason):
+        """
+        Stop the optimiser at the current level.
+        """
+        
+        self.stopped = True
+        self.add_to_log(action, reason)
+        regMethod.StopRegistration()
+    
+    def end(self, regMethod):
+        """
+        Callback for the sitkEndEvent.
+        """
+        
+        self.levelTimes[self.level] = time.time() - self.levelT0
+        
+        # Not the end of the registration if executing level by level:
+        if self.numLevels is not None and self.level < self.numLevels - 1:
+            return
+        
+        self.add_to_log(
+            'end', f'final metric value = {regMethod.GetMetricValue():.5f}'
+            )
+    
+    def add_commands(self, regMethod):
+        """
+        Add the observers to an ImageRegistrationMethod.
+        
+        Parameters
+        ----------
+        regMethod : SimpleITK ImageRegistrationMethod
+            The ImageRegistrationMethod.
+        
+        Returns
+        -------
+        None.
+        """
+        
+        regMethod.AddCommand(
+            sitk.sitkStartEvent, lambda: self.start(regMethod)
+            )
+        regMethod.AddCommand(
+            sitk.sitkMultiResolutionIterationEvent,
+            lambda: self.new_level(regMethod)
+            )
+        regMethod.AddCommand(
+            sitk.sitkIterationEvent, lambda: self.iteration(regMethod)
+            )
+        regMethod.AddCommand(
+            sitk.sitkEndEvent, lambda: self.end(regMethod)
+            )
+    
+    def print_log(self):
+        """
+        Print the decisions and the number of iterations and time at each
+        level.
+        """
+        
+        print('\nConvergence controller log:')
+        for entry in self.log:
+            print(f"   {entry['time']:7.2f} s, level {entry['level']}, iter "
+                  f"{entry['iteration']}: {entry['action']} "
+                  f"({entry['reason']})")
+        
+        print('\nIterations and time per level:')
+        for level, values in self.metricValuesByLevel.items():
+            levelTime = self.levelTimes.get(level, 0)
+            print(f'   level {level}: {len(values)} iterations, '
+                  f'{levelTime:.2f} s')
+        print('')
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 23 09:12:27 2026
+
+@author: ctorti
+"""
+
+""" Functions for cropping SimpleITK images to physical regions. """
+
+import numpy as np
+import SimpleITK as sitk
+from general_tools.geometry import get_im_verts
+
+
+def get_im_phys_bbox(im):
+    """
+    Get the axis-aligned physical bounding box of a 3D SimpleITK image.
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The 3D image.
+    
+    Returns
+    -------
+    bbox : tuple of Numpy arrays
+        The minimum and maximum physical coordinates (bboxMin, bboxMax).
+    """
+    
+    verts = np.array(get_im_verts(im))
+    
+    bbox = (verts.min(axis=0), verts.max(axis=0))
+    
+    return bbox
+
+def get_labims_phys_bbox(labims):
+    """
+    Get the axis-aligned physical bounding box of the non-zero voxels in a
+    list of 3D label images.
+    
+    Parameters
+    ----------
+    labims : list of SimpleITK Images
+        The list of 3D label images (e.g. labimByRoi or labimBySeg).
+    
+    Returns
+    -------
+    bbox : tuple of Numpy arrays or None
+        The minimum and maximum physical coordinates (bboxMin, bboxMax), or
+        None if all label images are empty.
+    """
+    
+    pts = []
+    
+    for labim in labims:
+        pixarr = sitk.GetArrayViewFromImage(labim)
+        
+        nonzero = np.nonzero(pixarr)
+        
+        if not nonzero[0].size:
+            continue
+        
+        # Indices are in (z, y, x) order in pixarr:
+        indMin = [int(nonzero[i].min()) for i in [2, 1, 0]]
+        indMax = [int(nonzero[i].max()) for i in [2, 1, 0]]
+        
+        # The corners of the voxels at the extremes:
+        for i in [indMin[0] - 0.5, indMax[0] + 0.5]:
+            for j in [indMin[1] - 0.5, indMax[1] + 0.5]:
+                for k in [indMin[2] - 0.5, indMax[2] + 0.5]:
+                    pts.append(
+                        labim.TransformContinuousIndexToPhysicalPoint(
+                            (i, j, k)
+                            )
+                        )
+    
+    if not pts:
+        return None
+    
+    pts = np.array(pts)
+    
+    bbox = (pts.min(axis=0), pts.max(axis=0))
+    
+    return bbox
+
+def intersect_phys_bboxes(bboxes):
+    """
+    Get the intersection of axis-aligned physical bounding boxes.
+    
+    Parameters
+    ----------
+    bboxes : list of tuples of Numpy arrays
+        The list of bounding boxes (bboxMin, bboxMax).
+    
+    Returns
+    -------
+    bbox : tuple of Numpy arrays or None
+        The intersection (bboxMin, bboxMax), or None if the bounding boxes
+        don't intersect.
+    """
+    
+    bboxMin = np.max([bbox[0] for bbox in bboxes], axis=0)
+    bboxMax = np.min([bbox[1] for bbox in bboxes], axis=0)
+    
+    if np.any(bboxMin >= bboxMax):
+        return None
+    
+    return bboxMin, bboxMax
+
+def get_phys_spacings(im):
+    """
+    Get the (approximate) voxel spacings of a 3D image along the physical x, y
+    and z axes.
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The 3D image.
+    
+    Returns
+    -------
+    physSpacings : Numpy array
+        The spacings along the physical axes.
+    """
+    
+    direction = np.abs(np.array(im.GetDirection()).reshape(3, 3))
+    
+    physSpacings = direction @ np.array(im.GetSpacing())
+    
+    return physSpacings
+
+def expand_phys_bbox(bbox, minExtent):
+    """
+    Expand an axis-aligned physical bounding box (about its centre) so that
+    its extent is at least minExtent along each physical axis.
+    
+    Parameters
+    ----------
+    bbox : tuple of Numpy arrays
+        The physical region (bboxMin, bboxMax).
+    minExtent : Numpy array
+        The minimum extent along the physical x, y and z axes.
+    
+    Returns
+    -------
+    bbox : tuple of Numpy arrays
+        The expanded region (bboxMin, bboxMax).
+    """
+    
+    bboxMin, bboxMax = bbox
+    
+    centre = (bboxMin + bboxMax)/2
+    halfExtent = np.maximum(bboxMax - bboxMin, minExtent)/2
+    
+    return centre - halfExtent, centre + halfExtent
+
+def get_focus_region(fixIm, movIm, movLabims, margin=20, minSize=32):
+    """
+    Get the physical region that registration will be focused on, i.e. the
+    bounding box of the ROI(s) in the moving image, expanded by a margin, and
+    intersected with the physical extents of both images.
+    
+    Parameters
+    ----------
+    fixIm : SimpleITK Image
+        The 3D fixed (target) image.
+    movIm : SimpleITK Image
+        The 3D moving (source) image.
+    movLabims : list of SimpleITK Images
+        The list of 3D label images of the ROI(s) in the moving image domain.
+    margin : int or float, optional
+        The margin (in mm) to add around the ROI(s). The default value is 20.
+    minSize : int, optional
+        The minimum number of voxels (of either image) that the region will
+        span along each axis (so that the coarsest level of the registration
+        pyramid has enough voxels to sample from). The default value is 32.
+    
+    Returns
+    -------
+    bbox : tuple of Numpy arrays or None
+        The physical region (bboxMin, bboxMax), or None if the label images
+        are empty or the region doesn't intersect both images.
+    
+    Note
+    ----
+    The region is defined in physical space so it is assumed that the
+    anatomy of interest occupies similar physical coordinates in both images
+    (to within the margin). If the images have different frames of reference
+    that are significantly misaligned the margin should be increased.
+    """
+    
+    roiBbox = get_labims_phys_bbox(movLabims)
+    
+    if roiBbox is None:
+        return None
+    
+    roiBbox = (roiBbox[0] - margin, roiBbox[1] + margin)
+    
+    minExtent = minSize*np.maximum(
+        get_phys_spacings(fixIm), get_phys_spacings(movIm)
+        )
+    
+    roiBbox = expand_phys_bbox(roiBbox, minExtent)
+    
+    bbox = intersect_phys_bboxes(
+        [roiBbox, get_im_phys_bbox(fixIm), get_im_phys_bbox(movIm)]
+        )
+    
+    return bbox
+
+def get_region_inds(im, bbox):
+    """
+    Get the index and size of the region of a 3D image that covers a
+    physical bounding box.
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The 3D image.
+    bbox : tuple of Numpy arrays
+        The physical region (bboxMin, bboxMax).
+    
+    Returns
+    -------
+    index : list of ints
+        The start index of the region.
+    size : list of ints
+        The size of the region.
+    """
+    
+    bboxMin, bboxMax = bbox
+    
+    # The corners of the bounding box in (continuous) index space (the image
+    # need not be aligned with the physical axes):
+    inds = []
+    for x in [bboxMin[0], bboxMax[0]]:
+        for y in [bboxMin[1], bboxMax[1]]:
+            for z in [bboxMin[2], bboxMax[2]]:
+                inds.append(
+                    im.TransformPhysicalPointToContinuousIndex(
+                        (float(x), float(y), float(z))
+                        )
+                    )
+    inds = np.array(inds)
+    
+    imSize = np.array(im.GetSize())
+    
+    indMin = np.clip(np.floor(inds.min(axis=0)).astype(int), 0, imSize - 1)
+    indMax = np.clip(np.ceil(inds.max(axis=0)).astype(int), 0, imSize - 1)
+    
+    index = [int(item) for item in indMin]
+    size = [int(item) for item in indMax - indMin + 1]
+    
+    return index, size
+
+def crop_im_to_phys_bbox(im, bbox):
+    """
+    Crop a 3D image to the region that covers a physical bounding box.
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The 3D image.
+    bbox : tuple of Numpy arrays
+        The physical region (bboxMin, bboxMax).
+    
+    Returns
+    -------
+    croppedIm : SimpleITK Image
+        The cropped image (whose origin is updated so that it occupies the
+        same physical space as the region in im).
+    """
+    
+    index, size = get_region_inds(im, bbox)
+    
+    croppedIm = sitk.RegionOfInterest(im, size, index)
+    
+    return croppedIm
+
+def create_mask_from_phys_bbox(im, bbox):
+    """
+    Create a binary mask (in the gridspace of a 3D image) of the region that
+    covers a physical bounding box.
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The 3D image.
+    bbox : tuple of Numpy arrays
+        The physical region (bboxMin, bboxMax).
+    
+    Returns
+    -------
+    mask : SimpleITK Image
+        The 8-bit binary mask.
+    """
+    
+    index, size = get_region_inds(im, bbox)
+    
+    pixarr = np.zeros(im.GetSize()[::-1], dtype=np.uint8)
+    
+    pixarr[index[2]:index[2] + size[2], index[1]:index[1] + size[1],
+           index[0]:index[0] + size[0]] = 1
+    
+    mask = sitk.GetImageFromArray(pixarr)
+    mask.CopyInformation(im)
+    
+    return mask
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 27 09:48:15 2026
+
+@author: ctorti
+"""
+
+""" Dense displacement fields for deformable SimpleITK transforms. """
+
+import os
+import hashlib
+import threading
+from pathlib import Path
+from collections import OrderedDict
+import numpy as np
+import SimpleITK as sitk
+
+
+def get_sub_txs(sitkTx):
+    """
+    Get the list of transforms that make up a SimpleITK Transform.
+    
+    Parameters
+    ----------
+    sitkTx : SimpleITK Transform
+        The transform (e.g. a CompositeTransform).
+    
+    Returns
+    -------
+    subTxs : list of SimpleITK Transforms
+        The list of transforms in a CompositeTransform (in the order they
+        were added), or a list containing sitkTx if it is not composite.
+    """
+    
+    if sitkTx.GetName() == 'CompositeTransform':
+        compTx = sitk.CompositeTransform(sitkTx)
+        
+        subTxs = []
+        for i in range(compTx.GetNumberOfTransforms()):
+            subTxs.extend(get_sub_txs(compTx.GetNthTransform(i)))
+    else:
+        subTxs = [sitkTx]
+    
+    return subTxs
+
+def is_deformable_tx(sitkTx):
+    """
+    Determine whether a SimpleITK Transform is (or contains) a BSpline
+    transform.
+    
+    Parameters
+    ----------
+    sitkTx : SimpleITK Transform
+        The transform.
+    
+    Returns
+    -------
+    isDeformable : bool
+        True if sitkTx is a BSplineTransform or a CompositeTransform that
+        contains one.
+    """
+    
+    isDeformable = any(
+        subTx.GetName() == 'BSplineTransform' for subTx in get_sub_txs(sitkTx)
+        )
+    
+    return isDeformable
+
+def get_tx_key(sitkTx, refIm):
+    """
+    Get a key that identifies a SimpleITK Transform and the gridspace of a
+    reference image.
+    
+    Parameters
+    ----------
+    sitkTx : SimpleITK Transform
+        The transform.
+    refIm : SimpleITK Image
+        The reference image (whose pixel values are not used).
+    
+    Returns
+    -------
+    key : str
+        The hex digest of the name, parameters and fixed parameters of each
+        transform in sitkTx and the size, spacing, origin and direction of
+        refIm.
+    """
+    
+    hasher = hashlib.blake2b(digest_size=16)
+    
+    for subTx in get_sub_txs(sitkTx):
+        hasher.update(subTx.GetName().encode())
+        hasher.update(np.array(subTx.GetParameters(), np.float64).tobytes())
+        hasher.update(
+            np.array(subTx.GetFixedParameters(), np.float64).tobytes()
+            )
+    
+    geometry = (
+        refIm.GetSize(), refIm.GetSpacing(), refIm.GetOrigin(),
+        refIm.GetDirection()
+        )
+    hasher.update(repr(geometry).encode())
+    
+    return hasher.hexdigest()
+
+def create_disp_field(sitkTx, refIm, numThreads=None):
+    """
+    Convert a SimpleITK Transform to a dense displacement field in the
+    gridspace of a reference image.
+    
+    Parameters
+    ----------
+    sitkTx : SimpleITK Transform
+        The transform.
+    refIm : SimpleITK Image
+        The reference image (e.g. the target image).
+    numThreads : int, optional
+        The number of threads to use. If None the SimpleITK global default
+        will be used. The default value is None.
+    
+    Returns
+    -------
+    dispField : SimpleITK Image
+        The displacement field (of pixel type sitkVectorFloat64), i.e. the
+        displacement of sitkTx at every voxel of refIm.
+    """
+    
+    filt = sitk.TransformToDisplacementFieldFilter()
+    filt.SetReferenceImage(refIm)
+    filt.SetOutputPixelType(sitk.sitkVectorFloat64)
+    if numThreads:
+        filt.SetNumberOfThreads(numThreads)
+    
+    dispField = filt.Execute(sitkTx)
+    
+    return dispField
+
+def create_disp_field_tx(dispField):
+    """
+    Create a DisplacementFieldTransform from a displacement field.
+    
+    Parameters
+    ----------
+    dispField : SimpleITK Image
+        The displacement field (of pixel type sitkVectorFloat64).
+    
+    Returns
+    -------
+    dispTx : SimpleITK DisplacementFieldTransform
+        The transform (with linear interpolation of the field).
+    
+    Note
+    ----
+    DisplacementFieldTransform takes ownership of the image passed to it
+    (leaving it empty), so a copy of dispField is passed so that dispField
+    can be reused (e.g. from DispFieldCache).
+    """
+    
+    dispTx = sitk.DisplacementFieldTransform(sitk.Image(dispField))
+    
+    return dispTx
+
+def check_disp_field_accuracy(sitkTx, dispTx, refIm, numPts=1000, seed=0):
+    """
+    Compare the points transformed by a displacement field transform with
+    those transformed by the transform it was created from.
+    
+    Parameters
+    ----------
+    sitkTx : SimpleITK Transform
+        The transform (e.g. a BSplineTransform).
+    dispTx : SimpleITK DisplacementFieldTransform
+        The displacement field transform created from sitkTx in the
+        gridspace of refIm.
+    refIm : SimpleITK Image
+        The reference image.
+    numPts : int, optional
+        The number of points sampled at voxel centres, and the number sampled
+        at random (sub-voxel) positions, within refIm. The default value is
+        1000.
+    seed : int, optional
+        The seed of the random number generator. The default value is 0.
+    
+    Returns
+    -------
+    errors : dict
+        Dictionary with keys 'maxVoxErr' and 'meanVoxErr' (the maximum and
+        mean distance in mm between the points transformed by dispTx and
+        sitkTx at voxel centres), and 'maxSubVoxErr' and 'meanSubVoxErr'
+        (as before at sub-voxel positions).
+    
+    Note
+    ----
+    Resampling onto the gridspace of refIm only evaluates the transform at
+    voxel centres, where the displacement field is sampled, so 'maxVoxErr'
+    measures the accuracy of the resampling. 'maxSubVoxErr' is due to the
+    linear interpolation of the field and is an indication of the accuracy
+    of dispTx if used for other purposes (e.g. transforming points).
+    """
+    
+    rng = np.random.default_rng(seed)
+    
+    size = np.array(refIm.GetSize())
+    
+    voxInds = rng.integers(0, size, size=(numPts, 3))
+    subVoxInds = rng.uniform(0, size - 1, size=(numPts, 3))
+    
+    errors = {}
+    
+    for label, inds in [('Vox', voxInds), ('SubVox', subVoxInds)]:
+        dists = []
+        
+        for ind in inds:
+            pt = refIm.TransformContinuousIndexToPhysicalPoint(
+                [float(item) for item in ind]
+                )
+            
+            dists.append(
+                np.linalg.norm(
+                    np.array(dispTx.TransformPoint(pt))\
+                        - np.array(sitkTx.TransformPoint(pt))
+                    )
+                )
+        
+        errors[f'max{label}Err'] = float(np.max(dists))
+        errors[f'mean{label}Err'] = float(np.mean(dists))
+    
+    return errors
+
+
+class DispFieldCache:
+    """
+    This class converts deformable transforms to dense displacement fields
+    (see create_disp_field) in the gridspace of a reference image and caches
+    them in memory and (optionally) to disk, so that a transform is evaluated
+    once per voxel of the reference image, rather than once per voxel per
+    resampled image (e.g. for each label image in labimBySeg and the DICOM
+    image).
+    
+    Fields are keyed by the transform and the gridspace of the reference
+    image (see get_tx_key).
+    
+    Parameters
+    ----------
+    cacheDir : str, optional
+        The directory to cache the fields to (as <key>.mha). If None or '' the
+        fields will only be cached in memory. The default value is None.
+    maxNumFields : int, optional
+        The maximum number of fields to cache in memory. The least recently
+        used field is discarded when the limit is exceeded. The default value
+        is 4.
+    
+    Returns
+    -------
+    self.numHits : int
+        The number of fields served from memory.
+    self.numDiskHits : int
+        The number of fields read from disk.
+    self.numMisses : int
+        The number of fields that were created.
+    """
+    
+    def __init__(self, cacheDir=None, maxNumFields=4):
+        self.cacheDir = cacheDir
+        self.maxNumFields = maxNumFields
+        self.fields = OrderedDict()
+        self.lock = threading.Lock()
+        self.numHits = 0
+        self.numDiskHits = 0
+        self.numMisses = 0
+    
+    def get_fpath(self, key):
+        """
+        Get the file path of a cached field.
+        """
+        
+        return os.path.join(self.cacheDir, f'{key}.mha')
+    
+    def get_field(self, sitkTx, refIm, numThreads=None):
+        """
+        Get the displacement field of a transform in the gridspace of a
+        reference image, creating it if it is not cached.
+        
+        Parameters
+        ----------
+        sitkTx : SimpleITK Transform
+            The transform.
+        refIm : SimpleITK Image
+            The reference image.
+        numThreads : int, optional
+            The number of threads to use if the field is created. The default
+            value is None.
+        
+        Returns
+        -------
+        dispField : SimpleITK Image
+            The displacement field.
+        """
+        
+        key = get_tx_key(sitkTx, refIm)
+        
+        with self.lock:
+            if key in self.fields:
+                self.fields.move_to_end(key)
+                self.numHits += 1
+                return self.fields[key]
+        
+        dispField = None
+        
+        if self.cacheDir:
+            fpath = self.get_fpath(key)
+            
+            if os.path.isfile(fpath):
+                dispField = sitk.ReadImage(fpath, sitk.sitkVectorFloat64)
+                self.numDiskHits += 1
+        
+        if dispField is None:
+            dispField = create_disp_field(sitkTx, refIm, numThreads)
+            self.numMisses += 1
+            
+            if self.cacheDir:
+                if not os.path.isdir(self.cacheDir):
+                    Path(self.cacheDir).mkdir(parents=True, exist_ok=True)
+                
+                # Write to a temporary file first so that a partially written
+                # file is never read by another process:
+                tmpFpath = fpath.replace('.mha', f'_{os.getpid()}.tmp.mha')
+                sitk.WriteImage(dispField, tmpFpath)
+                os.replace(tmpFpath, fpath)
+        
+        with self.lock:
+            self.fields[key] = dispField
+            
+            while len(self.fields) > self.maxNumFields:
+                self.fields.popitem(last=False)
+        
+        return dispField
+    
+    def get_tx(self, sitkTx, refIm, numThreads=None):
+        """
+        Get the displacement field transform of a transform in the gridspace
+        of a reference image (see get_field).
+        
+        Returns
+        -------
+        dispTx : SimpleITK DisplacementFieldTransform
+            The displacement field transform.
+        """
+        
+        return create_disp_field_tx(
+            self.get_field(sitkTx, refIm, numThreads)
+            )
+    
+    def clear(self):
+        """
+        Clear the in-memory cache (files cached to disk are not deleted).
+        """
+        
+        with self.lock:
+            self.fields.clear()
+            self.numHits = 0
+            self.numDiskHits = 0
+            self.numMisses = 0
+
+
+"""
+Caches shared by the resamplings in a process, by cache directory (see
+get_disp_field_cache).
+"""
+_dispFieldCaches = {}
+
+
+def get_disp_field_cache(cacheDir=None):
+    """
+    Get the DispFieldCache shared by the resamplings in this process for a
+    cache directory.
+    
+    Parameters
+    ----------
+    cacheDir : str, optional
+        The directory to cache the fields to. The default value is None.
+    
+    Returns
+    -------
+    dispFieldCache : DispFieldCache
+    """
+    
+    if not cacheDir in _dispFieldCaches:
+        _dispFieldCaches[cacheDir] = DispFieldCache(cacheDir)
+    
+    return _dispFieldCaches[cacheDir]
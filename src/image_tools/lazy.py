@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Nov  3 09:32:51 2026
+
+@author: ctorti
+"""
+
+""" Lazily evaluated (e.g. diagnostic) SimpleITK images. """
+
+import threading
+import SimpleITK as sitk
+
+
+class LazyImage:
+    """
+    This class is a handle to an image that is only created (e.g. resampled)
+    when it is first requested, and is then kept.
+    
+    Parameters
+    ----------
+    func : function
+        The function that returns the image (e.g. sitk.Resample or
+        image_tools.resampling.resample_im).
+    *args, **kwargs
+        The arguments of func.
+    
+    Returns
+    -------
+    self.get() : SimpleITK Image
+        The image (created on the first call).
+    self.isEvaluated : bool
+        True if the image has been created.
+    
+    Note
+    ----
+    Images that are only consumed by plots, exports, console output or error
+    checks (e.g. the registered and pre-registration aligned images) are
+    returned as LazyImages so that runs that don't consume them don't pay for
+    full-volume resamplings.
+    
+    SimpleITK Transforms passed as arguments are copied so that subsequent
+    changes to them don't change the image.
+    """
+    
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = [
+            sitk.Transform(arg) if isinstance(arg, sitk.Transform) else arg
+            for arg in args
+            ]
+        self.kwargs = {
+            key : sitk.Transform(val) if isinstance(val, sitk.Transform)\
+                else val for key, val in kwargs.items()
+            }
+        self.image = None
+        self.isEvaluated = False
+        self.lock = threading.Lock()
+    
+    def get(self):
+        """
+        Get the image, creating it if it hasn't been created.
+        
+        Returns
+        -------
+        image : SimpleITK Image
+        """
+        
+        with self.lock:
+            if not self.isEvaluated:
+                self.image = self.func(*self.args, **self.kwargs)
+                self.isEvaluated = True
+                
+                # Release the inputs:
+                self.args = None
+                self.kwargs = None
+        
+        return self.image
+
+
+def lazy_resample(movIm, fixIm, sitkTx):
+    """
+    Get a LazyImage of an image linearly resampled onto the gridspace of a
+    reference image (with the pixel type of movIm), as for the
+    registered and aligned images following image registration.
+    
+    Parameters
+    ----------
+    movIm : SimpleITK Image
+        The image to be resampled.
+    fixIm : SimpleITK Image
+        The reference image.
+    sitkTx : SimpleITK Transform
+        The transform.
+    
+    Returns
+    -------
+    lazyIm : LazyImage
+    """
+    
+    return LazyImage(
+        sitk.Resample, movIm, fixIm, sitkTx, sitk.sitkLinear, 0.0,
+        movIm.GetPixelID()
+        )
+
+def get_im(image):
+    """
+    Get an image from a SimpleITK Image or LazyImage.
+    
+    Parameters
+    ----------
+    image : SimpleITK Image, LazyImage or None
+    
+    Returns
+    -------
+    image : SimpleITK Image or None
+        The image (created if image is an unevaluated LazyImage).
+    """
+    
+    if isinstance(image, LazyImage):
+        return image.get()
+    
+    return image
@@ -433,7 +433,7 @@ def change_im_dtype(im, newPixType):
     
     return Caster.Execute(im)
 
-def find_thresh(binaryIm, nonBinaryIm, p2c=False):
+def find_thresh(binaryIm, nonBinaryIm, eps=1e-6, p2c=False):
     """
     Find a suitable threshold level that if used to binary threshold a non-
     binary 3D SimpleITK image, nonBinaryIm, would result in a similar 
@@ -446,87 +446,95 @@ def find_thresh(binaryIm, nonBinaryIm, p2c=False):
         The binary image.
     nonBinaryIm : SimpleITK Image
         The non-binary image.
+    eps : float, optional
+        Values in nonBinaryIm at or below eps are considered to be background.
+        The default value is 1e-6.
     p2c : bool, optional (False by default)
         Denotes whether some results will be logged to the console.
         
     Returns
     -------
     thresh : float
-        A threshold level that when applied to nonBinaryIm should result in 
-        a similar distribution of zeros and ones as in binaryIm.
+        A threshold level that when applied to nonBinaryIm (using 
+        binarise_im) should result in a similar distribution of zeros and 
+        ones as in binaryIm.
+    
+    Note
+    ----
+    The expected number of ones, N, is the number of ones in binaryIm scaled
+    by the ratio of the voxel volumes. The volume-preserving threshold is the
+    N^th largest value in nonBinaryIm, which is found by selection (i.e. 
+    np.partition) of the values above eps within the range of non-zero frames
+    (the bounding region of the ROI), rather than from a histogram of all 
+    voxels. Since binarise_im includes voxels equal to the threshold, exactly
+    N voxels will be ones unless values are tied at the threshold, in which
+    case the threshold (or the next greater value) that results in the number
+    of ones closest to N is returned.
     """
     
-    #from conversion_tools.pixarrs_ims import im_to_pixarr
+    from image_tools.attrs_info import get_cached_im_stats
     
     if p2c:
         print('\n\n', '-'*120)
         print('Running of find_thresh():')
-        #print('\n\n', '-'*120)
     
     ratio = get_voxel_volume_ratio(binaryIm, nonBinaryIm)
     
-    binPixarr, binf2sInds = im_to_pixarr(binaryIm)
-    
-    nonBinPixarr, nonBinf2sInds = im_to_pixarr(nonBinaryIm)
-    
-    numOfOnes_B = np.count_nonzero(binPixarr)
+    numOfOnes_B = get_cached_im_stats(binaryIm)['numNonzero']
     
     # The expected number of 1s to retain in nonBinPixarr (i.e. expected
     # number of 1st in the binarised non-binary pixel array):
     expectedNumOfOnes_BNB = int(numOfOnes_B/ratio)
-            
-    vals_NB = nonBinPixarr.flatten()
-    minVal = min(vals_NB)
-    maxVal = max(vals_NB)
     
-    freq, bins = np.histogram(vals_NB, bins=1000, range=[minVal, maxVal])
+    nonBinStats = get_cached_im_stats(nonBinaryIm)
+    f2sInds = nonBinStats['f2sInds']
     
-    """
-    if p2c:
-        print('\n      Distribution of values:')
-        #for b, f in zip(bins[1:], freq):
-        #    print(f'      {round(b, 8)} - {f}')
-        for i in reversed(range(len(freq))):
-                valRange = f'[{round(bins[i], 3)} - {round(bins[i+1], 3)}]'
-                print(f'      {valRange} : {freq[i]}')
-    """
-    
-    # The cumulative sum of the frequencies in reverse order:
-    cumSumfreq = np.cumsum(np.flip(freq))
-    
-    # The absolute differences between the cumulative sum of the frequencies
-    # and the number of ones in the binary image scaled by the ratio of the
-    # voxel volumes:
-    #absDiffs = np.abs(cumSumfreq - numOfOnes_B)
-    #absDiffs = np.abs(cumSumfreq - numOfOnes_B/ratio) # 20/08/21
-    absDiffs = np.abs(cumSumfreq - expectedNumOfOnes_BNB) # 20/08/21
-    
-    revInd = np.where(absDiffs == np.min(absDiffs))[0][0]
+    if f2sInds:
+        nonBinPixarr = sitk.GetArrayViewFromImage(nonBinaryIm)
+        
+        # The values above eps within the bounding region:
+        region = nonBinPixarr[f2sInds[0]:f2sInds[-1] + 1]
+        vals = region[region > eps]
+    else:
+        vals = np.array([])
     
-    ind = len(cumSumfreq) - revInd - 1
+    numOfVals = vals.size
     
-    thresh = bins[ind]
+    if numOfVals == 0 or expectedNumOfOnes_BNB <= 0:
+        # No voxels should be ones:
+        thresh = float(np.nextafter(nonBinStats['maxVal'], np.inf))
+    elif expectedNumOfOnes_BNB >= numOfVals:
+        # All voxels above eps should be ones:
+        thresh = float(vals.min())
+    else:
+        ind = numOfVals - expectedNumOfOnes_BNB
+        
+        thresh = np.partition(vals, ind)[ind]
+        
+        # If there are ties at thresh, the next greater value may result in a
+        # number of ones that is closer to the expected number:
+        above = vals[vals > thresh]
+        
+        numOfTies = int(np.count_nonzero(vals == thresh))
+        
+        if above.size and above.size + numOfTies - expectedNumOfOnes_BNB\
+                > expectedNumOfOnes_BNB - above.size:
+            thresh = above.min()
+        
+        thresh = float(thresh)
     
     if p2c:
+        numOfOnes_BNB = int(np.count_nonzero(vals >= thresh))
+        
         print(f'\nbinaryIm.GetSpacing() = {binaryIm.GetSpacing()}')
         print(f'\nnonBinaryIm.GetSpacing() = {nonBinaryIm.GetSpacing()}')
         print(f'\nVoxel volume ratio = {ratio}')
         print(f'\nNumber of 1s in binaryIm = {numOfOnes_B}')
         print(f'\nTarget number of ones = {expectedNumOfOnes_BNB}')
-        #print(f'\ncumSumfreq[0:revInd+5] = {cumSumfreq[:revInd+5]}')
-        #print(f'\nabsDiffs[0:revInd+5] = {absDiffs[:revInd+5]}')
-        print(f'\nind = {ind}')
-        print(f'bins[{ind}] = {bins[ind]}')
-    
-    binPixarr = (nonBinPixarr > thresh).astype(np.int_)
-    
-    numOfOnes_BNB = np.count_nonzero(binPixarr)
-    
-    if p2c:
+        print(f'\nNumber of values above eps = {numOfVals}')
         print(f'There are {numOfOnes_B} ones in the binary pixel array. ',
               f'\nThresholding the non-binary pixel array at {round(thresh,3)}',
               f'would result in {numOfOnes_BNB} ones (difference of',
-              #f'{abs(numOfOnes_BNB - numOfOnes_B)}).')
               f'{abs(numOfOnes_BNB - expectedNumOfOnes_BNB)}).')
         print('-'*120)
     
@@ -577,7 +585,7 @@ def binarise_im(im, thresh=0.5):
     
     return imFilt.Execute(im)
 
-def gaussian_blur_im(im, var=(1,1,1), p2c=False):
+def gaussian_blur_im(im, var=(1,1,1), numThreads=None, p2c=False):
     """
     Gaussian blur a 3D SimpleITK image.
     
@@ -587,6 +595,9 @@ def gaussian_blur_im(im, var=(1,1,1), p2c=False):
         The 3D image to be blurred.
     var : tuple of floats, optional ((1,1,1) by default)
         The variance along all dimensions.
+    numThreads : int or None, optional (None by default)
+        The number of threads to use for blurring. If None SimpleITK's global
+        default number of threads will be used.
     p2c : bool, optional (False by default)
         Denotes whether some results will be logged to the console.
         
@@ -615,8 +626,11 @@ def gaussian_blur_im(im, var=(1,1,1), p2c=False):
     
     if p2c:
         print('\n   Image info for im prior to Gaussian blurring:')
-            
-    pixID, pixIdtypeAsStr, uniqueValsPostTx, f2sInds = get_im_info(im, p2c)
+        
+        get_im_info(im, p2c)
+    
+    pixID = im.GetPixelID()
+    pixIdtypeAsStr = im.GetPixelIDTypeAsString()
     
     # Ensure im is a 32-bit float (pixID = 8).
     if pixID != 8: 
@@ -630,12 +644,14 @@ def gaussian_blur_im(im, var=(1,1,1), p2c=False):
         if p2c:
             print('\n   Image info for im after converting to Float32:')
             
-        pixID, pixIdtypeAsStr, uniqueVals, f2sInds = get_im_info(im, p2c)
+            get_im_info(im, p2c)
     
     imFilt = sitk.DiscreteGaussianImageFilter()
     #imFilt.SetMaximumKernelWidth(sigma)
     #print(f'   imFilt.GetMaximumKernelWidth() = {imFilt.GetMaximumKernelWidth()}')
     imFilt.SetVariance(var)
+    if numThreads is not None:
+        imFilt.SetNumberOfThreads(numThreads)
         
     blurredIm = imFilt.Execute(im)
     
@@ -688,8 +704,11 @@ def recursive_gaussian_blur_im(im, sigma, direction, p2c=False):
     
     if p2c:
         print('\n   Image info for im prior to Gaussian blurring:')
+        
+        get_im_info(im, p2c)
     
-    pixID, pixIdtypeAsStr, uniqueValsPostTx, f2sInds = get_im_info(im, p2c)
+    pixID = im.GetPixelID()
+    pixIdtypeAsStr = im.GetPixelIDTypeAsString()
     
     # Ensure im is a 32-bit float (pixID = 8).
     if pixID != 8: 
@@ -703,7 +722,7 @@ def recursive_gaussian_blur_im(im, sigma, direction, p2c=False):
         if p2c:
             print('\n   Image info for image after converting to Float32:')
             
-        pixID, pixIdtypeAsStr, uniqueVals, f2sInds = get_im_info(im, p2c)
+            get_im_info(im, p2c)
         
     imFilt = sitk.RecursiveGaussianImageFilter()
     imFilt.SetSigma(sigma)
@@ -728,7 +747,7 @@ def recursive_gaussian_blur_im(im, sigma, direction, p2c=False):
 
 def segment_im(
         im, closeHoles=True, threshFactor=0.25, kernelSize=3, 
-        numClosingOps=1, p2c=False
+        numClosingOps=1, numThreads=None, p2c=False
         ):
     """
     Segment a 3D SimpleITK Image using binary thresholding and (optional) a 
@@ -751,6 +770,10 @@ def segment_im(
     numClosingOps : int, optional
         The number of times to perform the hole closing operation. The default
         value is 1.
+    numThreads : int or None, optional
+        The number of threads to use for morphological closing. If None
+        SimpleITK's global default number of threads will be used. The default
+        value is None.
     p2c : bool, optional
         Denotes whether some results will be logged to the console. The default
         value is False.
@@ -772,6 +795,8 @@ def segment_im(
     
     if closeHoles:
         closing = sitk.BinaryMorphologicalClosingImageFilter()
+        if numThreads is not None:
+            closing.SetNumberOfThreads(numThreads)
         for i in range(numClosingOps):
             closing.SetKernelRadius([kernelSize]*im.GetDimension())
             seg = closing.Execute(seg)
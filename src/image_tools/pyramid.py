@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 10:17:52 2026
+
+@author: ctorti
+"""
+
+""" Cached multi-resolution image pyramids for registration. """
+
+import hashlib
+import threading
+from collections import OrderedDict
+import SimpleITK as sitk
+
+
+def get_im_key(im):
+    """
+    Get a key that identifies the content and geometry of a SimpleITK image.
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The image.
+    
+    Returns
+    -------
+    key : str
+        The hex digest of the pixel data, pixel type, size, spacing, origin
+        and direction.
+    """
+    
+    hasher = hashlib.blake2b(digest_size=16)
+    
+    geometry = (
+        im.GetPixelIDValue(), im.GetSize(), im.GetSpacing(), im.GetOrigin(),
+        im.GetDirection()
+        )
+    hasher.update(repr(geometry).encode())
+    hasher.update(sitk.GetArrayViewFromImage(im).tobytes())
+    
+    return hasher.hexdigest()
+
+def create_pyramid_level(im, shrinkFactor, smoothingSigma):
+    """
+    Create a level of a multi-resolution pyramid by smoothing and shrinking
+    an image.
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The image.
+    shrinkFactor : int
+        The shrink factor (applied to all dimensions).
+    smoothingSigma : int or float
+        The standard deviation (in physical units) of the Gaussian smoothing.
+        If 0 no smoothing will be applied.
+    
+    Returns
+    -------
+    levelIm : SimpleITK Image
+        The smoothed and shrunk image.
+    
+    Note
+    ----
+    The image is smoothed prior to shrinking (as in the multi-resolution
+    framework of SimpleITK's ImageRegistrationMethod with
+    SmoothingSigmasAreSpecifiedInPhysicalUnitsOn). ShrinkImageFilter
+    preserves the physical extent of the image, so transforms are valid at
+    all levels.
+    """
+    
+    levelIm = im
+    
+    if smoothingSigma:
+        levelIm = sitk.SmoothingRecursiveGaussian(
+            levelIm, float(smoothingSigma)
+            )
+    
+    if shrinkFactor > 1:
+        levelIm = sitk.Shrink(levelIm, [int(shrinkFactor)]*im.GetDimension())
+    
+    return levelIm
+
+
+class PyramidCache:
+    """
+    This class builds and caches the smoothed and shrunk levels of images
+    used for multi-resolution registration (see execute_reg_by_level in
+    image_tools.registering).
+    
+    Levels are keyed by the image content (see get_im_key), shrink factor
+    and smoothing sigma, so that the levels of an image (e.g. the target
+    image) are built once and reused across registrations (e.g. rigid, affine
+    and bspline registrations with the same target image, and registrations
+    of several source images to the same target image). Schedules that share
+    a level (e.g. shrink factor 1 and sigma 1 for both [2,1,1] and [4,2,1]
+    sigmas) share the cached level.
+    
+    Parameters
+    ----------
+    maxNumLevels : int, optional
+        The maximum number of levels to cache. The least recently used level
+        is discarded when the limit is exceeded. The default value is 24.
+    
+    Returns
+    -------
+    self.numHits : int
+        The number of levels served from the cache.
+    self.numMisses : int
+        The number of levels that were built.
+    
+    Note
+    ----
+    The cache is thread-safe but not shared between processes (e.g. the
+    workers of multistart_reg_im).
+    """
+    
+    def __init__(self, maxNumLevels=24):
+        self.maxNumLevels = maxNumLevels
+        self.levels = OrderedDict()
+        self.imKeys = {}
+        self.lock = threading.Lock()
+        self.numHits = 0
+        self.numMisses = 0
+    
+    def get_im_key(self, im):
+        """
+        Get the key of an image (see get_im_key), re-using the key computed
+        for the same Image object where possible.
+        """
+        
+        cached = self.imKeys.get(id(im))
+        
+        # The Image object is stored alongside the key so that its id can't
+        # be re-used by another object:
+        if cached is not None and cached[0] is im:
+            return cached[1]
+        
+        key = get_im_key(im)
+        
+        if len(self.imKeys) >= self.maxNumLevels:
+            self.imKeys.clear()
+        self.imKeys[id(im)] = (im, key)
+        
+        return key
+    
+    def get_level(self, im, shrinkFactor, smoothingSigma):
+        """
+        Get a level of the pyramid of an image, building it if it is not
+        cached.
+        
+        Parameters
+        ----------
+        im : SimpleITK Image
+            The image.
+        shrinkFactor : int
+            The shrink factor.
+        smoothingSigma : int or float
+            The standard deviation (in physical units) of the smoothing.
+        
+        Returns
+        -------
+        levelIm : SimpleITK Image
+            The smoothed and shrunk image.
+        """
+        
+        with self.lock:
+            key = (
+                self.get_im_key(im), int(shrinkFactor), float(smoothingSigma)
+                )
+            
+            if key in self.levels:
+                self.levels.move_to_end(key)
+                self.numHits += 1
+                return self.levels[key]
+        
+        levelIm = create_pyramid_level(im, shrinkFactor, smoothingSigma)
+        
+        with self.lock:
+            self.levels[key] = levelIm
+            self.numMisses += 1
+            
+            while len(self.levels) > self.maxNumLevels:
+                self.levels.popitem(last=False)
+        
+        return levelIm
+    
+    def get_levels(self, im, shrinkFactors, smoothingSigmas):
+        """
+        Get the levels of the pyramid of an image.
+        
+        Parameters
+        ----------
+        im : SimpleITK Image
+            The image.
+        shrinkFactors : list of ints
+            The shrink factor for each level.
+        smoothingSigmas : list of ints or floats
+            The standard deviation (in physical units) of the smoothing for
+            each level.
+        
+        Returns
+        -------
+        levelIms : list of SimpleITK Images
+            The list (for each level) of smoothed and shrunk images.
+        """
+        
+        if len(shrinkFactors) != len(smoothingSigmas):
+            msg = f"The number of shrink factors ({len(shrinkFactors)}) must "\
+                + "equal the number of smoothing sigmas "\
+                + f"({len(smoothingSigmas)})."
+            raise Exception(msg)
+        
+        levelIms = [
+            self.get_level(im, shrinkFactors[i], smoothingSigmas[i])
+            for i in range(len(shrinkFactors))
+            ]
+        
+        return levelIms
+    
+    def clear(self):
+        """
+        Clear the cache.
+        """
+        
+        with self.lock:
+            self.levels.clear()
+            self.imKeys.clear()
+            self.numHits = 0
+            self.numMisses = 0
+
+
+"""
+Cache shared by the registrations in a process (see get_pyramid_cache).
+"""
+_pyramidCache = None
+
+
+def get_pyramid_cache():
+    """
+    Get the PyramidCache shared by the registrations in this process.
+    
+    Parameters
+    ----------
+    None.
+    
+    Returns
+    -------
+    pyramidCache : PyramidCache
+    """
+    
+    global _pyramidCache
+    
+    if _pyramidCache is None:
+        _pyramidCache = PyramidCache()
+    
+    return _pyramidCache
@@ -15,8 +15,14 @@ import image_tools.operations
 reload(image_tools.operations)
 """
 
+import os
+import queue
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import SimpleITK as sitk
-#import numpy as np
+import numpy as np
 import time
 #import winsound # this is only available for windows!
 import matplotlib.pyplot as plt
@@ -26,6 +32,11 @@ from ipywidgets import interact, fixed
 from general_tools.fiducials import get_landmark_tx
 #import image_tools.registration_utilities as ru
 import image_tools.registration_callbacks as rc
+from image_tools.threads import (
+    get_num_of_cpus, get_num_threads_per_worker, init_pool_worker
+    )
+from image_tools.pyramid import get_pyramid_cache
+from image_tools.lazy import lazy_resample
 #from image_tools.operations import normalise_im
 
 
@@ -134,11 +145,115 @@ def plot_values_and_export(metricValues, multiresIters, regPlotFpath):
         
     print(f'Plot exported to:\n {regPlotFpath}\n')
 
+def execute_reg_by_level(
+        regMethod, fixIm, movIm, shrinkFactors, smoothingSigmas, 
+        samplingPercentage, pyramidCache, initialTx=None, controller=None
+        ):
+    """
+    Execute a multi-resolution registration level by level using cached
+    image pyramids (rather than the internal multi-resolution framework of 
+    the ImageRegistrationMethod).
+    
+    Parameters
+    ----------
+    regMethod : SimpleITK ImageRegistrationMethod
+        The ImageRegistrationMethod (with metric, optimiser, interpolator and
+        observers set).
+    fixIm : SimpleITK Image 
+        The 3D image that movIm will be registered to.
+    movIm : SimpleITK Image
+        The 3D image that will be registered to fixIm.
+    shrinkFactors : list of ints
+        The shrink factor for each level.
+    smoothingSigmas : list of ints or floats
+        The standard deviation (in physical units) of the smoothing for each
+        level.
+    samplingPercentage : float
+        The sampling percentage (as a fraction).
+    pyramidCache : PyramidCache
+        The cache from which the levels of fixIm and movIm will be served 
+        (see image_tools.pyramid).
+    initialTx : SimpleITK Transform, optional
+        The initial transform if it was set with inPlace=False (the optimised
+        transform of each level will be used to initialise the next level).
+        If None the initial transform is assumed to have been set with 
+        inPlace=True. The default value is None.
+    controller : ConvergenceController, optional
+        The convergence controller (if used). The default value is None.
+    
+    Returns
+    -------
+    finalTx : SimpleITK Transform
+        The transform returned by the ImageRegistrationMethod at the final
+        level.
+    
+    Note
+    ----
+    The module-level metricValues and multiresIters are concatenated across
+    levels so that they are the same as for a single call of 
+    regMethod.Execute().
+    
+    The ImageRegistrationMethod smooths the images at each level but only 
+    shrinks the virtual domain, whereas here both images are shrunk, so
+    results will differ slightly from those of regMethod.Execute().
+    """
+    
+    global metricValues, multiresIters
+    
+    numLevels = len(shrinkFactors)
+    
+    fixLevels = pyramidCache.get_levels(fixIm, shrinkFactors, smoothingSigmas)
+    movLevels = pyramidCache.get_levels(movIm, shrinkFactors, smoothingSigmas)
+    
+    if controller is not None:
+        samplingPercentages = controller.get_sampling_percentages(
+            numLevels, samplingPercentage
+            )
+    else:
+        samplingPercentages = [samplingPercentage]*numLevels
+    
+    regMethod.SetShrinkFactorsPerLevel(shrinkFactors=[1])
+    regMethod.SetSmoothingSigmasPerLevel(smoothingSigmas=[0])
+    
+    allMetricValues = []
+    allMultiresIters = []
+    
+    for i in range(numLevels):
+        regMethod.SetMetricSamplingPercentagePerLevel(
+            [samplingPercentages[i]]
+            )
+        
+        if initialTx is not None:
+            regMethod.SetInitialTransform(initialTx, inPlace=False)
+        
+        if controller is not None:
+            controller.levelOffset = i
+        
+        finalTx = regMethod.Execute(fixLevels[i], movLevels[i])
+        
+        allMultiresIters.append(len(allMetricValues))
+        allMetricValues.extend(metricValues)
+        
+        if initialTx is not None:
+            # Execute() returns a CompositeTransform containing the optimised
+            # transform:
+            initialTx = sitk.CompositeTransform(finalTx).GetNthTransform(0)
+    
+    if controller is not None:
+        controller.levelOffset = 0
+    
+    metricValues = allMetricValues
+    multiresIters = allMultiresIters
+    
+    return finalTx
+
 def rigid_reg_im(
         fixIm, movIm, regTxName='affine', initMethod='landmarks', 
         fixFidsFpath='', movFidsFpath='', samplingPercentage=5, 
         numIters=500, learningRate=1.0, optimiser='GDLS',
-        fixMask=None, movMask=None, p2c=False, regPlotFpath=''
+        shrinkFactors=[4, 2, 1], smoothingSigmas=[2, 1, 1],
+        fixMask=None, movMask=None, numThreads=None, iterCallback=None,
+        controller=None, pyramidCache=None, p2c=False, regPlotFpath=''
         ):
     """  
     Register two 3D SimpleITK images using a non-deformable transformation 
@@ -189,6 +304,13 @@ def rigid_reg_im(
             - 'LBFGSB' = Limited memory Broyden, Fletcher, Goldfarb, Shannon, 
             Bound Constrained
         The default value is 'GDSL'.
+    shrinkFactors : list of ints, optional
+        The shrink factor for each level of the multi-resolution framework.
+        The default value is [4, 2, 1].
+    smoothingSigmas : list of ints or floats, optional
+        The standard deviation (in physical units) of the smoothing for each
+        level of the multi-resolution framework. The default value is 
+        [2, 1, 1].
     fixMask : SimpleITK Image
         A 3D binary mask representing the volume within which sampling points 
         will be considered in fixIm when optimising the registration.  The 
@@ -197,6 +319,24 @@ def rigid_reg_im(
         A 3D binary mask representing the volume within which sampling points 
         will be considered in movIm when optimising the registration.  The 
         default value is None.
+    numThreads : int or None, optional
+        The number of threads to use for registration. If None SimpleITK's 
+        global default number of threads will be used. The default value is
+        None.
+    iterCallback : function, optional
+        A function (that takes the ImageRegistrationMethod as its only 
+        argument) that will be called at every iteration, e.g. to monitor the
+        metric value or to stop the registration early using
+        regMethod.StopRegistration(). The default value is None.
+    controller : ConvergenceController, optional
+        If provided, the controller (see image_tools.convergence) will set the
+        sampling percentage per level and stop/skip levels adaptively. The 
+        default value is None.
+    pyramidCache : PyramidCache, optional
+        If provided, the registration will be executed level by level using
+        the smoothed and shrunk levels of fixIm and movIm served from the
+        cache (see execute_reg_by_level and image_tools.pyramid). The default
+        value is None.
     p2c : bool, optional
         Denotes whether intermediate results will be logged to the console.
         The default value is False
@@ -207,8 +347,8 @@ def rigid_reg_im(
         
     Returns
     -------
-    regIm : SimpleITK Image
-        The 3D registered image.
+    regIm : LazyImage
+        The 3D registered image (see image_tools.lazy).
     initialTx : SimpleITK Transform
         The SimpleITK Transform used to initialise the registration.
     finalTx : SimpleITK Transform
@@ -349,6 +489,9 @@ def rigid_reg_im(
     
     regMethod.SetInitialTransform(initialTx, inPlace=False)
     
+    if numThreads is not None:
+        regMethod.SetNumberOfThreads(numThreads)
+    
     """ Similarity metric settings. """
     regMethod.SetMetricAsMattesMutualInformation(numberOfHistogramBins=50)
     #regMethod.SetMetricAsJointHistogramMutualInformation()
@@ -360,14 +503,20 @@ def rigid_reg_im(
     #regMethod.SetMetricSamplingPercentage(
     #    samplingPercentage, sitk.sitkWallClock
     #    )
+    if controller is not None:
+        regMethod.SetMetricSamplingPercentagePerLevel(
+            controller.get_sampling_percentages(
+                len(shrinkFactors), samplingPercentage
+                )
+            )
     if fixMask:
         regMethod.SetMetricFixedMask(fixMask)
     if movMask:
         regMethod.SetMetricMovingMask(movMask)
     
     """ Setup for the multi-resolution framework. """
-    shrinkFactors = [4,2,1]
-    smoothingSigmas = [2,1,1]
+    #shrinkFactors = [4,2,1]
+    #smoothingSigmas = [2,1,1]
     #smoothingSigmas = [2,1,0]
     #print('\n\n\n*** Changed smoothingSigmas from [2,1,1] to [4,2,1] on',
     #      '08/09/21\n\n\n')
@@ -453,9 +602,23 @@ def rigid_reg_im(
     # TODO! Correct above code, if number of valid points below sensible 
     # threshold may need to abort operation?
     
+    if iterCallback is not None:
+        regMethod.AddCommand(sitk.sitkIterationEvent, 
+                             lambda: iterCallback(regMethod))
+    
+    if controller is not None:
+        controller.add_commands(regMethod)
+    
     #finalTx = regMethod.Execute(sitk.Cast(fixIm, sitk.sitkFloat32), 
     #                            sitk.Cast(movIm, sitk.sitkFloat32))
-    finalTx = regMethod.Execute(fixIm, movIm)
+    if pyramidCache is not None:
+        finalTx = execute_reg_by_level(
+            regMethod, fixIm, movIm, shrinkFactors, smoothingSigmas, 
+            samplingPercentage, pyramidCache, initialTx=initialTx,
+            controller=controller
+            )
+    else:
+        finalTx = regMethod.Execute(fixIm, movIm)
     
     print('\nParameters used during registration:')
     print(f'regTxName = {regTxName}')
@@ -486,13 +649,11 @@ def rigid_reg_im(
     #print(f"Final Iteration: {finalIterNum}")
     
     # Resample movIm using finalTx to get the registered image:
-    regIm = sitk.Resample(
-        movIm, fixIm, finalTx, sitk.sitkLinear, 0.0, movIm.GetPixelID()
-        )
+    regIm = lazy_resample(movIm, fixIm, finalTx)
     
     if False:
         interact(plot_blended_im, Ind=(0,fixIm.GetSize()[2] - 1), 
-                 alpha=(0.0,1.0,0.05), fixIm=(fixIm), resIm=fixed(regIm));
+                 alpha=(0.0,1.0,0.05), fixIm=(fixIm), resIm=fixed(regIm.get()));
     
     times.append(time.time())
     #dTime = round(times[-1] - times[-2], 1)
@@ -507,16 +668,16 @@ def rigid_reg_im(
     
     # Resample movIm using intialTx to get the pre-registration aligned image 
     # (for info only - not required):
-    alignedIm = sitk.Resample(
-        movIm, fixIm, initialTx, sitk.sitkLinear, 0.0, movIm.GetPixelID()
-        )
+    alignedIm = lazy_resample(movIm, fixIm, initialTx)
     
     return initialTx, alignedIm, finalTx, regIm, metricValues, multiresIters
 
 def bspline_reg_im(
         fixIm, movIm, fixFidsFpath='', movFidsFpath='', numControlPts=8,
-        samplingPercentage=5, numIters=100, learningRate=5.0, p2c=False,
-        regPlotFpath=''
+        samplingPercentage=5, numIters=100, learningRate=5.0, 
+        shrinkFactors=[4, 2, 1], smoothingSigmas=[4, 2, 1], movInitialTx=None,
+        fixMask=None, movMask=None, numThreads=None, iterCallback=None, 
+        controller=None, pyramidCache=None, p2c=False, regPlotFpath=''
         ):
     """ 
     Register two 3D SimpleITK images using a B-spline transformation in
@@ -548,6 +709,46 @@ def bspline_reg_im(
     learningRate : float, optional
         The learning rate used for the gradient descent optimiser. The default
         value is 5.0.
+    shrinkFactors : list of ints, optional
+        The shrink factor for each level of the multi-resolution framework.
+        The default value is [4, 2, 1].
+    smoothingSigmas : list of ints or floats, optional
+        The standard deviation (in physical units) of the smoothing for each
+        level of the multi-resolution framework. The default value is 
+        [4, 2, 1].
+    movInitialTx : SimpleITK Transform, optional
+        A fixed (not optimised) transform that maps points from the fixed to
+        the moving image domain ahead of the BSpline, e.g. the result of an 
+        affine registration (see cascade_reg_im). If provided, the BSpline 
+        only models the residual deformation and regIm is resampled using 
+        the composite of movInitialTx and the BSpline. The default value is
+        None.
+    fixMask : SimpleITK Image
+        A 3D binary mask representing the volume within which sampling points 
+        will be considered in fixIm when optimising the registration.  The 
+        default value is None.
+    movMask : SimpleITK Image
+        A 3D binary mask representing the volume within which sampling points 
+        will be considered in movIm when optimising the registration.  The 
+        default value is None.
+    numThreads : int or None, optional
+        The number of threads to use for registration. If None SimpleITK's 
+        global default number of threads will be used. The default value is
+        None.
+    iterCallback : function, optional
+        A function (that takes the ImageRegistrationMethod as its only 
+        argument) that will be called at every iteration, e.g. to monitor the
+        metric value or to stop the registration early using
+        regMethod.StopRegistration(). The default value is None.
+    controller : ConvergenceController, optional
+        If provided, the controller (see image_tools.convergence) will set the
+        sampling percentage per level and stop/skip levels adaptively. The 
+        default value is None.
+    pyramidCache : PyramidCache, optional
+        If provided, the registration will be executed level by level using
+        the smoothed and shrunk levels of fixIm and movIm served from the
+        cache (see execute_reg_by_level and image_tools.pyramid). The default
+        value is None.
     p2c : bool, optional
         Denotes whether intermediate results will be logged to the console.
         The default value is False.
@@ -558,8 +759,8 @@ def bspline_reg_im(
         
     Returns
     -------
-    regIm : SimpleITK Image
-        The 3D registered image.
+    regIm : LazyImage
+        The 3D registered image (see image_tools.lazy).
     regMethod : SimpleITK ImageRegistrationMethod
         The SimpleITK ImageRegistrationMethod used to perform registration.
     initialTx : SimpleITK Transform
@@ -581,7 +782,7 @@ def bspline_reg_im(
     
     # Print simple metric values to console or plot of metric value v iteration?
     plotToConsole = False # simple text only
-    plotToConsole = True # plots
+    #plotToConsole = True # plots
     
     # Use scale factors for mesh grid?
     # Note 08/07/21: Not sure it works properly using scale factors.
@@ -645,10 +846,26 @@ def bspline_reg_im(
     else:
         regMethod.SetInitialTransform(initialTx, inPlace=True)
     
+    if movInitialTx is not None:
+        regMethod.SetMovingInitialTransform(movInitialTx)
+    
+    if numThreads is not None:
+        regMethod.SetNumberOfThreads(numThreads)
+    
     """ Similarity metric settings. """
     regMethod.SetMetricAsMattesMutualInformation(numberOfHistogramBins=50)
     regMethod.SetMetricSamplingStrategy(regMethod.RANDOM)
     regMethod.SetMetricSamplingPercentage(samplingPercentage)
+    if controller is not None:
+        regMethod.SetMetricSamplingPercentagePerLevel(
+            controller.get_sampling_percentages(
+                len(shrinkFactors), samplingPercentage
+                )
+            )
+    if fixMask:
+        regMethod.SetMetricFixedMask(fixMask)
+    if movMask:
+        regMethod.SetMetricMovingMask(movMask)
     
     """ Optimiser settings. Use LBFGSB (without scale factors) or LBFGS2 (with 
     scale factors).
@@ -670,8 +887,8 @@ def bspline_reg_im(
     
     #regMethod.SetShrinkFactorsPerLevel([6, 2, 1])
     #regMethod.SetSmoothingSigmasPerLevel([6, 2, 1])
-    regMethod.SetShrinkFactorsPerLevel([4, 2, 1])
-    regMethod.SetSmoothingSigmasPerLevel([4, 2, 1]) # <-- better result than [2, 1, 0]?..
+    regMethod.SetShrinkFactorsPerLevel(shrinkFactors)
+    regMethod.SetSmoothingSigmasPerLevel(smoothingSigmas) # <-- better result than [2, 1, 0]?..
     #regMethod.SetSmoothingSigmasPerLevel([2, 1, 0]) # in 65_Registration_FFD.ipynb example
     regMethod.SmoothingSigmasAreSpecifiedInPhysicalUnitsOn() # <-- THIS WAS MISSING until 21:51 on 1/7/21
     
@@ -693,7 +910,7 @@ def bspline_reg_im(
         regMethod.AddCommand(sitk.sitkMultiResolutionIterationEvent, 
                              update_multiresIters)
         regMethod.AddCommand(sitk.sitkIterationEvent, 
-                             update_metricValues(regMethod))
+                             lambda: update_metricValues(regMethod))
         regMethod.AddCommand(sitk.sitkIterationEvent, 
                              lambda: command_iteration(regMethod))
         regMethod.AddCommand(sitk.sitkMultiResolutionIterationEvent,
@@ -715,12 +932,30 @@ def bspline_reg_im(
                     regMethod, fixPts, movPts
                     )
                 )
-            
-    finalTx = regMethod.Execute(fixIm, movIm)
     
-    regIm = sitk.Resample(
-        movIm, fixIm, finalTx, sitk.sitkLinear, 0.0, movIm.GetPixelID()
-        )
+    if iterCallback is not None:
+        regMethod.AddCommand(sitk.sitkIterationEvent, 
+                             lambda: iterCallback(regMethod))
+    
+    if controller is not None:
+        controller.add_commands(regMethod)
+    
+    if pyramidCache is not None:
+        # The initial transform is optimised in place:
+        finalTx = execute_reg_by_level(
+            regMethod, fixIm, movIm, shrinkFactors, smoothingSigmas, 
+            samplingPercentage, pyramidCache, controller=controller
+            )
+    else:
+        finalTx = regMethod.Execute(fixIm, movIm)
+    
+    if movInitialTx is not None:
+        # Points are mapped by finalTx then movInitialTx:
+        resTx = sitk.CompositeTransform([movInitialTx, finalTx])
+    else:
+        resTx = finalTx
+    
+    regIm = lazy_resample(movIm, fixIm, resTx)
     
     times.append(time.time())
     dTime = round(times[-1] - times[-2], 1)
@@ -752,19 +987,318 @@ def bspline_reg_im(
     
     # Resample movIm using intialTx to get the pre-registration aligned image 
     # (for info only - not required):
-    alignedIm = sitk.Resample(
-        movIm, fixIm, initialTx, sitk.sitkLinear, 0.0, movIm.GetPixelID()
-        )
+    alignedIm = lazy_resample(movIm, fixIm, initialTx)
     
     return initialTx, alignedIm, finalTx, regIm, metricValues, multiresIters
 
+"""
+Linear (rigid, rigid_scale or affine) transforms from registrations in this
+process, keyed by get_linear_tx_key (see store_linear_tx and 
+get_stored_linear_tx).
+"""
+_linearTxs = {}
+
+def get_linear_tx_key(fixIm, movIm, regTxName, initMethod):
+    """
+    Get the key for a linear registration result.
+    
+    Parameters
+    ----------
+    fixIm : SimpleITK Image 
+        The 3D fixed image.
+    movIm : SimpleITK Image
+        The 3D moving image.
+    regTxName : str
+        The name of the linear transform ('rigid', 'rigid_scale' or 'affine').
+    initMethod : str
+        The method used for initialisation.
+    
+    Returns
+    -------
+    key : tuple
+        The key (image content keys of fixIm and movIm, regTxName and 
+        initMethod).
+    """
+    
+    # The shared PyramidCache re-uses the keys of Image objects it has seen:
+    pyramidCache = get_pyramid_cache()
+    
+    fixKey = pyramidCache.get_im_key(fixIm)
+    movKey = pyramidCache.get_im_key(movIm)
+    
+    return fixKey, movKey, regTxName, initMethod
+
+def store_linear_tx(fixIm, movIm, regTxName, initMethod, linearTx):
+    """
+    Store the result of a linear registration so that it can be reused (e.g.
+    to initialise a subsequent cascaded registration - see cascade_reg_im).
+    
+    Parameters
+    ----------
+    fixIm : SimpleITK Image 
+        The 3D fixed image.
+    movIm : SimpleITK Image
+        The 3D moving image.
+    regTxName : str
+        The name of the linear transform ('rigid', 'rigid_scale' or 'affine').
+    initMethod : str
+        The method used for initialisation.
+    linearTx : SimpleITK Transform
+        The linear transform (or a CompositeTransform containing it).
+    
+    Returns
+    -------
+    None.
+    """
+    
+    if linearTx.GetName() == 'CompositeTransform':
+        linearTx = sitk.CompositeTransform(linearTx).GetNthTransform(0)
+    
+    key = get_linear_tx_key(fixIm, movIm, regTxName, initMethod)
+    
+    _linearTxs[key] = sitk.Transform(linearTx)
+
+def get_stored_linear_tx(fixIm, movIm, regTxName, initMethod):
+    """
+    Get the result of a linear registration stored using store_linear_tx.
+    
+    Parameters
+    ----------
+    fixIm : SimpleITK Image 
+        The 3D fixed image.
+    movIm : SimpleITK Image
+        The 3D moving image.
+    regTxName : str
+        The name of the linear transform ('rigid', 'rigid_scale' or 'affine').
+    initMethod : str
+        The method used for initialisation.
+    
+    Returns
+    -------
+    linearTx : SimpleITK Transform or None
+        A copy of the stored transform, or None if no result was stored.
+    """
+    
+    key = get_linear_tx_key(fixIm, movIm, regTxName, initMethod)
+    
+    if not key in _linearTxs:
+        return None
+    
+    return sitk.Transform(_linearTxs[key])
+
+def get_affine_tx_about_origin(linearTx):
+    """
+    Express a linear (e.g. Euler3D, Similarity3D or Affine) transform as an
+    affine transform with its centre at the origin.
+    
+    Parameters
+    ----------
+    linearTx : SimpleITK Transform
+        The linear transform.
+    
+    Returns
+    -------
+    affineTx : SimpleITK AffineTransform
+        The equivalent affine transform with centre (0, 0, 0), whose 
+        parameters correspond to a DICOM Frame of Reference Transformation
+        Matrix (see get_txMatrix_from_tx in dro_tools.matrices).
+    """
+    
+    linearTx = linearTx.Downcast()
+    
+    matrix = np.array(linearTx.GetMatrix()).reshape(3, 3)
+    centre = np.array(linearTx.GetCenter())
+    translation = np.array(linearTx.GetTranslation())
+    
+    affineTx = sitk.AffineTransform(3)
+    affineTx.SetMatrix(linearTx.GetMatrix())
+    affineTx.SetTranslation(
+        [float(item) for item in translation + centre - matrix @ centre]
+        )
+    
+    return affineTx
+
+def cascade_reg_im(
+        fixIm, movIm, linearTxName='affine', initMethod='landmarks', 
+        fixFidsFpath='', movFidsFpath='', numControlPts=8, 
+        linearShrinkFactors=[4, 2], linearSmoothingSigmas=[2, 1], 
+        bsplineShrinkFactors=[2, 1], bsplineSmoothingSigmas=[2, 1],
+        linearNumIters=500, bsplineNumIters=30, fixMask=None, movMask=None, 
+        numThreads=None, controller=None, pyramidCache=None, p2c=False, 
+        regPlotFpath=''
+        ):
+    """
+    Register two 3D SimpleITK images using a linear (rigid, rigid_scale or 
+    affine) registration at the coarse levels followed by a BSpline 
+    registration of the residual deformation at the finer levels.
+    
+    Parameters
+    ----------
+    fixIm : SimpleITK Image 
+        The 3D image that movIm will be registered to.
+    movIm : SimpleITK Image
+        The 3D image that will be registered to fixIm.
+    linearTxName : str, optional
+        The linear transform ('rigid', 'rigid_scale' or 'affine'). The default
+        value is 'affine'.
+    initMethod : str, optional
+        The method used to initialise the linear registration (see 
+        rigid_reg_im). The default value is 'landmarks'.
+    fixFidsFpath : str, optional
+        The file path of the text file containing fiducials for fixIm. 
+        This parameter is only relevant if initMethod = 'landmarks'. 
+        The default value is ''.
+    movFidsFpath : str, optional
+        The file path of the text file containing fiducials for movIm. 
+        This argument is only relevant if initMethod = 'landmarks'.
+        The default value is ''.
+    numControlPts : int, optional
+        The number of control points that defines the BSpline grid. The default
+        value is 8.
+    linearShrinkFactors : list of ints, optional
+        The shrink factors for the linear registration. The default value is
+        [4, 2].
+    linearSmoothingSigmas : list of ints or floats, optional
+        The smoothing sigmas (in physical units) for the linear registration.
+        The default value is [2, 1].
+    bsplineShrinkFactors : list of ints, optional
+        The shrink factors for the BSpline registration. The default value is
+        [2, 1].
+    bsplineSmoothingSigmas : list of ints or floats, optional
+        The smoothing sigmas (in physical units) for the BSpline registration.
+        The default value is [2, 1].
+    linearNumIters : int, optional
+        The maximum number of iterations for the linear registration. The 
+        default value is 500.
+    bsplineNumIters : int, optional
+        The maximum number of iterations for the BSpline registration. The 
+        default value is 30.
+    fixMask : SimpleITK Image, optional
+        A 3D binary mask of the volume within which sampling points will be 
+        considered in fixIm. The default value is None.
+    movMask : SimpleITK Image, optional
+        A 3D binary mask of the volume within which sampling points will be 
+        considered in movIm. The default value is None.
+    numThreads : int or None, optional
+        The number of threads to use for registration. If None SimpleITK's 
+        global default number of threads will be used. The default value is
+        None.
+    controller : ConvergenceController, optional
+        If provided, the controller (see image_tools.convergence) will be used
+        for both stages. The default value is None.
+    pyramidCache : PyramidCache, optional
+        If provided, both stages will be executed level by level using cached
+        pyramid levels (see execute_reg_by_level). The default value is None.
+    p2c : bool, optional
+        Denotes whether intermediate results will be logged to the console.
+        The default value is False.
+    regPlotFpath : str, optional
+        The file path to be assigned to the Metric v Iteration number plot
+        following optimisation if regPlotFpath is not ''. 
+        The default value is ''.
+    
+    Returns
+    -------
+    linearTx : SimpleITK AffineTransform
+        The linear transform (the pre-deformation transform), expressed about
+        the origin (see get_affine_tx_about_origin).
+    alignedIm : LazyImage
+        movIm resampled using linearTx (see image_tools.lazy).
+    finalTx : SimpleITK CompositeTransform
+        The composite of linearTx and the BSpline transform (points are mapped
+        by the BSpline then linearTx).
+    regIm : LazyImage
+        movIm resampled using finalTx.
+    metricValues : list of floats
+        The metric value at each iteration of both stages.
+    multiresIters : list of ints
+        The iteration number at each change of resolution of both stages.
+    
+    Note
+    ----
+    If a linear registration of the same images (with the same linearTxName 
+    and initMethod) has already been performed in this process (see 
+    store_linear_tx), its result will be used and the linear stage skipped.
+    
+    Since the BSpline only needs to model the residual deformation it is run
+    at the finer levels only, and converges in far fewer iterations than a
+    BSpline registration initialised with BSplineTransformInitializer.
+    
+    The linear and BSpline transforms correspond to the pre-deformation 
+    matrix and the deformable registration grid of a Deformable Spatial 
+    Registration Object (see create_pre_tx_from_def_dro and 
+    create_tx_from_def_dro in dro_tools.create_tx_from_dro).
+    """
+    
+    linearTx = get_stored_linear_tx(fixIm, movIm, linearTxName, initMethod)
+    
+    if linearTx is not None:
+        print(f'Using the stored {linearTxName} registration result for the',
+              'linear stage of the cascaded registration.\n')
+        
+        linearMetricValues = []
+        linearMultiresIters = []
+    else:
+        _, _, linearTx, _, linearMetricValues, linearMultiresIters = \
+            rigid_reg_im(
+                fixIm=fixIm, movIm=movIm, regTxName=linearTxName, 
+                initMethod=initMethod, fixFidsFpath=fixFidsFpath, 
+                movFidsFpath=movFidsFpath, samplingPercentage=5, 
+                numIters=linearNumIters, learningRate=1.0, optimiser='GDLS',
+                shrinkFactors=linearShrinkFactors, 
+                smoothingSigmas=linearSmoothingSigmas,
+                fixMask=fixMask, movMask=movMask, numThreads=numThreads, 
+                controller=controller, pyramidCache=pyramidCache, p2c=False
+                )
+        
+        # Copy the lists since they are reset by the next registration:
+        linearMetricValues = list(linearMetricValues)
+        linearMultiresIters = list(linearMultiresIters)
+        
+        linearTx = sitk.CompositeTransform(linearTx).GetNthTransform(0)
+        
+        store_linear_tx(fixIm, movIm, linearTxName, initMethod, linearTx)
+    
+    # The pre-deformation transform of a DRO has no centre of rotation:
+    linearTx = get_affine_tx_about_origin(linearTx)
+    
+    _, _, bsplineTx, regIm, bsplineMetricValues, bsplineMultiresIters = \
+        bspline_reg_im(
+            fixIm=fixIm, movIm=movIm, numControlPts=numControlPts, 
+            samplingPercentage=5, numIters=bsplineNumIters, 
+            shrinkFactors=bsplineShrinkFactors, 
+            smoothingSigmas=bsplineSmoothingSigmas, movInitialTx=linearTx,
+            fixMask=fixMask, movMask=movMask, numThreads=numThreads, 
+            controller=controller, pyramidCache=pyramidCache, p2c=False
+            )
+    
+    finalTx = sitk.CompositeTransform([linearTx, bsplineTx])
+    
+    numLinearIters = len(linearMetricValues)
+    
+    metricValues = linearMetricValues + list(bsplineMetricValues)
+    multiresIters = linearMultiresIters\
+        + [numLinearIters + item for item in bsplineMultiresIters]
+    
+    print(f'Cascaded registration: {numLinearIters} {linearTxName} and',
+          f'{len(bsplineMetricValues)} bspline iterations.\n')
+    
+    if p2c and regPlotFpath:
+        plot_values_and_export(metricValues, multiresIters, regPlotFpath)
+    
+    alignedIm = lazy_resample(movIm, fixIm, linearTx)
+    
+    return linearTx, alignedIm, finalTx, regIm, metricValues, multiresIters
+
 def register_im(
         fixIm, movIm, regTxName='affine', initMethod='landmarks',
-        fixFidsFpath='', movFidsFpath='', p2c=False, regPlotFpath=''
+        fixFidsFpath='', movFidsFpath='', fixMask=None, movMask=None,
+        cascade=False, numThreads=None, controller=None, pyramidCache=None, 
+        p2c=False, regPlotFpath=''
         ):
     """
-    Wrapper function for functions rigid_reg_im() and bspline_reg_im() 
-    to register two 3D SimpleITK images using SimpleITK.
+    Wrapper function for functions rigid_reg_im(), bspline_reg_im() and 
+    cascade_reg_im() to register two 3D SimpleITK images using SimpleITK.
     
     Parameters
     ----------
@@ -797,6 +1331,33 @@ def register_im(
         working directory) of the text file containing fiducials for movIm. 
         The string need not contain the .txt extension. This argument is only
         relevant if initMethod = 'landmarks'. The default value is ''.
+    fixMask : SimpleITK Image, optional
+        A 3D binary mask representing the volume within which sampling points 
+        will be considered in fixIm when optimising the registration.  The 
+        default value is None.
+    movMask : SimpleITK Image, optional
+        A 3D binary mask representing the volume within which sampling points 
+        will be considered in movIm when optimising the registration.  The 
+        default value is None.
+    cascade : bool, optional
+        If True and regTxName = 'bspline', the registration will be performed
+        using cascade_reg_im (affine then BSpline of the residual), and the 
+        results of linear registrations will be stored so that they can be 
+        reused by subsequent cascaded registrations of the same images (see 
+        store_linear_tx). The default value is False.
+    numThreads : int or None, optional
+        The number of threads to use for registration. If None SimpleITK's 
+        global default number of threads will be used. The default value is
+        None.
+    controller : ConvergenceController, optional
+        If provided, the controller (see image_tools.convergence) will set the
+        sampling percentage per level and stop/skip levels adaptively. The 
+        default value is None.
+    pyramidCache : PyramidCache, optional
+        If provided, the registration will be executed level by level using
+        the smoothed and shrunk levels of fixIm and movIm served from the
+        cache (see execute_reg_by_level and image_tools.pyramid). The default
+        value is None.
     p2c : bool, optional
         Denotes whether intermediate results will be logged to the console.
         The default value is False.
@@ -807,8 +1368,8 @@ def register_im(
         
     Returns
     -------
-    regIm : SimpleITK Image
-        The 3D registered image.
+    regIm : LazyImage
+        The 3D registered image (see image_tools.lazy).
     initialTx : SimpleITK Transform
         The SimpleITK Transform used to initialise the registration.
     finalTx : SimpleITK Transform
@@ -857,7 +1418,19 @@ def register_im(
     movIm = normalise_im(movIm)
     """
     
-    if regTxName == 'bspline':
+    if regTxName == 'bspline' and cascade:
+        if p2c:
+            print('Running cascade_reg_im()...\n')
+        
+        initialTx, alignedIm, finalTx, regIm, metricValues,\
+            multiresIters = cascade_reg_im(
+                fixIm=fixIm, movIm=movIm, linearTxName='affine',
+                initMethod=initMethod, fixFidsFpath=fixFidsFpath, 
+                movFidsFpath=movFidsFpath, fixMask=fixMask, movMask=movMask,
+                numThreads=numThreads, controller=controller, 
+                pyramidCache=pyramidCache, p2c=p2c, regPlotFpath=regPlotFpath
+                )
+    elif regTxName == 'bspline':
         if p2c:
             print('Running bspline_reg()...\n')
             
@@ -868,7 +1441,9 @@ def register_im(
                 movFidsFpath=movFidsFpath,
                 numControlPts=8, samplingPercentage=5,
                 numIters=100, learningRate=5.0, 
-                p2c=p2c, regPlotFpath=regPlotFpath
+                fixMask=fixMask, movMask=movMask,
+                numThreads=numThreads, controller=controller,
+                pyramidCache=pyramidCache, p2c=p2c, regPlotFpath=regPlotFpath
                 )
     else:
         if p2c:
@@ -885,7 +1460,822 @@ def register_im(
                 movFidsFpath=movFidsFpath,
                 samplingPercentage=5, numIters=500, 
                 learningRate=1.0, optimiser=optimiser,
-                p2c=p2c, regPlotFpath=regPlotFpath
+                fixMask=fixMask, movMask=movMask,
+                numThreads=numThreads, controller=controller,
+                pyramidCache=pyramidCache, p2c=p2c, regPlotFpath=regPlotFpath
                 )
+        
+        if cascade:
+            store_linear_tx(fixIm, movIm, regTxName, initMethod, finalTx)
+    
+    return initialTx, alignedIm, finalTx, regIm, metricValues, multiresIters
+
+def get_default_reg_candidates(
+        regTxName='affine', initMethod='geometry', fixFidsFpath='', 
+        movFidsFpath=''
+        ):
+    """
+    Get the default candidate configurations for multi-start registration.
+    
+    Parameters
+    ----------
+    regTxName : str, optional
+        Transformation to use for registration ('rigid', 'rigid_scale', 
+        'affine' or 'bspline'). The default value is 'affine'.
+    initMethod : str, optional
+        The initialisation method (see rigid_reg_im) for the first candidate. 
+        The default value is 'geometry'.
+    fixFidsFpath : str, optional
+        The file path of the text file containing fiducials for fixIm. The 
+        default value is ''.
+    movFidsFpath : str, optional
+        The file path of the text file containing fiducials for movIm. The 
+        default value is ''.
+    
+    Returns
+    -------
+    candidates : list of dicts
+        A list (for each candidate) of a dictionary of keyword arguments for 
+        rigid_reg_im (or bspline_reg_im if regTxName = 'bspline').
+    
+    Note
+    ----
+    The candidates for rigid/affine registrations cover the optimisers and 
+    sampling percentages compared in the Notes of rigid_reg_im (GDLS v LBFGSB
+    and 5% v 1%), together with an alternative initialisation.
+    """
+    
+    if regTxName == 'bspline':
+        candidates = [
+            {'samplingPercentage' : 5, 'numControlPts' : 8},
+            {'samplingPercentage' : 10, 'numControlPts' : 8},
+            {'samplingPercentage' : 5, 'numControlPts' : 6},
+            {'samplingPercentage' : 5, 'numControlPts' : 8, 
+             'learningRate' : 2.5}
+            ]
+        
+        for candidate in candidates:
+            candidate['fixFidsFpath'] = fixFidsFpath
+            candidate['movFidsFpath'] = movFidsFpath
+    else:
+        if initMethod in ['moments', 'centerofgravity']:
+            altInitMethod = 'geometry'
+        else:
+            altInitMethod = 'moments'
+        
+        candidates = [
+            {'optimiser' : 'GDLS', 'samplingPercentage' : 5, 
+             'initMethod' : initMethod},
+            {'optimiser' : 'LBFGSB', 'samplingPercentage' : 5, 
+             'initMethod' : initMethod},
+            {'optimiser' : 'GDLS', 'samplingPercentage' : 1, 
+             'initMethod' : initMethod},
+            {'optimiser' : 'GDLS', 'samplingPercentage' : 5, 
+             'initMethod' : altInitMethod}
+            ]
+        
+        for candidate in candidates:
+            candidate['regTxName'] = regTxName
+            candidate['fixFidsFpath'] = fixFidsFpath
+            candidate['movFidsFpath'] = movFidsFpath
+    
+    return candidates
+
+def evaluate_reg_metric(
+        fixIm, movIm, sitkTx, samplingPercentage=10, fixMask=None, 
+        movMask=None
+        ):
+    """
+    Evaluate the Mattes mutual information between fixIm and movIm 
+    transformed by sitkTx using regular (i.e. repeatable) sampling.
+    
+    Parameters
+    ----------
+    fixIm : SimpleITK Image 
+        The 3D fixed image.
+    movIm : SimpleITK Image
+        The 3D moving image.
+    sitkTx : SimpleITK Transform
+        The transform that maps fixIm to movIm.
+    samplingPercentage : int or float, optional
+        The percentage of the images that are sampled for evaluating the 
+        metric. The default value is 10.
+    fixMask : SimpleITK Image, optional
+        A mask of the region of fixIm that the metric will be evaluated in. 
+        The default value is None.
+    movMask : SimpleITK Image, optional
+        A mask of the region of movIm that the metric will be evaluated in. 
+        The default value is None.
+    
+    Returns
+    -------
+    metricVal : float
+        The metric value (lower is better).
+    
+    Note
+    ----
+    The metric values reported by the optimisers of different candidates
+    are not comparable since they were obtained with different (random) 
+    sampling, so the candidates are compared using this common evaluation.
+    """
+    
+    regMethod = sitk.ImageRegistrationMethod()
+    regMethod.SetMetricAsMattesMutualInformation(numberOfHistogramBins=50)
+    regMethod.SetMetricSamplingStrategy(regMethod.REGULAR)
+    regMethod.SetMetricSamplingPercentage(samplingPercentage/100)
+    regMethod.SetInterpolator(sitk.sitkLinear)
+    regMethod.SetInitialTransform(sitkTx, inPlace=False)
+    if fixMask:
+        regMethod.SetMetricFixedMask(fixMask)
+    if movMask:
+        regMethod.SetMetricMovingMask(movMask)
+    
+    metricVal = regMethod.MetricEvaluate(fixIm, movIm)
+    
+    return metricVal
+
+def refine_reg_tx(
+        fixIm, movIm, sitkTx, numIters=20, samplingPercentage=10, 
+        numThreads=None
+        ):
+    """
+    Run a short rigid registration of fixIm and movIm starting from sitkTx,
+    to measure how much the alignment of an existing transform can be 
+    improved.
+    
+    Parameters
+    ----------
+    fixIm : SimpleITK Image 
+        The 3D fixed image.
+    movIm : SimpleITK Image
+        The 3D moving image.
+    sitkTx : SimpleITK Transform
+        The transform that maps fixIm to movIm, which is kept fixed (i.e. the
+        registration optimises a rigid correction of it).
+    numIters : int, optional
+        The maximum number of iterations. The default value is 20.
+    samplingPercentage : int or float, optional
+        The percentage of the images that are sampled for evaluating the 
+        metric. The default value is 10.
+    numThreads : int or None, optional
+        The number of threads used by the registration, or None to use the
+        SimpleITK global default. The default value is None.
+    
+    Returns
+    -------
+    initMetric : float
+        The metric value (lower is better) of sitkTx.
+    finalMetric : float
+        The metric value of sitkTx corrected by the registration.
+    shift : float
+        The largest displacement (in mm) of the corners of fixIm by the
+        correction.
+    
+    Note
+    ----
+    The metric is sampled regularly (as in evaluate_reg_metric) so that 
+    initMetric and finalMetric are comparable.
+    """
+    
+    corrTx = sitk.Euler3DTransform()
+    corrTx.SetCenter(
+        fixIm.TransformContinuousIndexToPhysicalPoint(
+            [(size - 1)/2 for size in fixIm.GetSize()]
+            )
+        )
+    
+    regMethod = sitk.ImageRegistrationMethod()
+    regMethod.SetMetricAsMattesMutualInformation(numberOfHistogramBins=50)
+    regMethod.SetMetricSamplingStrategy(regMethod.REGULAR)
+    regMethod.SetMetricSamplingPercentage(samplingPercentage/100)
+    regMethod.SetInterpolator(sitk.sitkLinear)
+    regMethod.SetOptimizerAsRegularStepGradientDescent(
+        learningRate=1.0, minStep=1e-4, numberOfIterations=numIters
+        )
+    regMethod.SetOptimizerScalesFromPhysicalShift()
+    regMethod.SetMovingInitialTransform(sitkTx)
+    regMethod.SetInitialTransform(corrTx, inPlace=True)
+    if numThreads is not None:
+        regMethod.SetNumberOfThreads(numThreads)
+    
+    initMetric = regMethod.MetricEvaluate(fixIm, movIm)
+    
+    regMethod.Execute(fixIm, movIm)
+    
+    finalMetric = regMethod.MetricEvaluate(fixIm, movIm)
+    
+    corners = [
+        fixIm.TransformIndexToPhysicalPoint(
+            [(size - 1)*corner[i] for i, size in enumerate(fixIm.GetSize())]
+            )
+        for corner in np.ndindex(2, 2, 2)
+        ]
+    
+    shift = max(
+        np.linalg.norm(np.subtract(corrTx.TransformPoint(pt), pt)) 
+        for pt in corners
+        )
+    
+    return initMetric, finalMetric, float(shift)
+
+def run_reg_candidate(
+        candId, regTxName, candidate, fixImFpath, movImFpath, exportDir,
+        progressQueue, cancelFlags, numThreads=None, fixMaskFpath='', 
+        movMaskFpath=''
+        ):
+    """
+    Run a candidate registration (in a worker process) for 
+    multistart_reg_im.
+    
+    Parameters
+    ----------
+    candId : int
+        The index of the candidate.
+    regTxName : str
+        Transformation to use for registration.
+    candidate : dict
+        Dictionary of keyword arguments for rigid_reg_im (or bspline_reg_im
+        if regTxName = 'bspline').
+    fixImFpath : str
+        The file path of the fixed image.
+    movImFpath : str
+        The file path of the moving image.
+    exportDir : str
+        The directory to export the initial and final transforms to.
+    progressQueue : Queue
+        A (Manager) queue that (candId, level, iteration, metric value) will
+        be put on at every iteration.
+    cancelFlags : dict
+        A (Manager) dictionary that the candidate will be cancelled by if 
+        cancelFlags[candId] is True.
+    numThreads : int or None, optional
+        The number of threads to use for registration. The default value is
+        None.
+    fixMaskFpath : str, optional
+        The file path of the mask of the fixed image (used to limit the 
+        region that the metric is evaluated in), or '' if there is none. The
+        default value is ''.
+    movMaskFpath : str, optional
+        The file path of the mask of the moving image, or '' if there is 
+        none. The default value is ''.
+    
+    Returns
+    -------
+    result : dict
+        Dictionary containing the diagnostics for the candidate and the file 
+        paths of the exported transforms.
+    """
+    
+    result = {
+        'candId' : candId,
+        'candidate' : candidate,
+        'status' : None,
+        'time' : None,
+        'finalMetric' : None,
+        'stopCondition' : None,
+        'metricValues' : [],
+        'multiresIters' : [],
+        'initTxFpath' : '',
+        'finalTxFpath' : '',
+        'error' : ''
+        }
+    
+    # The ImageRegistrationMethod (for the stopping condition):
+    regMethods = []
+    
+    def monitor(regMethod):
+        if not regMethods:
+            regMethods.append(regMethod)
+        
+        progressQueue.put(
+            (candId, regMethod.GetCurrentLevel(), 
+             regMethod.GetOptimizerIteration(), regMethod.GetMetricValue())
+            )
+        
+        # Stopping the optimiser ends the current level only, so this is
+        # repeated at each remaining level:
+        if cancelFlags.get(candId, False):
+            regMethod.StopRegistration()
+    
+    t0 = time.time()
+    
+    try:
+        fixIm = sitk.ReadImage(fixImFpath)
+        movIm = sitk.ReadImage(movImFpath)
+        
+        fixMask = sitk.ReadImage(fixMaskFpath) if fixMaskFpath else None
+        movMask = sitk.ReadImage(movMaskFpath) if movMaskFpath else None
+        
+        if regTxName == 'bspline':
+            initialTx, alignedIm, finalTx, regIm, metricValues,\
+                multiresIters = bspline_reg_im(
+                    fixIm=fixIm, movIm=movIm, fixMask=fixMask, 
+                    movMask=movMask, numThreads=numThreads, 
+                    iterCallback=monitor, **candidate
+                    )
+        else:
+            initialTx, alignedIm, finalTx, regIm, metricValues,\
+                multiresIters = rigid_reg_im(
+                    fixIm=fixIm, movIm=movIm, fixMask=fixMask, 
+                    movMask=movMask, numThreads=numThreads, 
+                    iterCallback=monitor, **candidate
+                    )
+        
+        result['initTxFpath'] = os.path.join(
+            exportDir, f'cand{candId}_initialTx.tfm'
+            )
+        result['finalTxFpath'] = os.path.join(
+            exportDir, f'cand{candId}_finalTx.tfm'
+            )
+        sitk.WriteTransform(initialTx, result['initTxFpath'])
+        sitk.WriteTransform(finalTx, result['finalTxFpath'])
+        
+        result['metricValues'] = list(metricValues)
+        result['multiresIters'] = list(multiresIters)
+        if metricValues:
+            result['finalMetric'] = metricValues[-1]
+        if regMethods:
+            result['stopCondition']\
+                = regMethods[0].GetOptimizerStopConditionDescription()
+        
+        if cancelFlags.get(candId, False):
+            result['status'] = 'cancelled'
+        else:
+            result['status'] = 'completed'
+    except Exception as err:
+        result['status'] = 'failed'
+        result['error'] = repr(err)
+    
+    result['time'] = time.time() - t0
+    
+    return result
+
+def get_smoothed_metric(metrics, minIters=10):
+    """
+    Get the smoothed metric value of a candidate at a resolution level.
+    
+    Parameters
+    ----------
+    metrics : list of floats
+        The most recent metric values (at most minIters) reported by the
+        optimiser at the level.
+    minIters : int, optional
+        The number of iterations the metric values are averaged over. The 
+        default value is 10.
+    
+    Returns
+    -------
+    metric : float or None
+        The mean of the metric values, or None if fewer than minIters metric
+        values are available.
+    
+    Note
+    ----
+    With RANDOM sampling the metric value reported at each iteration is 
+    noisy (since a different set of points is sampled at every iteration), 
+    so the running minimum is biased towards candidates with noisier (e.g.
+    lower percentage) sampling. The mean over the last minIters iterations
+    is much less sensitive to the noise.
+    """
+    
+    if len(metrics) < minIters:
+        return None
+    
+    return sum(metrics[-minIters:])/minIters
+
+def get_cancel_reason(candId, progress, cancelTol=0.05, minIters=10):
+    """
+    Determine whether a running candidate should be cancelled, i.e. whether
+    another (running or completed) candidate with the same sampling 
+    percentage has achieved a better smoothed metric value at the same 
+    resolution level by more than cancelTol.
+    
+    Parameters
+    ----------
+    candId : int
+        The index of the candidate.
+    progress : dict
+        Dictionary (with candidate indices as keys) of dictionaries with keys
+        'status', 'level', 'samplingPercentage' and 'metricsByLevel' (a 
+        dictionary, with levels as keys, of a list of the most recent metric
+        values, at most minIters, at that level).
+    cancelTol : float, optional
+        The fractional margin (relative to the magnitude of the better metric
+        value) by which another candidate must be better. The default value is
+        0.05.
+    minIters : int, optional
+        The number of iterations the metric values are averaged over (see 
+        get_smoothed_metric), and so the minimum number of iterations both
+        candidates must have completed at the level before they are compared.
+        The default value is 10.
+    
+    Returns
+    -------
+    reason : str
+        The reason for cancellation, or '' if the candidate should not be 
+        cancelled.
+    
+    Note
+    ----
+    The metric values of candidates with different sampling percentages 
+    aren't comparable (see evaluate_reg_metric), so such candidates never
+    cancel each other.
+    """
+    
+    cand = progress[candId]
+    level = cand['level']
+    
+    if level is None:
+        return ''
+    
+    metric = get_smoothed_metric(cand['metricsByLevel'][level], minIters)
+    
+    if metric is None:
+        return ''
+    
+    for otherId, other in progress.items():
+        if otherId == candId or other['status'] in ['cancelled', 'failed']:
+            continue
+        
+        if other['samplingPercentage'] != cand['samplingPercentage']:
+            continue
+        
+        if not level in other['metricsByLevel']:
+            continue
+        
+        otherMetric = get_smoothed_metric(
+            other['metricsByLevel'][level], minIters
+            )
+        
+        if otherMetric is None:
+            continue
+        
+        if otherMetric < metric - cancelTol*abs(otherMetric):
+            reason = f"metric {metric:.5f} at level {level} is worse than "\
+                + f"{otherMetric:.5f} (candidate {otherId})"
+            return reason
+    
+    return ''
+
+def multistart_reg_im(
+        fixIm, movIm, regTxName='affine', initMethod='geometry', 
+        fixFidsFpath='', movFidsFpath='', candidates=None, maxWorkers=None,
+        cancelTol=0.05, minIters=10, evalSamplingPercentage=10, 
+        fixMask=None, movMask=None, numThreads=None, p2c=False
+        ):
+    """
+    Register two 3D SimpleITK images by running several candidate 
+    registrations (with different optimisers, sampling percentages and/or
+    initialisations) concurrently in a process pool and selecting the best.
+    
+    Parameters
+    ----------
+    fixIm : SimpleITK Image 
+        The 3D image that movIm will be registered to.
+    movIm : SimpleITK Image
+        The 3D image that will be registered to fixIm.
+    regTxName : str, optional
+        Transformation to use for registration ('rigid', 'rigid_scale', 
+        'affine' or 'bspline'). The default value is 'affine'.
+    initMethod : str, optional
+        The initialisation method (see rigid_reg_im) used for the default 
+        candidates. The default value is 'geometry'.
+    fixFidsFpath : str, optional
+        The file path of the text file containing fiducials for fixIm. The 
+        default value is ''.
+    movFidsFpath : str, optional
+        The file path of the text file containing fiducials for movIm. The 
+        default value is ''.
+    candidates : list of dicts, optional
+        A list (for each candidate) of a dictionary of keyword arguments for 
+        rigid_reg_im (or bspline_reg_im if regTxName = 'bspline'). If None 
+        the candidates from get_default_reg_candidates will be used. The 
+        default value is None.
+    maxWorkers : int, optional
+        The maximum number of candidates to run concurrently. If None the 
+        smaller of the number of candidates and the number of available CPUs
+        will be used. The default value is None.
+    cancelTol : float, optional
+        The fractional margin by which another candidate must be better for a
+        candidate to be cancelled (see get_cancel_reason). The default value 
+        is 0.05.
+    minIters : int, optional
+        The number of iterations the metric values are averaged over, and so
+        the minimum number of iterations a candidate must complete at a level
+        before it can be cancelled (see get_cancel_reason). The default value
+        is 10.
+    evalSamplingPercentage : int or float, optional
+        The sampling percentage used to compare the candidates (see 
+        evaluate_reg_metric). The default value is 10.
+    fixMask : SimpleITK Image, optional
+        A mask of the region of fixIm that the metric of every candidate (and
+        the common evaluation metric) will be evaluated in. The default value
+        is None.
+    movMask : SimpleITK Image, optional
+        A mask of the region of movIm that the metric of every candidate (and
+        the common evaluation metric) will be evaluated in. The default value
+        is None.
+    numThreads : int or None, optional
+        The total number of threads to divide between the workers. If None 
+        all available CPUs will be used. The default value is None.
+    p2c : bool, optional
+        Denotes whether intermediate results will be logged to the console.
+        The default value is False.
+    
+    Returns
+    -------
+    initialTx : SimpleITK Transform
+        The SimpleITK Transform used to initialise the best registration.
+    alignedIm : LazyImage
+        movIm resampled using initialTx (see image_tools.lazy).
+    finalTx : SimpleITK Transform
+        The final SimpleITK Transform of the best registration.
+    regIm : LazyImage
+        The 3D registered image (see image_tools.lazy).
+    metricValues : list of floats
+        The metric values at each iteration for the best registration.
+    multiresIters : list of ints
+        The iteration numbers at each change of resolution for the best 
+        registration.
+    candResults : list of dicts
+        A list (for each candidate) of a dictionary containing the 
+        candidate's parameters, status ('completed', 'cancelled' or 
+        'failed'), run time, number of iterations, final optimiser metric
+        value, common evaluation metric value ('evalMetric'), optimiser 
+        stopping condition, reason for cancellation and error (if any).
+    
+    Note
+    ----
+    Each worker reports its metric value at every iteration. A running
+    candidate is cancelled once another candidate with the same sampling 
+    percentage has achieved a better smoothed metric value (the mean over 
+    the last minIters iterations) at the same resolution level by more than
+    cancelTol (see get_cancel_reason), so that poor candidates don't delay 
+    the result. The
+    wall time is therefore close to that of the slowest competitive 
+    candidate rather than the sum of all candidates.
+    
+    The thread budget (numThreads) is divided between the workers (see
+    image_tools.threads) so that the concurrent registrations don't 
+    oversubscribe the CPUs.
+    
+    The best candidate is the completed candidate with the lowest common 
+    evaluation metric (evaluate_reg_metric). If no candidate completed (e.g.
+    if the candidate that caused the others to be cancelled then failed) the
+    best of the cancelled candidates (whose transforms at cancellation are 
+    exported) is used instead.
+    """
+    
+    if candidates is None:
+        candidates = get_default_reg_candidates(
+            regTxName, initMethod, fixFidsFpath, movFidsFpath
+            )
+    
+    if not candidates:
+        msg = "At least one candidate is required for multi-start "\
+            + "registration."
+        raise Exception(msg)
+    
+    if maxWorkers is None:
+        maxWorkers = min(len(candidates), get_num_of_cpus())
+    
+    numThreadsPerWorker = get_num_threads_per_worker(maxWorkers, numThreads)
+    
+    # Start timing:
+    times = []
+    times.append(time.time())
+    
+    # The images and transforms are exchanged with the workers via files:
+    exportDir = tempfile.mkdtemp(prefix='multistart_reg_')
+    fixImFpath = os.path.join(exportDir, 'fixIm.mha')
+    movImFpath = os.path.join(exportDir, 'movIm.mha')
+    sitk.WriteImage(fixIm, fixImFpath)
+    sitk.WriteImage(movIm, movImFpath)
+    
+    fixMaskFpath = ''
+    movMaskFpath = ''
+    if fixMask:
+        fixMaskFpath = os.path.join(exportDir, 'fixMask.mha')
+        sitk.WriteImage(fixMask, fixMaskFpath)
+    if movMask:
+        movMaskFpath = os.path.join(exportDir, 'movMask.mha')
+        sitk.WriteImage(movMask, movMaskFpath)
+    
+    progress = {}
+    for candId in range(len(candidates)):
+        progress[candId] = {
+            'status' : 'pending', 'level' : None, 
+            'samplingPercentage' : candidates[candId].get(
+                'samplingPercentage', 5
+                ),
+            'metricsByLevel' : {}, 'cancelReason' : ''
+            }
+    
+    results = {}
+    
+    ctx = multiprocessing.get_context('spawn')
+    
+    try:
+        with ctx.Manager() as manager:
+            progressQueue = manager.Queue()
+            cancelFlags = manager.dict()
+            
+            with ProcessPoolExecutor(
+                    max_workers=maxWorkers, mp_context=ctx, 
+                    initializer=init_pool_worker, 
+                    initargs=(numThreadsPerWorker,)
+                    ) as executor:
+                futures = {}
+                for candId, candidate in enumerate(candidates):
+                    future = executor.submit(
+                        run_reg_candidate, candId, regTxName, candidate, 
+                        fixImFpath, movImFpath, exportDir, progressQueue, 
+                        cancelFlags, numThreadsPerWorker, fixMaskFpath, 
+                        movMaskFpath
+                        )
+                    futures[future] = candId
+                
+                while futures:
+                    # Monitor the progress of the running candidates:
+                    try:
+                        candId, level, iteration, metric\
+                            = progressQueue.get(timeout=0.1)
+                        
+                        cand = progress[candId]
+                        
+                        if cand['status'] == 'pending':
+                            cand['status'] = 'running'
+                        
+                        cand['level'] = level
+                        
+                        # Keep the most recent minIters metric values at
+                        # this level (see get_smoothed_metric):
+                        metrics = cand['metricsByLevel'].setdefault(
+                            level, []
+                            )
+                        metrics.append(metric)
+                        del metrics[:-minIters]
+                    except queue.Empty:
+                        pass
+                    
+                    # Cancel the losers:
+                    for candId, cand in progress.items():
+                        if cand['status'] != 'running':
+                            continue
+                        
+                        reason = get_cancel_reason(
+                            candId, progress, cancelTol, minIters
+                            )
+                        
+                        if reason:
+                            cand['status'] = 'cancelled'
+                            cand['cancelReason'] = reason
+                            cancelFlags[candId] = True
+                            
+                            if p2c:
+                                print(f'\nCancelling candidate {candId}: '
+                                      f'{reason}\n')
+                    
+                    done = [future for future in futures if future.done()]
+                    
+                    for future in done:
+                        candId = futures.pop(future)
+                        result = future.result()
+                        results[candId] = result
+                        
+                        if result['status'] == 'completed':
+                            progress[candId]['status'] = 'completed'
+                        elif result['status'] == 'failed':
+                            progress[candId]['status'] = 'failed'
+        
+        # Evaluate the candidates using a common metric:
+        candResults = []
+        bestId = None
+        bestMetric = None
+        
+        for candId in range(len(candidates)):
+            result = results[candId]
+            
+            candResult = {
+                'candId' : candId,
+                'candidate' : result['candidate'],
+                'status' : result['status'],
+                'time' : result['time'],
+                'numIters' : len(result['metricValues']),
+                'finalMetric' : result['finalMetric'],
+                'evalMetric' : None,
+                'stopCondition' : result['stopCondition'],
+                'cancelReason' : progress[candId]['cancelReason'],
+                'error' : result['error']
+                }
+            
+            candResults.append(candResult)
+        
+        # Choose from the completed candidates, or if none completed (e.g. 
+        # the candidate that caused the others to be cancelled then failed),
+        # from the cancelled candidates whose transforms were exported:
+        for status in ['completed', 'cancelled']:
+            for candResult in candResults:
+                result = results[candResult['candId']]
+                
+                if result['status'] != status or not result['finalTxFpath']:
+                    continue
+                
+                finalTx = sitk.ReadTransform(result['finalTxFpath'])
+                
+                evalMetric = evaluate_reg_metric(
+                    fixIm, movIm, finalTx, evalSamplingPercentage, fixMask,
+                    movMask
+                    )
+                candResult['evalMetric'] = evalMetric
+                
+                if bestMetric is None or evalMetric < bestMetric:
+                    bestId = candResult['candId']
+                    bestMetric = evalMetric
+            
+            if bestId is not None:
+                break
+        
+        if bestId is None:
+            errors = [f"{result['candId']}: {result['error']}" 
+                      for result in candResults]
+            msg = "None of the multi-start registration candidates "\
+                + f"completed:\n{errors}"
+            raise Exception(msg)
+        
+        if candResults[bestId]['status'] == 'cancelled':
+            print('None of the multi-start registration candidates',
+                  f'completed, so the best cancelled candidate ({bestId})',
+                  'was used.\n')
+        
+        initialTx = sitk.ReadTransform(results[bestId]['initTxFpath'])
+        finalTx = sitk.ReadTransform(results[bestId]['finalTxFpath'])
+        metricValues = results[bestId]['metricValues']
+        multiresIters = results[bestId]['multiresIters']
+    finally:
+        shutil.rmtree(exportDir, ignore_errors=True)
+    
+    for candResult in candResults:
+        candResult['best'] = candResult['candId'] == bestId
+    
+    # Resample movIm using finalTx to get the registered image:
+    regIm = lazy_resample(movIm, fixIm, finalTx)
+    
+    # Resample movIm using intialTx to get the pre-registration aligned image 
+    # (for info only - not required):
+    alignedIm = lazy_resample(movIm, fixIm, initialTx)
+    
+    times.append(time.time())
+    dTime = times[-1] - times[-2]
+    
+    print_reg_candidates(candResults)
+    
+    print(f'*Took {dTime:.1f} s ({dTime/60:.1f} min) to perform multi-start',
+          f'image registration ({len(candidates)} candidates, {maxWorkers}',
+          'workers).\n')
+    
+    return initialTx, alignedIm, finalTx, regIm, metricValues, multiresIters,\
+        candResults
+
+def print_reg_candidates(candResults):
+    """
+    Print the diagnostics for each candidate of a multi-start registration.
+    
+    Parameters
+    ----------
+    candResults : list of dicts
+        The list (for each candidate) of diagnostics returned by 
+        multistart_reg_im.
+    
+    Returns
+    -------
+    None.
+    """
+    
+    print('\nMulti-start registration candidates:')
+    
+    for candResult in candResults:
+        params = ', '.join(
+            [f'{key}={val}' for key, val in candResult['candidate'].items()
+             if not key in ['fixFidsFpath', 'movFidsFpath']]
+            )
+        
+        if candResult['evalMetric'] is None:
+            evalMetric = '-'
+        else:
+            evalMetric = f"{candResult['evalMetric']:.5f}"
+        
+        best = ' (best)' if candResult.get('best', False) else ''
+        
+        print(f"   {candResult['candId']}: {params}")
+        print(f"      {candResult['status']}{best}, "
+              f"{candResult['time']:.1f} s, {candResult['numIters']} iters, "
+              f"evalMetric = {evalMetric}")
+        
+        if candResult['cancelReason']:
+            print(f"      cancelled as {candResult['cancelReason']}")
+        
+        if candResult['error']:
+            print(f"      error: {candResult['error']}")
     
-    return initialTx, alignedIm, finalTx, regIm, metricValues, multiresIters
\ No newline at end of file
+    print('')
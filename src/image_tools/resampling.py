@@ -14,9 +14,10 @@ reload(image_tools.operations)
 import image_tools.attrs_info
 reload(image_tools.attrs_info)
 
+import numpy as np
 import SimpleITK as sitk
 
-from image_tools.attrs_info import get_im_info
+from image_tools.attrs_info import get_im_info, get_cached_im_stats
 from image_tools.operations import (
     change_im_dtype, find_thresh, binarise_im, gaussian_blur_im#, recursive_gaussian_blur_im
     )
@@ -26,10 +27,161 @@ from plotting_tools.general import plot_two_ims
 from general_tools.console_printing import (
     print_indsByRoi#, print_ptsByCntByRoi, print_pixarrBySeg, print_labimBySeg
     )
+from general_tools.transforming import get_affine_matrix, get_im_geometry
+
+def get_grid_index_map(im, refIm, sitkTx, tol=1e-3):
+    """
+    Determine whether resampling an image onto the gridspace of a reference
+    image reduces to indexing, i.e. whether every voxel centre of refIm maps
+    (under sitkTx) onto a voxel centre of im.
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The 3D image to be resampled.
+    refIm : SimpleITK Image
+        The 3D image whose gridspace im would be resampled to.
+    sitkTx : SimpleITK Transform
+        The transform that maps points in refIm to points in im.
+    tol : float, optional
+        The maximum deviation (in voxels) of the mapped indices from integers.
+        The default value is 1e-3.
+    
+    Returns
+    -------
+    indexMap : list of tuples of ints or None
+        A list (for each axis of refIm) of the (axis, step, offset) of im,
+        such that the index of im along axis is step*n + offset for index n
+        of refIm, or None if the mapping isn't an integer offset, stride
+        and/or permutation (e.g. if sitkTx isn't linear, or the spacings of
+        refIm aren't integer multiples of those of im).
+    """
+    
+    affMatrix = get_affine_matrix(sitkTx)
+    
+    if affMatrix is None:
+        return None
+    
+    refInd2pt = get_im_geometry(refIm)[0]
+    imPt2ind = get_im_geometry(im)[1]
+    
+    # Map from indices of refIm to continuous indices of im:
+    indMatrix = imPt2ind @ affMatrix @ refInd2pt
+    
+    roundedMatrix = np.round(indMatrix)
+    
+    if np.abs(indMatrix - roundedMatrix).max() > tol:
+        return None
+    
+    linMatrix = roundedMatrix[:3, :3]
+    
+    # Each axis of refIm must map to a different axis of im:
+    if not (np.count_nonzero(linMatrix, axis=0) == 1).all()\
+            or not (np.count_nonzero(linMatrix, axis=1) == 1).all():
+        return None
+    
+    indexMap = []
+    
+    for a in range(3):
+        axis = int(np.flatnonzero(linMatrix[:, a])[0])
+        
+        indexMap.append(
+            (axis, int(linMatrix[axis, a]), int(roundedMatrix[axis, 3]))
+            )
+    
+    return indexMap
+
+def resample_im_by_indexing(im, refIm, indexMap, dtype=None):
+    """
+    Resample an image onto the gridspace of a reference image by Numpy
+    indexing (see get_grid_index_map).
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The 3D image to be resampled.
+    refIm : SimpleITK Image
+        The 3D image whose gridspace im will be resampled to.
+    indexMap : list of tuples of ints
+        The list (for each axis of refIm) of the (axis, step, offset) of im
+        from get_grid_index_map.
+    dtype : Numpy dtype, optional
+        The dtype of the resampled image. If None the dtype of im will be
+        used. The default value is None.
+    
+    Returns
+    -------
+    resIm : SimpleITK Image
+        The resampled 3D image, with zeros outside of the extent of im.
+    
+    Note
+    ----
+    The voxels of im are selected by slicing with (possibly negative) steps
+    and transposing a view of its pixel array, so the only copy is to the
+    resampled image.
+    """
+    
+    imArr = sitk.GetArrayViewFromImage(im)
+    
+    if dtype is None:
+        dtype = imArr.dtype
+    
+    imSize = im.GetSize()
+    refSize = refIm.GetSize()
+    
+    # Slices of the pixel arrays of im and refIm (which are in z, y, x order):
+    imSlices = [None]*3
+    refSlices = [None]*3
+    
+    # The axis of the pixel array of im for each axis of refIm's:
+    order = [None]*3
+    
+    for a, (axis, step, offset) in enumerate(indexMap):
+        # The range of indices n along axis a of refIm for which
+        # 0 <= step*n + offset < imSize[axis]:
+        if step > 0:
+            nMin = int(np.ceil(-offset/step))
+            nMax = int(np.floor((imSize[axis] - 1 - offset)/step))
+        else:
+            nMin = int(np.ceil((imSize[axis] - 1 - offset)/step))
+            nMax = int(np.floor(-offset/step))
+        
+        nMin = max(nMin, 0)
+        nMax = min(nMax, refSize[a] - 1)
+        
+        if nMin > nMax:
+            # refIm doesn't overlap im:
+            resArr = np.zeros(refSize[::-1], dtype=dtype)
+            
+            resIm = sitk.GetImageFromArray(resArr)
+            resIm.CopyInformation(refIm)
+            
+            return resIm
+        
+        start = step*nMin + offset
+        stop = step*nMax + offset + (1 if step > 0 else -1)
+        
+        imSlices[2 - axis] = slice(start, stop if stop >= 0 else None, step)
+        refSlices[2 - a] = slice(nMin, nMax + 1)
+        order[2 - a] = 2 - axis
+    
+    subArr = np.transpose(imArr[tuple(imSlices)], order)
+    
+    if subArr.shape == tuple(refSize[::-1]):
+        resArr = subArr.astype(dtype)
+    else:
+        resArr = np.zeros(refSize[::-1], dtype=dtype)
+        resArr[tuple(refSlices)] = subArr
+    
+    resIm = sitk.GetImageFromArray(resArr)
+    resIm.CopyInformation(refIm)
+    
+    return resIm
 
 def resample_im(im, refIm, sitkTx=sitk.Transform(3, sitk.sitkIdentity),
                 #sitkTx=sitk.Transform(), 
-                interp='Linear', p2c=False):
+                interp='Linear', numThreads=None, useGridAligned=False, 
+                p2c=False):
     """
     Resample a 3D SimpleITK image.
     
@@ -49,6 +201,13 @@ def resample_im(im, refIm, sitkTx=sitk.Transform(3, sitk.sitkIdentity),
         - 'NearestNeighbor'
         - 'LabelGaussian'
         The default value is 'Linear'.
+    numThreads : int or None, optional
+        The number of threads to use for resampling. If None SimpleITK's global
+        default number of threads will be used. The default value is None.
+    useGridAligned : bool, optional
+        If True, and the voxel centres of refIm map onto voxel centres of im
+        (see get_grid_index_map), im will be resampled by indexing rather than
+        interpolation. The default value is False.
     p2c : bool, optional
         Denotes whether some results will be logged to the console. The default
         value is False.
@@ -63,6 +222,11 @@ def resample_im(im, refIm, sitkTx=sitk.Transform(3, sitk.sitkIdentity),
     While a linear (or BSpline) interpolator is appropriate for intensity 
     images, only a NearestNeighbor interpolator is appropriate for binary 
     images (e.g. segmentations) so that no new labels are introduced.
+    
+    At voxel centres the NearestNeighbor, Linear and BSpline interpolators
+    return the voxel values, so for grid-aligned images indexing gives the 
+    same result. The LabelGaussian interpolator weights neighbouring voxels
+    so it is always used if chosen.
     """
     
     # Define which interpolator to use:
@@ -90,6 +254,18 @@ def resample_im(im, refIm, sitkTx=sitk.Transform(3, sitk.sitkIdentity),
         
         raise Exception(msg)
     
+    if useGridAligned and interp != 'LabelGaussian':
+        indexMap = get_grid_index_map(im, refIm, sitkTx)
+        
+        if indexMap is not None:
+            if p2c:
+                print(f'\nResampling by indexing (indexMap = {indexMap})\n')
+            
+            dtype = np.float32 if sitkPixType == sitk.sitkFloat32\
+                else np.uint32
+            
+            return resample_im_by_indexing(im, refIm, indexMap, dtype)
+    
     #print('\nUsing', Interpolation, 'interp\n')
     
     resampler = sitk.ResampleImageFilter()
@@ -99,6 +275,8 @@ def resample_im(im, refIm, sitkTx=sitk.Transform(3, sitk.sitkIdentity),
     resampler.SetReferenceImage(refIm)
     resampler.SetOutputPixelType(sitkPixType)
     resampler.SetDefaultPixelValue(0)
+    if numThreads is not None:
+        resampler.SetNumberOfThreads(numThreads)
     
     resIm = resampler.Execute(im)
     
@@ -113,7 +291,8 @@ def resample_labim(
         labim, f2sInds, im, refIm, sitkTx=sitk.Transform(3, sitk.sitkIdentity),
         #sitkTx=sitk.Transform(), 
         interp='NearestNeighbor', applyPreResBlur=False, preResVar=(1,1,1), 
-        applyPostResBlur=True, postResVar=(1,1,1), p2c=False
+        applyPostResBlur=True, postResVar=(1,1,1), numThreads=None, 
+        blurNumThreads=None, useGridAligned=False, p2c=False
         ):
     """
     Resample a 3D label image.
@@ -156,6 +335,19 @@ def resample_labim(
         A tuple (for each dimension) of the variance to be applied if the 
         labelmap image is to be Gaussian blurred prior after resampling. The
         default value is (1,1,1).
+    numThreads : int or None, optional
+        The number of threads to use for resampling. If None SimpleITK's global
+        default number of threads will be used. The default value is None.
+    blurNumThreads : int or None, optional
+        The number of threads to use for Gaussian blurring. If None SimpleITK's
+        global default number of threads will be used. The default value is
+        None.
+    useGridAligned : bool, optional
+        If True, and the voxel centres of refIm map onto voxel centres of 
+        labim (i.e. the transform and grids reduce to an integer offset, 
+        stride and/or permutation of indices; see get_grid_index_map), labim 
+        will be resampled by indexing, without interpolation or blurring. The
+        default value is False.
     p2c : bool, optional
         Denotes whether some results will be logged to the console. The 
         default value is False.
@@ -207,6 +399,12 @@ def resample_labim(
     
     Link: https://github.com/SimpleITK/SimpleITK/issues/1277
     
+    If labim is resampled by indexing (useGridAligned) the resampled label 
+    image is exact, since every voxel in refIm coincides with a voxel in 
+    labim. Strided (downsampled) labels can still alias, so if the result is
+    empty (and f2sInds isn't) labim is resampled as if useGridAligned were
+    False.
+    
     Rather than applying a Gaussian blur by default, might consider only 
     blurring if the labelim is very sparse (i.e. if there's only 1 segmentation
     as indicated by a length of 1 for f2sInds). Although blurring is needed to
@@ -254,24 +452,48 @@ def resample_labim(
     # Store the interpolation set as metadata:
     labim.SetMetaData("resInterpSet", interp)
     
+    indexMap = get_grid_index_map(labim, refIm, sitkTx)\
+        if useGridAligned else None
+    
+    if indexMap is not None:
+        if p2c:
+            print(f'Resampling labim by indexing (indexMap = {indexMap})\n')
+        
+        resLabim = resample_im_by_indexing(labim, refIm, indexMap, np.uint32)
+        
+        resPixarr, resF2Sinds = im_to_pixarr(resLabim)
+        
+        if resF2Sinds or not f2sInds:
+            resLabim.SetMetaData("resInterpUsed", 'Indexing')
+            
+            return resLabim, resPixarr, resF2Sinds
+        
+        print(f"There are {len(f2sInds)} non-empty masks in the input label",
+              "image but 0 non-empty frames in the label image resampled by",
+              f"indexing. Will resample using {interp}...\n")
+    
     if interp in ['NearestNeighbor', 'LabelGaussian']:
         if p2c:
             print(f'Attempting to resample labim using {interp} interpolator\n')
         
         if applyPreResBlur:
             # Gaussian blur labim:
-            blurLabIm = gaussian_blur_im(im=labim, var=postResVar)
+            blurLabIm = gaussian_blur_im(
+                im=labim, var=postResVar, numThreads=blurNumThreads
+                )
             
             # Resample blurLabIm using the chosen interpolator:
             resLabim = resample_im(
-                im=blurLabIm, refIm=refIm, sitkTx=sitkTx, interp=interp
+                im=blurLabIm, refIm=refIm, sitkTx=sitkTx, interp=interp,
+                numThreads=numThreads
                 )
             
             msg = 'Image info for resampled blurred image:'
         else:
             # Resample labim using the chosen interpolator:
             resLabim = resample_im(
-                im=labim, refIm=refIm, sitkTx=sitkTx, interp=interp
+                im=labim, refIm=refIm, sitkTx=sitkTx, interp=interp,
+                numThreads=numThreads
                 )
             
             msg = 'Image info for resampled image:'
@@ -279,26 +501,26 @@ def resample_labim(
         if p2c:
             print(msg)
         
-        pixID, pixIDTypeAsStr, uniqueVals, resF2Sinds = get_im_info(
-            resLabim, p2c
-            )
+        resF2Sinds = get_cached_im_stats(resLabim)['f2sInds']
         if p2c:
+            get_im_info(resLabim, p2c)
             print('')
         
         if applyPostResBlur:
             # Gaussian blur resLabim:
-            resLabim = gaussian_blur_im(im=resLabim, var=postResVar)
+            resLabim = gaussian_blur_im(
+                im=resLabim, var=postResVar, numThreads=blurNumThreads
+                )
             
             if p2c:
                 print('Image info for blurred resampled image:')
-            pixID, pixIDTypeAsStr, uniqueVals, resF2Sinds = get_im_info(
-                resLabim, p2c
-                )
+            resF2Sinds = get_cached_im_stats(resLabim)['f2sInds']
             if p2c:
+                get_im_info(resLabim, p2c)
                 print('')
             
             # Binarise resLabim if required:
-            if len(uniqueVals) != 2 or sum(uniqueVals) != 1:
+            if not get_cached_im_stats(resLabim)['isBinary']:
                 """
                 resLabim is not binary. Find suitable threshold value that 
                 approximately preserves the number of pre-blurred truth values
@@ -313,10 +535,9 @@ def resample_labim(
                 
                 if p2c:
                     print(f'\nImage info after binary thresholding at {thresh}:')
-                pixID, pixIDTypeAsStr, uniqueVals, resF2Sinds = get_im_info(
-                    resLabim, p2c
-                    )
+                resF2Sinds = get_cached_im_stats(resLabim)['f2sInds']
                 if p2c:
+                    get_im_info(resLabim, p2c)
                     print('')
         
         #print(f'\n   resF2Sinds = {resF2Sinds}')
@@ -342,13 +563,13 @@ def resample_labim(
 
     if interp == 'BlurThenLinear':
         # Gaussian blur labim:
-        blurLabIm = gaussian_blur_im(im=labim, var=preResVar)
+        blurLabIm = gaussian_blur_im(
+            im=labim, var=preResVar, numThreads=blurNumThreads
+            )
         
         if p2c:
             print('\nImage info for blurLabIm:')
-            pixID, pixIDTypeAsStr, uniqueVals, f2sInds = get_im_info(
-                blurLabIm, p2c
-                )
+            get_im_info(blurLabIm, p2c)
             print('\n\nblurLabIm prior to resampling:')
             print(f'   blurLabIm.GetSize() = {blurLabIm.GetSize()}')
             print(f'   blurLabIm.GetSpacing() = {blurLabIm.GetSpacing()}')
@@ -357,7 +578,8 @@ def resample_labim(
         
         # Linearly resample blurLabIm:
         resLabim = resample_im(
-            im=blurLabIm, refIm=refIm, sitkTx=sitkTx, interp='Linear'
+            im=blurLabIm, refIm=refIm, sitkTx=sitkTx, interp='Linear',
+            numThreads=numThreads
             )
         
         """ 
@@ -374,15 +596,16 @@ def resample_labim(
         
         if p2c:
             print('\nImage info after resampling using linear interpolator:')
-        pixID, pixIDTypeAsStr, uniqueVals, resF2Sinds = get_im_info(
-            resLabim, p2c
-            )
+        resF2Sinds = get_cached_im_stats(resLabim)['f2sInds']
         if p2c:
+            get_im_info(resLabim, p2c)
             print('')
         
         if applyPostResBlur:
             # Gaussian blur resLabim:
-            resLabim = gaussian_blur_im(im=resLabim, var=postResVar)
+            resLabim = gaussian_blur_im(
+                im=resLabim, var=postResVar, numThreads=blurNumThreads
+                )
             
         # Find suitable threshold value:
         thresh = find_thresh(binaryIm=labim, nonBinaryIm=resLabim, p2c=p2c)
@@ -392,16 +615,17 @@ def resample_labim(
         
         if p2c:
             print(f'\nImage info after binary thresholding {thresh}:')
-        pixID, pixIDTypeAsStr, uniqueVals, resF2Sinds = get_im_info(
-            resLabim, p2c
-            )
+        resF2Sinds = get_cached_im_stats(resLabim)['f2sInds']
         if p2c:
+            get_im_info(resLabim, p2c)
             print('')
     
     # Ensure that resLabim is a 32-bit unsigned integer (pixID = 5):
+    pixID = resLabim.GetPixelID()
     if pixID != 5: 
         if p2c:
-            print(f'\nresLabim has PixelID = {pixID} ({pixIDTypeAsStr})).')
+            print(f'\nresLabim has PixelID = {pixID}',
+                  f'({resLabim.GetPixelIDTypeAsString()})).')
         
         # Convert resLabim from float to 32-bit unsigned integer:
         resLabim = change_im_dtype(im=resLabim, newPixType='UInt32')
@@ -409,10 +633,9 @@ def resample_labim(
         if p2c:
             print('\nImage info after converting to 32-bit unsigned int:')
         #print(f'\nThe metadata keys are:', resLabim.GetMetaDataKeys())
-        pixID, pixIDTypeAsStr, uniqueVals, resF2Sinds = get_im_info(
-            resLabim, p2c
-            )
+        resF2Sinds = get_cached_im_stats(resLabim)['f2sInds']
         if p2c:
+            get_im_info(resLabim, p2c)
             print('')
     
     # Convert resLabim to a pixel array:
@@ -446,7 +669,8 @@ def resample_labim(
 def resample_labimBySeg(
         labimBySeg, f2sIndsBySeg, im, refIm, sitkTx=sitk.Transform(), 
         interp='NearestNeighbor', applyPreResBlur=False, preResVar=(1,1,1), 
-        applyPostResBlur=True, postResVar=(1,1,1), p2c=False
+        applyPostResBlur=True, postResVar=(1,1,1), numThreads=None, 
+        blurNumThreads=None, useGridAligned=False, p2c=False
         ):
     """
     Resample a list 3D SimpleITK images representing binary label images. 
@@ -488,6 +712,16 @@ def resample_labimBySeg(
         A tuple (for each dimension) of the variance to be applied if the 
         resampled labelmap image(s) is/are to be Gaussian blurred after  
         resampling. The default value is (1,1,1).
+    numThreads : int or None, optional
+        The number of threads to use for resampling. If None SimpleITK's global
+        default number of threads will be used. The default value is None.
+    blurNumThreads : int or None, optional
+        The number of threads to use for Gaussian blurring. If None SimpleITK's
+        global default number of threads will be used. The default value is
+        None.
+    useGridAligned : bool, optional
+        If True, label images will be resampled by indexing if possible (see
+        resample_labim). The default value is False.
     p2c : bool, optional
         Denotes whether some results will be logged to the console. The
         default value is False.
@@ -527,7 +761,8 @@ def resample_labimBySeg(
                 refIm=refIm, sitkTx=sitkTx, interp=interp, 
                 applyPreResBlur=applyPreResBlur, preResVar=preResVar, 
                 applyPostResBlur=applyPostResBlur, postResVar=postResVar, 
-                p2c=p2c
+                numThreads=numThreads, blurNumThreads=blurNumThreads,
+                useGridAligned=useGridAligned, p2c=p2c
                 )
         
         resLabimBySeg.append(resLabim)
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 09:34:12 2026
+
+@author: ctorti
+"""
+
+""" Thread budgeting for SimpleITK filters and registrations. """
+
+import os
+from contextlib import contextmanager
+import SimpleITK as sitk
+
+
+"""
+The stages whose thread counts can be set individually (via the
+"numThreadsByStage" key in cfgDict):
+    -- 'registration' (rigid_reg_im, bspline_reg_im)
+    -- 'resampling' (resample_im, resample_labim and the binarising, dtype
+    conversions, etc. that follow)
+    -- 'blurring' (gaussian_blur_im)
+"""
+STAGES = ['registration', 'resampling', 'blurring']
+
+
+def get_num_of_cpus():
+    """
+    Get the number of CPUs available to this process.
+    
+    Parameters
+    ----------
+    None.
+    
+    Returns
+    -------
+    numCpus : int
+        The number of CPUs available.
+    
+    Note
+    ----
+    os.cpu_count() returns the number of CPUs in the system, whereas
+    os.sched_getaffinity() returns the number of CPUs the process is allowed
+    to run on (e.g. in a container with a CPU limit), so the latter will be
+    used where available.
+    """
+    
+    try:
+        numCpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        numCpus = os.cpu_count()
+    
+    if not numCpus:
+        numCpus = 1
+    
+    return numCpus
+
+def get_thread_budget(cfgDict):
+    """
+    Get the total number of threads available to SimpleITK for a run.
+    
+    Parameters
+    ----------
+    cfgDict : dict
+        Dictionary containing the parameters for the run.
+    
+    Returns
+    -------
+    budget : int
+        The number of threads available to a run.
+    
+    Note
+    ----
+    If cfgDict['numThreads'] is 0 (or missing) all available CPUs will be
+    used.
+    
+    If runs are executed concurrently (e.g. in a process pool)
+    cfgDict['numConcurrentRuns'] should be set to the number of concurrent
+    runs so that the budget is divided between them, rather than each run
+    assuming that all of the CPUs are available to it (which would result in
+    oversubscription).
+    """
+    
+    numThreads = cfgDict.get('numThreads', 0)
+    numConcurrentRuns = cfgDict.get('numConcurrentRuns', 1)
+    
+    if not numThreads:
+        numThreads = get_num_of_cpus()
+    
+    if not numConcurrentRuns or numConcurrentRuns < 1:
+        numConcurrentRuns = 1
+    
+    budget = max(1, numThreads // numConcurrentRuns)
+    
+    return budget
+
+def get_num_threads(cfgDict, stage):
+    """
+    Get the number of threads to use for a stage.
+    
+    Parameters
+    ----------
+    cfgDict : dict
+        Dictionary containing the parameters for the run.
+    stage : str
+        The stage (see STAGES).
+    
+    Returns
+    -------
+    numThreads : int
+        The number of threads to use for the stage.
+    
+    Note
+    ----
+    The number of threads for a stage is given by
+    cfgDict['numThreadsByStage'][stage] if it is non-zero, otherwise the
+    thread budget for the run (see get_thread_budget). In either case it will
+    not exceed the thread budget.
+    """
+    
+    if not stage in STAGES:
+        msg = f"The stage '{stage}' is not valid. It must be one of "\
+            + f"{STAGES}."
+        raise Exception(msg)
+    
+    budget = get_thread_budget(cfgDict)
+    
+    numThreadsByStage = cfgDict.get('numThreadsByStage', {})
+    
+    if numThreadsByStage and numThreadsByStage.get(stage, 0):
+        numThreads = min(numThreadsByStage[stage], budget)
+    else:
+        numThreads = budget
+    
+    return numThreads
+
+def get_num_threads_per_worker(numWorkers, numThreads=0):
+    """
+    Divide a thread budget between the workers of a process pool.
+    
+    Parameters
+    ----------
+    numWorkers : int
+        The number of workers in the pool.
+    numThreads : int, optional
+        The total number of threads to divide between the workers. If 0 all
+        available CPUs will be used. The default value is 0.
+    
+    Returns
+    -------
+    numThreadsPerWorker : int
+        The number of threads each worker may use.
+    """
+    
+    if not numThreads:
+        numThreads = get_num_of_cpus()
+    
+    numThreadsPerWorker = max(1, numThreads // max(1, numWorkers))
+    
+    return numThreadsPerWorker
+
+def init_pool_worker(numThreads):
+    """
+    Initialiser for the workers of a process pool (e.g. passed as the
+    initializer argument of concurrent.futures.ProcessPoolExecutor, with
+    initargs=(get_num_threads_per_worker(numWorkers),)) so that the SimpleITK
+    global default number of threads in each worker is limited to its share.
+    
+    Parameters
+    ----------
+    numThreads : int
+        The number of threads each worker may use.
+    
+    Returns
+    -------
+    None.
+    """
+    
+    sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(numThreads)
+
+@contextmanager
+def sitk_threads(numThreads):
+    """
+    Context manager that sets SimpleITK's global default number of threads
+    and restores the previous value on exit.
+    
+    Parameters
+    ----------
+    numThreads : int or None
+        The number of threads to use. If None the global default will not be
+        changed.
+    
+    Returns
+    -------
+    None.
+    
+    Note
+    ----
+    The global default number of threads applies to filters that are
+    instantiated (including within procedural calls such as sitk.Resample)
+    while the context is active, so it covers the many helper functions
+    (e.g. binarise_im, change_im_dtype) that don't accept a numThreads
+    argument.
+    
+    Example usage:
+    
+    with sitk_threads(get_num_threads(cfgDict, 'resampling')):
+        resLabim = resample_im(...)
+    """
+    
+    if numThreads is None:
+        yield
+        return
+    
+    prevNumThreads = sitk.ProcessObject.GetGlobalDefaultNumberOfThreads()
+    
+    sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(numThreads)
+    
+    try:
+        yield
+    finally:
+        sitk.ProcessObject.SetGlobalDefaultNumberOfThreads(prevNumThreads)
+
+@contextmanager
+def stage_threads(cfgDict, stage):
+    """
+    Context manager that sets SimpleITK's global default number of threads to
+    that for a stage (see get_num_threads) and restores the previous value on
+    exit.
+    
+    Parameters
+    ----------
+    cfgDict : dict
+        Dictionary containing the parameters for the run.
+    stage : str
+        The stage (see STAGES).
+    
+    Returns
+    -------
+    None.
+    """
+    
+    with sitk_threads(get_num_threads(cfgDict, stage)):
+        yield
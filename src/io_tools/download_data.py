@@ -19,10 +19,13 @@ reload(xnat_tools.alias_tokens)
 
 import os
 import time
+import threading
 from xnat_tools.sessions import create_session
 from xnat_tools.scans import download_scan
 from xnat_tools.im_assessors import download_im_asr
-from xnat_tools.format_pathsDict import get_scan_asr_fname_and_id
+from xnat_tools.format_pathsDict import (
+    get_scan_asr_fname_and_id, merge_pathsDicts
+    )
 #from xnat_tools.alias_tokens import (
 #    import_alias_token, is_alias_token_valid, generate_alias_token,
 #    export_alias_token
@@ -76,6 +79,16 @@ class DataDownloader:
         self.timings = [time.time()]
         self.timingMsgs = []
         
+        # Initialise pathsDict (populated when data is downloaded):
+        self.pathsDict = None
+        
+        # The latest timestamp added by each thread (for stages that are run
+        # concurrently, see io_tools.pipeline) and locks to guard the shared
+        # timings and pathsDict:
+        self.timingsByThread = {}
+        self.timingLock = threading.Lock()
+        self.pathsDictLock = threading.Lock()
+    
     def establish_xnat_connection(self):
         """
         Establish XNAT connection.
@@ -128,11 +141,18 @@ class DataDownloader:
         self.xnatSession = xnatSession
         self.aliasToken = aliasToken
         
-    def add_dirs_and_fpaths(self):
+    def add_dirs_and_fpaths(self, srcORtrg=None):
         """
         Add directories and filepaths to params.srcXnatParams and 
         params.trgXnatParams from pathsDict.
         
+        Parameters
+        ----------
+        srcORtrg : str or None, optional
+            'src' or 'trg' if the directories and filepaths are to be added
+            for the source or target only (e.g. once the source or target data
+            has been downloaded), or None for both. The default value is None.
+        
         Returns
         -------
         None.
@@ -155,51 +175,56 @@ class DataDownloader:
         trgScanID = cfgDict['trgScanID']
         trgRoicolName = cfgDict['trgRoicolName']
         
-        srcDcmDir = pathsDict['projects'][projID]['subjects'][subjLab]\
-            ['experiments'][srcExpLab]['scans'][srcScanID]['resources']\
-                ['DICOM']['files']['dicomDir']
-        
-        trgDcmDir = pathsDict['projects'][projID]['subjects'][subjLab]\
-            ['experiments'][trgExpLab]['scans'][trgScanID]['resources']\
-                ['DICOM']['files']['dicomDir']
-        
-        srcRoicolFname, srcAsrID\
-            = get_scan_asr_fname_and_id(
-                pathsDict, projID, subjLab, srcExpLab, roicolMod, srcRoicolName
-                )
-        
-        srcRoicolFpath = pathsDict['projects'][projID]['subjects'][subjLab]\
-            ['experiments'][srcExpLab]['assessors'][srcAsrID]['resources']\
-                [roicolMod]['files'][srcRoicolFname]['roicolFpath']
-        
-        if trgRoicolName == None:
-            trgRoicolFpath = None
-        else:
-            trgRoicolFname, trgAsrID\
+        if srcORtrg in [None, 'src']:
+            srcDcmDir = pathsDict['projects'][projID]['subjects'][subjLab]\
+                ['experiments'][srcExpLab]['scans'][srcScanID]['resources']\
+                    ['DICOM']['files']['dicomDir']
+            
+            srcRoicolFname, srcAsrID\
                 = get_scan_asr_fname_and_id(
-                    pathsDict, projID, subjLab, trgExpLab, roicolMod, 
-                    trgRoicolName
+                    pathsDict, projID, subjLab, srcExpLab, roicolMod, 
+                    srcRoicolName
                     )
             
-            trgRoicolFpath = pathsDict['projects'][projID]['subjects'][subjLab]\
-                ['experiments'][trgExpLab]['assessors'][trgAsrID]['resources']\
-                    [roicolMod]['files'][trgRoicolFname]['roicolFpath']
-        
-        # Add filepaths and directories to cfgDict:
-        cfgDict['srcAsrID'] = srcAsrID
-        cfgDict['srcRoicolFname'] = srcRoicolFname
-        cfgDict['srcRoicolFpath'] = srcRoicolFpath
-        cfgDict['srcDicomDir'] = srcDcmDir
-        
-        cfgDict['trgDicomDir'] = trgDcmDir
-        if trgRoicolName != None:
-            cfgDict['trgAsrID'] = trgAsrID
-            cfgDict['trgRoicolFname'] = trgRoicolFname
-            cfgDict['trgRoicolFpath'] = trgRoicolFpath
-        else:
-            cfgDict['trgAsrID'] = None
-            cfgDict['trgRoicolFname'] = None
-            cfgDict['trgRoicolFpath'] = None
+            srcRoicolFpath = pathsDict['projects'][projID]['subjects'][subjLab]\
+                ['experiments'][srcExpLab]['assessors'][srcAsrID]['resources']\
+                    [roicolMod]['files'][srcRoicolFname]['roicolFpath']
+            
+            # Add filepaths and directories to cfgDict:
+            cfgDict['srcAsrID'] = srcAsrID
+            cfgDict['srcRoicolFname'] = srcRoicolFname
+            cfgDict['srcRoicolFpath'] = srcRoicolFpath
+            cfgDict['srcDicomDir'] = srcDcmDir
+        
+        if srcORtrg in [None, 'trg']:
+            trgDcmDir = pathsDict['projects'][projID]['subjects'][subjLab]\
+                ['experiments'][trgExpLab]['scans'][trgScanID]['resources']\
+                    ['DICOM']['files']['dicomDir']
+            
+            if trgRoicolName == None:
+                trgRoicolFpath = None
+            else:
+                trgRoicolFname, trgAsrID\
+                    = get_scan_asr_fname_and_id(
+                        pathsDict, projID, subjLab, trgExpLab, roicolMod, 
+                        trgRoicolName
+                        )
+                
+                trgRoicolFpath = pathsDict['projects'][projID]['subjects']\
+                    [subjLab]['experiments'][trgExpLab]['assessors'][trgAsrID]\
+                        ['resources'][roicolMod]['files'][trgRoicolFname]\
+                            ['roicolFpath']
+            
+            # Add filepaths and directories to cfgDict:
+            cfgDict['trgDicomDir'] = trgDcmDir
+            if trgRoicolName != None:
+                cfgDict['trgAsrID'] = trgAsrID
+                cfgDict['trgRoicolFname'] = trgRoicolFname
+                cfgDict['trgRoicolFpath'] = trgRoicolFpath
+            else:
+                cfgDict['trgAsrID'] = None
+                cfgDict['trgRoicolFname'] = None
+                cfgDict['trgRoicolFpath'] = None
             
         self.cfgDict = cfgDict
     
@@ -210,12 +235,21 @@ class DataDownloader:
         timingMsg with the time difference dTime calculated below. If the
         keywork doesn't exist it's not a time-related message but just info.
         """
-        self.timings.append(time.time())
+        with self.timingLock:
+            self.timings.append(time.time())
+            
+            # The previous timestamp added by this thread (or the previous
+            # timestamp added by any thread if this is the thread's first), so
+            # that timings of stages run concurrently aren't interleaved:
+            prevTiming = self.timingsByThread.get(
+                threading.get_ident(), self.timings[-2]
+                )
+            self.timingsByThread[threading.get_ident()] = self.timings[-1]
         
         if 'total' in timingMsg:
             dTime = self.timings[-1] - self.timings[0]
         else:
-            dTime = self.timings[-1] - self.timings[-2]
+            dTime = self.timings[-1] - prevTiming
         
         if '[*]' in timingMsg:
             if 'total' in timingMsg:
@@ -329,4 +363,86 @@ class DataDownloader:
         self.add_timestamp(timingMsg)
         
         # Modify Source and Target XNAT parameters:
-        self.add_dirs_and_fpaths()
\ No newline at end of file
+        self.add_dirs_and_fpaths()    
+    
+    def download_src_data(self):
+        """
+        Download the source scan and ROI Collection, merge their paths into
+        pathsDict and add the source directories and filepaths to cfgDict.
+        
+        Unlike download_and_get_pathsDict this method (and download_trg_data)
+        only modifies shared data while holding self.pathsDictLock, so the
+        source and target data can be downloaded concurrently (e.g. see
+        io_tools.pipeline).
+        
+        Returns
+        -------
+        self.pathsDict : dict
+            Dictionary containing paths of data downloaded.
+        """
+        
+        print('*** Fetching source DICOM scan from XNAT...\n')
+        
+        pathsDict = download_scan(
+            config=self.cfgDict, srcORtrg='src', xnatSession=self.xnatSession
+            )
+        
+        print('*** Fetching source ROI Collection from XNAT...\n')
+        
+        pathsDict = download_im_asr(
+            config=self.cfgDict, srcORtrg='src', xnatSession=self.xnatSession,
+            pathsDict=pathsDict
+            )
+        
+        with self.pathsDictLock:
+            self.pathsDict = merge_pathsDicts(
+                self.pathsDict, pathsDict
+                )
+            
+            self.add_dirs_and_fpaths('src')
+        
+        timingMsg = "Took [*] to download the source DICOM scan and ROI "\
+            + "Collection.\n"
+        self.add_timestamp(timingMsg)
+    
+    def download_trg_data(self):
+        """
+        Download the target scan and ROI Collection (if applicable), merge
+        their paths into pathsDict and add the target directories and 
+        filepaths to cfgDict.
+        
+        Returns
+        -------
+        self.pathsDict : dict
+            Dictionary containing paths of data downloaded.
+        """
+        
+        trgRoicolName = self.cfgDict['trgRoicolName']
+        
+        print('*** Fetching target DICOM scan from XNAT...\n')
+        
+        pathsDict = download_scan(
+            config=self.cfgDict, srcORtrg='trg', xnatSession=self.xnatSession
+            )
+        
+        if trgRoicolName != None:
+            print('*** Fetching target ROI Collection from XNAT...\n')
+            
+            pathsDict = download_im_asr(
+                config=self.cfgDict, srcORtrg='trg', 
+                xnatSession=self.xnatSession, pathsDict=pathsDict
+                )
+        
+        with self.pathsDictLock:
+            self.pathsDict = merge_pathsDicts(
+                self.pathsDict, pathsDict
+                )
+            
+            self.add_dirs_and_fpaths('trg')
+        
+        if trgRoicolName == None:
+            timingMsg = "Took [*] to download the target DICOM scan.\n"
+        else:
+            timingMsg = "Took [*] to download the target DICOM scan and ROI "\
+                + "Collection.\n"
+        self.add_timestamp(timingMsg)
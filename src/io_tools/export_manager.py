@@ -0,0 +1,551 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Nov  9 11:26:08 2026
+
+@author: ctorti
+"""
+
+""" Background (compressed, deduplicated) exports of images and transforms. """
+
+import os
+import json
+import atexit
+import hashlib
+import threading
+import numpy as np
+import SimpleITK as sitk
+
+from io_tools.uploads import UploadManager
+from io_tools.exports import (
+    get_im_file_ext, export_im, export_labim, export_tx
+    )
+
+
+# The name of the index (of the content hashes of the exported files) kept in
+# each export directory:
+indexFname = '.export_index.json'
+
+
+def get_im_hash(im, *extras):
+    """
+    Get a hash of the pixel data, pixel type and geometry of an image.
+    
+    Parameters
+    ----------
+    im : SimpleITK Image
+        The image.
+    *extras
+        Any other attributes that determine the exported file (e.g. the file
+        format and compression).
+    
+    Returns
+    -------
+    imHash : str
+        The SHA-1 digest (as hexadecimal).
+    """
+    
+    hasher = hashlib.sha1()
+    
+    hasher.update(
+        np.ascontiguousarray(sitk.GetArrayViewFromImage(im)).data
+        )
+    
+    hasher.update(
+        repr(
+            (im.GetPixelIDValue(), im.GetSize(), im.GetSpacing(),
+             im.GetOrigin(), im.GetDirection(), extras)
+            ).encode()
+        )
+    
+    return hasher.hexdigest()
+
+def get_file_hash(fpath, blockSize=2**20):
+    """
+    Get a hash of the contents of a file.
+    
+    Parameters
+    ----------
+    fpath : str
+        Full path of the file.
+    blockSize : int, optional
+        The number of bytes read at a time. The default value is 2**20.
+    
+    Returns
+    -------
+    fileHash : str
+        The SHA-1 digest (as hexadecimal).
+    """
+    
+    hasher = hashlib.sha1()
+    
+    with open(fpath, 'rb') as file:
+        for block in iter(lambda: file.read(blockSize), b''):
+            hasher.update(block)
+    
+    return hasher.hexdigest()
+
+
+class ExportManager(UploadManager):
+    """
+    This class writes (debugging) exports of images, label images and
+    transforms on background worker threads, so that they are off the
+    critical path of the run, and deduplicates exports whose content is
+    identical to files exported previously (e.g. by previous runs).
+    
+    Parameters
+    ----------
+    maxWorkers : int, optional
+        The maximum number of exports to write concurrently. The default value
+        is 2.
+    useCompression : bool, optional
+        If True images will be exported compressed (see
+        io_tools.exports.export_im). The default value is True.
+    dedupe : bool, optional
+        If True an export whose content is identical to a file previously
+        exported to the same directory will be created as a hard link to that
+        file rather than written. The default value is False.
+    
+    Returns
+    -------
+    self.futures : dict
+        Dictionary (with task names as keys) of the Futures of the submitted
+        tasks.
+    self.taskTimes : dict
+        Dictionary (with task names as keys) of the time taken by each task.
+    self.dedupedFpaths : list of strs
+        Full paths of the exports that were deduplicated.
+    
+    Note
+    ----
+    The content hashes of the exported files are kept in an index
+    (indexFname) in each export directory, which is updated when the exports
+    are flushed. flush is registered to run at exit so that pending exports
+    are written and the indices saved if the run doesn't complete.
+    
+    Each entry of an index records the size and modification time of the 
+    file when it was written (see get_index_entry), and an export is only 
+    linked to a file that is unchanged since (see is_index_entry_valid), so
+    that a file that was since rewritten with different content (e.g. an 
+    export of a rerun with the same file name) isn't linked to. A file name
+    is only recorded for one content hash, i.e. the entry of its previous
+    content is dropped when it's rewritten.
+    
+    Images and transforms are copied when submitted (SimpleITK's copies are
+    copy-on-write) so that subsequent changes to them don't change the
+    exports.
+    
+    The export functions (see io_tools.exports) remove an existing file 
+    before writing it, so that (re)writing a file that is hard linked 
+    doesn't change the files linked to it.
+    """
+    
+    def __init__(self, maxWorkers=2, useCompression=True, dedupe=False):
+        super().__init__(maxWorkers)
+        self.useCompression = useCompression
+        self.dedupe = dedupe
+        self.indexByDir = {}
+        self.dedupedFpaths = []
+        self.lock = threading.Lock()
+        self.isFlushed = False
+        
+        atexit.register(self.flush)
+    
+    def get_index(self, exportDir):
+        """
+        Get the index (of content hashes and file names) of an export
+        directory, which must be called with self.lock acquired.
+        """
+        
+        exportDir = os.path.abspath(exportDir)
+        
+        if not exportDir in self.indexByDir:
+            self.indexByDir[exportDir] = import_index(exportDir)
+        
+        return self.indexByDir[exportDir]
+    
+    def link_if_duplicate(self, key, fpath):
+        """
+        Create an export as a hard link to a previously exported file with
+        the same content hash (if there is one, and it is unchanged since it
+        was exported).
+        
+        Parameters
+        ----------
+        key : str
+            The content hash of the export.
+        fpath : str
+            Full path of the export.
+        
+        Returns
+        -------
+        isDuplicate : bool
+            True if fpath was created as a hard link.
+        
+        Note
+        ----
+        If fpath already exists (e.g. a transform that was written before its
+        hash could be computed) it is replaced by the link. If the link can't
+        be created (e.g. the file system doesn't support hard links) fpath is
+        left to be written as normal (and then recorded, see record_export).
+        
+        An entry whose file has changed since it was exported is dropped.
+        """
+        
+        exportDir, fname = os.path.split(os.path.abspath(fpath))
+        
+        with self.lock:
+            index = self.get_index(exportDir)
+            
+            entry = index.get(key, None)
+            
+            if entry is None:
+                return False
+            
+            if not is_index_entry_valid(exportDir, entry):
+                del index[key]
+                
+                return False
+            
+            if entry['fname'] == fname:
+                return False
+            
+            try:
+                if os.path.isfile(fpath):
+                    os.remove(fpath)
+                
+                os.link(os.path.join(exportDir, entry['fname']), fpath)
+            except OSError:
+                return False
+            
+            self.dedupedFpaths.append(fpath)
+        
+        return True
+    
+    def record_export(self, key, fpath):
+        """
+        Record the content hash of a written export in the index of its
+        directory, dropping the entries of any other content previously 
+        exported with the same file name.
+        
+        Parameters
+        ----------
+        key : str
+            The content hash of the export.
+        fpath : str
+            Full path of the export.
+        """
+        
+        exportDir, fname = os.path.split(os.path.abspath(fpath))
+        
+        with self.lock:
+            index = self.get_index(exportDir)
+            
+            for otherKey in get_keys_of_fname(index, fname):
+                del index[otherKey]
+            
+            index[key] = get_index_entry(exportDir, fname)
+    
+    def write_im(self, im, filename, exportDir, fileFormat, isLabim):
+        """
+        Write an image (see export_im) on a worker, unless it is a duplicate.
+        """
+        
+        if isLabim and fileFormat != 'PackedLabel'\
+                and im.GetPixelID() != sitk.sitkUInt8:
+            im = sitk.Cast(im, sitk.sitkUInt8)
+        
+        fpath = os.path.join(
+            exportDir,
+            filename + get_im_file_ext(fileFormat, self.useCompression)
+            )
+        
+        if self.dedupe:
+            key = get_im_hash(im, fileFormat, self.useCompression)
+            
+            if self.link_if_duplicate(key, fpath):
+                return fpath
+        
+        if isLabim:
+            fpath = export_labim(
+                im, filename, fileFormat, exportDir, self.useCompression
+                )
+        else:
+            fpath = export_im(
+                im, filename, fileFormat, exportDir, self.useCompression
+                )
+        
+        if self.dedupe:
+            self.record_export(key, fpath)
+        
+        return fpath
+    
+    def write_tx(self, tx, filename, exportDir, fileExts):
+        """
+        Write a transform (see export_tx) on a worker, and replace any files
+        that are duplicates by hard links.
+        """
+        
+        fpaths = export_tx(tx, filename, exportDir, fileExts)
+        
+        if self.dedupe:
+            for fpath in fpaths:
+                key = get_file_hash(fpath)
+                
+                if not self.link_if_duplicate(key, fpath):
+                    self.record_export(key, fpath)
+        
+        return fpaths
+    
+    def submit_im(
+            self, im, filename, exportDir, fileFormat='NrrdImageIO',
+            isLabim=False
+            ):
+        """
+        Submit an image to be exported on a background worker.
+        
+        Parameters
+        ----------
+        im : SimpleITK Image
+            The image to be exported.
+        filename : str
+            The filename (without extension) to assign to the exported file.
+            It is also used as the name of the task.
+        exportDir : str
+            The directory to which the file will be exported to. If the
+            directory doesn't exist it will be created.
+        fileFormat : str, optional
+            Any format accepted by io_tools.exports.export_im, or
+            'PackedLabel' if isLabim is True. The default value is
+            'NrrdImageIO'.
+        isLabim : bool, optional
+            If True im is a binary label image that will be exported as 8-bit
+            unsigned integers or packed bits (see
+            io_tools.exports.export_labim). The default value is False.
+        
+        Returns
+        -------
+        future : Future
+            The Future of the task.
+        """
+        
+        os.makedirs(exportDir, exist_ok=True)
+        
+        return self.submit(
+            filename, self.write_im, sitk.Image(im), filename, exportDir,
+            fileFormat, isLabim
+            )
+    
+    def submit_tx(self, tx, filename, exportDir, fileExts=['.tfm']):
+        """
+        Submit a transform to be exported on a background worker.
+        
+        Parameters
+        ----------
+        tx : SimpleITK Transform
+            The transform to be exported.
+        filename : str
+            The filename (without extension) to assign to the exported files.
+            It is also used as the name of the task.
+        exportDir : str
+            The directory to which the files will be exported to. If the
+            directory doesn't exist it will be created.
+        fileExts : list of strs, optional
+            The file extensions of the files to export (see
+            io_tools.exports.export_tx). The default value is ['.tfm'].
+        
+        Returns
+        -------
+        future : Future
+            The Future of the task.
+        """
+        
+        os.makedirs(exportDir, exist_ok=True)
+        
+        return self.submit(
+            filename, self.write_tx, sitk.Transform(tx), filename, exportDir,
+            list(fileExts)
+            )
+    
+    def save_indices(self):
+        """
+        Save the indices of the export directories, merged with any entries
+        added to them by other (e.g. concurrent) runs.
+        """
+        
+        with self.lock:
+            for exportDir, index in self.indexByDir.items():
+                # Drop the entries (from the saved index) of file names that 
+                # were recorded by this run, since they may be for the 
+                # previous content of the files:
+                fnames = set(entry['fname'] for entry in index.values())
+                
+                savedIndex = {
+                    key : entry for key, entry 
+                    in import_index(exportDir).items()
+                    if not entry['fname'] in fnames
+                    }
+                
+                index = {**savedIndex, **index}
+                
+                # Drop the entries of files that no longer exist or have 
+                # changed:
+                index = {
+                    key : entry for key, entry in index.items()
+                    if is_index_entry_valid(exportDir, entry)
+                    }
+                
+                fpath = os.path.join(exportDir, indexFname)
+                tmpFpath = f'{fpath}.{os.getpid()}.tmp'
+                
+                with open(tmpFpath, 'w') as file:
+                    json.dump(index, file)
+                
+                os.replace(tmpFpath, fpath)
+    
+    def flush(self):
+        """
+        Wait for all submitted exports to be written, shut down the workers
+        and save the indices of the export directories.
+        
+        Returns
+        -------
+        results : dict
+            Dictionary (with task names as keys) of the file path(s) of each
+            export.
+        
+        Note
+        ----
+        Subsequent calls (e.g. at exit) return an empty dictionary.
+        """
+        
+        if self.isFlushed:
+            return {}
+        
+        self.isFlushed = True
+        
+        atexit.unregister(self.flush)
+        
+        try:
+            return self.wait()
+        finally:
+            if self.dedupe:
+                self.save_indices()
+    
+    def print_summary(self):
+        """
+        Print the time taken by each export and the number of exports that
+        were deduplicated.
+        """
+        
+        print('\nBackground exports:')
+        for name, dTime in self.taskTimes.items():
+            print(f'   {name}: {dTime:.2f} s')
+        print(f'   {len(self.dedupedFpaths)} exports were deduplicated\n')
+
+
+def import_index(exportDir):
+    """
+    Import the index (of content hashes and file names) of an export
+    directory.
+    
+    Parameters
+    ----------
+    exportDir : str
+        The export directory.
+    
+    Returns
+    -------
+    index : dict
+        Dictionary (with content hashes as keys) of entries (see 
+        get_index_entry), which is empty if the directory has no index or it
+        can't be read.
+    
+    Note
+    ----
+    Entries of an older format (e.g. file names without their sizes and 
+    modification times) are dropped, since it isn't known whether the files
+    have changed since they were exported.
+    """
+    
+    fpath = os.path.join(exportDir, indexFname)
+    
+    if not os.path.isfile(fpath):
+        return {}
+    
+    try:
+        with open(fpath, 'r') as file:
+            index = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    
+    return {
+        key : entry for key, entry in index.items()
+        if isinstance(entry, dict) 
+        and set(entry) == set(['fname', 'size', 'mtime'])
+        }
+
+def get_index_entry(exportDir, fname):
+    """
+    Get the entry of an exported file for the index of its directory.
+    
+    Parameters
+    ----------
+    exportDir : str
+        The export directory.
+    fname : str
+        The file name.
+    
+    Returns
+    -------
+    entry : dict
+        Dictionary with keys 'fname', 'size' (in bytes) and 'mtime' (the 
+        modification time in ns).
+    """
+    
+    stat = os.stat(os.path.join(exportDir, fname))
+    
+    return {'fname' : fname, 'size' : stat.st_size, 'mtime' : stat.st_mtime_ns}
+
+def is_index_entry_valid(exportDir, entry):
+    """
+    Determine whether the file of an entry in the index of an export 
+    directory exists and is unchanged (i.e. has the same size and 
+    modification time) since it was exported.
+    
+    Parameters
+    ----------
+    exportDir : str
+        The export directory.
+    entry : dict
+        The entry (see get_index_entry).
+    
+    Returns
+    -------
+    isValid : bool
+        True if the file exists and is unchanged.
+    """
+    
+    try:
+        return get_index_entry(exportDir, entry['fname']) == entry
+    except OSError:
+        return False
+
+def get_keys_of_fname(index, fname):
+    """
+    Get the content hashes in the index of an export directory whose entries
+    are for a file name.
+    
+    Parameters
+    ----------
+    index : dict
+        The index (see import_index).
+    fname : str
+        The file name.
+    
+    Returns
+    -------
+    keys : list of strs
+        The content hashes.
+    """
+    
+    return [key for key, entry in index.items() if entry['fname'] == fname]
@@ -13,6 +13,7 @@ import time
 import pandas as pd
 import csv
 import json
+import numpy as np
 import SimpleITK as sitk
 
 
@@ -325,7 +326,65 @@ def export_list_to_csv(items, filename, exportDir='cwd'):
     
     return
 
-def export_im(im, filename, fileFormat='HDF5ImageIO', exportDir='cwd'):
+def remove_existing_file(filepath):
+    """
+    Remove a file (if it exists) that is about to be (re)written.
+    
+    Parameters
+    ----------
+    filepath : str
+        The file path.
+    
+    Note
+    ----
+    SimpleITK (and Numpy) truncate and rewrite an existing file in place, 
+    which would also change any files that are hard links to it (e.g. 
+    deduplicated exports, see io_tools.export_manager). Removing it first 
+    means the file is written anew, leaving any other links unchanged.
+    """
+    
+    if os.path.isfile(filepath):
+        os.remove(filepath)
+
+def get_im_file_ext(fileFormat, useCompression=False):
+    """
+    Get the file extension of an image exported in a given format.
+    
+    Parameters
+    ----------
+    fileFormat : str
+        The file format, e.g. 'HDF5ImageIO', 'NiftiImageIO', 'NrrdImageIO' or
+        'PackedLabel' (see export_packed_labim).
+    useCompression : bool, optional
+        If True the image is to be exported compressed. The default value is
+        False.
+    
+    Returns
+    -------
+    fileExt : str
+    """
+    
+    # TODO Complete file extension section below
+    # Determine the appropriate file extension (THIS IS INCOMPLETE as it does
+    # not cover all possible file formats allowed!):
+    if fileFormat == 'HDF5ImageIO':
+        fileExt = '.hdf'
+    elif fileFormat == 'NiftiImageIO':
+        fileExt = '.nii.gz' if useCompression else '.nii'
+    elif fileFormat == 'NrrdImageIO':
+        fileExt = '.nrrd'
+    elif fileFormat == 'PackedLabel':
+        fileExt = '.npz'
+    else:
+        msg = f"The file format '{fileFormat}' is not supported."
+        raise Exception(msg)
+    
+    return fileExt
+
+def export_im(
+        im, filename, fileFormat='HDF5ImageIO', exportDir='cwd',
+        useCompression=False
+        ):
     """ 
     Export a SimpleITK Image in a desired format. 
     
@@ -344,6 +403,14 @@ def export_im(im, filename, fileFormat='HDF5ImageIO', exportDir='cwd'):
         If provided the directory to which the file will be exported to. If the
         directory doesn't exist it will be created. The default value is 'cwd',
         i.e. the current working directory.
+    useCompression : bool, optional
+        If True the pixel data will be compressed (gzip for HDF and NRRD, and
+        a .nii.gz file for NIfTI). The default value is False.
+    
+    Returns
+    -------
+    filepath : str
+        The file path of the exported file.
     
     Note
     ----
@@ -354,30 +421,164 @@ def export_im(im, filename, fileFormat='HDF5ImageIO', exportDir='cwd'):
     #if not '.nii' in filename:
     #    filename += '.nii'
     
-    # TODO Complete file extension section below
-    # Determine the appropriate file extension (THIS IS INCOMPLETE as it does
-    # not cover all possible file formats allowed!):
-    if fileFormat == 'HDF5ImageIO':
-        fileExt = '.hdf'
-    elif fileFormat == 'NiftiImageIO':
-        fileExt = '.nii'
-    elif fileFormat == 'NrrdImageIO':
-        fileExt = '.nrrd'
-    
-    filename += fileExt
+    filename += get_im_file_ext(fileFormat, useCompression)
     
     if exportDir == 'cwd':
         filepath = filename
     else:
         if not os.path.isdir(exportDir):
             #os.mkdir(exportDir)
-            Path(exportDir).mkdir(parents=True)
+            Path(exportDir).mkdir(parents=True, exist_ok=True)
         
         filepath = os.path.join(exportDir, filename)
     
+    remove_existing_file(filepath)
+    
     writer = sitk.ImageFileWriter()
     writer.SetImageIO(fileFormat)
     writer.SetFileName(filepath)
+    writer.SetUseCompression(useCompression)
     writer.Execute(im)
     
-    return
\ No newline at end of file
+    return filepath
+
+def export_packed_labim(labim, filename, exportDir='cwd'):
+    """
+    Export a binary label image with its voxels packed into bits (8 voxels
+    per byte) in a compressed Numpy (.npz) file.
+    
+    Parameters
+    ----------
+    labim : SimpleITK Image
+        The binary label image to be exported (non-zero voxels are exported as
+        1).
+    filename : str
+        The filename (without extension) to assign to the exported file.
+    exportDir : str, optional
+        If provided the directory to which the file will be exported to. If the
+        directory doesn't exist it will be created. The default value is 'cwd',
+        i.e. the current working directory.
+    
+    Returns
+    -------
+    filepath : str
+        The file path of the exported file.
+    
+    Note
+    ----
+    The size, spacings, origin and direction of labim are stored with the
+    packed bits so that the image can be restored using
+    io_tools.imports.import_packed_labim.
+    """
+    
+    filename += '.npz'
+    
+    if exportDir == 'cwd':
+        filepath = filename
+    else:
+        if not os.path.isdir(exportDir):
+            Path(exportDir).mkdir(parents=True, exist_ok=True)
+        
+        filepath = os.path.join(exportDir, filename)
+    
+    pixarr = sitk.GetArrayViewFromImage(labim)
+    
+    remove_existing_file(filepath)
+    
+    np.savez_compressed(
+        filepath,
+        packedBits=np.packbits(pixarr.ravel() > 0),
+        size=np.array(labim.GetSize()),
+        spacing=np.array(labim.GetSpacing()),
+        origin=np.array(labim.GetOrigin()),
+        direction=np.array(labim.GetDirection())
+        )
+    
+    return filepath
+
+def export_labim(
+        labim, filename, fileFormat='NrrdImageIO', exportDir='cwd',
+        useCompression=True
+        ):
+    """
+    Export a binary label image as 8-bit unsigned integers or packed bits.
+    
+    Parameters
+    ----------
+    labim : SimpleITK Image
+        The binary label image to be exported.
+    filename : str
+        The filename (without extension) to assign to the exported file.
+    fileFormat : str, optional
+        'PackedLabel' (see export_packed_labim) or any format accepted by
+        export_im. The default value is 'NrrdImageIO'.
+    exportDir : str, optional
+        If provided the directory to which the file will be exported to. If the
+        directory doesn't exist it will be created. The default value is 'cwd',
+        i.e. the current working directory.
+    useCompression : bool, optional
+        If True the pixel data will be compressed (not applicable to 
+        'PackedLabel', which is always compressed). The default value is True.
+    
+    Returns
+    -------
+    filepath : str
+        The file path of the exported file.
+    """
+    
+    if fileFormat == 'PackedLabel':
+        return export_packed_labim(labim, filename, exportDir)
+    
+    if labim.GetPixelID() != sitk.sitkUInt8:
+        labim = sitk.Cast(labim, sitk.sitkUInt8)
+    
+    return export_im(labim, filename, fileFormat, exportDir, useCompression)
+
+def export_tx(tx, filename, exportDir='cwd', fileExts=['.tfm']):
+    """
+    Export a SimpleITK Transform (and/or its parameters).
+    
+    Parameters
+    ----------
+    tx : SimpleITK Transform
+        The transform to be exported.
+    filename : str
+        The filename (without extension) to assign to the exported files.
+    exportDir : str, optional
+        If provided the directory to which the files will be exported to. If
+        the directory doesn't exist it will be created. The default value is 
+        'cwd', i.e. the current working directory.
+    fileExts : list of strs, optional
+        The file extensions of the files to export, from '.tfm' and '.hdf' 
+        (the transform), and '.txt' (its parameters). The default value is 
+        ['.tfm'].
+    
+    Returns
+    -------
+    filepaths : list of strs
+        The file paths of the exported files.
+    """
+    
+    if exportDir == 'cwd':
+        exportDir = ''
+    elif not os.path.isdir(exportDir):
+        Path(exportDir).mkdir(parents=True, exist_ok=True)
+    
+    filepaths = []
+    
+    for fileExt in fileExts:
+        filepath = os.path.join(exportDir, filename + fileExt)
+        
+        remove_existing_file(filepath)
+        
+        if fileExt == '.txt':
+            export_list_to_txt(
+                items=tx.GetParameters(), filename=filename,
+                exportDir=exportDir if exportDir else 'cwd'
+                )
+        else:
+            sitk.WriteTransform(tx, filepath)
+        
+        filepaths.append(filepath)
+    
+    return filepaths
@@ -9,9 +9,10 @@ import os
 from io_tools.imports import import_dict_from_json
 #from select_xnat_config import get_global_vars, get_xnat_config
 from general_tools.geometry import (
-    prop_of_segs_in_extent, prop_of_rois_in_extent
+    props_of_segs_in_extent, props_of_rois_in_extent
     )
 from general_tools.general import are_items_equal_to_within_eps
+from general_tools.slice_index import get_slice_index
 
 
 def get_global_vars():
@@ -78,6 +79,8 @@ class ConfigFetcher:
         The fractional proportion (normalised to 1) of the points or voxels
         that define the contour(s)/segmentation(s) to be copied/propagated
         intersect the extent of trgIm.
+    self.fracPropByRoi : list of floats
+        The fractional proportion for each ROI/segment.
     
     Note
     ----
@@ -232,6 +235,10 @@ class ConfigFetcher:
             The fractional proportion (normalised to 1) of the points or voxels
             that define the contour(s)/segmentation(s) to be copied/propagated
             intersect the extent of trgIm.
+        self.fracPropByRoi : list of floats
+            List (for each ROI/segment) of the fractional proportion 
+            (normalised to 1) of the points or voxels that intersect the 
+            extent of trgIm.
         """
         
         timingMsg = "* Calculating the intersection between the entity to " +\
@@ -243,29 +250,36 @@ class ConfigFetcher:
         p2c = cfgDict['p2c']
         
         if roicolMod == 'SEG':
-            fracProp = prop_of_segs_in_extent(
+            fracPropByRoi, numByRoi = props_of_segs_in_extent(
                 pixarrBySeg=srcDataset.pixarrBySeg, 
                 f2sIndsBySeg=srcDataset.f2sIndsBySeg, 
                 srcIm=srcDataset.dcmIm, 
-                trgIm=trgDataset.dcmIm, 
-                p2c=p2c
+                trgIm=trgDataset.dcmIm
                 )
         else:
-            fracProp = prop_of_rois_in_extent(
+            fracPropByRoi, numByRoi = props_of_rois_in_extent(
                 ptsByCntByRoi=srcDataset.ptsByCntByRoi,
-                trgIm=trgDataset.dcmIm, 
-                p2c=p2c
+                trgIm=trgDataset.dcmIm
                 )
         
+        # The proportion of all points/voxels:
+        fracProp = sum(
+            [fracPropByRoi[r]*numByRoi[r] for r in range(len(numByRoi))]
+            )/sum(numByRoi) if sum(numByRoi) else 0.0
+        
         timingMsg = "Took [*] to calculate the intersection between the " +\
             "entity to be copied and the target image extent.\n"
         params.add_timestamp(timingMsg)
         
         if p2c:
+            for r in range(len(fracPropByRoi)):
+                print(f'{100*fracPropByRoi[r]:.2f}% of ROI/segment {r} '
+                      'intersects the Target image domain.')
             print(f'{100*fracProp:.2f}% of the Source ROI Collection '
                   'intersects the Target image domain.\n')
             
         self.fracProp = fracProp
+        self.fracPropByRoi = fracPropByRoi
     
     def which_use_case(self, srcDataset, trgDataset, params):
         # TODO update docstrings
@@ -472,6 +486,15 @@ class ConfigFetcher:
             else:
                 print(f'   * different origins:\n      Source: {srcIPPs[0]}',
                       f'\n      Target: {trgIPPs[0]}')
+            
+            # The distances of the Source slices to the nearest Target slices:
+            srcSlcIndex = get_slice_index(srcDataset.dcmIm)
+            trgSlcIndex = get_slice_index(trgDataset.dcmIm)
+            nearestInds, diffs = trgSlcIndex.map_slices(
+                srcSlcIndex, range(srcSize[2])
+                )
+            print('   * Source slices are within',
+                  f'{diffs.max():.3f} mm of the nearest Target slices')
                 
             if sameDirs:
                 print('   * same patient orientation\n',
@@ -71,6 +71,7 @@ from conversion_tools.inds_pts_pixarrs import ptsByCntByRoi_to_pixarrByRoi
 #from conversion_tools.inds_pts_cntdata import ptsByCntByRoi_to_cntdataByCntByRoi
 from image_tools.attrs_info import get_im_attrs
 from general_tools.geometry import get_im_extent
+from general_tools.slice_index import get_slice_index
 from io_tools.exports import export_im
 
 class DataImporter:
@@ -604,11 +605,17 @@ class DataImporter:
             SimpleITK Image representation of the DICOM series.
         self.dcmPixarr : SimpleITK Image
             SimpleITK Image representation of the DICOM series.
+        self.sliceIndex : SliceIndex
+            The slice geometry of self.dcmIm (see general_tools.slice_index),
+            which is also attached to self.dcmIm so that it is shared by 
+            subsequent slice queries.
         """
         
         self.dcmIm, self.dcmPixarr = import_dicoms_as_im(self.dicomDir)
+        
+        self.sliceIndex = get_slice_index(self.dcmIm)
     
-    def export_dicom_image(self, params):
+    def export_dicom_image(self, params, exporter=None):
         """
         Exports a SimpleITK Image.
         
@@ -621,6 +628,9 @@ class DataImporter:
             SimpleITK Image representation of the DICOM series.
         params : Params Object
             Object containing various parameters.
+        exporter : ExportManager, optional
+            If provided the image will be written on a background worker of 
+            exporter (see io_tools.export_manager). The default value is None.
             
         Returns
         -------
@@ -628,7 +638,9 @@ class DataImporter:
         
         Note
         ----
-        The image can be exported in HDF, NIFTI or NRRD formats.
+        The image can be exported in HDF, NIFTI or NRRD formats (given by the
+        config setting imExportFormat), compressed if the config setting
+        compressExports is True.
         """
         
         srcORtrg = self.srcORtrg
@@ -637,17 +649,25 @@ class DataImporter:
         cfgDict = params.cfgDict
         runID = cfgDict['runID']
         imExportDir = cfgDict['imExportDir']
+        fileFormat = cfgDict['imExportFormat']
         
         print(f'* Exporting {srcORtrg} image..\n')
         
         fname = f'{runID}_{srcORtrg}Im'
         
-        export_im(
-            image, filename=fname,
-            fileFormat='HDF5ImageIO', exportDir=imExportDir
-        )
+        if exporter is not None:
+            exporter.submit_im(
+                image, filename=fname, exportDir=imExportDir,
+                fileFormat=fileFormat
+                )
+        else:
+            export_im(
+                image, filename=fname,
+                fileFormat=fileFormat, exportDir=imExportDir,
+                useCompression=cfgDict['compressExports']
+            )
         
-    def import_data(self, params):
+    def import_data(self, params, getUids=True):
         # TODO update docstrings
         """
         Import various data.
@@ -657,6 +677,11 @@ class DataImporter:
         params : DataDownloader Object
             Contains parameters (cfgDict), file paths (pathsDict), timestamps
             (timings) and timing messages (timingMsgs).
+        getUids : bool, optional
+            If False the DICOM UIDs will not be fetched, e.g. if 
+            get_dicom_uids() was already called so that the DRO search could
+            start before the data was imported (see io_tools.pipeline). The
+            default value is True.
         Returns
         -------
         
@@ -683,7 +708,8 @@ class DataImporter:
         # Source and Target (06/08/21)
         
         # Get DICOM UIDs:
-        self.get_dicom_uids()
+        if getUids:
+            self.get_dicom_uids()
         
         # Import the ROI Collection:
         self.import_roicol()
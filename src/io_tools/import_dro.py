@@ -16,6 +16,9 @@ from pydicom import dcmread
 from datetime import datetime
 #from xnat_tools.FOR_uid import get_FOR_uid
 from xnat_tools.dicom_metadata import get_dicom_metadata
+from dro_tools.tx_graph import (
+    TxGraph, ALLOWED_TX_NAMES, get_reg_cache_dir, add_reg_cache_to_graph
+    )
     
 
 class DroImporter:
@@ -28,6 +31,14 @@ class DroImporter:
     params : DataDownloader Object
         Contains parameters (cfgDict), file paths (pathsDict), timestamps
         (timings) and timing messages (timingMsgs).
+    srcDataset : DataImporter Object, optional
+        DataImporter Object for the source DICOM series (only the DICOM UIDs
+        are required). If provided (with trgDataset) whether a DRO is required
+        is determined from the Frame of Reference UIDs rather than the use
+        case. The default value is None.
+    trgDataset : DataImporter Object, optional
+        DataImporter Object for the target DICOM series. The default value is
+        None.
     
     Returns
     -------
@@ -53,18 +64,35 @@ class DroImporter:
         List of floats representing the vector deformations that deform the
         moving (Source) image to the fixed (Target) image (if there exists a
         DRO (as a subject assessor) that matches the requirements); None if not.
+    self.txPath : list of dicts or None
+        The path of transforms (from DROs and/or local registrations) from 
+        the Source to the Target Frame of Reference if no DRO matched and 
+        cfgDict['useTxGraph'] is True (see find_tx_path); None otherwise.
     """
     
     
-    def __init__(self, params):
+    def __init__(self, params, srcDataset=None, trgDataset=None):
         cfgDict = params.cfgDict
         
-        useCase = cfgDict['useCaseToApply']
         forceReg = cfgDict['forceReg']
         
+        if srcDataset is None or trgDataset is None:
+            useCase = cfgDict['useCaseToApply']
+            
+            isDroRequired = useCase in ['5a', '5b'] and not forceReg
+        else:
+            """
+            The use case isn't known yet (e.g. the DRO search is started as
+            soon as the DICOM UIDs are known, see io_tools.pipeline). Use 
+            case 5a/5b applies (without forceReg) if and only if the Source 
+            and Target Frames of Reference differ.
+            """
+            isDroRequired = (srcDataset.foruid != trgDataset.foruid and 
+                             not forceReg)
+        
         # Only proceed with searching for a suitable DRO and downloding it if
         # image registration would be required:
-        if useCase in ['5a', '5b'] and not forceReg:
+        if isDroRequired:
             self.fetch_dro(params)
         else:
             self.dro = None
@@ -72,6 +100,7 @@ class DroImporter:
             self.gridDims = None
             self.gridRes = None
             self.vectGridData = None
+            self.txPath = None
             
         #print(f'type(self.dro) = {type(self.dro)}\n')
     
@@ -449,5 +478,103 @@ class DroImporter:
         self.gridRes = gridRes
         self.vectGridData = vectGridData
         
+        self.txPath = None
+        
+        if dro is None and cfgDict['useTxGraph']:
+            self.txPath = self.find_tx_path(
+                params, fnames, files, srcFORuid_req, trgFORuid_req
+                )
+        
         if p2c:
-            print('-'*120)
\ No newline at end of file
+            print('-'*120)
+    
+    def find_tx_path(self, params, fnames, files, srcFORuid, trgFORuid):
+        """
+        Find a path of existing transforms from the Source to the Target
+        Frame of Reference in the transform graph of the subject, built from 
+        the DROs (subject assessors) and the local registration cache.
+        
+        Parameters
+        ----------
+        params : DataDownloader Object
+            Contains parameters (cfgDict), file paths (pathsDict), timestamps
+            (timings) and timing messages (timingMsgs).
+        fnames : list of strs
+            The file names of the DICOM subject assessors.
+        files : list of Pydicom Objects
+            The DICOM subject assessors.
+        srcFORuid : str
+            The FrameOfReferenceUID of the Source image series.
+        trgFORuid : str
+            The FrameOfReferenceUID of the Target image series.
+        
+        Returns
+        -------
+        txPath : list of dicts or None
+            The list of edges (see dro_tools.tx_graph.TxGraph.find_path) from
+            srcFORuid to trgFORuid, or None if no path was found.
+        self.txGraph : TxGraph Object
+            The transform graph of the subject.
+        
+        Note
+        ----
+        Inverses of rigid and affine transforms are used. Deformable 
+        transforms are only used if cfgDict['regTxName'] is 'bspline'. The
+        path is composed and checked for quality before it is used (see 
+        io_tools.propagate.Propagator.create_tx_from_path).
+        """
+        
+        cfgDict = params.cfgDict
+        regTxName = cfgDict['regTxName']
+        p2c = cfgDict['p2c']
+        
+        timingMsg = "* Searching the transform graph for a path of "\
+            + "existing transforms...\n"
+        params.add_timestamp(timingMsg)
+        
+        txGraph = TxGraph()
+        
+        numDros = 0
+        for fname, file in zip(fnames, files):
+            if f'{file.Modality}' != 'REG':
+                continue
+            
+            try:
+                txGraph.add_dro(file, label=fname)
+                numDros += 1
+            except Exception as err:
+                print(f'The DRO {fname} could not be added to the transform'
+                      f' graph: {err}')
+        
+        numLocal = add_reg_cache_to_graph(txGraph, get_reg_cache_dir(cfgDict))
+        
+        maxPathLength = cfgDict['maxTxPathLength']
+        
+        txPath = txGraph.find_path(
+            srcFORuid, trgFORuid, ALLOWED_TX_NAMES[regTxName], maxPathLength
+            )
+        
+        if txPath is None:
+            msg = f"* There was no path of at most {maxPathLength} transforms"\
+                + f" from the {numDros} DRO(s) and {numLocal} local "\
+                + f"registration(s) from the Source ({srcFORuid}) to the "\
+                + f"Target ({trgFORuid}) Frame of Reference.\n"
+            
+            timingMsg = "Took [*] to search the transform graph. None found.\n"
+        else:
+            msg = f"* A path of {len(txPath)} transform(s) from the "\
+                + f"{numDros} DRO(s) and {numLocal} local registration(s) was "\
+                + "found from the Source to the Target Frame of Reference.\n"
+            
+            timingMsg = "Took [*] to find a path in the transform graph.\n"
+        
+        print(msg)
+        
+        if p2c and txPath is not None:
+            txGraph.print_path(txPath)
+        
+        params.add_timestamp(timingMsg)
+        
+        self.txGraph = txGraph
+        
+        return txPath
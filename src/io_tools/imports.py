@@ -12,6 +12,7 @@ reload(dicom_tools.dcm_metadata)
 """
 
 import json
+import numpy as np
 import SimpleITK as sitk
 from pydicom import read_file
 from dicom_tools.dcm_metadata import get_dcm_fpaths
@@ -223,6 +224,36 @@ def import_im(filepath, fileFormat):
     
     return im
 
+def import_packed_labim(filepath):
+    """
+    Import a binary label image exported by
+    io_tools.exports.export_packed_labim.
+    
+    Parameters
+    ----------
+    filepath : str
+        The filepath of the .npz file.
+    
+    Returns
+    -------
+    labim : SimpleITK Image
+        The label image (with pixel type sitkUInt8).
+    """
+    
+    with np.load(filepath) as data:
+        size = [int(item) for item in data['size']]
+        
+        pixarr = np.unpackbits(
+            data['packedBits'], count=int(np.prod(size))
+            ).reshape(size[::-1])
+        
+        labim = sitk.GetImageFromArray(pixarr)
+        labim.SetSpacing([float(item) for item in data['spacing']])
+        labim.SetOrigin([float(item) for item in data['origin']])
+        labim.SetDirection([float(item) for item in data['direction']])
+    
+    return labim
+
 def import_dict_from_json(filepath):
     """
     Import a dictionary from a JSON file from the current working directory.
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 10:12:48 2026
+
+@author: ctorti
+"""
+
+"""
+from importlib import reload
+import io_tools.import_data
+reload(io_tools.import_data)
+import io_tools.import_dro
+reload(io_tools.import_dro)
+"""
+
+import time
+from concurrent.futures import (
+    ThreadPoolExecutor, wait, FIRST_COMPLETED
+    )
+from io_tools.import_data import DataImporter
+from io_tools.import_dro import DroImporter
+
+
+class StagePipeline:
+    """
+    This class runs stages (functions that take no arguments) concurrently in
+    a thread pool, starting each stage as soon as the stages it depends on
+    have completed.
+    
+    Since the stages are mostly I/O (downloads, REST API calls, reading of
+    DICOM files) or run in SimpleITK (which releases the GIL), threads are
+    sufficient to overlap them, and the end-to-end time approaches that of
+    the longest chain of dependent stages rather than the sum of all stages.
+    
+    Parameters
+    ----------
+    maxWorkers : int, optional
+        The maximum number of stages to run concurrently. The default value is
+        4.
+    
+    Returns
+    -------
+    self.stages : dict
+        Dictionary (with stage names as keys) of dictionaries containing the
+        function ('func') and list of names of stages it depends on ('deps').
+    self.results : dict
+        Dictionary (with stage names as keys) of the values returned by each
+        stage.
+    self.stageTimes : dict
+        Dictionary (with stage names as keys) of the start and end times of
+        each stage (relative to the start of the run).
+    self.totalTime : float
+        The time taken to run all stages.
+    
+    Note
+    ----
+    A stage that raises an exception stops any stages that haven't started
+    from being started, and the exception is re-raised once the stages that
+    are running have completed.
+    """
+    
+    def __init__(self, maxWorkers=4):
+        self.maxWorkers = maxWorkers
+        self.stages = {}
+        self.results = {}
+        self.stageTimes = {}
+        self.totalTime = None
+    
+    def add_stage(self, name, func, deps=[]):
+        """
+        Add a stage to the pipeline.
+        
+        Parameters
+        ----------
+        name : str
+            The name of the stage.
+        func : function
+            The function (that takes no arguments) to be run. Its return value
+            will be stored in self.results[name].
+        deps : list of strs, optional
+            The names of the stages that must complete before this stage can
+            start. The default value is [].
+        
+        Returns
+        -------
+        None.
+        """
+        
+        if name in self.stages:
+            msg = f"A stage with name '{name}' has already been added."
+            raise Exception(msg)
+        
+        for dep in deps:
+            if not dep in self.stages:
+                msg = f"The stage '{name}' depends on '{dep}' which has not "\
+                    + "been added. Stages must be added after the stages they"\
+                    + " depend on."
+                raise Exception(msg)
+        
+        self.stages[name] = {'func' : func, 'deps' : list(deps)}
+    
+    def run_stage(self, name, t0):
+        """
+        Run a stage and record its start and end times.
+        """
+        
+        start = time.time() - t0
+        
+        result = self.stages[name]['func']()
+        
+        self.stageTimes[name] = (start, time.time() - t0)
+        
+        return result
+    
+    def run(self):
+        """
+        Run all stages in the pipeline.
+        
+        Returns
+        -------
+        self.results : dict
+            Dictionary (with stage names as keys) of the values returned by
+            each stage.
+        """
+        
+        t0 = time.time()
+        
+        # Since stages can only depend on stages already added there can be
+        # no cycles, so every stage will eventually become ready:
+        pending = list(self.stages.keys())
+        done = []
+        futures = {}
+        error = None
+        
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            while pending or futures:
+                if error is None:
+                    # Submit the stages whose dependencies have completed:
+                    ready = [
+                        name for name in pending if all(
+                            [dep in done for dep in self.stages[name]['deps']]
+                            )
+                        ]
+                    
+                    for name in ready:
+                        pending.remove(name)
+                        
+                        futures[executor.submit(self.run_stage, name, t0)]\
+                            = name
+                else:
+                    pending = []
+                
+                if not futures:
+                    break
+                
+                completed, _ = wait(
+                    list(futures.keys()), return_when=FIRST_COMPLETED
+                    )
+                
+                for future in completed:
+                    name = futures.pop(future)
+                    
+                    try:
+                        self.results[name] = future.result()
+                        done.append(name)
+                    except Exception as err:
+                        if error is None:
+                            error = err
+        
+        self.totalTime = time.time() - t0
+        
+        if error is not None:
+            raise error
+        
+        return self.results
+    
+    def print_summary(self):
+        """
+        Print the start time, end time and duration of each stage, and compare
+        the total time with the sum of the stage durations.
+        """
+        
+        maxL = max([len(name) for name in self.stageTimes.keys()])
+        
+        print('\n\nPIPELINE SUMMARY\n****************')
+        
+        for name, (start, end) in self.stageTimes.items():
+            d = maxL - len(name)
+            print(' '*d + f'{name} : {start:.2f} s to {end:.2f} s '
+                  f'({end - start:.2f} s)')
+        
+        sumOfStages = sum(
+            [end - start for start, end in self.stageTimes.values()]
+            )
+        
+        print(f'\nTook {self.totalTime:.2f} s to run the pipeline (the sum of '
+              f'the stage durations is {sumOfStages:.2f} s).\n')
+
+def download_and_import_data(cfgObj, params, maxWorkers=4):
+    """
+    Download and import the source and target data, determine the use case
+    and fetch the DRO (if applicable) using a StagePipeline.
+    
+    This is equivalent to the following steps in app.main:
+        params.download_and_get_pathsDict()
+        srcDataset = DataImporter(params, 'src')
+        srcDataset.import_data(params)
+        trgDataset = DataImporter(params, 'trg')
+        trgDataset.import_data(params)
+        cfgObj.get_intersection_of_roi_and_trgIm(
+            srcDataset, trgDataset, params
+            )
+        cfgObj.which_use_case(srcDataset, trgDataset, params)
+        droObj = DroImporter(params)
+    
+    but with the stages overlapped as follows:
+        -- the source and target data are downloaded concurrently
+        -- the DICOM UIDs are fetched as soon as each download completes
+        -- the DRO search starts as soon as both sets of UIDs are known
+        -- the source and target data are imported concurrently (and
+        concurrently with the DRO search and the other download)
+        -- the use case is determined once both imports have completed
+    
+    Parameters
+    ----------
+    cfgObj : ConfigFetcher Object
+        Contains the parameters (cfgDict) for the run.
+    params : DataDownloader Object
+        Contains parameters (cfgDict), file paths (pathsDict), timestamps
+        (timings) and timing messages (timingMsgs).
+    maxWorkers : int, optional
+        The maximum number of stages to run concurrently. The default value is
+        4.
+    
+    Returns
+    -------
+    srcDataset : DataImporter Object
+        DataImporter Object for the source DICOM series.
+    trgDataset : DataImporter Object
+        DataImporter Object for the target DICOM series.
+    droObj : DroImporter Object
+        DroImporter Object containing the DRO (if applicable).
+    pipeline : StagePipeline Object
+        The pipeline (containing the timings of each stage).
+    """
+    
+    params.print_cfg_params_to_console()
+    
+    pipeline = StagePipeline(maxWorkers)
+    results = pipeline.results
+    
+    def get_uids(srcORtrg):
+        dataset = DataImporter(params, srcORtrg)
+        dataset.get_dicom_uids()
+        return dataset
+    
+    def import_data(srcORtrg):
+        dataset = results[f'{srcORtrg}_uids']
+        dataset.import_data(params, getUids=False)
+        return dataset
+    
+    def get_use_case():
+        srcDataset = results['import_src']
+        trgDataset = results['import_trg']
+        
+        cfgObj.get_intersection_of_roi_and_trgIm(
+            srcDataset, trgDataset, params
+            )
+        
+        cfgObj.which_use_case(srcDataset, trgDataset, params)
+    
+    pipeline.add_stage('download_src', params.download_src_data)
+    pipeline.add_stage('download_trg', params.download_trg_data)
+    pipeline.add_stage(
+        'src_uids', lambda: get_uids('src'), deps=['download_src']
+        )
+    pipeline.add_stage(
+        'trg_uids', lambda: get_uids('trg'), deps=['download_trg']
+        )
+    pipeline.add_stage(
+        'dro_search',
+        lambda: DroImporter(
+            params, results['src_uids'], results['trg_uids']
+            ),
+        deps=['src_uids', 'trg_uids']
+        )
+    pipeline.add_stage(
+        'import_src', lambda: import_data('src'), deps=['src_uids']
+        )
+    pipeline.add_stage(
+        'import_trg', lambda: import_data('trg'), deps=['trg_uids']
+        )
+    pipeline.add_stage(
+        'use_case', get_use_case, deps=['import_src', 'import_trg']
+        )
+    
+    pipeline.run()
+    
+    return results['import_src'], results['import_trg'],\
+        results['dro_search'], pipeline
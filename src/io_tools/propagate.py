@@ -19,6 +19,8 @@ import image_tools.registering
 reload(image_tools.registering)
 import dro_tools.create_tx_from_dro
 reload(dro_tools.create_tx_from_dro)
+import dro_tools.tx_graph
+reload(dro_tools.tx_graph)
 import plotting_tools.general
 reload(plotting_tools.general)
 import plotting_tools.res_reg_results
@@ -29,6 +31,20 @@ import general_tools.geometry
 reload(general_tools.geometry)
 import general_tools.console_printing
 reload(general_tools.console_printing)
+import image_tools.threads
+reload(image_tools.threads)
+import image_tools.convergence
+reload(image_tools.convergence)
+import image_tools.cropping
+reload(image_tools.cropping)
+import image_tools.pyramid
+reload(image_tools.pyramid)
+import image_tools.displacement
+reload(image_tools.displacement)
+import image_tools.lazy
+reload(image_tools.lazy)
+import general_tools.transforming
+reload(general_tools.transforming)
 """
 
 import time
@@ -45,17 +61,42 @@ from general_tools.general import (
     #does_instance_variable_exist
     )
 #from conversion_tools.pixarrs_ims import pixarr_to_im
-from conversion_tools.inds_pts_pixarrs import pixarrBySeg_to_ptsByCntByRoi
+from conversion_tools.pixarrs_ims import pixarrBySeg_to_labimBySeg
+from conversion_tools.inds_pts_pixarrs import (
+    pixarrBySeg_to_ptsByCntByRoi, ptsByCntByRoi_to_pixarrByRoi
+    )
+from conversion_tools.inds_pts_cntdata import (
+    ptsByCntByRoi_to_cntdataByCntByRoi
+    )
 #from image_tools.attrs_info import get_im_info
 from image_tools.resampling import resample_im, resample_labimBySeg
-from image_tools.registering import register_im
+from image_tools.registering import (
+    register_im, multistart_reg_im, evaluate_reg_metric, refine_reg_tx
+    )
+from image_tools.threads import get_num_threads, stage_threads
+from image_tools.convergence import ConvergenceController
+from image_tools.cropping import (
+    get_focus_region, crop_im_to_phys_bbox, create_mask_from_phys_bbox
+    )
+from image_tools.pyramid import get_pyramid_cache
+from image_tools.lazy import LazyImage, get_im
+from image_tools.displacement import (
+    is_deformable_tx, get_disp_field_cache, check_disp_field_accuracy,
+    get_sub_txs
+    )
 from dro_tools.create_tx_from_dro import (
     create_tx_from_spa_dro, create_pre_tx_from_def_dro, create_tx_from_def_dro
     )
+from dro_tools.tx_graph import (
+    compose_path, get_reg_cache_dir, store_reg_in_cache
+    )
+from general_tools.transforming import (
+    transform_ptsByCntByRoi, get_affine_matrix
+    )
 from general_tools.pixarr_ops import (
     mean_frame_in_pixarrBySeg, or_frame_of_pixarrBySeg
     )
-from io_tools.exports import export_im, export_list_to_txt
+from io_tools.exports import export_labim, export_tx
 #from general_tools.geometry import (
 #    prop_of_segs_in_extent, prop_of_rois_in_extent
 #    )
@@ -114,6 +155,13 @@ class Propagator:
     self.initRegTx
     self.initRegTxParams 
     self.alignedIm
+    self.regCandidates
+    self.regLog
+    self.focusRegion
+    self.dispTx
+    self.dispFieldErrors
+    self.txPath
+    self.txPathMetrics
     self.preRegTx 
     self.preRegTxParams
     self.metricValues
@@ -220,6 +268,16 @@ class Propagator:
         self.initRegTx = None # initial registration transform
         self.initRegTxParams = None
         self.alignedIm = None # from resampling usinig initRegTx
+        self.regCandidates = None # diagnostics from multi-start registration
+        self.regLog = None # decisions of the adaptive convergence controller
+        self.focusRegion = None # physical region used for focused registration
+        self.dispTx = None # displacement field transform created from resTx
+        self.dispTxFrom = None # the resTx that dispTx was created from
+        self.dispTxIsValid = False
+        self.dispFieldErrors = None # accuracy of dispTx v resTx
+        self.txPath = None # path of transforms composed from the tx graph
+        self.txPathMetrics = None # metric values of the composed path
+        self.isPtsTx = False # contours were propagated by transforming pts
         #self.finalTx = None # from registration or DRO
         #self.sitkTx = None
         #self.regIm = None
@@ -234,10 +292,10 @@ class Propagator:
         
         """
         Initialise self.resIm, which will result from resampling, transforming
-        (from DRO transform parameters) or registration:
+        (from DRO transform parameters) or registration (self.resDcmPixarr is
+        derived from it):
         """
         self.resIm = None
-        self.resDcmPixarr = None
         
         
         # TODO are inputs valid below
@@ -277,6 +335,35 @@ class Propagator:
         
         #self.propagate(params, srcDataset, trgDataset)
     
+    """
+    The resampled/registered source image and the pre-registration aligned 
+    image are only consumed by plots, exports and console output, so they are
+    stored as LazyImages (see image_tools.lazy) and only resampled when first
+    accessed.
+    """
+    @property
+    def resIm(self):
+        return get_im(self._resIm)
+    
+    @resIm.setter
+    def resIm(self, image):
+        self._resIm = image
+    
+    @property
+    def alignedIm(self):
+        return get_im(self._alignedIm)
+    
+    @alignedIm.setter
+    def alignedIm(self, image):
+        self._alignedIm = image
+    
+    @property
+    def resDcmPixarr(self):
+        resIm = self.resIm
+        
+        return None if resIm is None else sitk.GetArrayViewFromImage(resIm)
+    
+    
     def get_voxel_shift(self, srcDataset, trgDataset, params):
         # TODO update docstrings
         """
@@ -341,7 +428,7 @@ class Propagator:
         #if useCaseToApply in ['1', '2a', '2b']:
         if useCaseToApply in ['1', '2a']:
             im = srcDataset.dcmIm
-            #slcNum = srcDataset.slcNum # initial value
+            slcNum = srcDataset.slcNum # self.slcNum isn't set for 1/2a
             #f2sIndsByRoi = srcDataset.f2sIndsByRoi # initial value
             #pixarrByRoi = srcDataset.pixarrByRoi # initial value
             
@@ -377,6 +464,7 @@ class Propagator:
             # Use the resampled source slice number for srcSlcNum, and the
             # resampled pixel arrays for srcPixarrByRoi:
             im = self.dcmIm # 27/09/21
+            slcNum = self.slcNum # 27/09/21
             #im = srcDataset.dcmIm # 14/09/21
             #srcSlcNum = self.resSlcNum # does this still exist? (06/09/21)
             #srcPixarrByRoi = self.resPixarrByRoi # does this still exist? (06/09/21)
@@ -400,7 +488,7 @@ class Propagator:
         """
         #srcIm = srcDataset.dcmIm
         #slcNum = srcDataset.slcNum
-        slcNum = self.slcNum # 27/09/21
+        #slcNum = self.slcNum # 27/09/21
         
         trgIm = trgDataset.dcmIm
         trgSlcNum = trgDataset.slcNum
@@ -1083,6 +1171,93 @@ class Propagator:
                 + "copy of the source ROI Collection.\n"
         params.add_timestamp(timingMsg)
     
+    def get_res_tx(self, trgDataset, params):
+        """
+        Get the transform to use when resampling source images (e.g. label
+        images and the DICOM image) to the target domain.
+        
+        Parameters
+        ----------
+        trgDataset : DataImporter Object
+            DataImporter Object for the target DICOM series.
+        params : DataDownloader Object
+            Contains parameters (cfgDict), file paths (pathsDict), timestamps
+            (timings) and timing messages (timingMsgs).
+        
+        Returns
+        -------
+        sitkTx : SimpleITK Transform
+            self.resTx, or the displacement field transform created from 
+            self.resTx in the target image gridspace (self.dispTx) if 
+            cfgDict['useDispField'] is True and self.resTx is deformable.
+        self.dispTx : SimpleITK DisplacementFieldTransform or None
+            The displacement field transform (if created).
+        self.dispFieldErrors : dict or None
+            The errors (in mm) between points transformed by self.dispTx and
+            self.resTx (see 
+            image_tools.displacement.check_disp_field_accuracy).
+        
+        Note
+        ----
+        Evaluating a BSpline transform is costly, and resample_labimBySeg
+        evaluates it at every voxel of the target image for every label
+        image. The displacement field is created once per transform (and 
+        cached to cfgDict['dispFieldDir'] if not '') so that subsequent 
+        resamplings only interpolate the field. Since the field is sampled at 
+        the voxel centres of the target image, resampling onto the target
+        image gridspace using self.dispTx is equivalent to using self.resTx
+        (to within dispFieldTol, otherwise self.resTx will be used).
+        
+        self.resTx is unchanged (e.g. for export to a DRO).
+        """
+        
+        cfgDict = params.cfgDict
+        p2c = cfgDict['p2c']
+        
+        if not cfgDict['useDispField'] or not is_deformable_tx(self.resTx):
+            return self.resTx
+        
+        # Re-use the displacement field transform if it was created from the 
+        # current resTx:
+        if self.dispTx is not None and self.dispTxFrom is self.resTx:
+            return self.dispTx if self.dispTxIsValid else self.resTx
+        
+        timingMsg = "* Creating the displacement field from the "\
+            + "deformable transform...\n"
+        params.add_timestamp(timingMsg)
+        
+        dispFieldCache = get_disp_field_cache(cfgDict['dispFieldDir'])
+        
+        with stage_threads(cfgDict, 'resampling'):
+            self.dispTx = dispFieldCache.get_tx(
+                self.resTx, trgDataset.dcmIm,
+                numThreads=get_num_threads(cfgDict, 'resampling')
+                )
+        self.dispTxFrom = self.resTx
+        
+        self.dispFieldErrors = check_disp_field_accuracy(
+            self.resTx, self.dispTx, trgDataset.dcmIm
+            )
+        
+        self.dispTxIsValid = \
+            self.dispFieldErrors['maxVoxErr'] <= cfgDict['dispFieldTol']
+        
+        if p2c or not self.dispTxIsValid:
+            print('Displacement field v deformable transform errors (mm): '
+                  f"max = {self.dispFieldErrors['maxVoxErr']:.2e} (voxels),"
+                  f" {self.dispFieldErrors['maxSubVoxErr']:.2e} (sub-voxel)"
+                  )
+        
+        if not self.dispTxIsValid:
+            print('The maximum error exceeds dispFieldTol = '
+                  f"{cfgDict['dispFieldTol']} mm so the deformable transform"
+                  ' will be used.\n')
+        
+        timingMsg = "Took [*] to create the displacement field.\n"
+        params.add_timestamp(timingMsg)
+        
+        return self.dispTx if self.dispTxIsValid else self.resTx
+    
     def resample_src_labims(self, srcDataset, trgDataset, params):
         # TODO update docstrings
         """
@@ -1127,21 +1302,26 @@ class Propagator:
             _2sIndsBy_ = srcDataset.f2sIndsBySeg
             labimBy_ = srcDataset.labimBySeg
             
-        labimBy_, pixarrBy_, f2sIndsBy_ = resample_labimBySeg(
-            labimBySeg=labimBy_,
-            f2sIndsBySeg=_2sIndsBy_,
-            im=srcDataset.dcmIm,
-            refIm=trgDataset.dcmIm,
-            sitkTx=self.resTx, # 03/09/21
-            #sitkTx=self.sitkTx, # 01/09/21
-            #sitkTx=self.finalTx, # 01/09/21
-            interp=params.cfgDict['resInterp'], 
-            applyPreResBlur=params.cfgDict['applyPreResBlur'],
-            preResVar=params.cfgDict['preResVar'],
-            applyPostResBlur=params.cfgDict['applyPostResBlur'],
-            postResVar=params.cfgDict['postResVar'],
-            p2c=params.cfgDict['p2c']
-            )
+        with stage_threads(params.cfgDict, 'resampling'):
+            labimBy_, pixarrBy_, f2sIndsBy_ = resample_labimBySeg(
+                labimBySeg=labimBy_,
+                f2sIndsBySeg=_2sIndsBy_,
+                im=srcDataset.dcmIm,
+                refIm=trgDataset.dcmIm,
+                sitkTx=self.get_res_tx(trgDataset, params),
+                #sitkTx=self.resTx, # 03/09/21
+                #sitkTx=self.sitkTx, # 01/09/21
+                #sitkTx=self.finalTx, # 01/09/21
+                interp=params.cfgDict['resInterp'], 
+                applyPreResBlur=params.cfgDict['applyPreResBlur'],
+                preResVar=params.cfgDict['preResVar'],
+                applyPostResBlur=params.cfgDict['applyPostResBlur'],
+                postResVar=params.cfgDict['postResVar'],
+                numThreads=get_num_threads(params.cfgDict, 'resampling'),
+                blurNumThreads=get_num_threads(params.cfgDict, 'blurring'),
+                useGridAligned=params.cfgDict['useGridAlignedRes'],
+                p2c=params.cfgDict['p2c']
+                )
         
         """
         Although the desired interpolation (resInterp) was provided, the actual
@@ -1176,6 +1356,215 @@ class Propagator:
             self.pixarrBySeg = pixarrBy_
             self.labimBySeg = labimBy_
     
+    def transform_src_pts(self, srcDataset, trgDataset, params):
+        """
+        Propagate the source contours to the target domain by transforming
+        their points directly (rather than by resampling the source label
+        images), if possible.
+        
+        Parameters
+        ----------
+        srcDataset : DataImporter Object
+            DataImporter Object for the source DICOM series.
+        trgDataset : DataImporter Object
+            DataImporter Object for the target DICOM series.
+        params : DataDownloader Object
+            Contains parameters (cfgDict), file paths (pathsDict), timestamps
+            (timings) and timing messages (timingMsgs).
+        
+        Returns
+        -------
+        self.isPtsTx : bool
+            True if the contours were propagated, False if the source label
+            images need to be resampled instead (i.e. cfgDict['usePtsTx'] is
+            False, the ROI Collection isn't an RTSTRUCT, the use case isn't
+            relationship-preserving, self.resTx isn't linear, or a transformed
+            contour isn't coplanar with the target slices to within
+            cfgDict['ptsTxTol']).
+        self.ptsByCntByRoi : list of list of a list of a list of floats
+            List (for each ROI) of a list (for all contours) of a list (for
+            each point) of a list (for each dimension) of coordinates.
+        self.c2sIndsByRoi : list of a list of ints
+            List (for each ROI) of a list (for each contour) of the target
+            slice indices.
+        self.cntdataByCntByRoi : list of a list of a list of strs
+            List (for each ROI) of a list (for all contours) of a flat list of
+            coordinates in ptsByCntByRoi converted from floats to strings.
+        self.pixarrByRoi, self.labimByRoi and self.f2sIndsByRoi
+            The pixel arrays, label images and frame-to-slice indices of the
+            propagated contours (for overlays and export of label images).
+        
+        Note
+        ----
+        Under a linear transform the propagated contours are the transformed
+        source contours, so the resampling, blurring and binarisation of label
+        images and the conversion back to contours are avoided (see
+        general_tools.transforming.transform_ptsByCntByRoi). Deformable
+        transforms, non-relationship-preserving use cases (which operate on
+        pixel arrays) and out-of-plane rotations fall back to resampling.
+        """
+        
+        cfgDict = params.cfgDict
+        p2c = cfgDict['p2c']
+        
+        self.isPtsTx = False
+        
+        if not (cfgDict['usePtsTx'] and cfgDict['roicolMod'] == 'RTSTRUCT'
+                and cfgDict['useCaseToApply'] in ['3b', '4b', '5b']):
+            return self.isPtsTx
+        
+        timingMsg = "* Transforming the source contour points...\n"
+        params.add_timestamp(timingMsg)
+        
+        ptsByCntByRoi, c2sIndsByRoi, maxSpread = transform_ptsByCntByRoi(
+            ptsByCntByRoi=srcDataset.ptsByCntByRoi,
+            c2sIndsByRoi=srcDataset.c2sIndsByRoi,
+            sitkTx=self.resTx,
+            srcIm=srcDataset.dcmIm,
+            trgIm=trgDataset.dcmIm,
+            tol=cfgDict['ptsTxTol'],
+            p2c=p2c
+            )
+        
+        if ptsByCntByRoi is None:
+            if maxSpread is None:
+                print('The transform is not linear so the source label images'
+                      ' will be resampled.\n')
+            else:
+                print('The transformed contours are not coplanar with the '
+                      f'target slices (spread = {maxSpread:.2e} > ptsTxTol = '
+                      f"{cfgDict['ptsTxTol']} slices) so the source label "
+                      'images will be resampled.\n')
+            return self.isPtsTx
+        
+        self.ptsByCntByRoi = ptsByCntByRoi
+        self.c2sIndsByRoi = c2sIndsByRoi
+        self.cntdataByCntByRoi = ptsByCntByRoi_to_cntdataByCntByRoi(
+            ptsByCntByRoi
+            )
+        
+        # As for DataImporter, populate the pixel arrays and label images for
+        # consistency with SEG data:
+        self.pixarrByRoi = ptsByCntByRoi_to_pixarrByRoi(
+            ptsByCntByRoi=ptsByCntByRoi, refIm=trgDataset.dcmIm, p2c=p2c
+            )
+        
+        self.labimByRoi, self.f2sIndsByRoi = pixarrBySeg_to_labimBySeg(
+            pixarrBySeg=self.pixarrByRoi,
+            f2sIndsBySeg=c2sIndsByRoi,
+            refIm=trgDataset.dcmIm,
+            p2c=p2c
+            )
+        
+        params.cfgDict['resInterpUsed'] = 'None'
+        
+        self.isPtsTx = True
+        
+        timingMsg = "Took [*] to transform the source contour points.\n"
+        params.add_timestamp(timingMsg)
+        print(timingMsg)
+        
+        return self.isPtsTx
+    
+    def get_focused_reg_inputs(self, srcDataset, trgDataset, params):
+        """
+        Get the images (and masks) for ROI-focused registration.
+        
+        Parameters
+        ----------
+        srcDataset : DataImporter Object
+            DataImporter Object for the source DICOM series.
+        trgDataset : DataImporter Object
+            DataImporter Object for the target DICOM series.
+        params : DataDownloader Object
+            Contains parameters (cfgDict), file paths (pathsDict), timestamps
+            (timings) and timing messages (timingMsgs).
+        
+        Returns
+        -------
+        fixIm : SimpleITK Image
+            The (cropped if cfgDict['focusedReg'] is 'crop') target image.
+        movIm : SimpleITK Image
+            The (cropped if cfgDict['focusedReg'] is 'crop') source image.
+        fixMask : SimpleITK Image or None
+            The mask of the focus region in the target image domain if 
+            cfgDict['focusedReg'] is 'mask', None otherwise.
+        movMask : SimpleITK Image or None
+            The mask of the focus region in the source image domain if 
+            cfgDict['focusedReg'] is 'mask', None otherwise.
+        self.focusRegion : tuple of Numpy arrays or None
+            The physical region (bboxMin, bboxMax) that registration was
+            focused on, or None if the full images were used.
+        
+        Note
+        ----
+        The focus region is the bounding box of the source ROI(s), expanded by
+        cfgDict['focusedRegMargin'] (mm), and intersected with the physical
+        extents of both images (see image_tools.cropping.get_focus_region).
+        It is defined in physical space, so it is assumed that the anatomy of
+        interest occupies similar physical coordinates in the source and 
+        target images (to within the margin). 
+        
+        Since cropping preserves the physical coordinates of the voxels, the
+        transforms that result from registering the cropped images are valid 
+        in the physical space of the original images. For a BSpline transform
+        the control point grid will only cover the focus region (outside of 
+        which the deformation is zero).
+        
+        If the source ROI(s) are empty or the focus region doesn't intersect
+        both images, the full images will be used.
+        """
+        
+        fixIm = trgDataset.dcmIm
+        movIm = srcDataset.dcmIm
+        
+        cfgDict = params.cfgDict
+        focusedReg = cfgDict['focusedReg']
+        margin = cfgDict['focusedRegMargin']
+        p2c = cfgDict['p2c']
+        
+        if not focusedReg in ['crop', 'mask']:
+            msg = f"focusedReg = '{focusedReg}' is not valid. Acceptable "\
+                + "values are '', 'crop' and 'mask'."
+            raise Exception(msg)
+        
+        if cfgDict['roicolMod'] == 'RTSTRUCT':
+            labimBy_ = srcDataset.labimByRoi
+        else:
+            labimBy_ = srcDataset.labimBySeg
+        
+        bbox = get_focus_region(
+            fixIm=fixIm, movIm=movIm, movLabims=labimBy_, margin=margin
+            )
+        
+        self.focusRegion = bbox
+        
+        if bbox is None:
+            print('\nThe focus region for registration is empty. The full',
+                  'images will be used.\n')
+            return fixIm, movIm, None, None
+        
+        if focusedReg == 'crop':
+            fixIm = crop_im_to_phys_bbox(fixIm, bbox)
+            movIm = crop_im_to_phys_bbox(movIm, bbox)
+            fixMask = None
+            movMask = None
+        else:
+            fixMask = create_mask_from_phys_bbox(fixIm, bbox)
+            movMask = create_mask_from_phys_bbox(movIm, bbox)
+        
+        if p2c:
+            print(f'\nFocus region for registration ({focusedReg}):')
+            print(f'   bboxMin = {bbox[0]}')
+            print(f'   bboxMax = {bbox[1]}')
+            if focusedReg == 'crop':
+                print(f'   target size: {trgDataset.dcmIm.GetSize()} -> '
+                      f'{fixIm.GetSize()}')
+                print(f'   source size: {srcDataset.dcmIm.GetSize()} -> '
+                      f'{movIm.GetSize()}\n')
+        
+        return fixIm, movIm, fixMask, movMask
+    
     def register_image(self, srcDataset, trgDataset, params):
         # TODO update docstrings
         """
@@ -1212,6 +1601,22 @@ class Propagator:
         self.multiresIters : list of floats
             The iteration number at each step change of resolution during
             optimisation.
+        self.regCandidates : list of dicts or None
+            The diagnostics for each candidate if multi-start registration
+            was performed (i.e. if cfgDict['multiStartReg'] is True).
+        self.regLog : list of dicts or None
+            The decisions made by the convergence controller if adaptive
+            convergence was used (i.e. if cfgDict['adaptiveReg'] is True).
+        self.focusRegion : tuple of Numpy arrays or None
+            The physical region that registration was focused on if 
+            cfgDict['focusedReg'] is 'crop' or 'mask' (see 
+            get_focused_reg_inputs).
+        self.preRegTx : SimpleITK Transform
+            The linear (pre-deformation) transform if a cascaded registration
+            was performed (i.e. if cfgDict['cascadeReg'] is True and 
+            cfgDict['regTxName'] is 'bspline').
+        self.preRegTxParams : list of floats
+            List of the parameters for self.preRegTx.
         params.timings : list of Time timestamps
             Additional timestamp appended.
         params.timingMsgs : list of strs
@@ -1268,16 +1673,80 @@ class Propagator:
             print(f'fixFidsFpath = {fixFidsFpath}')
             print(f'movFidsFpath = {movFidsFpath}\n')
         
-        self.initRegTx, self.alignedIm, self.resTx, self.resIm,\
-            self.metricValues, self.multiresIters = register_im(
-                fixIm=fixIm, movIm=movIm, 
-                regTxName=regTxName, initMethod=initMethod,
-                fixFidsFpath=fixFidsFpath, 
-                movFidsFpath=movFidsFpath,
-                p2c=p2c, regPlotFpath=resPlotFpath
+        # Focus the registration on the region around the source ROI(s)?
+        if cfgDict['focusedReg']:
+            regFixIm, regMovIm, fixMask, movMask = \
+                self.get_focused_reg_inputs(srcDataset, trgDataset, params)
+        else:
+            regFixIm, regMovIm, fixMask, movMask = fixIm, movIm, None, None
+        
+        with stage_threads(params.cfgDict, 'registration'):
+            if cfgDict['multiStartReg']:
+                self.initRegTx, self.alignedIm, self.resTx, self.resIm,\
+                    self.metricValues, self.multiresIters,\
+                        self.regCandidates = multistart_reg_im(
+                            fixIm=regFixIm, movIm=regMovIm, 
+                            regTxName=regTxName, initMethod=initMethod,
+                            fixFidsFpath=fixFidsFpath, 
+                            movFidsFpath=movFidsFpath,
+                            fixMask=fixMask, movMask=movMask,
+                            numThreads=get_num_threads(
+                                params.cfgDict, 'registration'
+                                ),
+                            p2c=p2c
+                            )
+            else:
+                if cfgDict['adaptiveReg']:
+                    controller = ConvergenceController(p2c=p2c)
+                else:
+                    controller = None
+                
+                if cfgDict['cacheRegPyramids']:
+                    pyramidCache = get_pyramid_cache()
+                else:
+                    pyramidCache = None
+                
+                self.initRegTx, self.alignedIm, self.resTx, self.resIm,\
+                    self.metricValues, self.multiresIters = register_im(
+                        fixIm=regFixIm, movIm=regMovIm, 
+                        regTxName=regTxName, initMethod=initMethod,
+                        fixFidsFpath=fixFidsFpath, 
+                        movFidsFpath=movFidsFpath,
+                        fixMask=fixMask, movMask=movMask,
+                        cascade=cfgDict['cascadeReg'],
+                        numThreads=get_num_threads(
+                            params.cfgDict, 'registration'
+                            ),
+                        controller=controller, pyramidCache=pyramidCache,
+                        p2c=p2c, regPlotFpath=resPlotFpath
+                        )
+                
+                if controller is not None:
+                    self.regLog = controller.log
+                    
+                    if p2c:
+                        controller.print_log()
+                
+                if cfgDict['cascadeReg'] and regTxName == 'bspline':
+                    # The linear transform is the pre-deformation transform
+                    # (self.resTx is the composite of it and the BSpline):
+                    self.preRegTx = self.initRegTx
+                    self.preRegTxParams = list(self.preRegTx.GetParameters())
+        
+        if not regFixIm is fixIm or not regMovIm is movIm:
+            # Resample the full source image onto the full target image grid
+            # (the transforms are valid in the original physical space):
+            numThreads = get_num_threads(cfgDict, 'resampling')
+            
+            self.resIm = LazyImage(
+                resample_im, im=movIm, refIm=fixIm, 
+                sitkTx=self.get_res_tx(trgDataset, params), interp='Linear',
+                numThreads=numThreads, p2c=False
+                )
+            self.alignedIm = LazyImage(
+                resample_im, im=movIm, refIm=fixIm, sitkTx=self.initRegTx, 
+                interp='Linear', numThreads=numThreads, p2c=False
                 )
-        
-        self.resDcmPixarr = sitk.GetArrayViewFromImage(self.resIm)
         
         #if p2c:
         #    print(f'\nmetricValues = {self.metricValues}')
@@ -1299,6 +1768,14 @@ class Propagator:
         self.resTxParams = self.resTx.GetParameters() # 03/09/21
         self.initRegTxParams = self.initRegTx.GetParameters() # 03/09/21
         
+        if cfgDict['useTxGraph']:
+            # Store the transform in the local registration cache so that it
+            # can be used in transform paths (see dro_tools.tx_graph):
+            store_reg_in_cache(
+                get_reg_cache_dir(cfgDict), srcDataset.foruid, 
+                trgDataset.foruid, self.resTx, regTxName
+                )
+        
         timingMsg = "Took [*] to register the source to target DICOM scans.\n"
         params.add_timestamp(timingMsg)
     
@@ -1343,6 +1820,7 @@ class Propagator:
         srcIm = srcDataset.dcmIm
         trgIm = trgDataset.dcmIm
         p2c = params.cfgDict['p2c']
+        numThreads = get_num_threads(params.cfgDict, 'resampling')
         
         timingMsg = "Creating a transform from the DRO...\n"
         params.add_timestamp(timingMsg)
@@ -1357,9 +1835,9 @@ class Propagator:
             #listOfSitkTxs.append(sitkTx)
             
             # Resample srcIm:
-            resIm = resample_im(
-                im=srcIm, refIm=trgIm, sitkTx=resTx, interp='Linear', 
-                p2c=False
+            resIm = LazyImage(
+                resample_im, im=srcIm, refIm=trgIm, sitkTx=resTx, 
+                interp='Linear', numThreads=numThreads, p2c=False
                 )
         else:
             # Create the deformable SimpleITK Transform:
@@ -1378,15 +1856,16 @@ class Propagator:
                 so no need to resample/transform the label image using
                 preRegTx - only need to use sitkTx. 
                 """
-                # Resample srcIm using sitkTx:
-                resIm = resample_im(
-                    im=srcIm, refIm=trgIm, sitkTx=resTx, 
-                    interp='Linear', p2c=False
-                    )
-                
                 # Update resTx and resTxParams:
                 self.resTx = resTx
                 self.resTxParams = list(resTx.GetParameters())
+                
+                # Resample srcIm using sitkTx:
+                resIm = LazyImage(
+                    resample_im, im=srcIm, refIm=trgIm, 
+                    sitkTx=self.get_res_tx(trgDataset, params), 
+                    interp='Linear', numThreads=numThreads, p2c=False
+                    )
             else:
                 """ 
                 The pre-registration matrix is not the identity matrix so
@@ -1397,15 +1876,16 @@ class Propagator:
                 compTx = sitk.CompositeTransform(preRegTx)
                 compTx.AddTransform(resTx)
             
-                # Resample srcIm usig compTx:
-                resIm = resample_im(
-                    im=srcIm, refIm=trgIm, sitkTx=compTx, 
-                    interp='Linear', p2c=False
-                    )
-                
                 # Update resTx and resTxParams:
                 self.resTx = compTx
                 self.resTxParams = list(compTx.GetParameters())
+                
+                # Resample srcIm usig compTx:
+                resIm = LazyImage(
+                    resample_im, im=srcIm, refIm=trgIm, 
+                    sitkTx=self.get_res_tx(trgDataset, params), 
+                    interp='Linear', numThreads=numThreads, p2c=False
+                    )
         
         timingMsg = "Took [*] to create the transform.\n"
         params.add_timestamp(timingMsg)
@@ -1413,7 +1893,184 @@ class Propagator:
         #self.dcmIm = resIm 
         self.resIm = resIm # 27/09/21
         
-        self.resDcmPixarr = sitk.GetArrayViewFromImage(self.resIm)
+    def create_tx_from_path(self, srcDataset, trgDataset, txPath, params):
+        """
+        Compose a path of existing transforms (from the transform graph of 
+        the subject) into a single transform, and use it if it passes a 
+        quality check.
+        
+        Parameters
+        ----------
+        srcDataset : DataImporter Object
+            DataImporter Object for the source DICOM series.
+        trgDataset : DataImporter Object
+            DataImporter Object for the target DICOM series.
+        txPath : list of dicts
+            The list of edges from the Source to the Target Frame of Reference
+            (see io_tools.import_dro.DroImporter.find_tx_path).
+        params : DataDownloader Object
+            Contains parameters (cfgDict), file paths (pathsDict), timestamps
+            (timings) and timing messages (timingMsgs).
+        
+        Returns
+        -------
+        isAccepted : bool
+            True if the composed transform passed the quality check (in which
+            case registration isn't required).
+        self.resTx : SimpleITK AffineTransform or CompositeTransform
+            The composed transform (if accepted), collapsed into a single
+            AffineTransform if all of the transforms in the path are linear.
+        self.resTxParams : list of floats
+            The parameters of self.resTx (if accepted), or the parameters of
+            each of its transforms (concatenated) if it's a 
+            CompositeTransform.
+        self.resIm : SimpleITK Image
+            The source image resampled using self.resTx (if accepted).
+        self.txPath : list of dicts
+            txPath (if accepted).
+        self.txPathMetrics : dict
+            Dictionary with keys 'pathMetric' and 'initMetric', the metric 
+            values (see image_tools.registering.evaluate_reg_metric) of the
+            composed transform and the geometry-centred initial alignment,
+            'refinedMetric', 'relImprovement' and 'shift', the metric value,
+            its relative improvement and the largest displacement (in mm) 
+            after a short registration starting from the composed transform
+            (see image_tools.registering.refine_reg_tx), and 'reason', why
+            the composed transform was accepted or rejected.
+        
+        Note
+        ----
+        Errors accumulate along a path, so the composed transform is only 
+        accepted if it aligns the images better than the geometry-centred 
+        initial alignment that registration would start from (the metric
+        value is lower), and a short registration (of txPathRefineIters 
+        iterations) starting from it neither improves the metric value by
+        more than txPathTol (relative) nor moves the image by more than 
+        txPathMaxShift (mm), i.e. registration wouldn't change it much.
+        
+        The parameters of a CompositeTransform (GetParameters()) are only 
+        those of its last transform, so linear paths are collapsed into a 
+        single AffineTransform (so that self.resTxParams and exports represent
+        the entire path). A DRO isn't created from the composed transform (see
+        dro_tools.create_dro.DroCreator.create_dro).
+        """
+        
+        cfgDict = params.cfgDict
+        p2c = cfgDict['p2c']
+        
+        timingMsg = "* Composing the path of transforms and checking the "\
+            + "result...\n"
+        params.add_timestamp(timingMsg)
+        
+        srcIm = sitk.Cast(srcDataset.dcmIm, sitk.sitkFloat32)
+        trgIm = sitk.Cast(trgDataset.dcmIm, sitk.sitkFloat32)
+        
+        pathTx = compose_path(txPath)
+        
+        initTx = sitk.CenteredTransformInitializer(
+            trgIm, srcIm, sitk.Euler3DTransform(),
+            sitk.CenteredTransformInitializerFilter.GEOMETRY
+            )
+        
+        self.txPathMetrics = {
+            'pathMetric' : evaluate_reg_metric(trgIm, srcIm, pathTx),
+            'initMetric' : evaluate_reg_metric(trgIm, srcIm, initTx)
+            }
+        
+        print(f"The metric value of the {len(txPath)} composed transform(s) "
+              f"is {self.txPathMetrics['pathMetric']:.5f} (v "
+              f"{self.txPathMetrics['initMetric']:.5f} for the initial "
+              "alignment).")
+        
+        if self.txPathMetrics['pathMetric']\
+                > self.txPathMetrics['initMetric']:
+            isAccepted = False
+            self.txPathMetrics['reason'] = 'The metric value is higher than'\
+                + ' that of the initial alignment.'
+        else:
+            with stage_threads(cfgDict, 'registration'):
+                refMetric, refinedMetric, shift = refine_reg_tx(
+                    trgIm, srcIm, pathTx, 
+                    numIters=cfgDict['txPathRefineIters'],
+                    numThreads=get_num_threads(cfgDict, 'registration')
+                    )
+            
+            relImprovement = (refMetric - refinedMetric)\
+                / max(abs(refinedMetric), 1e-12)
+            
+            self.txPathMetrics.update({
+                'refinedMetric' : refinedMetric,
+                'relImprovement' : relImprovement,
+                'shift' : shift
+                })
+            
+            print(f"A short registration starting from it improved the "
+                  f"metric value by {100*relImprovement:.2f}% (to "
+                  f"{refinedMetric:.5f}) and moved the image by up to "
+                  f"{shift:.2f} mm.")
+            
+            if relImprovement > cfgDict['txPathTol']:
+                isAccepted = False
+                self.txPathMetrics['reason'] = 'A short registration '\
+                    + 'improved the metric value by more than '\
+                    + f"txPathTol ({cfgDict['txPathTol']})."
+            elif shift > cfgDict['txPathMaxShift']:
+                isAccepted = False
+                self.txPathMetrics['reason'] = 'A short registration moved'\
+                    + " the image by more than txPathMaxShift "\
+                    + f"({cfgDict['txPathMaxShift']} mm)."
+            else:
+                isAccepted = True
+                self.txPathMetrics['reason'] = 'A short registration '\
+                    + 'improved the metric value by no more than txPathTol '\
+                    + 'and moved the image by no more than txPathMaxShift.'
+        
+        print(self.txPathMetrics['reason'])
+        
+        if not isAccepted:
+            print('The composed transform was rejected so image registration'
+                  ' will be performed.\n')
+            
+            timingMsg = "Took [*] to compose and reject the path of "\
+                + "transforms.\n"
+            params.add_timestamp(timingMsg)
+            
+            return False
+        
+        affMatrix = get_affine_matrix(pathTx)
+        
+        if affMatrix is None:
+            # The path includes a deformable transform:
+            self.resTx = pathTx
+            self.resTxParams = [
+                param for subTx in get_sub_txs(pathTx) 
+                for param in subTx.GetParameters()
+                ]
+        else:
+            self.resTx = sitk.AffineTransform(3)
+            self.resTx.SetMatrix(
+                [float(item) for item in affMatrix[:3, :3].ravel()]
+                )
+            self.resTx.SetTranslation(
+                [float(item) for item in affMatrix[:3, 3]]
+                )
+            self.resTxParams = list(self.resTx.GetParameters())
+        
+        self.txPath = txPath
+        
+        self.resIm = LazyImage(
+            resample_im, im=srcDataset.dcmIm, refIm=trgDataset.dcmIm, 
+            sitkTx=self.get_res_tx(trgDataset, params), interp='Linear', 
+            numThreads=get_num_threads(cfgDict, 'resampling'), p2c=False
+            )
+        
+        if p2c:
+            print('The composed transform was accepted.\n')
+        
+        timingMsg = "Took [*] to compose and accept the path of transforms.\n"
+        params.add_timestamp(timingMsg)
+        
+        return True
     
     def reduce_frames(self, params):
         # TODO update docstrings
@@ -1654,7 +2311,8 @@ class Propagator:
         
         For relation-preserving propagations of SEG data no further steps are
         required, but for RTSTUCT the pixarrByRoi need to be converted to
-        ptsByCntByRoi and cntdataByCntByRoi.
+        ptsByCntByRoi and cntdataByCntByRoi (unless the contours were 
+        propagated by transform_src_pts()).
         """
         
         roicolMod = params.cfgDict['roicolMod']
@@ -1663,14 +2321,14 @@ class Propagator:
                 + "source ROI Collection...\n"
         params.add_timestamp(timingMsg)
         
-        if roicolMod == 'RTSTRUCT':
+        if roicolMod == 'RTSTRUCT' and not self.isPtsTx:
             self.convert_pixarr_to_cntdata(srcDataset, trgDataset, params)
         
         timingMsg = "Took [*] to make a relationship-preserving "\
                 + "propagation of the source ROI Collection.\n"
         params.add_timestamp(timingMsg)
         
-    def execute(self, srcDataset, trgDataset, params, dro):
+    def execute(self, srcDataset, trgDataset, params, dro, txPath=None):
         # TODO update docstrings
         """
         Execute the methods that copy/propagate the source ROI Collection to
@@ -1687,6 +2345,11 @@ class Propagator:
         params : DataDownloader Object
             Contains parameters (cfgDict), file paths (pathsDict), timestamps
             (timings) and timing messages (timingMsgs).
+        txPath : list of dicts, optional
+            The path of existing transforms from the Source to the Target 
+            Frame of Reference (see DroImporter.find_tx_path) that will be
+            used (if it passes the check in create_tx_from_path) if no 
+            suitable DRO was found. The default value is None.
         
         Returns
         -------
@@ -1779,7 +2442,8 @@ class Propagator:
             if p2c:
                 print('Running useCase in ["3a", "3b", "4a" and "4b"]\n')
             
-            self.resample_src_labims(srcDataset, trgDataset, params)
+            if not self.transform_src_pts(srcDataset, trgDataset, params):
+                self.resample_src_labims(srcDataset, trgDataset, params)
             
             """ 
             Although resampling of the source image to the target domain is 
@@ -1788,13 +2452,14 @@ class Propagator:
             (e.g. for overlays of the resampled ROI Collection on the resampled
             DICOM image).
             """ 
-            self.resIm = resample_im(
-                srcDataset.dcmIm, refIm=trgDataset.dcmIm,
-                sitkTx=self.resTx, p2c=params.cfgDict['p2c']
+            self.resIm = LazyImage(
+                resample_im, srcDataset.dcmIm, refIm=trgDataset.dcmIm,
+                sitkTx=self.get_res_tx(trgDataset, params), 
+                numThreads=get_num_threads(cfgDict, 'resampling'),
+                useGridAligned=cfgDict['useGridAlignedRes'],
+                p2c=params.cfgDict['p2c']
                 )
             
-            self.resDcmPixarr = sitk.GetArrayViewFromImage(self.resIm)
-            
             if p2c:
                 # Plot resampled result:
                 midInd = trgDataset.dcmIm.GetSize()[2] // 2
@@ -1823,7 +2488,15 @@ class Propagator:
                     print('Image registeration will be performed instead',
                           'of using the DRO from XNAT.\n')
                 
-                self.register_image(srcDataset, trgDataset, params)
+                # Compose a path of existing transforms if one was found, and
+                # only register if there wasn't or it was rejected:
+                isPathUsed = dro == None and txPath != None and useDroForTx\
+                    and self.create_tx_from_path(
+                        srcDataset, trgDataset, txPath, params
+                        )
+                
+                if not isPathUsed:
+                    self.register_image(srcDataset, trgDataset, params)
                 #self.plot_res_results(srcDataset, trgDataset, params)
                 #self.plot_roi_over_dicom_im(srcDataset, trgDataset, params)
             else:
@@ -1837,8 +2510,10 @@ class Propagator:
                 self.create_tx_from_dro(srcDataset, trgDataset, dro, params)
             
             # Resample the source label images using the registration 
-            # transform (i.e. transform the source label images):
-            self.resample_src_labims(srcDataset, trgDataset, params)
+            # transform (i.e. transform the source label images), unless the
+            # source contours can be transformed directly:
+            if not self.transform_src_pts(srcDataset, trgDataset, params):
+                self.resample_src_labims(srcDataset, trgDataset, params)
             
         if useCase in ['3a', '4a', '5a']:
             self.make_non_relationship_preserving_propagation(
@@ -1868,9 +2543,14 @@ class Propagator:
         #    "target image domain.\n"
         #params.add_timestamp(timingMsg)
     
-    def export_labims(self, srcDataset, trgDataset, params):
+    def export_labims(self, srcDataset, trgDataset, params, exporter=None):
         """ 
         Export source, target and new label images (for all ROIs/segments).
+        
+        If exporter (an ExportManager, see io_tools.export_manager) is 
+        provided the label images will be written on its background workers.
+        The format and compression of the label images are given by the
+        config settings labimExportFormat and compressExports.
         """
         
         print('* Exporting label images..\n')
@@ -1881,9 +2561,11 @@ class Propagator:
         
         labimExportDir = cfgDict['labimExportDir']
         runID = cfgDict['runID']
+        fileFormat = cfgDict['labimExportFormat']
+        useCompression = cfgDict['compressExports']
         
         if not os.path.isdir(labimExportDir):
-            Path(labimExportDir).mkdir(parents=True)
+            Path(labimExportDir).mkdir(parents=True, exist_ok=True)
         
         dateTime = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
         
@@ -1899,15 +2581,37 @@ class Propagator:
                 for r in range(len(labimByRoi)):
                     fname = f'{runID}_{dsName}Labim_{r}_{dateTime}'
                     
-                    export_im(
-                        labimByRoi[r], filename=f'{fname}{r}',
-                        fileFormat='HDF5ImageIO', exportDir=labimExportDir
-                    )
-        
-        timingMsg = "Took [*] to export the label images.\n"
+                    if exporter is None:
+                        export_labim(
+                            labimByRoi[r], filename=fname,
+                            fileFormat=fileFormat, exportDir=labimExportDir,
+                            useCompression=useCompression
+                            )
+                    else:
+                        exporter.submit_im(
+                            labimByRoi[r], filename=fname, 
+                            exportDir=labimExportDir, fileFormat=fileFormat,
+                            isLabim=True
+                            )
+        
+        if exporter is None:
+            timingMsg = "Took [*] to export the label images.\n"
+        else:
+            timingMsg = "Took [*] to queue the label images for export.\n"
         params.add_timestamp(timingMsg)
     
-    def export_txs_and_params(self, srcDataset, trgDataset, params):
+    def export_txs_and_params(
+            self, srcDataset, trgDataset, params, exporter=None
+            ):
+        """
+        Export the transforms (and/or their parameters) used for the
+        propagation.
+        
+        If exporter (an ExportManager, see io_tools.export_manager) is 
+        provided the transforms will be written on its background workers.
+        The files exported for each transform are given by the config setting
+        txExportExts.
+        """
         
         print('* Exporting transforms and transform parameters..\n')
         timingMsg = "* Exporting transforms and transform parameters...\n"
@@ -1920,9 +2624,10 @@ class Propagator:
         useCaseToApply = cfgDict['useCaseToApply']
         useDroForTx = cfgDict['useDroForTx']
         regTxName = cfgDict['regTxName']
+        fileExts = cfgDict['txExportExts']
         
         if not os.path.isdir(txExportDir):
-            Path(txExportDir).mkdir(parents=True)
+            Path(txExportDir).mkdir(parents=True, exist_ok=True)
         
         #srcLabimByRoi = srcDataset.labimByRoi
         #trgLabimByRoi = trgDataset.labimByRoi
@@ -1938,48 +2643,49 @@ class Propagator:
         
         dateTime = time.strftime("%Y%m%d_%H%M%S", time.gmtime())
         
-        # Prepare filenames:
+        # Prepare filenames (transforms without a filename aren't exported):
+        resFname = ''
+        initRegFname = ''
+        preRegFname = ''
+        
         if useCaseToApply in ['3a', '3b', '4a', '4b']:
             resFname = f'{runID}_resTx'
             
-        elif useCaseToApply in ['5a', '5a']:
+        elif useCaseToApply in ['5a', '5b']:
             if useDroForTx:
                 resFname = f'{runID}_regTx_{regTxName}_from_DRO'
                 
                 if regTxName == 'bspline':
-                    preRegFname = '{runID}_pre_regTx_from_DRO'
+                    preRegFname = f'{runID}_pre_regTx_from_DRO'
                 
             else:
                 resFname = f'{runID}_regTx_{regTxName}'
-                initRegFname = 'init_regTx'
+                initRegFname = f'{runID}_init_regTx'
         
         # List of transforms to export and their names:
         txs = [resTx, initRegTx, preRegTx]
         fnames = [resFname, initRegFname, preRegFname]
         
         for tx, fname in zip(txs, fnames):
-            if tx: # is not None
+            if tx and fname: # tx is not None
                 fname += f'_{dateTime}'
                 
-                # Export tx as a TFM:
-                fpath = os.path.join(txExportDir, fname + '.tfm')
-                sitk.WriteTransform(tx, fpath)
-                
-                # Export tx as HDF:
-                fpath = os.path.join(txExportDir, fname + '.hdf')
-                sitk.WriteTransform(tx, fpath)
-                
-                # Export the tx parameters as a TXT:
-                export_list_to_txt(
-                    items=tx.GetParameters(),
-                    filename=fname,
-                    exportDir=txExportDir
-                    )
+                if exporter is None:
+                    export_tx(tx, fname, txExportDir, fileExts)
+                else:
+                    exporter.submit_tx(tx, fname, txExportDir, fileExts)
         
-        timingMsg = "Took [*] to export transforms and transform parameters.\n"
+        if exporter is None:
+            timingMsg = "Took [*] to export transforms and transform "\
+                + "parameters.\n"
+        else:
+            timingMsg = "Took [*] to queue transforms and transform "\
+                + "parameters for export.\n"
         params.add_timestamp(timingMsg)
     
-    def plot_roi_over_dicom_im(self, srcDataset, trgDataset, params):
+    def plot_roi_over_dicom_im(
+            self, srcDataset, trgDataset, params, plotter=None
+            ):
         """ 
         Plot along columns:
         col 1 : Src points (srcDataset.ptsByCntByRoi) or pixel arrays 
@@ -2002,6 +2708,9 @@ class Propagator:
                 (trgDataset.dcmIm)
         
         for use cases 3-5.
+        
+        If plotter (a PlotManager, see plotting_tools.rendering) is provided
+        the plot will be rendered and exported on a background worker.
         """
         
         """
@@ -2142,19 +2851,22 @@ class Propagator:
             listOfIPPs=listOfIPPs,
             listOfPlotTitles=listOfPlotTitles,
             fontSize=fontSize, exportPlot=exportPlot, exportDir=roiExportDir, 
-            exportFname=fname, p2c=p2c
+            exportFname=fname, p2c=p2c, plotter=plotter
         )
         
         timingMsg = "Took [*] to plot the source and target entities " +\
             "over the DICOM images.\n"
         params.add_timestamp(timingMsg)
         
-    def plot_metric_v_iters(self, params):
+    def plot_metric_v_iters(self, params, plotter=None):
         """ 
         Plot the metric values v iterations from the registeration.
         
         Note that metric values will only exist if registration was performed,
         so this plot will only be produced if useDroForTx = False.
+        
+        If plotter (a PlotManager, see plotting_tools.rendering) is provided
+        the plot will be rendered and exported on a background worker.
         """
         
         cfgDict = params.cfgDict
@@ -2194,13 +2906,16 @@ class Propagator:
             plot_metricValues_v_iters(
                 metricValues=metricValues, multiresIters=multiresIters, 
                 exportPlot=exportPlot, exportDir=resExportDir,
-                fname=fname
+                fname=fname, plotter=plotter
                 )
     
-    def plot_res_results(self, srcDataset, trgDataset, params):
+    def plot_res_results(self, srcDataset, trgDataset, params, plotter=None):
         """ 
         Plot a single slice from trgIm and resIm and compare to assess result
         of resampling/registering.
+        
+        If plotter (a PlotManager, see plotting_tools.rendering) is provided
+        the plots will be rendered and exported on a background worker.
         """
         
         cfgDict = params.cfgDict
@@ -2258,7 +2973,7 @@ class Propagator:
                         im0=trgIm, im1=image, k=midInd,
                         title0='Target image', title1=title,
                         exportPlot=exportPlot, exportDir=resExportDir,
-                        fname=fname
+                        fname=fname, plotter=plotter
                     )
     
     def print_summary_of_results(self, srcDataset, trgDataset):
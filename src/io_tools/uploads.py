@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Nov  4 14:05:27 2026
+
+@author: ctorti
+"""
+
+""" Background (in-memory) uploads of DICOM objects to XNAT. """
+
+import time
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+
+def ds_to_bytes(ds):
+    """
+    Serialise a pydicom Dataset (e.g. a ROI Collection or DRO) in memory.
+    
+    Parameters
+    ----------
+    ds : Pydicom Object
+        The dataset to be serialised.
+    
+    Returns
+    -------
+    dsBytes : bytes
+        The DICOM file as bytes (the same as those of the exported file).
+    """
+    
+    buf = BytesIO()
+    
+    # As for export to disk (e.g. by RoicolCreator.export_roicol):
+    ds.save_as(buf)
+    
+    return buf.getvalue()
+
+def get_upload_buffer(ds):
+    """
+    Get an in-memory buffer of a pydicom Dataset or its serialised bytes to
+    be used as the body of an upload request.
+    
+    Parameters
+    ----------
+    ds : Pydicom Object or bytes
+        The dataset, or the dataset serialised by ds_to_bytes.
+    
+    Returns
+    -------
+    buf : BytesIO
+        The buffer (at position 0) containing the DICOM file.
+    
+    Note
+    ----
+    Since the buffer is file-like with a known length it is streamed by
+    requests (in blocks) as the body of a PUT request, with no need to export
+    the dataset to disk and read it back. Each call returns a new buffer so
+    that the same bytes can be used by concurrent tasks (e.g. an upload and an
+    export).
+    """
+    
+    if not isinstance(ds, bytes):
+        ds = ds_to_bytes(ds)
+    
+    return BytesIO(ds)
+
+def write_bytes(dsBytes, fpath):
+    """
+    Write serialised bytes (e.g. from ds_to_bytes) to disk.
+    
+    Parameters
+    ----------
+    dsBytes : bytes
+        The bytes to be written.
+    fpath : str
+        Full path of the file to be written.
+    
+    Returns
+    -------
+    fpath : str
+        Full path of the written file.
+    """
+    
+    with open(fpath, 'wb') as file:
+        file.write(dsBytes)
+    
+    return fpath
+
+
+class UploadManager:
+    """
+    This class runs uploads (and optional exports to disk) on background
+    worker threads, so that the uploads of the new ROI Collection and DRO are
+    sent concurrently with each other and with any remaining work.
+    
+    Parameters
+    ----------
+    maxWorkers : int, optional
+        The maximum number of uploads/exports to run concurrently. The default
+        value is 2.
+    
+    Returns
+    -------
+    self.futures : dict
+        Dictionary (with task names as keys) of the Futures of the submitted
+        tasks.
+    self.taskTimes : dict
+        Dictionary (with task names as keys) of the time taken by each task.
+    
+    Note
+    ----
+    The tasks are I/O bound (HTTP requests and writes to disk), so threads
+    are sufficient. The requests session is shared between the threads.
+    
+    Datasets should be serialised (using ds_to_bytes) before their tasks are
+    submitted, so that they are serialised once and aren't accessed by 
+    concurrent tasks.
+    """
+    
+    def __init__(self, maxWorkers=2):
+        self.executor = ThreadPoolExecutor(max_workers=maxWorkers)
+        self.futures = {}
+        self.taskTimes = {}
+    
+    def run_task(self, name, func, *args, **kwargs):
+        """
+        Run a task and record the time it took.
+        """
+        
+        t0 = time.time()
+        
+        result = func(*args, **kwargs)
+        
+        self.taskTimes[name] = time.time() - t0
+        
+        return result
+    
+    def submit(self, name, func, *args, **kwargs):
+        """
+        Submit a task to be run on a background worker.
+        
+        Parameters
+        ----------
+        name : str
+            The name of the task (e.g. 'roicolUpload').
+        func : function
+            The function to be run.
+        *args, **kwargs
+            The arguments of func.
+        
+        Returns
+        -------
+        future : Future
+            The Future of the task.
+        """
+        
+        if name in self.futures:
+            msg = f"A task with name '{name}' has already been submitted."
+            raise Exception(msg)
+        
+        future = self.executor.submit(
+            self.run_task, name, func, *args, **kwargs
+            )
+        
+        self.futures[name] = future
+        
+        return future
+    
+    def wait(self):
+        """
+        Wait for all submitted tasks to complete and shut down the workers.
+        
+        Returns
+        -------
+        results : dict
+            Dictionary (with task names as keys) of the values returned by
+            each task.
+        
+        Note
+        ----
+        All tasks are waited on before the exception raised by the first task
+        that failed (if any) is re-raised.
+        """
+        
+        self.executor.shutdown(wait=True)
+        
+        results = {}
+        error = None
+        
+        for name, future in self.futures.items():
+            if future.exception() is None:
+                results[name] = future.result()
+            elif error is None:
+                error = future.exception()
+        
+        if error is not None:
+            raise error
+        
+        return results
+    
+    def print_summary(self):
+        """
+        Print the time taken by each task.
+        """
+        
+        print('\nBackground uploads/exports:')
+        for name, dTime in self.taskTimes.items():
+            print(f'   {name}: {dTime:.2f} s')
+        print('')
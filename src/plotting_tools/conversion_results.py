@@ -12,13 +12,14 @@ import os
 from pathlib import Path
 #import SimpleITK as sitk
 #import itk
-import matplotlib.pyplot as plt
 #from pydicom import dcmread
 
 import dicom_tools.seg_data
 reload(dicom_tools.seg_data)
 import general_tools.general
 reload(general_tools.general)
+import plotting_tools.rendering
+reload(plotting_tools.rendering)
 
 from general_tools.general import get_unique_items, unpack
 #from image_tools.attrs_info import get_im_attrs_from_list_of_dicomDir
@@ -27,6 +28,7 @@ from general_tools.general import get_unique_items, unpack
 #    )
 #from conversion_tools.pixarrs_ims import im_to_pixarr
 from conversion_tools.inds_pts_cntdata import pts_to_inds
+from plotting_tools.rendering import FigSpec, get_frame, export_fig
 #from general_tools.console_printing import (
 #    print_indsByRoi, print_ptsByCntByRoi, print_pixarrBySeg, print_labimBySeg
 #    )
@@ -35,7 +37,8 @@ def plot_pts_and_pixarr(
         listOfIms, listOfDcmPixarr, listOfF2SindsBySeg, listOfPixarrBySeg,
         listOfC2SindsByRoi, listOfPtsByCntByRoi, #listOfDcmDirs,
         listOfIPPs, listOfPlotTitles, fontSize=12,
-        exportPlot=False, exportDir=None, exportFname='', p2c=False):
+        exportPlot=False, exportDir=None, exportFname='', p2c=False,
+        plotter=None):
     """ 
     08/06/21: Modelled on PlotPixArrsFromListOfLabImBySeg and 
     PlotContoursFromListOfRtss_v4.
@@ -44,7 +47,8 @@ def plot_pts_and_pixarr(
     SimpleITK Images.
     
     listOfDcmPixarr is a list (for each dataset, which could be of length 1) of
-    3D pixel array representations of the DICOM series.
+    3D pixel array representations of the DICOM series. If an item is None 
+    the frames will be extracted from the corresponding image in listOfIms.
     
     listOfF2SindsByRoi is a list (for each dataset, which could be of length 1) 
     of a list (for each ROI/segment) of a list of the contour-/segmentation-
@@ -63,7 +67,14 @@ def plot_pts_and_pixarr(
     listOfPlotTitles is a list (which could be of length 1) of text for each
     plot title.
     
+    plotter is an optional PlotManager (see plotting_tools.rendering). If
+    provided (and exportPlot is True) the figure will be rendered and exported
+    on a background worker.
+    
     Plot has different DATASETS ALONG COLUMNS and different SLICES ALONG ROWS. 
+    
+    Only the frames that are plotted are extracted from the DICOM pixel arrays
+    (or images).
     """
     
     if p2c:
@@ -141,7 +152,7 @@ def plot_pts_and_pixarr(
     else:
         #figSize = (4*Ncols, 8*Nrows)
         figSize = (3*Ncols, 5*Nrows)
-    fig, ax = plt.subplots(Nrows, Ncols, figsize=figSize, dpi=dpi)
+    figSpec = FigSpec(Nrows, Ncols, figSize, dpi)
     
     # Loop through each slice/frame number (i.e. each row in the plot):
     for rowNum in range(maxNumSlices):
@@ -176,13 +187,16 @@ def plot_pts_and_pixarr(
             if rowNum < len(uniqueSinds):
                 sInd = uniqueSinds[rowNum]
                 
-                dcmFrame = dcmPixarr[sInd]
+                if dcmPixarr is None:
+                    dcmFrame = get_frame(dcmIm, sInd)
+                else:
+                    dcmFrame = get_frame(dcmPixarr, sInd)
                 IPP = IPPs[sInd]
                 
-                ax = plt.subplot(Nrows, Ncols, n)
+                ax = figSpec.subplot(n)
             
                 #im = ax.imshow(dcmFrame, cmap=plt.cm.Greys_r)
-                ax.imshow(dcmFrame, cmap=plt.cm.Greys_r, alpha=dcmAlpha)
+                ax.imshow(dcmFrame, cmap='Greys_r', alpha=dcmAlpha)
                 
                 if p2c:
                     print(f'   sInd = {sInd}')
@@ -215,7 +229,7 @@ def plot_pts_and_pixarr(
                             for f in range(len(frameNums)):
                                 frameNum = frameNums[f]
                             
-                                segFrame = segPixarr[frameNum]
+                                segFrame = get_frame(segPixarr, frameNum)
                                 
                                 if p2c:
                                     print(f'      sliceNum = {sInd} is in f2sInds')
@@ -381,8 +395,10 @@ def plot_pts_and_pixarr(
         
         exportFpath = os.path.join(exportDir, exportFname)
         
-        plt.savefig(exportFpath, bbox_inches='tight')
+        export_fig(figSpec, exportFpath, plotter)
         
         print(f'Plot exported to:\n {exportFpath}\n')
+    else:
+        export_fig(figSpec)
         
     return
\ No newline at end of file
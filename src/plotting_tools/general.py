@@ -17,6 +17,8 @@ import general_tools.geometry
 reload(general_tools.geometry)
 import dicom_tools.rts_data
 reload(dicom_tools.rts_data)
+import plotting_tools.rendering
+reload(plotting_tools.rendering)
 
 
 import time
@@ -38,6 +40,7 @@ from general_tools.console_printing import (
     )
 from dicom_tools.rts_data import get_rts_data_from_list_of_rtss
 from conversion_tools.inds_pts_cntdata import pts_to_inds
+from plotting_tools.rendering import FigSpec, get_frame, export_fig
     
 def plot_two_ims(
         im0, im1, ind0, ind1=None, plotTitle0='im0', plotTitle1='im1',
@@ -356,7 +359,7 @@ def plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
         listOfSegs, listOfDicomPixarrs, listOfDicomDirs, listOfPlotTitles,
         exportPlot=False, exportDir='cwd', runID='', useCaseToApply='',
         forceReg=False, useDroForTx=False, regTxName='', initMethod='', 
-        resInterp='', fname='', fontSize=12, p2c=False
+        resInterp='', fname='', fontSize=12, p2c=False, plotter=None
         ):
     """
     02/06/2021
@@ -371,7 +374,9 @@ def plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
     listOfSegs is a list (which could be of length 1) of SEG (Pydicom) objects.
     
     listOfDicomPixarrs is a list (which could be of length 1) of a list (for
-    each DICOM) of pixel array representations of the DICOM.
+    each DICOM) of pixel array representations of the DICOM (or of a 3D pixel
+    array, 3D SimpleITK Image, or list of DICOM file paths, from which the 
+    frames that are plotted will be extracted).
     
     listOfDicomDirs is a list (which could be of length 1) of strings 
     containing the directory containing DICOMs.
@@ -392,6 +397,9 @@ def plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
     
     both of which then calls this function. 
     
+    If plotter (a PlotManager, see plotting_tools.rendering) is provided (and
+    exportPlot is True) the figure will be rendered and exported on a
+    background worker.
     
     Plot has different DATASETS ALONG COLUMNS and different SLICES ALONG ROWS. 
     """
@@ -400,17 +408,6 @@ def plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
         listOfImIPPs, listOfImDirections, listOfDcmFpaths\
             = get_seg_data_from_list_of_segs(listOfSegs, listOfDicomDirs, p2c)
     
-    # Get a list of pixel arrays for each dicom for each dataset:
-    listOfDcmPixarrs = []
-    
-    # Loop through each dataset:
-    for i in range(len(listOfDcmFpaths)):
-        dcmFpaths = listOfDcmFpaths[i]
-        pixarrs = []
-        for fpath in dcmFpaths:
-            pixarrs.append(dcmread(fpath).pixel_array)
-        listOfDcmPixarrs.append(pixarrs)
-    
     # Get the maximum number of slices containing segmentations in any ROI in 
     # any dataset:
     maxNumSlices = 0
@@ -466,7 +463,7 @@ def plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
         #figSize = (4*Ncols, 6.5*Nrows)
         figSize = (3*Ncols, 5*Nrows)
     
-    fig, ax = plt.subplots(Nrows, Ncols, figsize=figSize, dpi=dpi)
+    figSpec = FigSpec(Nrows, Ncols, figSize, dpi)
     
     # Loop through each slice number (i.e. each row in the plot):
     for rowNum in range(maxNumSlices):
@@ -477,7 +474,7 @@ def plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
             uniqueSinds = listOfUniqueSinds[i]
             
             #dicomFpaths = listOfDcmFpaths[i]
-            dicomPixarrs = listOfDcmPixarrs[i]
+            dicomPixarrs = listOfDicomPixarrs[i]
             IPPs = listOfImIPPs[i]
             #directions = listOfImDirections[i]
             #spacings = listOfImSpacings[i]
@@ -494,13 +491,13 @@ def plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
             if rowNum < len(uniqueSinds):
                 sInd = uniqueSinds[rowNum]
                 
-                ax = plt.subplot(Nrows, Ncols, n)
+                ax = figSpec.subplot(n)
                 
                 #dicomPixarr = dcmread(dicomFpaths[sInd]).pixel_array
-                dicomPixarr = dicomPixarrs[sInd]
+                dicomPixarr = get_frame(dicomPixarrs, sInd)
                 
                 #im = ax.imshow(dicomPixarr, cmap=plt.cm.Greys_r)
-                ax.imshow(dicomPixarr, cmap=plt.cm.Greys_r, alpha=dcmAlpha)
+                ax.imshow(dicomPixarr, cmap='Greys_r', alpha=dcmAlpha)
                 
                 IPP = IPPs[sInd]
                     
@@ -526,7 +523,7 @@ def plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
                         for f in range(len(frameNums)):
                             frameNum = frameNums[f]
                         
-                            frame = pixarr[frameNum]
+                            frame = get_frame(pixarr, frameNum)
                             
                             if p2c:
                                 print(f'      SliceNum = {sInd} is in f2sInds')
@@ -604,9 +601,11 @@ def plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
         
         exportFpath = os.path.join(exportDir, exportFname)
         
-        plt.savefig(exportFpath, bbox_inches='tight')
+        export_fig(figSpec, exportFpath, plotter)
         
         print(f'Plot exported to:\n {exportFpath}\n')
+    else:
+        export_fig(figSpec)
         
     return
 
@@ -614,7 +613,7 @@ def plot_pixarrs_from_list_of_segs_and_dicomDirs(
         listOfSegs, listOfDicomDirs, listOfPlotTitles,
         exportPlot=False, exportDir='cwd', runID='', useCaseToApply='',
         forceReg=False, useDroForTx=False, regTxName='', initMethod='', 
-        resInterp='', fname='', p2c=False
+        resInterp='', fname='', p2c=False, plotter=None
         ):
     """ 
     02/06/2021
@@ -648,22 +647,15 @@ def plot_pixarrs_from_list_of_segs_and_dicomDirs(
         listOfImIPPs, listOfImDirections, listOfDicomFpaths\
             = get_seg_data_from_list_of_segs(listOfSegs, listOfDicomDirs, p2c)
     
-    # Get a list of pixel arrays for each dicom for each dataset:
-    listOfDicomPixarrs = []
-    
-    # Loop through each dataset:
-    for i in range(len(listOfDicomFpaths)):
-        fpaths = listOfDicomFpaths[i]
-        pixarrs = []
-        for fpath in fpaths:
-            pixarrs.append(dcmread(fpath).pixel_array)
-        listOfDicomPixarrs.append(pixarrs)
+    # The DICOM file paths for each dataset (only the DICOMs of the slices
+    # that are plotted will be read):
+    listOfDicomPixarrs = listOfDicomFpaths
     
     plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
         listOfSegs, listOfDicomPixarrs, listOfDicomDirs, listOfPlotTitles,
         exportPlot, exportDir, runID, useCaseToApply,
         forceReg, useDroForTx, regTxName, initMethod, 
-        resInterp, fname, p2c
+        resInterp, fname, p2c=p2c, plotter=plotter
         )
         
     return
@@ -672,7 +664,7 @@ def plot_pixarrs_from_list_of_segs_and_dicom_ims(
         listOfSegs, listOfDicomIms, listOfDicomDirs, listOfPlotTitles,
         exportPlot=False, exportDir='cwd', runID='', useCaseToApply='',
         forceReg=False, useDroForTx=False, regTxName='', initMethod='', 
-        resInterp='', fname='', fontSize=12, p2c=False
+        resInterp='', fname='', fontSize=12, p2c=False, plotter=None
         ):
     """ 
     02/06/2021
@@ -710,21 +702,16 @@ def plot_pixarrs_from_list_of_segs_and_dicom_ims(
         listOfImIPPs, listOfImDirections, listOfDicomFpaths\
             = get_seg_data_from_list_of_segs(listOfSegs, listOfDicomDirs, p2c)
     
-    # Store the 3D pixel arrays for each dataset:
-    listOfDicomPixarrs = []
-    
-    # Loop through each dataset:
-    for i in range(len(listOfDicomIms)):
-        image = listOfDicomIms[i]
-        
-        #listOfDicomPixarrs.append(im_to_pixarr(image)) # 20/09/21
-        listOfDicomPixarrs.append(sitk.GetArrayViewFromImage(image))
+    # The 3D images for each dataset (only the slices that are plotted will be
+    # extracted):
+    #listOfDicomPixarrs.append(im_to_pixarr(image)) # 20/09/21
+    listOfDicomPixarrs = list(listOfDicomIms)
     
     plot_pixarrs_from_list_of_segs_and_dicomPixarrs(
         listOfSegs, listOfDicomPixarrs, listOfDicomDirs, listOfPlotTitles,
         exportPlot, exportDir, runID, useCaseToApply,
         forceReg, useDroForTx, regTxName, initMethod, 
-        resInterp, fname, fontSize, p2c
+        resInterp, fname, fontSize, p2c, plotter
         )
         
     return
@@ -1326,7 +1313,7 @@ def plot_contours_from_list_of_rtss_and_dicom_ims(
         listOfRtss, listOfDicomIms, listOfDicomDirs, listOfPlotTitles,
         exportPlot=False, exportDir='cwd', runID='', useCaseToApply='',
         forceReg=False, useDroForTx=False, regTxName='', initMethod='', 
-        resInterp='', fname='', fontSize=12, p2c=False
+        resInterp='', fname='', fontSize=12, p2c=False, plotter=None
         ):
     """ 
     Previously called PlotContoursFromListOfRtss_v4.
@@ -1351,6 +1338,9 @@ def plot_contours_from_list_of_rtss_and_dicom_ims(
     ListOfPlotTitles is a list (which could be of length 1) of text for each
     plot title.
     
+    If plotter (a PlotManager, see plotting_tools.rendering) is provided (and
+    exportPlot is True) the figure will be rendered and exported on a
+    background worker.
     
     Plot has different DATASETS ALONG COLUMNS and different SLICES ALONG ROWS. 
     """
@@ -1412,7 +1402,7 @@ def plot_contours_from_list_of_rtss_and_dicom_ims(
         #figSize = (4*Ncols, 6.5*Nrows)
         figSize = (3*Ncols, 5*Nrows)
     
-    fig, ax = plt.subplots(Nrows, Ncols, figsize=figSize, dpi=dpi)
+    figSpec = FigSpec(Nrows, Ncols, figSize, dpi)
     
     # Loop through each slice/frame number (i.e. each row in the plot):
     for rowNum in range(maxNumSlices):
@@ -1422,7 +1412,6 @@ def plot_contours_from_list_of_rtss_and_dicom_ims(
             c2sIndsByRoi = listOfC2SindsByRoi[i]
             uniqueSinds = listOfUniqueSinds[i]
             dicomIm = listOfDicomIms[i]
-            dicom3dPixarr = sitk.GetArrayViewFromImage(dicomIm)
             
             IPPs = listOfImIPPs[i]
             #Origin = listOfOrigins[i]
@@ -1442,12 +1431,12 @@ def plot_contours_from_list_of_rtss_and_dicom_ims(
             if rowNum < len(uniqueSinds):
                 sInd = uniqueSinds[rowNum]
                 
-                ax = plt.subplot(Nrows, Ncols, n)
+                ax = figSpec.subplot(n)
                 
                 #dicomPixArr = dcmread(dicomFpaths[sInd]).pixel_array
             
                 ax.imshow(
-                    dicom3dPixarr[sInd], cmap=plt.cm.Greys_r, alpha=dcmAlpha
+                    get_frame(dicomIm, sInd), cmap='Greys_r', alpha=dcmAlpha
                     )
                 
                 IPP = IPPs[sInd]
@@ -1571,8 +1560,10 @@ def plot_contours_from_list_of_rtss_and_dicom_ims(
         
         exportFpath = os.path.join(exportDir, exportFname)
         
-        plt.savefig(exportFpath, bbox_inches='tight')
+        export_fig(figSpec, exportFpath, plotter)
         
         print(f'Plot exported to:\n {exportFpath}\n')
+    else:
+        export_fig(figSpec)
         
     return
\ No newline at end of file
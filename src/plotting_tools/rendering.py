@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Nov  6 10:12:44 2026
+
+@author: ctorti
+"""
+
+""" Headless rendering of (QA) figures on background worker processes. """
+
+import os
+import time
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import SimpleITK as sitk
+import matplotlib
+from matplotlib.figure import Figure
+from pydicom import dcmread
+
+from image_tools.lazy import get_im
+
+
+class AxesSpec:
+    """
+    This class records the calls (e.g. imshow, plot and set_title) to be made
+    on a matplotlib Axes, so that a subplot can be described in the main
+    process and drawn when its figure is rendered (e.g. on a worker process).
+    
+    Returns
+    -------
+    self.calls : list of tuples
+        List (for each call) of the name of the Axes method, its arguments and
+        its keyword arguments.
+    
+    Note
+    ----
+    The arguments must be picklable (e.g. Numpy arrays, lists, strs, and
+    colormaps given by name), so pixel arrays should only contain the frames
+    that are to be shown (see get_frame).
+    """
+    
+    def __init__(self):
+        self.calls = []
+    
+    def imshow(self, *args, **kwargs):
+        self.calls.append(('imshow', args, kwargs))
+    
+    def plot(self, *args, **kwargs):
+        self.calls.append(('plot', args, kwargs))
+    
+    def set_title(self, *args, **kwargs):
+        self.calls.append(('set_title', args, kwargs))
+    
+    def set_xlabel(self, *args, **kwargs):
+        self.calls.append(('set_xlabel', args, kwargs))
+    
+    def set_ylabel(self, *args, **kwargs):
+        self.calls.append(('set_ylabel', args, kwargs))
+    
+    def axis(self, *args, **kwargs):
+        self.calls.append(('axis', args, kwargs))
+    
+    def colorbar(self):
+        """ Add a colorbar for the last image shown (by imshow). """
+        self.calls.append(('colorbar', (), {}))
+    
+    def draw(self, ax, fig):
+        """
+        Make the recorded calls on a matplotlib Axes.
+        """
+        
+        mappable = None
+        
+        for name, args, kwargs in self.calls:
+            if name == 'colorbar':
+                fig.colorbar(mappable, ax=ax)
+            else:
+                result = getattr(ax, name)(*args, **kwargs)
+                
+                if name == 'imshow':
+                    mappable = result
+
+
+class FigSpec:
+    """
+    This class describes a figure with a grid of subplots (as created by
+    plt.subplots) without using the pyplot state machine.
+    
+    Parameters
+    ----------
+    Nrows : int
+        The number of rows of subplots.
+    Ncols : int
+        The number of columns of subplots.
+    figSize : tuple of floats, optional
+        The figure size (width, height) in inches. The default value is None,
+        in which case matplotlib's default size will be used.
+    dpi : int, optional
+        The resolution of the figure (and exported file). The default value is
+        None, in which case matplotlib's default dpi will be used.
+    
+    Returns
+    -------
+    self.axes : dict
+        Dictionary (with subplot numbers as keys) of AxesSpecs.
+    """
+    
+    def __init__(self, Nrows, Ncols, figSize=None, dpi=None):
+        self.Nrows = Nrows
+        self.Ncols = Ncols
+        self.figSize = figSize
+        self.dpi = dpi
+        self.axes = {}
+    
+    def subplot(self, n):
+        """
+        Get the AxesSpec of a subplot (as for plt.subplot(Nrows, Ncols, n)).
+        
+        Parameters
+        ----------
+        n : int
+            The (1-indexed) subplot number.
+        
+        Returns
+        -------
+        axSpec : AxesSpec
+        """
+        
+        if not n in self.axes:
+            self.axes[n] = AxesSpec()
+        
+        return self.axes[n]
+    
+    def get_data(self):
+        """
+        Get the description of the figure as a dictionary of built-in types.
+        
+        Returns
+        -------
+        figData : dict
+        
+        Note
+        ----
+        FigSpecs are sent to worker processes as dictionaries since instances
+        of a class don't pickle once its module has been reloaded (using
+        importlib.reload).
+        """
+        
+        return {
+            'Nrows' : self.Nrows,
+            'Ncols' : self.Ncols,
+            'figSize' : self.figSize,
+            'dpi' : self.dpi,
+            'callsByAxes' : {n : axSpec.calls for n, axSpec in self.axes.items()}
+            }
+    
+    @classmethod
+    def from_data(cls, figData):
+        """
+        Create a FigSpec from the dictionary returned by get_data.
+        """
+        
+        figSpec = cls(
+            figData['Nrows'], figData['Ncols'], figData['figSize'],
+            figData['dpi']
+            )
+        
+        for n, calls in figData['callsByAxes'].items():
+            figSpec.subplot(n).calls = calls
+        
+        return figSpec
+
+
+def get_frame(source, k):
+    """
+    Get a single 2D frame from a 3D image or pixel array, without converting
+    the whole image to a pixel array.
+    
+    Parameters
+    ----------
+    source : SimpleITK Image, LazyImage, Numpy array or list
+        The 3D image, pixel array, list (for each slice) of 2D pixel arrays or
+        list (for each slice) of DICOM file paths.
+    k : int
+        The slice index.
+    
+    Returns
+    -------
+    frame : Numpy array
+        The 2D pixel array (a copy) of slice k.
+    """
+    
+    source = get_im(source)
+    
+    if isinstance(source, sitk.Image):
+        # Only slice k is extracted and converted:
+        return sitk.GetArrayFromImage(source[:, :, int(k)])
+    
+    item = source[k]
+    
+    if isinstance(item, str):
+        # Only the DICOM of slice k is read:
+        return dcmread(item).pixel_array
+    
+    return np.array(item)
+
+def render_fig(figSpec, exportFpath=None, thumbFpath=None, thumbDpi=30):
+    """
+    Render a FigSpec and (optionally) export it to disk.
+    
+    Parameters
+    ----------
+    figSpec : FigSpec
+        The description of the figure.
+    exportFpath : str, optional
+        The full file path of the exported figure. The default value is None,
+        in which case the figure will be created using pyplot (e.g. to be
+        displayed in a console/IDE) and not exported.
+    thumbFpath : str, optional
+        The full file path of a PNG thumbnail of the figure. The default value
+        is None, in which case a thumbnail won't be exported.
+    thumbDpi : int, optional
+        The resolution of the thumbnail. The default value is 30.
+    
+    Returns
+    -------
+    exportFpath : str or None
+        The full file path of the exported figure.
+    
+    Note
+    ----
+    Exported figures are created using matplotlib.figure.Figure (rather than
+    pyplot) so that they don't require an interactive backend and aren't
+    kept by pyplot once rendered.
+    """
+    
+    kwargs = {'figsize' : figSpec.figSize}
+    if figSpec.dpi is not None:
+        kwargs['dpi'] = figSpec.dpi
+    
+    if exportFpath is None:
+        import matplotlib.pyplot as plt
+        
+        fig = plt.figure(**kwargs)
+    else:
+        fig = Figure(**kwargs)
+    
+    axs = fig.subplots(figSpec.Nrows, figSpec.Ncols, squeeze=False)
+    
+    for n, axSpec in figSpec.axes.items():
+        axSpec.draw(axs.flat[n - 1], fig)
+    
+    if exportFpath is not None:
+        fig.savefig(exportFpath, bbox_inches='tight')
+        
+        if thumbFpath is not None:
+            fig.savefig(
+                thumbFpath, dpi=thumbDpi, format='png', bbox_inches='tight'
+                )
+    
+    return exportFpath
+
+def export_fig(figSpec, exportFpath=None, plotter=None):
+    """
+    Render a FigSpec, either on the workers of a PlotManager or in-process.
+    
+    Parameters
+    ----------
+    figSpec : FigSpec
+        The description of the figure.
+    exportFpath : str, optional
+        The full file path of the exported figure. The default value is None,
+        in which case the figure will be rendered in-process using pyplot
+        (and not exported).
+    plotter : PlotManager, optional
+        If provided (and exportFpath is not None) the figure will be rendered
+        and exported on a background worker. The default value is None.
+    
+    Returns
+    -------
+    None.
+    """
+    
+    if exportFpath is not None:
+        exportDir = os.path.dirname(exportFpath)
+        
+        if exportDir and not os.path.isdir(exportDir):
+            Path(exportDir).mkdir(parents=True, exist_ok=True)
+    
+    if plotter is not None and exportFpath is not None:
+        plotter.submit(os.path.basename(exportFpath), figSpec, exportFpath)
+    else:
+        render_fig(figSpec, exportFpath)
+
+def get_thumb_fpath(exportFpath):
+    """
+    Get the file path of the PNG thumbnail of an exported figure.
+    """
+    
+    return os.path.splitext(exportFpath)[0] + '_thumb.png'
+
+def init_worker():
+    """
+    Initialise a worker process with the non-interactive (Agg) backend.
+    """
+    
+    matplotlib.use('Agg')
+
+def run_render(figData, exportFpath, thumbFpath, thumbDpi):
+    """
+    Render a FigSpec (from the dictionary returned by FigSpec.get_data) on a
+    worker process and return the time it took.
+    """
+    
+    t0 = time.time()
+    
+    render_fig(
+        FigSpec.from_data(figData), exportFpath, thumbFpath, thumbDpi
+        )
+    
+    return exportFpath, thumbFpath, time.time() - t0
+
+
+class PlotManager:
+    """
+    This class renders and exports figures (described by FigSpecs) on
+    background worker processes, so that plotting is off the critical path
+    of the run.
+    
+    Parameters
+    ----------
+    maxWorkers : int, optional
+        The maximum number of figures to render concurrently. The default
+        value is 2.
+    thumbnails : bool, optional
+        If True a PNG thumbnail (with suffix '_thumb') will be exported with
+        each figure. The default value is False.
+    thumbDpi : int, optional
+        The resolution of the thumbnails. The default value is 30.
+    
+    Returns
+    -------
+    self.futures : dict
+        Dictionary (with task names as keys) of the Futures of the submitted
+        figures.
+    self.taskTimes : dict
+        Dictionary (with task names as keys) of the time taken to render and
+        export each figure.
+    
+    Note
+    ----
+    Rendering is CPU bound and matplotlib isn't thread-safe, so the figures
+    are rendered on processes (started with 'spawn' so that they don't
+    inherit the state of the threads of the main process) using the Agg
+    backend. The workers are started when the first figure is submitted.
+    """
+    
+    def __init__(self, maxWorkers=2, thumbnails=False, thumbDpi=30):
+        self.executor = ProcessPoolExecutor(
+            max_workers=maxWorkers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker
+            )
+        self.thumbnails = thumbnails
+        self.thumbDpi = thumbDpi
+        self.futures = {}
+        self.taskTimes = {}
+    
+    def submit(self, name, figSpec, exportFpath):
+        """
+        Submit a figure to be rendered and exported on a background worker.
+        
+        Parameters
+        ----------
+        name : str
+            The name of the task (e.g. the file name of the exported figure).
+        figSpec : FigSpec
+            The description of the figure.
+        exportFpath : str
+            The full file path of the exported figure.
+        
+        Returns
+        -------
+        future : Future
+            The Future of the task.
+        """
+        
+        if name in self.futures:
+            msg = f"A figure with name '{name}' has already been submitted."
+            raise Exception(msg)
+        
+        thumbFpath = get_thumb_fpath(exportFpath) if self.thumbnails else None
+        
+        future = self.executor.submit(
+            run_render, figSpec.get_data(), exportFpath, thumbFpath, 
+            self.thumbDpi
+            )
+        
+        self.futures[name] = future
+        
+        return future
+    
+    def wait(self):
+        """
+        Wait for all submitted figures to be exported and shut down the
+        workers.
+        
+        Returns
+        -------
+        results : dict
+            Dictionary (with task names as keys) of the full file paths of the
+            exported figures.
+        
+        Note
+        ----
+        All figures are waited on before the exception raised by the first
+        figure that failed (if any) is re-raised.
+        """
+        
+        self.executor.shutdown(wait=True)
+        
+        results = {}
+        error = None
+        
+        for name, future in self.futures.items():
+            if future.exception() is None:
+                exportFpath, thumbFpath, dTime = future.result()
+                
+                results[name] = exportFpath
+                self.taskTimes[name] = dTime
+            elif error is None:
+                error = future.exception()
+        
+        if error is not None:
+            raise error
+        
+        return results
+    
+    def print_summary(self):
+        """
+        Print the time taken to render and export each figure.
+        """
+        
+        print('\nBackground plots:')
+        for name, dTime in self.taskTimes.items():
+            print(f'   {name}: {dTime:.2f} s')
+        print('')
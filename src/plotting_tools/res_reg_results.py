@@ -26,21 +26,23 @@ import matplotlib.pyplot as plt
 #    )
 #from conversion_tools.pixarrs_ims import im_to_pixarr
 
-from image_tools.operations import normalise_im
+from image_tools.operations import normalise_im, get_im_stats
 from general_tools.pixarr_ops import checkered_frame
+from plotting_tools.rendering import FigSpec, export_fig
 
 def plot_metricValues_v_iters(
         metricValues, multiresIters, exportPlot=False, 
-        exportDir='cwd', fname=''
+        exportDir='cwd', fname='', plotter=None
         ):
     
-    plt.figure(figsize=(10,8))
+    figSpec = FigSpec(1, 1, figSize=(10,8))
     
-    plt.plot(metricValues, 'r')
-    plt.plot(multiresIters, 
-             [metricValues[ind] for ind in multiresIters], 'b*')
-    plt.xlabel('Iteration number', fontsize=12)
-    plt.ylabel('Metric value', fontsize=12)
+    ax = figSpec.subplot(1)
+    ax.plot(list(metricValues), 'r')
+    ax.plot(multiresIters, 
+            [metricValues[ind] for ind in multiresIters], 'b*')
+    ax.set_xlabel('Iteration number', fontsize=12)
+    ax.set_ylabel('Metric value', fontsize=12)
     
     if exportPlot:
         if exportDir == 'cwd':
@@ -57,9 +59,11 @@ def plot_metricValues_v_iters(
         
         exportFpath = os.path.join(exportDir, exportFname)
         
-        plt.savefig(exportFpath, bbox_inches='tight')
+        export_fig(figSpec, exportFpath, plotter)
         
         print(f'\nPlot exported to:\n\n{exportFpath}\n')
+    else:
+        export_fig(figSpec)
         
     return
 
@@ -105,7 +109,7 @@ def compare_res_results(
         im0, im1, k,
         title0='Resampled image 0', title1='Resampled image 1', 
         exportPlot=False, exportDir='cwd', fname='', fontSize=12,
-        cBarForDiffIm=False
+        cBarForDiffIm=False, plotter=None
         ):
     """
     Plot two SimpleITK images, a blended image and a difference image.
@@ -137,6 +141,10 @@ def compare_res_results(
     fontSize : int, optional
         The font size for the plot title and axes labels. The default value is 
         12.
+    plotter : PlotManager, optional
+        If provided (and exportPlot is True) the figure will be rendered and
+        exported on a background worker (see plotting_tools.rendering). The
+        default value is None.
         
     Returns
     -------
@@ -146,6 +154,9 @@ def compare_res_results(
     ----
     It will be assumed that im0 and im1 have the same size/dimensions, as will
     be the case for resampled/registered images.
+    
+    Only slice k of im0 and im1 is normalised (by the sum of all voxels in the
+    respective image, as for normalise_im), rather than the whole images.
     """
     
     # Use the origin or central pixel to report the z-position?
@@ -163,15 +174,16 @@ def compare_res_results(
     else:
         i, j = 0, 0
     
-    im0 = normalise_im(im0)
-    im1 = normalise_im(im1)
+    # Normalise slice k of each image by the sum of the image:
+    sliceIm0 = im0[:, :, k]/get_im_stats(im0)[5]
+    sliceIm1 = im1[:, :, k]/get_im_stats(im1)[5]
     
-    frame0 = sitk.GetArrayViewFromImage(im0)[k, :, :]
-    frame1 = sitk.GetArrayViewFromImage(im1)[k, :, :]
+    frame0 = sitk.GetArrayFromImage(sliceIm0)
+    frame1 = sitk.GetArrayFromImage(sliceIm1)
     
-    blendedIm = (1.0 - alpha)*im0[:, :, k] + alpha*im1[:, :, k]
+    blendedIm = (1.0 - alpha)*sliceIm0 + alpha*sliceIm1
     
-    diffIm = im0[:, :, k] - im1[:, :, k]
+    diffIm = sliceIm0 - sliceIm1
     
     checkeredFrame = checkered_frame(frame0, frame1)
     
@@ -189,39 +201,39 @@ def compare_res_results(
         dpi = 80
         
     #plt.subplots(2, 2, figsize=(10,11), dpi=dpi)
-    plt.subplots(2, 3, figsize=(15,12), dpi=dpi)
+    figSpec = FigSpec(2, 3, figSize=(15,12), dpi=dpi)
     
-    plt.subplot(2, 3, 1)
-    plt.imshow(frame0, cmap=plt.cm.Greys_r);
-    plt.title(title0, fontsize=fontSize)
-    plt.axis('off')
+    ax = figSpec.subplot(1)
+    ax.imshow(frame0, cmap='Greys_r')
+    ax.set_title(title0, fontsize=fontSize)
+    ax.axis('off')
     
-    plt.subplot(2, 3, 2)
-    plt.imshow(frame1, cmap=plt.cm.Greys_r);
-    plt.title(title1, fontsize=fontSize)
-    plt.axis('off')
+    ax = figSpec.subplot(2)
+    ax.imshow(frame1, cmap='Greys_r')
+    ax.set_title(title1, fontsize=fontSize)
+    ax.axis('off')
     
-    plt.subplot(2, 3, 3)
-    plt.axis('off')
+    ax = figSpec.subplot(3)
+    ax.axis('off')
     
-    plt.subplot(2, 3, 4)
-    plt.imshow(sitk.GetArrayViewFromImage(blendedIm), cmap=plt.cm.Greys_r);
-    plt.title(blendedTitle, fontsize=fontSize)
-    plt.axis('off')
+    ax = figSpec.subplot(4)
+    ax.imshow(sitk.GetArrayFromImage(blendedIm), cmap='Greys_r')
+    ax.set_title(blendedTitle, fontsize=fontSize)
+    ax.axis('off')
     
-    ax = plt.subplot(2, 3, 5)
-    im = ax.imshow(sitk.GetArrayViewFromImage(diffIm), cmap=plt.cm.Greys_r);
+    ax = figSpec.subplot(5)
+    ax.imshow(sitk.GetArrayFromImage(diffIm), cmap='Greys_r')
     ax.set_title(diffTitle, fontsize=fontSize)
     ax.axis('off')
     if cBarForDiffIm:
         #cbar = plt.colorbar(im, ax=ax)
         #cbar.mappable.set_clim(0, MaxVal)
-        plt.colorbar(im, ax=ax)
+        ax.colorbar()
     
-    plt.subplot(2, 3, 6)
-    plt.imshow(checkeredFrame, cmap=plt.cm.Greys_r);
-    plt.title(checkeredTitle, fontsize=fontSize)
-    plt.axis('off')
+    ax = figSpec.subplot(6)
+    ax.imshow(checkeredFrame, cmap='Greys_r')
+    ax.set_title(checkeredTitle, fontsize=fontSize)
+    ax.axis('off')
     
     #plt.show()
     
@@ -240,9 +252,11 @@ def compare_res_results(
         
         exportFpath = os.path.join(exportDir, exportFname)
         
-        plt.savefig(exportFpath, bbox_inches='tight')
+        export_fig(figSpec, exportFpath, plotter)
         
         print(f'\nPlot exported to:\n\n{exportFpath}\n')
+    else:
+        export_fig(figSpec)
     
     return
 
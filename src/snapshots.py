@@ -15,6 +15,15 @@ Example usage as a module (run in a command shell)
 
 python snapshots.py http://10.1.1.20
 
+or (fetching only the experiments that are new or have changed since the last
+snapshot)
+
+python snapshots.py http://10.1.1.20 --incremental
+
+or (using bulk listings of the XNAT search service)
+
+python snapshots.py http://10.1.1.20 --bulk
+
 
 Example usage as a function (run in a Python command shell)
 -----------------------------------------------------------
@@ -71,6 +80,8 @@ from xnat_tools.projects import get_proj_desc_by_proj
 #from xnat_tools.dates_times import get_start_date_by_proj
 from xnat_tools.dates_times import get_first_last_im_session_uploads_by_proj
 from xnat_tools.format_pathsDict import reorder_keys_and_fill_zeros
+from xnat_tools.snapshot_store import SnapshotStore
+from xnat_tools.bulk_queries import get_bulk_data_by_proj
 from xnat_tools.alias_tokens import (
     import_alias_token, is_alias_token_valid, generate_alias_token,
     export_alias_token
@@ -82,7 +93,8 @@ from io_tools.exports import (
 
 def get_xnat_snapshot(
         url, username="", password="", session=None,
-        export_xlsx=True, log_to_console=False
+        export_xlsx=True, log_to_console=False, incremental=False,
+        store_fpath=None, bulk=False
         ):
     """
     Get a "snapshot" of info from an XNAT broken down by projects, and 
@@ -109,6 +121,21 @@ def get_xnat_snapshot(
     log_to_console : bool, optional
         If True some results will be printed to the console. The default value
         is False.
+    incremental : bool, optional
+        If True the file counts and sizes of each experiment will be kept in a
+        local store (see xnat_tools.snapshot_store), and only experiments that
+        are new or have changed since the last snapshot will be fetched. The
+        default value is False.
+    store_fpath : str, optional
+        The file path of the store used if incremental = True. The default 
+        value is None, in which case the store will be 
+        "xnat_snapshots/snapshot_store.db" in the current working directory.
+    bulk : bool, optional
+        If True the file counts and sizes, project descriptions and upload
+        dates will be fetched with a few column-selected bulk listings (see
+        xnat_tools.bulk_queries) rather than by project and by experiment,
+        falling back to the latter for any listing the XNAT forbids. The 
+        default value is False.
     
     Returns
     -------
@@ -153,13 +180,13 @@ def get_xnat_snapshot(
         *Took 3.26 s to get all snapshots.
     """
     
+    # Get current working directory:
+    cwd = os.getcwd()
+    
+    # Assumed directory that may contain an XNAT alias token:
+    tokenDir = os.path.join(cwd, 'xnat_tokens')
+    
     if session == None:
-        # Get current working directory:
-        cwd = os.getcwd()
-        
-        # Assumed directory that may contain an XNAT alias token:
-        tokenDir = os.path.join(cwd, 'xnat_tokens')
-        
         print(f'Searching for an XNAT alias token in {tokenDir}')
         # Import an XNAT alias token:
         aliasToken = import_alias_token(tokenDir)
@@ -225,22 +252,54 @@ def get_xnat_snapshot(
     image scans by modality, ave. scans/session, ave. image scans/session,
     no. of DICOM/RTSTRUCT/AIM/SEG files, total size of DICOM/RTSTRUCT/SEG files,
     etc, all organised by project: """
-    data_by_proj = get_file_count_size_by_type_by_proj(
-        url, session, data_by_proj
-        )
-    
-    times.append(time.time())
-    Dtime = round(times[-1] - times[-2], 2)
-    if log_to_console:
-        print(f'*Took {Dtime} s to fetch file counts and sizes.\n')
-    
-    """ Get the project description by project: """
-    data_by_proj = get_proj_desc_by_proj(url, session, data_by_proj)
+    if incremental:
+        if store_fpath is None:
+            store_fpath = os.path.join(
+                cwd, 'xnat_snapshots', 'snapshot_store.db'
+                )
+        
+        store = SnapshotStore(store_fpath)
+    else:
+        store = None
+    
+    if bulk:
+        """ Get the above, the project descriptions and the first and last 
+        upload dates by project with bulk listings (falling back to requests
+        by project/experiment for any that fail): """
+        data_by_proj, fallbacks = get_bulk_data_by_proj(
+            url, session, data_by_proj, log_to_console, store
+            )
+        
+        times.append(time.time())
+        Dtime = round(times[-1] - times[-2], 2)
+        if log_to_console:
+            print(f'*Took {Dtime} s to fetch file counts and sizes, project',
+                  'descriptions and image session uploads.\n')
+    else:
+        data_by_proj = get_file_count_size_by_type_by_proj(
+            url, session, data_by_proj, log_to_console, store
+            )
+        
+        times.append(time.time())
+        Dtime = round(times[-1] - times[-2], 2)
+        if log_to_console:
+            print(f'*Took {Dtime} s to fetch file counts and sizes.\n')
+    
+    if store is not None:
+        print(f'{store.num_fetched} experiments were fetched,',
+              f'{store.num_reused} were unchanged and {store.num_removed}',
+              'were removed since the last snapshot.\n')
+        
+        store.close()
     
-    times.append(time.time())
-    Dtime = round(times[-1] - times[-2], 2)
-    if log_to_console:
-        print(f'*Took {Dtime} s to fetch project descriptions.\n')
+    if not bulk:
+        """ Get the project description by project: """
+        data_by_proj = get_proj_desc_by_proj(url, session, data_by_proj)
+        
+        times.append(time.time())
+        Dtime = round(times[-1] - times[-2], 2)
+        if log_to_console:
+            print(f'*Took {Dtime} s to fetch project descriptions.\n')
     
     """ Start date might not be the same as first upload.. """
     #""" Get the start date by project: """
@@ -255,15 +314,16 @@ def get_xnat_snapshot(
     if log_to_console:
         print(f'*Took {Dtime} s to fetch users.\n')
     
-    """ Get the first and last upload dates by project: """
-    data_by_proj = get_first_last_im_session_uploads_by_proj(
-        url, session, data_by_proj
-        )
-    
-    times.append(time.time())
-    Dtime = round(times[-1] - times[-2], 2)
-    if log_to_console:
-        print(f'*Took {Dtime} s to fetch image session uploads.\n')
+    if not bulk:
+        """ Get the first and last upload dates by project: """
+        data_by_proj = get_first_last_im_session_uploads_by_proj(
+            url, session, data_by_proj
+            )
+        
+        times.append(time.time())
+        Dtime = round(times[-1] - times[-2], 2)
+        if log_to_console:
+            print(f'*Took {Dtime} s to fetch image session uploads.\n')
     
     """ Re-order the keys at the second tier: """
     data_by_proj = reorder_keys_and_fill_zeros(data_by_proj)
@@ -494,10 +554,31 @@ if __name__ == '__main__':
         help='Log output to the console?'
         )
     
+    parser.add_argument(
+        '--incremental', '-i',
+        action='store_true',
+        help='Only fetch experiments that are new or have changed since the '
+        + 'last snapshot?'
+        )
+    
+    parser.add_argument(
+        '--bulk', '-b',
+        action='store_true',
+        help='Fetch the statistics with bulk listings (where allowed)?'
+        )
+    
+    parser.add_argument(
+        '--store_fpath',
+        nargs='?',
+        default=None,
+        const=None,
+        help='The file path of the store of the incremental snapshots'
+        )
+    
     args = parser.parse_args()
     
     # Run get_xnat_snapshot():
     get_xnat_snapshot(
         args.url, args.username, args.password, args.session, args.export_xlsx,
-        args.log_to_console
+        args.log_to_console, args.incremental, args.store_fpath, args.bulk
         )
\ No newline at end of file
@@ -0,0 +1,513 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Nov 11 10:03:52 2026
+
+@author: ctorti
+"""
+
+""" Bulk (column-selected) XNAT search queries for snapshot statistics. """
+
+import sys
+import pandas as pd
+
+
+""" The columns of each listing as a dictionary of the names used in the
+tables (keys) and the XNAT search columns (values): """
+project_columns = {
+    'ID' : 'ID',
+    'name' : 'name',
+    'description' : 'description'
+    }
+
+# One row per project each experiment is shared into (or one row with an
+# empty shared_project if it isn't shared):
+experiment_columns = {
+    'ID' : 'ID',
+    'project' : 'project',
+    'xsiType' : 'xsiType',
+    'insert_date' : 'insert_date',
+    'shared_project' : 'xnat:experimentData/sharing/share/project'
+    }
+
+# One row per resource of each scan of each image session:
+scan_resource_columns = {
+    'ID' : 'ID',
+    'project' : 'project',
+    'scan_ID' : 'xnat:imageScanData/ID',
+    'modality' : 'xnat:imageScanData/modality',
+    'label' : 'xnat:imageScanData/file/label',
+    'format' : 'xnat:imageScanData/file/format',
+    'file_count' : 'xnat:imageScanData/file/file_count',
+    'file_size' : 'xnat:imageScanData/file/file_size'
+    }
+
+# One row per resource of each ROI Collection (with the ID of its image
+# session):
+assessor_resource_columns = {
+    'ID' : 'icr:roiCollectionData/imageSession_ID',
+    'project' : 'project',
+    'modality' : 'icr:roiCollectionData/collectionType',
+    'label' : 'icr:roiCollectionData/out/file/label',
+    'format' : 'icr:roiCollectionData/out/file/format',
+    'file_count' : 'icr:roiCollectionData/out/file/file_count',
+    'file_size' : 'icr:roiCollectionData/out/file/file_size'
+    }
+
+
+def get_table(
+        url, session, path, columns, params=None, log_to_console=False
+        ):
+    """
+    Get a column-selected listing from the XNAT search service as a table.
+    
+    Parameters
+    ----------
+    url : str
+        URL of XNAT (e.g. 'http://10.1.1.20').
+    session : requests session
+        A valid Requests Session for the XNAT of interest.
+    path : str
+        The path of the listing (e.g. '/data/experiments').
+    columns : dict
+        A dictionary of the names of the columns of the table (keys) and the
+        XNAT search columns (values).
+    params : dict, optional
+        Any other query parameters (e.g. {'xsiType' : 'xnat:mrSessionData'}).
+        The default is None.
+    log_to_console : bool, optional
+        If True the reason for a failed query will be printed to the console.
+        The default is False.
+    
+    Returns
+    -------
+    table : Pandas DataFrame or None
+        The table with one row per result and the columns in columns, or None
+        if the query failed (e.g. HTTP 403 Forbidden, as happens for some
+        queries on XNAT Central) or a column is missing from the results.
+    
+    Notes
+    -----
+    XNAT returns the columns given by XML paths (e.g.
+    'xnat:imageScanData/modality') in lower case, so columns are matched
+    ignoring case.
+    """
+    
+    if params is None:
+        params = {}
+    
+    params = dict(
+        params, columns=','.join(columns.values()), format='json'
+        )
+    
+    try:
+        request = session.get(f'{url}{path}', params=params)
+        
+        if request.status_code >= 400:
+            if log_to_console:
+                print(f'Bulk query of {path} returned HTTP',
+                      f'{request.status_code}.\n')
+            return None
+        
+        results = request.json()['ResultSet']['Result']
+    except (OSError, ValueError, KeyError, TypeError):
+        if log_to_console:
+            print(f'Bulk query of {path} failed:\n',
+                  f'{sys.exc_info()[0]}: {sys.exc_info()[1]}\n')
+        return None
+    
+    if not results:
+        return pd.DataFrame(columns=list(columns.keys()))
+    
+    table = pd.DataFrame(results)
+    
+    keys_by_lower = {key.lower() : key for key in table.columns}
+    
+    renames = {}
+    
+    for name, column in columns.items():
+        key = keys_by_lower.get(column.lower(), keys_by_lower.get(name.lower()))
+        
+        if key is None:
+            if log_to_console:
+                print(f"Bulk query of {path} didn't return the column",
+                      f"'{column}'.\n")
+            return None
+        
+        renames[key] = name
+    
+    return table.rename(columns=renames)[list(columns.keys())]
+
+def get_snapshot_tables(url, session, log_to_console=False):
+    """
+    Get the projects, experiments and resources of an XNAT with four bulk
+    listings.
+    
+    Parameters
+    ----------
+    url : str
+        URL of XNAT (e.g. 'http://10.1.1.20').
+    session : requests session
+        A valid Requests Session for the XNAT of interest.
+    log_to_console : bool, optional
+        If True some info will be printed to the console. The default is
+        False.
+    
+    Returns
+    -------
+    tables : dict
+        A dictionary containing the tables (Pandas DataFrames, or None if the
+        query failed) of the projects, experiments, scan resources and ROI
+        Collection resources.
+    """
+    
+    return {
+        'projects' : get_table(
+            url, session, '/data/projects', project_columns,
+            log_to_console=log_to_console
+            ),
+        'experiments' : get_table(
+            url, session, '/data/experiments', experiment_columns,
+            log_to_console=log_to_console
+            ),
+        'scan_resources' : get_table(
+            url, session, '/data/experiments', scan_resource_columns,
+            {'xsiType' : 'xnat:imageSessionData'}, log_to_console
+            ),
+        'assessor_resources' : get_table(
+            url, session, '/data/experiments', assessor_resource_columns,
+            {'xsiType' : 'icr:roiCollectionData'}, log_to_console
+            )
+        }
+
+def get_exp_mod(exp_type):
+    """
+    Get the modality of an experiment from its xsiType (e.g. 'MR' from
+    'xnat:mrSessionData'), as in get_file_count_size_by_type_by_proj.
+    """
+    
+    return exp_type.split('xnat:')[1].split('SessionData')[0].upper()
+
+def add_counts_by_proj(data_by_proj, counts, key_format):
+    """
+    Add counts (a Pandas Series indexed by project, or by project and a
+    second level used in the key) to data_by_proj.
+    """
+    
+    for index, value in counts.items():
+        if isinstance(index, tuple):
+            proj_id, item = index
+            key = key_format.format(item)
+        else:
+            proj_id = index
+            key = key_format
+        
+        if not proj_id in data_by_proj.keys():
+            continue
+        
+        value = value.item() if hasattr(value, 'item') else value
+        
+        if key in data_by_proj[proj_id].keys():
+            data_by_proj[proj_id][key] += value
+        else:
+            data_by_proj[proj_id][key] = value
+
+def get_shares(experiments):
+    """
+    Get a table of the IDs of the experiments and the projects they are 
+    shared into (columns 'ID' and 'shared_project') from the table of 
+    experiments (see experiment_columns).
+    """
+    
+    is_shared = experiments['shared_project'].fillna('') != ''
+    
+    return experiments.loc[
+        is_shared, ['ID', 'shared_project']
+        ].drop_duplicates()
+
+def add_shared_rows(table, shares):
+    """
+    Add a copy of the rows of each experiment (matched by 'ID') in table for
+    each project it is shared into (see get_shares), with the shared project
+    as 'project'.
+    """
+    
+    if shares.empty:
+        return table
+    
+    shared = table.merge(shares, on='ID')
+    shared['project'] = shared.pop('shared_project')
+    
+    return pd.concat([table, shared], ignore_index=True)
+
+def get_file_count_size_by_type_by_proj_from_tables(
+        proj_ids, experiments, resources, data_by_proj=None
+        ):
+    """
+    Return a dictionary containing the number of files and the total size of
+    files by modality, all organised by project, from the tables of bulk
+    listings (as for get_file_count_size_by_type_by_proj).
+    
+    Parameters
+    ----------
+    proj_ids : list of strs
+        The IDs of the projects.
+    experiments : Pandas DataFrame
+        The table of experiments (see experiment_columns).
+    resources : Pandas DataFrame
+        The table of resources of scans and ROI Collections (see
+        scan_resource_columns and assessor_resource_columns).
+    data_by_proj : dict, optional
+        A dictionary with projects as keys, containing data organised by
+        projects. The default is None.
+    
+    Returns
+    -------
+    data_by_proj : dict
+        A dictionary with projects as keys, containing data organised by
+        projects.
+    
+    Notes
+    -----
+    Experiments (and their resources) are counted under their (primary) 
+    project and each project they are shared into (see get_shares), as in 
+    get_file_count_size_by_type_by_proj.
+    """
+    
+    from xnat_tools.file_count_size import get_empty_counts
+    
+    if data_by_proj == None:
+        data_by_proj = {}
+    
+    for proj_id in proj_ids:
+        if proj_id in data_by_proj.keys():
+            data_by_proj[proj_id].update(get_empty_counts())
+        else:
+            data_by_proj[proj_id] = get_empty_counts()
+    
+    shares = get_shares(experiments)
+    
+    exps = add_shared_rows(
+        experiments.drop(columns='shared_project').drop_duplicates('ID'),
+        shares
+        )
+    exps = exps[exps['project'].isin(proj_ids)]
+    
+    add_counts_by_proj(
+        data_by_proj, exps.groupby('project').size(), 'No. of experiments'
+        )
+    
+    # Experiments of type 'xnat:...' by modality:
+    exp_mods = exps['xsiType'].map(
+        lambda exp_type: get_exp_mod(exp_type) if 'xnat:' in exp_type\
+            else None
+        )
+    
+    add_counts_by_proj(
+        data_by_proj, exps.groupby(['project', exp_mods]).size(),
+        'No. of {} sessions'
+        )
+    
+    num_sessions = exps[
+        exps['xsiType'].str.contains('Session')
+        ].groupby('project').size()
+    
+    res = add_shared_rows(resources, shares)
+    res = res[res['project'].isin(proj_ids)].copy()
+    
+    # File size is not listed for SNAPSHOTS so skip them (and rows of
+    # sessions without scans):
+    res = res[(res['label'] != 'SNAPSHOTS') & (res['label'].fillna('') != '')]
+    
+    """ Change 'PT' to 'PET' for consistency: """
+    res['modality'] = res['modality'].replace('PT', 'PET')
+    
+    res['file_count'] = pd.to_numeric(
+        res['file_count'], errors='coerce'
+        ).fillna(0)
+    res['file_size'] = pd.to_numeric(
+        res['file_size'], errors='coerce'
+        ).fillna(0)/1000000 # convert to MB
+    
+    rois = res[res['label'].isin(['RTSTRUCT', 'SEG'])]
+    
+    add_counts_by_proj(
+        data_by_proj,
+        rois.groupby(['project', 'label'])['file_count'].sum(),
+        'No. of {} ROI files'
+        )
+    
+    # DICOM scans (images):
+    ims = res[res['label'] == 'DICOM']
+    
+    add_counts_by_proj(
+        data_by_proj, ims.groupby('project')['file_count'].sum()/1000,
+        'No. of DICOM image files [k]'
+        )
+    add_counts_by_proj(
+        data_by_proj, ims.groupby('project')['file_size'].sum(),
+        'Size of DICOM image files [MB]'
+        )
+    
+    # DICOM scans, RTSTRUCT scans and ROI Collections:
+    dcms = res[res['format'] == 'DICOM']
+    
+    add_counts_by_proj(
+        data_by_proj, dcms.groupby('project')['file_count'].sum()/1000,
+        'No. of DICOM files [k]'
+        )
+    add_counts_by_proj(
+        data_by_proj, dcms.groupby('project')['file_size'].sum(),
+        'Size of DICOM files [MB]'
+        )
+    
+    # Image scans and secondary DICOMs (e.g. RTSTRUCT or OT scans) by
+    # modality:
+    scans = pd.concat([ims, dcms[dcms['label'] == 'secondary']])
+    
+    add_counts_by_proj(
+        data_by_proj, scans.groupby(['project', 'modality']).size(),
+        'No. of {} scans'
+        )
+    
+    """ Get the average number of image scans by project (dividing ints, since
+    Numpy rounds halves to even): """
+    num_im_scans = ims.groupby('project').size()
+    
+    for proj_id in proj_ids:
+        if num_sessions.get(proj_id, 0):
+            data_by_proj[proj_id]['Ave. image scans/session'] = round(
+                int(num_im_scans.get(proj_id, 0))/int(num_sessions[proj_id]),
+                1
+                )
+    
+    """ Round the file sizes and file counts expressed in k to 2 decimals: """
+    for project in list(data_by_proj.keys()):
+        for key, value in data_by_proj[project].items():
+            if '[MB]' in key or '[k]' in key:
+                data_by_proj[project][key] = round(value, 2)
+    
+    return data_by_proj
+
+def get_bulk_data_by_proj(
+        url, session, data_by_proj=None, log_to_console=False, store=None
+        ):
+    """
+    Return a dictionary containing the project descriptions, file counts and
+    sizes by modality, and first and last image session uploads, organised by
+    project, using bulk listings where the XNAT allows them.
+    
+    Parameters
+    ----------
+    url : str
+        URL of XNAT (e.g. 'http://10.1.1.20').
+    session : requests session
+        A valid Requests Session for the XNAT of interest.
+    data_by_proj : dict, optional
+        A dictionary with projects as keys, containing data organised by
+        projects. The default is None.
+    log_to_console : bool, optional
+        If True some info will be printed to the console. The default is
+        False.
+    store : SnapshotStore, optional
+        The store used (see xnat_tools.snapshot_store) if the file counts and
+        sizes have to be crawled by experiment. The default is None.
+    
+    Returns
+    -------
+    data_by_proj : dict
+        A dictionary with projects as keys, containing data organised by
+        projects.
+    fallbacks : list of strs
+        The names of the statistics that were fetched using the per-project or
+        per-experiment requests (since a bulk listing failed).
+    
+    Notes
+    -----
+    The same data is returned as by get_proj_desc_by_proj,
+    get_file_count_size_by_type_by_proj and
+    get_first_last_im_session_uploads_by_proj, which are used for any
+    statistic whose bulk listings fail (e.g. are forbidden).
+    """
+    
+    from xnat_tools.projects import get_project_ids, get_proj_desc_by_proj
+    from xnat_tools.file_count_size import get_file_count_size_by_type_by_proj
+    from xnat_tools.dates_times import (
+        get_first_last_im_session_uploads_by_proj
+        )
+    
+    if data_by_proj == None:
+        data_by_proj = {}
+    
+    tables = get_snapshot_tables(url, session, log_to_console)
+    
+    projects = tables['projects']
+    experiments = tables['experiments']
+    
+    fallbacks = []
+    
+    if projects is None:
+        proj_ids = get_project_ids(url, session)
+    else:
+        proj_ids = projects['ID'].tolist()
+    
+    """ Get the file counts and sizes by project: """
+    if experiments is None or tables['scan_resources'] is None\
+            or tables['assessor_resources'] is None:
+        fallbacks.append('file counts and sizes')
+        
+        data_by_proj = get_file_count_size_by_type_by_proj(
+            url, session, data_by_proj, log_to_console, store
+            )
+    else:
+        resources = pd.concat(
+            [tables['scan_resources'], tables['assessor_resources']],
+            ignore_index=True
+            )
+        
+        data_by_proj = get_file_count_size_by_type_by_proj_from_tables(
+            proj_ids, experiments, resources, data_by_proj
+            )
+    
+    """ Get the project description by project: """
+    if projects is None:
+        fallbacks.append('project descriptions')
+        
+        data_by_proj = get_proj_desc_by_proj(url, session, data_by_proj)
+    else:
+        for proj_id, desc in zip(projects['ID'], projects['description']):
+            if not isinstance(desc, str) or desc == '':
+                # There is no description for this project:
+                desc = 'None'
+            
+            data_by_proj[proj_id]['Project description'] = desc
+    
+    """ Get the first and last upload dates by project: """
+    if experiments is None:
+        fallbacks.append('first and last uploads')
+        
+        data_by_proj = get_first_last_im_session_uploads_by_proj(
+            url, session, data_by_proj
+            )
+    else:
+        # The dates are by (primary) project, as in
+        # get_first_last_im_session_uploads_by_proj:
+        sessions = experiments.drop_duplicates('ID')
+        sessions = sessions[sessions['xsiType'].str.contains('SessionData')]
+        
+        dates = sessions.groupby('project', sort=False)['insert_date']
+        
+        for project, first_date, last_date in zip(
+                dates.min().index, dates.min(), dates.max()
+                ):
+            if project in data_by_proj.keys():
+                data_by_proj[project]['First upload'] = first_date
+                data_by_proj[project]['Last upload'] = last_date
+            else:
+                data_by_proj[project] = {'First upload' : first_date}
+                data_by_proj[project].update({'Last upload' : last_date})
+    
+    if log_to_console and fallbacks:
+        print('Bulk listings failed for the', ', '.join(fallbacks),
+              'which were fetched by project/experiment instead.\n')
+    
+    return data_by_proj, fallbacks
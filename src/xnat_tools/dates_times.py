@@ -49,7 +49,8 @@ def get_insert_dates_by_proj(url, session):
             print('')
     
         if 'SessionData' in exp_type:
-            request = session.get(f'{url}/data/experiments/{exp_id}/scans')
+            # (The scans of the session aren't needed so aren't requested)
+            #request = session.get(f'{url}/data/experiments/{exp_id}/scans')
     
             #print(request, '\n')
             
@@ -6,8 +6,13 @@ Created on Mon Jul  5 11:58:55 2021
 """
 
 
+# The columns of the experiments listed by project (including the last 
+# modified dates) if a SnapshotStore is used:
+exp_columns = 'ID,label,xsiType,date,insert_date,last_modified,URI'
+
+
 def get_file_count_size_by_type_by_proj(
-        url, session, data_by_proj=None, log_to_console=False
+        url, session, data_by_proj=None, log_to_console=False, store=None
         ):
     """
     06/07/21 NOTE: 
@@ -33,6 +38,11 @@ def get_file_count_size_by_type_by_proj(
         projects. The default is None.
     log_to_console : bool, optional
         If True some info will be printed to the console.
+    store : SnapshotStore, optional
+        If provided only the experiments that are new or have changed (i.e.
+        whose insert date or last modified date differ from those stored) will
+        be fetched, and the counts and sizes of the others will be taken from 
+        the store (see xnat_tools.snapshot_store). The default is None.
 
     Returns
     -------
@@ -139,46 +149,28 @@ def get_file_count_size_by_type_by_proj(
     if data_by_proj == None:
         data_by_proj = {}
     
-    empty_dict = {'No. of experiments' : 0,
-                  'No. of MR sessions' : 0,
-                  'No. of CT sessions' : 0,
-                  'No. of PET sessions' : 0,
-                  'Ave. image scans/session' : 0,
-                  #'Ave. scans/session' : 0,
-                  'No. of MR scans' : 0,
-                  'No. of CT scans' : 0,
-                  'No. of PET scans' : 0,
-                  'No. of OT scans' : 0,
-                  'No. of DICOM image files [k]' : 0,
-                  'Size of DICOM image files [MB]' : 0,
-                  'No. of RTSTRUCT scans' : 0,
-                  #'Size of RTSTRUCT scans [MB]' : 0,
-                  #'No. of AIM ROI files' : 0,
-                  #'Size of AIM ROI files [MB]' : 0,
-                  'No. of RTSTRUCT ROI files' : 0,
-                  #'Size of RTSTRUCT ROI files [MB]' : 0,
-                  'No. of SEG ROI files' : 0,
-                  #'Size of SEG ROI files [MB]' : 0,
-                  'No. of DICOM files [k]' : 0,
-                  'Size of DICOM files [MB]' : 0
-                  }
     
     proj_ids = get_project_ids(url, session)
     
     for proj_id in proj_ids:
         if proj_id in data_by_proj.keys():
-            data_by_proj[proj_id].update(empty_dict)
+            data_by_proj[proj_id].update(get_empty_counts())
         else:
-            #data_by_proj[proj_id] = {}
-            #data_by_proj[proj_id] = empty_dict
-            #data_by_proj[proj_id] = deepcopy(empty_dict)
-            data_by_proj[proj_id] = dict(empty_dict) # or empty_dict.copy()
-            
-            #print('empty_dict = ', empty_dict, '\n')
+            data_by_proj[proj_id] = get_empty_counts()
             
         
         # Get all experiments for this proj_id:
-        request = session.get(f'{url}/data/projects/{proj_id}/experiments')
+        if store is None:
+            request = session.get(
+                f'{url}/data/projects/{proj_id}/experiments'
+                )
+        else:
+            # Include the last modified dates (to detect changed 
+            # experiments):
+            request = session.get(
+                f'{url}/data/projects/{proj_id}/experiments',
+                params={'columns' : exp_columns, 'format' : 'json'}
+                )
         
         """ 06/07/21: When running snapshot method on XNAT Central I get
         
@@ -197,11 +189,11 @@ def get_file_count_size_by_type_by_proj(
             
             key = 'No. of experiments'
             data_by_proj[proj_id][key] = len(exps)
-                
-            URIs = [exp['URI'] for exp in exps]
+            
+            if store is not None:
+                stored_by_exp = store.get_exps(url, proj_id)
             
             num_sessions_this_proj = 0 # initial value of no. of image sessions for this project
-            num_scans_this_proj = 0 # initial value of the no. of scans for this project
             num_im_scans_this_proj = 0 # initial value of the no. of image scans for this project
             
             # Loop through each experiment:
@@ -213,6 +205,7 @@ def get_file_count_size_by_type_by_proj(
                 exp_id = exps[exp_no]['ID']
                 exp_date = exps[exp_no]['date']
                 insert_date = exps[exp_no]['insert_date']
+                last_modified = exps[exp_no].get('last_modified', '')
             
                 if log_to_console:
                     print('----------------------------------------------------')
@@ -234,222 +227,44 @@ def get_file_count_size_by_type_by_proj(
                 if 'Session' in exp_type:
                     num_sessions_this_proj += 1
                 
-                #URI = URIs[exp_no]
-                
-                # Get more details for this experiment: 
-                request = session.get(f'{url}{URIs[exp_no]}?format=json')
+                stored = None
+                if store is not None:
+                    stored = stored_by_exp.get(exp_id, None)
                 
-                exp = request.json()['items'][0]['children']
+                if stored is not None and stored[:2] == (insert_date, last_modified):
+                    # This experiment hasn't changed since it was stored:
+                    counts, num_im_scans = stored[2:]
+                    
+                    store.num_reused += 1
+                else:
+                    # Get more details for this experiment: 
+                    counts, num_im_scans = get_file_count_size_of_exp(
+                        url, session, exps[exp_no]['URI'], log_to_console
+                        )
+                    
+                    if store is not None:
+                        store.set_exp(
+                            url, proj_id, exp_id, insert_date, last_modified,
+                            counts, num_im_scans
+                            )
                 
-                if log_to_console:
-                    print(f" Experiment {exp_no} has {len(exp)} items.\n")
+                num_im_scans_this_proj += num_im_scans
                 
-                for exp_item_no in range(len(exp)):
-                    #exp_item_type = exp[exp_item_no]['field'] # assessors/assessor or scans/scan
-                    
-                    if 'assessor' in exp[exp_item_no]['field']:
-                        exp_item_type = 'assessor'
-                    elif 'scan' in exp[exp_item_no]['field']:
-                        exp_item_type = 'scan'
+                for key, value in counts.items():
+                    if key in data_by_proj[proj_id].keys():
+                        data_by_proj[proj_id][key] += value
                     else:
-                        msg = f"Unexpected field value {exp[exp_item_no]['field']}."\
-                              + "Was expecting 'assessors/assessors' or 'scans/scan'."
-                        raise Exception(msg)
-                    
-                    #print(f"    Experiment item {exp_item_no} is a {exp_item_type}.\n")
-                    
-                    if log_to_console:
-                        print(f"    Item {exp_item_no} is a {exp_item_type} and has",
-                              f"{len(exp[exp_item_no]['items'])} items.\n")
-                    
-                    # Loop through each assessor/scan sub-item:
-                    for sub_item_no in range(len(exp[exp_item_no]['items'])):
-                        # Proceed only for items with field 'out/file' (assessors)
-                        # or 'file' (scans) (there are also items with field 
-                        # 'references/seriesUID':
-                        field = exp[exp_item_no]['items'][sub_item_no]['children'][0]['field']
-                        
-                        if log_to_console:
-                            print(f"      Sub-item {sub_item_no} has field {field}.")
-                        
-                        if 'file' in field:
-                            
-                            #label = exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][0]['data_fields']['label']
-                            #item_format = exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][0]['data_fields']['format']
-                            #
-                            #print(f"      Sub-item {sub_item_no} has label {label}.")
-                            #print(f"      Sub-item {sub_item_no} has format {item_format}.")
-                            
-                            # modality doesn't exist for AIM:
-                            #modality = exp[exp_item_no]['items'][sub_item_no]['data_fields']['modality']
-                            #try:
-                            #    modality = exp[exp_item_no]['items'][sub_item_no]['data_fields']['modality']
-                            #except KeyError:
-                            #    #return exp[exp_item_no]['items'][sub_item_no]
-                            #    modality = 'N/A'
-                            
-                            """ Seems that modality is not accessible from exp[exp_item_no]['items'][sub_item_no]['children']...
-                            as are label, item_format, file_size, etc. (as obtained by looping through each sub-sub-item below). """
-                            if exp_item_type == 'assessor':
-                                modality = exp[exp_item_no]['items'][sub_item_no]['data_fields']['collectionType']
-                            else: # exp_item_type = 'scan'
-                                modality = exp[exp_item_no]['items'][sub_item_no]['data_fields']['modality']
-                            
-                            
-                            """ Change 'PT' to 'PET' for consistency: """
-                            if modality == 'PT':
-                                modality = 'PET'
-                            
-                            N = len(exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'])
-                            
-                            if log_to_console:
-                                print(f"\n      Sub-item {sub_item_no} has {N} items.")
-                            
-                            # Loop through each sub-sub-item:
-                            for sub_sub_item_no in range(N):
-                                #if log_to_console:
-                                #    print(exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][sub_sub_item_no], '\n')
-                                
-                                label = exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][sub_sub_item_no]['data_fields']['label']
-                                item_format = exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][sub_sub_item_no]['data_fields']['format']
-                                
-                                if log_to_console:
-                                    print(f"        Sub-sub-item {sub_sub_item_no} has modality {modality}.")
-                                    print(f"        Sub-sub-item {sub_sub_item_no} has label {label}.")
-                                    print(f"        Sub-sub-item {sub_sub_item_no} has format {item_format}.")
-                                
-                                # File size is not listed for SNAPSHOTS so skip them:
-                                if label == 'SNAPSHOTS':
-                                    #return exp[exp_item_no]['items'][sub_item_no]
-                                
-                                    if log_to_console:
-                                        print(f"      Skipping sub_sub_item_no {sub_sub_item_no} since it is type {label}.\n")
-                                
-                                else:
-                                    num_scans_this_proj += 1
-                                    
-                                    if label == 'DICOM':
-                                        # This is an image scan:
-                                        num_im_scans_this_proj += 1
-                                    
-                                    file_count = exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][sub_sub_item_no]['data_fields']['file_count']
-                                    file_size = exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][sub_sub_item_no]['data_fields']['file_size']
-                                    
-                                    if log_to_console:
-                                        print(f"        Sub-sub-item {sub_sub_item_no} has file_count {file_count}.")
-                                        print(f"        Sub-sub-item {sub_sub_item_no} has file_size {file_size}.\n")
-                                        
-                                        if label == 'secondary':
-                                            print(exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][sub_sub_item_no], '\n')
-                                    
-                                    # Proceed only for sub-sub-items with field 'out/file' (ignore 'references/seriesUID'):
-                                    if 'file' in exp[exp_item_no]['items'][sub_item_no]['children'][0]['field']:
-                                        file_count = exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][sub_sub_item_no]['data_fields']['file_count']
-                                        file_size = exp[exp_item_no]['items'][sub_item_no]['children'][0]['items'][sub_sub_item_no]['data_fields']['file_size']
-                                        file_size = file_size/1000000 # convert to MB
-                                        
-                                        #print(f"        Sub-sub-item {sub_sub_item_no} has modality {modality}.")
-                                        #print(f"        Sub-sub-item {sub_sub_item_no} has file_count {file_count}.")
-                                        #print(f"        Sub-sub-item {sub_sub_item_no} has file_size {file_size}.\n")
-                                        
-                                        #if label == 'AIM':
-                                        #    return exp[exp_item_no]['items']#[sub_item_no]
-                                        
-                                        #if label == 'SEG':
-                                        #    return exp[exp_item_no]['items'][sub_item_no]
-                                        #    print('')
-                                        
-                                        #if label == 'secondary':
-                                        #    return exp[exp_item_no]['items'][sub_item_no]#['children'][0]['items'][0]
-                                        #    return exp[exp_item_no]['items'][sub_item_no - 1]
-                                        #    print('')
-                                        
-                                        #if modality == 'OT':
-                                        #    return exp[exp_item_no]['items'][sub_item_no]
-                                        
-                                        #if label in ['AIM', 'RTSTRUCT', 'SEG']:
-                                        if label in ['RTSTRUCT', 'SEG']:
-                                            key = f'No. of {label} ROI files'
-                                            if key in data_by_proj[proj_id].keys():
-                                                data_by_proj[proj_id][key] += file_count
-                                            else:
-                                                data_by_proj[proj_id][key] = file_count
-                                            
-                                            """ Leave out file size for secondary
-                                            ROI Collections for now:
-                                            key = f'Size of {label} ROI files [MB]'
-                                            if key in data_by_proj[proj_id].keys():
-                                                data_by_proj[proj_id][key] += file_size
-                                            else:
-                                                data_by_proj[proj_id][key] = file_size
-                                            """
-                                        elif label == 'DICOM':
-                                            # This is a DICOM scan (images)
-                                            
-                                            key = 'No. of DICOM image files [k]'
-                                            if key in data_by_proj[proj_id].keys():
-                                                data_by_proj[proj_id][key] += file_count/1000
-                                            else:
-                                                data_by_proj[proj_id][key] = file_count/1000
-                                            
-                                            key = 'Size of DICOM image files [MB]'
-                                            if key in data_by_proj[proj_id].keys():
-                                                data_by_proj[proj_id][key] += file_size
-                                            else:
-                                                data_by_proj[proj_id][key] = file_size
-                                            
-                                            key = f"No. of {modality} scans"
-                                            if key in data_by_proj[proj_id].keys():
-                                                data_by_proj[proj_id][key] += 1
-                                            else:
-                                                data_by_proj[proj_id][key] = 1        
-                                        
-                                        if item_format == 'DICOM':
-                                            # This is a DICOM scan or RTSTRUCT scan or
-                                            # ROI Collection of type AIM, RTSTRUCT or SEG:
-                                            
-                                            key = 'No. of DICOM files [k]'
-                                            if key in data_by_proj[proj_id].keys():
-                                                data_by_proj[proj_id][key] += file_count/1000
-                                            else:
-                                                data_by_proj[proj_id][key] = file_count/1000
-                                            
-                                            key = 'Size of DICOM files [MB]'
-                                            if key in data_by_proj[proj_id].keys():
-                                                data_by_proj[proj_id][key] += file_size
-                                            else:
-                                                data_by_proj[proj_id][key] = file_size
-                                            
-                                            if label == 'secondary': 
-                                                # Secondary DICOMs, e.g. RTSTRUCT or OT scan
-                                                """ Replaced file_count with 1 counting scans
-                                                not number of files within scans. """
-                                                key = f'No. of {modality} scans'
-                                                if key in data_by_proj[proj_id].keys():
-                                                    #data_by_proj[proj_id][key] += file_count
-                                                    data_by_proj[proj_id][key] += 1
-                                                else:
-                                                    #data_by_proj[proj_id][key] = file_count
-                                                    data_by_proj[proj_id][key] = 1
-                                                
-                                                """ Leave out file size for secondary
-                                                DICOMs for now: 
-                                                key = f'Size of {modality} scans [MB]'
-                                                if key in data_by_proj[proj_id].keys():
-                                                    data_by_proj[proj_id][key] += file_size
-                                                else:
-                                                    data_by_proj[proj_id][key] = file_size
-                                                """
-                 
-                    #key = 'No. of experiments'
-                    ##if key in data_by_proj[proj_id].keys():
-                    ##    data_by_proj[proj_id][key] += 1
-                    ##else:
-                    ##    data_by_proj[proj_id][key] = 1
-                    #data_by_proj[proj_id][key] += 1
+                        data_by_proj[proj_id][key] = value
                 
                 if log_to_console:
                     print('----------------------------------------------------\n')
+            
+            if store is not None:
+                # Remove experiments that no longer exist:
+                store.remove_other_exps(
+                    url, proj_id, [exp['ID'] for exp in exps]
+                    )
+                store.commit()
                 
             """ Get the average number of scans by project: """
             #ave_scans = round(num_scans_this_proj/num_sessions_this_proj, 1)
@@ -478,11 +293,193 @@ def get_file_count_size_by_type_by_proj(
         #if log_to_console:
         #    print('****************************************************\n')
     
-    
     """ Round the file sizes and file counts expressed in k to 2 decimals: """
     for project in list(data_by_proj.keys()):
         for key, value in data_by_proj[project].items():
             if '[MB]' in key or '[k]' in key:
                 data_by_proj[project][key] = round(value, 2)
         
-    return data_by_proj
\ No newline at end of file
+    return data_by_proj
+
+def get_empty_counts():
+    """
+    Return a dictionary of the (zero) counts and sizes of a project, to which
+    the counts and sizes of its experiments are added.
+    """
+    
+    empty_dict = {'No. of experiments' : 0,
+                  'No. of MR sessions' : 0,
+                  'No. of CT sessions' : 0,
+                  'No. of PET sessions' : 0,
+                  'Ave. image scans/session' : 0,
+                  #'Ave. scans/session' : 0,
+                  'No. of MR scans' : 0,
+                  'No. of CT scans' : 0,
+                  'No. of PET scans' : 0,
+                  'No. of OT scans' : 0,
+                  'No. of DICOM image files [k]' : 0,
+                  'Size of DICOM image files [MB]' : 0,
+                  'No. of RTSTRUCT scans' : 0,
+                  #'Size of RTSTRUCT scans [MB]' : 0,
+                  #'No. of AIM ROI files' : 0,
+                  #'Size of AIM ROI files [MB]' : 0,
+                  'No. of RTSTRUCT ROI files' : 0,
+                  #'Size of RTSTRUCT ROI files [MB]' : 0,
+                  'No. of SEG ROI files' : 0,
+                  #'Size of SEG ROI files [MB]' : 0,
+                  'No. of DICOM files [k]' : 0,
+                  'Size of DICOM files [MB]' : 0
+                  }
+    
+    return empty_dict
+
+def get_file_count_size_of_exp(url, session, uri, log_to_console=False):
+    """
+    Return the number of files and the total size of files by modality of an
+    experiment.
+    
+    Parameters
+    ----------
+    url : str
+        URL of XNAT (e.g. 'http://10.1.1.20').
+    session : requests session
+        A valid Requests Session for the XNAT of interest.
+    uri : str
+        The URI of the experiment (e.g. '/data/experiments/{exp_id}').
+    log_to_console : bool, optional
+        If True some info will be printed to the console.
+    
+    Returns
+    -------
+    counts : dict
+        A dictionary containing the counts and sizes of the experiment, with
+        the same keys as data_by_proj[proj_id] (e.g. 'No. of MR scans' and
+        'Size of DICOM image files [MB]').
+    num_im_scans : int
+        The number of image scans of the experiment.
+    
+    Notes
+    -----
+    See get_file_count_size_by_type_by_proj for the structure of the 
+    experiment.
+    """
+    
+    request = session.get(f'{url}{uri}?format=json')
+    
+    exp = request.json()['items'][0]['children']
+    
+    counts = {}
+    num_im_scans = 0
+    
+    def add_to_counts(key, value):
+        if key in counts.keys():
+            counts[key] += value
+        else:
+            counts[key] = value
+    
+    if log_to_console:
+        print(f" Experiment has {len(exp)} items.\n")
+    
+    for exp_item_no in range(len(exp)):
+        if 'assessor' in exp[exp_item_no]['field']:
+            exp_item_type = 'assessor'
+        elif 'scan' in exp[exp_item_no]['field']:
+            exp_item_type = 'scan'
+        else:
+            msg = f"Unexpected field value {exp[exp_item_no]['field']}."\
+                  + "Was expecting 'assessors/assessors' or 'scans/scan'."
+            raise Exception(msg)
+        
+        if log_to_console:
+            print(f"    Item {exp_item_no} is a {exp_item_type} and has",
+                  f"{len(exp[exp_item_no]['items'])} items.\n")
+        
+        # Loop through each assessor/scan sub-item:
+        for sub_item_no in range(len(exp[exp_item_no]['items'])):
+            sub_item = exp[exp_item_no]['items'][sub_item_no]
+            
+            # Proceed only for items with field 'out/file' (assessors) or 
+            # 'file' (scans) (there are also items with field 
+            # 'references/seriesUID':
+            field = sub_item['children'][0]['field']
+            
+            if log_to_console:
+                print(f"      Sub-item {sub_item_no} has field {field}.")
+            
+            if not 'file' in field:
+                continue
+            
+            """ Seems that modality is not accessible from 
+            sub_item['children'] as are label, item_format, file_size, etc. 
+            (as obtained by looping through each sub-sub-item below). """
+            if exp_item_type == 'assessor':
+                modality = sub_item['data_fields']['collectionType']
+            else: # exp_item_type = 'scan'
+                modality = sub_item['data_fields']['modality']
+            
+            """ Change 'PT' to 'PET' for consistency: """
+            if modality == 'PT':
+                modality = 'PET'
+            
+            sub_sub_items = sub_item['children'][0]['items']
+            
+            if log_to_console:
+                print(f"\n      Sub-item {sub_item_no} has",
+                      f"{len(sub_sub_items)} items.")
+            
+            # Loop through each sub-sub-item:
+            for sub_sub_item_no in range(len(sub_sub_items)):
+                data_fields = sub_sub_items[sub_sub_item_no]['data_fields']
+                
+                label = data_fields['label']
+                item_format = data_fields['format']
+                
+                if log_to_console:
+                    print(f"        Sub-sub-item {sub_sub_item_no} has",
+                          f"modality {modality}, label {label} and format",
+                          f"{item_format}.")
+                
+                # File size is not listed for SNAPSHOTS so skip them:
+                if label == 'SNAPSHOTS':
+                    if log_to_console:
+                        print(f"      Skipping sub_sub_item_no",
+                              f"{sub_sub_item_no} since it is type {label}.\n")
+                    continue
+                
+                if label == 'DICOM':
+                    # This is an image scan:
+                    num_im_scans += 1
+                
+                file_count = data_fields['file_count']
+                file_size = data_fields['file_size']/1000000 # convert to MB
+                
+                if log_to_console:
+                    print(f"        Sub-sub-item {sub_sub_item_no} has",
+                          f"file_count {file_count} and file_size",
+                          f"{file_size} MB.\n")
+                
+                #if label in ['AIM', 'RTSTRUCT', 'SEG']:
+                if label in ['RTSTRUCT', 'SEG']:
+                    # File sizes of secondary ROI Collections are left out
+                    # for now:
+                    add_to_counts(f'No. of {label} ROI files', file_count)
+                
+                elif label == 'DICOM':
+                    # This is a DICOM scan (images)
+                    add_to_counts('No. of DICOM image files [k]', file_count/1000)
+                    add_to_counts('Size of DICOM image files [MB]', file_size)
+                    add_to_counts(f'No. of {modality} scans', 1)
+                
+                if item_format == 'DICOM':
+                    # This is a DICOM scan or RTSTRUCT scan or ROI Collection
+                    # of type AIM, RTSTRUCT or SEG:
+                    add_to_counts('No. of DICOM files [k]', file_count/1000)
+                    add_to_counts('Size of DICOM files [MB]', file_size)
+                    
+                    if label == 'secondary': 
+                        # Secondary DICOMs, e.g. RTSTRUCT or OT scan (counting
+                        # scans not the number of files within scans; file
+                        # sizes of secondary DICOMs are left out for now):
+                        add_to_counts(f'No. of {modality} scans', 1)
+    
+    return counts, num_im_scans
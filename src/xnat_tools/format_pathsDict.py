@@ -300,6 +300,25 @@ def create_pathsDict_for_subj_asr(
     
     return pathsDict, keys
 
+def merge_pathsDicts(pathsDict, pathsDictToAdd):
+    """
+    Recursively merge the items in pathsDictToAdd into pathsDict, e.g. to
+    combine the dictionaries of source and target data that were downloaded
+    concurrently. Values in pathsDictToAdd take priority over those in
+    pathsDict if both are not dictionaries.
+    """
+    
+    if pathsDict == None:
+        pathsDict = {}
+    
+    for key, value in pathsDictToAdd.items():
+        if isinstance(value, dict) and isinstance(pathsDict.get(key), dict):
+            merge_pathsDicts(pathsDict[key], value)
+        else:
+            pathsDict[key] = value
+    
+    return pathsDict
+
 def reorder_keys_and_fill_zeros(data_by_proj):
     """
     Reorder the keys in the dictionary data_by_proj and zero-fill missing keys.
@@ -14,14 +14,18 @@ import general_tools.general
 reload(general_tools.general)
 
 import os
+import threading
 from pathlib import Path
 from pydicom import dcmread
+from pydicom.dataset import Dataset
 from io import BytesIO
+from io_tools.uploads import get_upload_buffer
 from xnat_tools.sessions import create_session
 from xnat_tools.format_pathsDict import create_pathsDict_for_im_asr
 from io_tools.general import get_user_input_as_int
 from general_tools.general import (
-    combine_dates_and_times, get_ind_of_newest_and_oldest_datetime
+    combine_dates_and_times, get_ind_of_newest_and_oldest_datetime,
+    get_lock_for_fpath
     )
 
 def download_im_asr(
@@ -422,13 +426,21 @@ def download_im_asr(
         )
 
     if not os.path.isdir(exportDir):
-        Path(exportDir).mkdir(parents=True)
+        Path(exportDir).mkdir(parents=True, exist_ok=True)
         print(f'Created directory:\n {exportDir}\n')
     
     fpath = os.path.join(exportDir, fname)
     
-    with open(fpath, 'wb') as file:
-        file.write(request.content)
+    # The Source and Target ROI Collections may be the same and downloaded
+    # concurrently (see io_tools.pipeline), so write to a temporary file and
+    # replace fpath with it (so fpath is never partially written):
+    with get_lock_for_fpath(fpath):
+        tempFpath = f'{fpath}.{threading.get_ident()}.part'
+        
+        with open(tempFpath, 'wb') as file:
+            file.write(request.content)
+        
+        os.replace(tempFpath, fpath)
     
     print(f'Image assessor downloaded to:\n {fpath}\n')
     
@@ -453,7 +465,7 @@ def download_im_asr(
 
 def upload_im_asr(
         roicol_fpath, url, proj_id, session_id, coll_label='',
-        session=None, username=None, password=None
+        session=None, username=None, password=None, roicol=None
     ):
     """
     Upload an image assessor (ROI Collection) to XNAT.
@@ -479,6 +491,12 @@ def upload_im_asr(
     password : str, optional
         The password for XNAT log-in.  If not provided (i.e. password = None)
         the user will be prompted to enter a password.
+    roicol : Pydicom Object or bytes, optional
+        The ROI Collection (or the ROI Collection serialised by 
+        io_tools.uploads.ds_to_bytes) to be uploaded. If provided it will be
+        uploaded from memory (and roicol_fpath will only be used to get the
+        collection label, so the file need not exist). The default value is
+        None.
     
     Returns
     -------
@@ -486,15 +504,10 @@ def upload_im_asr(
     
     Note
     ----
-    If the file is read using pydicom.dcmread() within the same "with open() 
-    as file:" command, followed by the conversion to bytes (buf), the 
-    conversion fails since the file is not closed and reading seems to alter 
-    "file".  If "file" is converted to bytes first (buf), reading the DICOM
-    fails since it seems that "file" is apparently changed. I tried making a
-    copy.deepcopy of "file" but that didn't work.  I wasn't able to see how to
-    read the DICOM and close following read, so the file will be opened twice:
-    once to get the modality from the pydicom object, and a second time to 
-    convert to bytes.
+    The file (or roicol) is read once into a buffer, and the modality is
+    read from the buffer (without the pixel data) before rewinding the buffer
+    for upload (unless roicol is a pydicom object). The buffer is streamed as
+    the body of the PUT request.
     """
     
     #overwrite = 'false'
@@ -517,24 +530,30 @@ def upload_im_asr(
     
     #print(f'coll_label = {coll_label}')
     
-    # Get the modality from the pydicom object:
-    with open(roicol_fpath, 'rb') as file:
-        ds = dcmread(file)
-        mod = ds.Modality
+    if roicol is None:
+        with open(roicol_fpath, 'rb') as file:
+            buf = BytesIO(file.read())
+    else:
+        buf = get_upload_buffer(roicol)
     
-    # Upload the ROI Collection:
-    with open(roicol_fpath, 'rb') as file:
-        buf = BytesIO(file.read())
-        
-        uri = f"{url}/xapi/roi/projects/{proj_id}/sessions/{session_id}/" +\
-            f"collections/{coll_label}?overwrite={overwrite}&type={mod}"
-        
-        #print(f'\nmod = {mod}')
-        #print(f'type(file) = {type(file)}')
-        #print(f'type(buf) = {type(buf)}')
-        #print(f'\nuri = {uri}\n')
+    if isinstance(roicol, Dataset):
+        mod = roicol.Modality
+    else:
+        # Get the modality from the pydicom object:
+        mod = dcmread(
+            buf, stop_before_pixels=True, specific_tags=['Modality']
+            ).Modality
         
-        request = session.put(uri, data=buf)
+        buf.seek(0)
+    
+    # Upload the ROI Collection:
+    uri = f"{url}/xapi/roi/projects/{proj_id}/sessions/{session_id}/" +\
+        f"collections/{coll_label}?overwrite={overwrite}&type={mod}"
+    
+    #print(f'\nmod = {mod}')
+    #print(f'\nuri = {uri}\n')
+    
+    request = session.put(uri, data=buf)
     
     # Raise status error if not None:
     if request.raise_for_status() != None:
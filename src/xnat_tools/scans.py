@@ -14,6 +14,7 @@ from pathlib import Path
 from zipfile import ZipFile
 from xnat_tools.sessions import create_session
 from xnat_tools.format_pathsDict import create_pathsDict_for_scan
+from general_tools.general import get_lock_for_fpath
 
 
 def download_scan(config, srcORtrg, xnatSession=None, pathsDict=None):
@@ -86,35 +87,39 @@ def download_scan(config, srcORtrg, xnatSession=None, pathsDict=None):
         )
 
     if not os.path.isdir(exportDir):
-        Path(exportDir).mkdir(parents=True)
+        Path(exportDir).mkdir(parents=True, exist_ok=True)
         print(f'Created directory:\n {exportDir}\n')
     
     filepath = os.path.join(
         exportDir, f'Experiment_{expLab}__Scan_{scanID}.zip'
         )
     
-    if not os.path.exists(filepath) or OVERWRITE_ZIP:
-        with open(filepath, 'wb') as file:
-            file.write(request.content)
+    # The Source and Target scans may be the same (e.g. use case 1) and
+    # downloaded concurrently (see io_tools.pipeline), so hold the lock for
+    # filepath while the zip file is written, extracted and read:
+    with get_lock_for_fpath(filepath):
+        if not os.path.exists(filepath) or OVERWRITE_ZIP:
+            with open(filepath, 'wb') as file:
+                file.write(request.content)
             
-        print(f'Zipped file downloaded to: \n{filepath}\n')
+            print(f'Zipped file downloaded to: \n{filepath}\n')
+            
+            #zip_file = ZipFile(filepath, mode='r')
+            #zip_file.extractall(exportDir)
+            
+            with ZipFile(filepath, 'r') as file:
+                file.extractall(exportDir)
+            
+            print(f'Zipped file extracted to: \n{exportDir}\n')
+        else:
+            if not OVERWRITE_ZIP:
+                print(f'Zipped file already downloaded to: \n{filepath}\n')
         
-        #zip_file = ZipFile(filepath, mode='r')
-        #zip_file.extractall(exportDir)
         
+        """ Get the directory name of the exported DICOMs: """
+        # Get the filepath of the first file in the zip file:
         with ZipFile(filepath, 'r') as file:
-            file.extractall(exportDir)
-        
-        print(f'Zipped file extracted to: \n{exportDir}\n')
-    else:
-        if not OVERWRITE_ZIP:
-            print(f'Zipped file already downloaded to: \n{filepath}\n')
-    
-    
-    """ Get the directory name of the exported DICOMs: """
-    # Get the filepath of the first file in the zip file:
-    with ZipFile(filepath, 'r') as file:
-        filepath = file.infolist()[0].filename
+            filepath = file.infolist()[0].filename
     
     fullFpath = os.path.join(exportDir, filepath)
     
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Nov 10 09:14:37 2026
+
+@author: ctorti
+"""
+
+""" Local (SQLite) store of per-experiment results for XNAT snapshots. """
+
+import os
+import json
+import sqlite3
+from pathlib import Path
+
+
+class SnapshotStore:
+    """
+    This class stores the file counts and sizes of each experiment crawled by
+    get_file_count_size_by_type_by_proj, keyed by XNAT, project and
+    experiment ID with the experiment's insert and last modified dates, so
+    that subsequent (incremental) snapshots only fetch experiments that are
+    new or have changed.
+    
+    Parameters
+    ----------
+    fpath : str
+        Full path of the SQLite database file. If the file (or its directory)
+        doesn't exist it will be created.
+    
+    Returns
+    -------
+    self.num_fetched : int
+        The number of experiments whose results were stored (i.e. fetched).
+    self.num_reused : int
+        The number of experiments whose stored results were reused.
+    self.num_removed : int
+        The number of experiments removed from the store (e.g. deleted from
+        XNAT).
+    
+    Notes
+    -----
+    The results of an experiment are reused if its insert date and last
+    modified date are unchanged. Changes that don't update the last modified
+    date of the experiment (or if XNAT doesn't return it) won't be detected,
+    in which case the results can be refreshed by deleting the file.
+    """
+    
+    def __init__(self, fpath):
+        exportDir = os.path.dirname(fpath)
+        
+        if exportDir and not os.path.isdir(exportDir):
+            Path(exportDir).mkdir(parents=True, exist_ok=True)
+        
+        self.fpath = fpath
+        self.conn = sqlite3.connect(fpath)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS experiments (
+                url TEXT NOT NULL,
+                proj_id TEXT NOT NULL,
+                exp_id TEXT NOT NULL,
+                insert_date TEXT,
+                last_modified TEXT,
+                counts TEXT NOT NULL,
+                num_im_scans INTEGER NOT NULL,
+                PRIMARY KEY (url, proj_id, exp_id)
+                )"""
+            )
+        self.conn.commit()
+        
+        self.num_fetched = 0
+        self.num_reused = 0
+        self.num_removed = 0
+    
+    def get_exps(self, url, proj_id):
+        """
+        Get the stored results of the experiments in a project.
+        
+        Parameters
+        ----------
+        url : str
+            URL of XNAT (e.g. 'http://10.1.1.20').
+        proj_id : str
+            The project ID.
+        
+        Returns
+        -------
+        results_by_exp : dict
+            A dictionary with experiment IDs as keys, containing tuples of the
+            insert date, last modified date, counts (dict) and number of image
+            scans of each experiment.
+        """
+        
+        rows = self.conn.execute(
+            """SELECT exp_id, insert_date, last_modified, counts, num_im_scans
+            FROM experiments WHERE url = ? AND proj_id = ?""",
+            (url, proj_id)
+            )
+        
+        return {
+            exp_id : (insert_date, last_modified, json.loads(counts),
+                      num_im_scans)
+            for exp_id, insert_date, last_modified, counts, num_im_scans
+            in rows
+            }
+    
+    def set_exp(
+            self, url, proj_id, exp_id, insert_date, last_modified, counts,
+            num_im_scans
+            ):
+        """
+        Store (or replace) the results of an experiment.
+        
+        Parameters
+        ----------
+        url : str
+            URL of XNAT (e.g. 'http://10.1.1.20').
+        proj_id : str
+            The project ID.
+        exp_id : str
+            The experiment ID.
+        insert_date : str
+            The insert date of the experiment.
+        last_modified : str
+            The last modified date of the experiment.
+        counts : dict
+            The file counts and sizes of the experiment (as returned by
+            get_file_count_size_of_exp).
+        num_im_scans : int
+            The number of image scans of the experiment.
+        """
+        
+        self.conn.execute(
+            """INSERT OR REPLACE INTO experiments VALUES
+            (?, ?, ?, ?, ?, ?, ?)""",
+            (url, proj_id, exp_id, insert_date, last_modified,
+             json.dumps(counts), num_im_scans)
+            )
+        
+        self.num_fetched += 1
+    
+    def remove_other_exps(self, url, proj_id, exp_ids):
+        """
+        Remove the stored results of the experiments in a project that are
+        not in a list of experiment IDs (e.g. experiments deleted from XNAT).
+        
+        Parameters
+        ----------
+        url : str
+            URL of XNAT (e.g. 'http://10.1.1.20').
+        proj_id : str
+            The project ID.
+        exp_ids : list of strs
+            The IDs of the experiments to keep.
+        """
+        
+        rows = self.conn.execute(
+            "SELECT exp_id FROM experiments WHERE url = ? AND proj_id = ?",
+            (url, proj_id)
+            )
+        
+        stored_ids = set(exp_id for exp_id, in rows)
+        
+        to_remove = [
+            (url, proj_id, exp_id) for exp_id in stored_ids - set(exp_ids)
+            ]
+        
+        self.conn.executemany(
+            """DELETE FROM experiments
+            WHERE url = ? AND proj_id = ? AND exp_id = ?""",
+            to_remove
+            )
+        
+        self.num_removed += len(to_remove)
+    
+    def commit(self):
+        """
+        Commit the changes to the database file.
+        """
+        
+        self.conn.commit()
+    
+    def close(self):
+        """
+        Commit the changes and close the connection.
+        """
+        
+        self.conn.commit()
+        self.conn.close()
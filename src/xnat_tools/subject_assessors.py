@@ -10,6 +10,7 @@ import os
 from pathlib import Path
 from xnat_tools.sessions import create_session
 from xnat_tools.format_pathsDict import create_pathsDict_for_subj_asr
+from io_tools.uploads import get_upload_buffer
     
     
 def download_subj_asrs(
@@ -110,7 +111,7 @@ def download_subj_asrs(
 def upload_subj_asr(
         subj_asr_fpath, url, proj_id, subj_label, 
         content_label='DRO', session=None, 
-        username=None, password=None
+        username=None, password=None, subj_asr=None
         ):
     """
     Upload a subject assessor to a particular subject in XNAT.
@@ -144,6 +145,11 @@ def upload_subj_asr(
         The password for XNAT log-in.  If not provided (i.e. password = None)
         the user will be prompted to enter a password. The default value is 
         None.
+    subj_asr : Pydicom Object or bytes, optional
+        The assessor (e.g. DRO), or the assessor serialised by 
+        io_tools.uploads.ds_to_bytes, to be uploaded. If provided it will be
+        uploaded from memory (and subj_asr_fpath will only be used to get the
+        file name, so the file need not exist). The default value is None.
     
     Returns
     -------
@@ -167,12 +173,15 @@ def upload_subj_asr(
         fname_with_ext = fname + ext
     
     # Upload the resource:
-    with open(subj_asr_fpath, 'rb') as file:
-        uri = f"{url}/data/projects/{proj_id}/subjects/{subj_label}/" +\
-            f"resources/DICOM/files/{fname_with_ext}?inbody=true" +\
-            "&file_format=DICOM&overwrite=true"
-        
-        request = session.put(uri, data=file)
+    uri = f"{url}/data/projects/{proj_id}/subjects/{subj_label}/" +\
+        f"resources/DICOM/files/{fname_with_ext}?inbody=true" +\
+        "&file_format=DICOM&overwrite=true"
+    
+    if subj_asr is None:
+        with open(subj_asr_fpath, 'rb') as file:
+            request = session.put(uri, data=file)
+    else:
+        request = session.put(uri, data=get_upload_buffer(subj_asr))
     
     # Raise status error if not None:
     if request.raise_for_status() != None: